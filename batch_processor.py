@@ -18,23 +18,32 @@ os.chdir(script_dir)
 sys.path.insert(0, str(script_dir))
 
 from database.supabase_client import SupabaseUploader
-from scrapers.uk.aqa_hybrid_scraper import AQAHybridScraper
+from scrapers.uk.aqa_hybrid_scraper import AQAHybridScraper, STAGES
 from utils.logger import setup_logger
+from utils.stage_store import StageStore
 
 load_dotenv()
 
+# Per-subject stage checkpoints: a failed upload reruns from the saved extraction
+STAGE_CACHE_DIR = 'data/state/stages/batch'
+
 
 class BatchProcessor:
     """Robust batch processor with progress tracking and resume capability."""
     
-    def __init__(self, test_mode=False):
+    def __init__(self, test_mode=False, state_file=None, refresh_from=None, use_stage_cache=True):
         """
         Initialize batch processor.
         
         Args:
             test_mode: If True, only process first 3 subjects for testing
+            state_file: Existing state file to resume (skips completed subjects)
+            refresh_from: Ignore stage checkpoints from this stage on (see STAGES)
+            use_stage_cache: If False, don't read or write stage checkpoints
         """
         self.test_mode = test_mode
+        self.refresh_from = refresh_from
+        self.use_stage_cache = use_stage_cache
         self.timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
         # Setup logging
@@ -43,7 +52,7 @@ class BatchProcessor:
         self.logger = setup_logger('INFO', log_file)
         
         # State file for resumability
-        self.state_file = f'data/state/batch_state_{self.timestamp}.json'
+        self.state_file = state_file or f'data/state/batch_state_{self.timestamp}.json'
         Path(self.state_file).parent.mkdir(parents=True, exist_ok=True)
         
         # Initialize state
@@ -172,7 +181,11 @@ class BatchProcessor:
                     subject=subject['name'],
                     qualification=subject['qualification'],
                     subject_code=subject['code'],
-                    upload_to_supabase=True  # Hybrid scraper handles upload
+                    upload_to_supabase=True,  # Hybrid scraper handles upload
+                    stage_store=StageStore(
+                        STAGE_CACHE_DIR, subject_id, STAGES,
+                        refresh_from=self.refresh_from, enabled=self.use_stage_cache
+                    )
                 )
                 
                 # Check result
@@ -345,6 +358,9 @@ def main():
     parser = argparse.ArgumentParser(description='Batch Process All AQA Subjects')
     parser.add_argument('--test', action='store_true', help='Test mode: only process 3 subjects')
     parser.add_argument('--resume', help='Resume from specific state file')
+    parser.add_argument('--refresh-from', choices=STAGES,
+                        help='Ignore stage checkpoints from this stage on (e.g. extraction to re-run AI)')
+    parser.add_argument('--no-stage-cache', action='store_true', help='Do not read or write stage checkpoints')
     
     args = parser.parse_args()
     
@@ -360,7 +376,12 @@ def main():
         return 1
     
     # Create processor and run
-    processor = BatchProcessor(test_mode=args.test)
+    processor = BatchProcessor(
+        test_mode=args.test,
+        state_file=args.resume,
+        refresh_from=args.refresh_from,
+        use_stage_cache=not args.no_stage_cache
+    )
     
     try:
         processor.process_all()
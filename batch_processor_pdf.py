@@ -21,6 +21,8 @@ sys.path.insert(0, str(script_dir))
 from database.supabase_client import SupabaseUploader
 from extractors.specification_extractor import SpecificationExtractor
 from utils.logger import setup_logger
+from utils.spec_registry import SpecRegistry
+from utils.stage_store import StageStore, file_hash
 import requests
 from bs4 import BeautifulSoup
 import re
@@ -28,12 +30,20 @@ from urllib.parse import urljoin
 
 load_dotenv()
 
+# Per-subject stage checkpoints: a failed upload reruns from the saved extraction
+STAGE_CACHE_DIR = 'data/state/stages/pdf_batch'
+STAGES = ('pdf_url', 'extraction', 'upload')
+PDF_URL_MAX_AGE = 7 * 24 * 3600
+
 
 class PDFBatchProcessor:
     """Process all subjects using PDF extraction for rich metadata."""
     
-    def __init__(self, test_mode=False):
+    def __init__(self, test_mode=False, refresh_from=None, use_stage_cache=True, force=False):
         self.test_mode = test_mode
+        self.force = force
+        self.refresh_from = refresh_from
+        self.use_stage_cache = use_stage_cache
         self.timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
         # Setup logging
@@ -50,6 +60,7 @@ class PDFBatchProcessor:
         # Initialize components
         self.uploader = SupabaseUploader()
         self.pdf_extractor = SpecificationExtractor()
+        self.spec_registry = SpecRegistry()
         
         self.logger.info("=" * 80)
         self.logger.info(f"PDF BATCH PROCESSOR - Full Rich Metadata Extraction")
@@ -66,6 +77,7 @@ class PDFBatchProcessor:
             'timestamp': self.timestamp,
             'completed': [],
             'failed': [],
+            'skipped': [],
             'total_processed': 0,
             'total_cost_estimate': 0.0
         }
@@ -128,33 +140,57 @@ class PDFBatchProcessor:
             self.logger.info("=" * 80)
             
             try:
+                store = StageStore(
+                    STAGE_CACHE_DIR, subject_id, STAGES,
+                    refresh_from=self.refresh_from, enabled=self.use_stage_cache
+                )
+                
                 # Find specification page
                 spec_url = self._build_spec_url(subject)
                 self.logger.info(f"Spec page: {spec_url}")
                 
                 # Find PDF
-                pdf_url = self._find_pdf(spec_url)
+                pdf_url = store.run('pdf_url', [spec_url], lambda: self._find_pdf(spec_url),
+                                    kind='text', max_age=PDF_URL_MAX_AGE)
                 if not pdf_url:
                     raise ValueError("No PDF found")
                 
                 self.logger.info(f"[OK] PDF URL: {pdf_url}")
                 
-                # Download PDF
-                pdf_path = self._download_pdf(pdf_url, subject)
+                # Skip specs that haven't changed since the last successful run
+                registry_key = f"aqa-pdf-batch/{subject_id}"
+                spec_check = self.spec_registry.check(registry_key, pdf_url, force=self.force)
+                if not spec_check.changed:
+                    self.logger.info(f"[SKIP] Spec unchanged ({spec_check.reason})")
+                    self.state.setdefault('skipped', []).append(subject_id)
+                    continue
+                self.logger.info(f"Spec check: {spec_check.reason}")
+                
+                # Download PDF (re-download when a previously processed spec changed)
+                pdf_path = self._download_pdf(pdf_url, subject, refresh=bool(self.spec_registry.get(registry_key)))
                 if not pdf_path:
                     raise ValueError("Download failed")
                 
                 self.logger.info(f"[OK] Downloaded: {pdf_path}")
                 
-                # Extract with AI
-                self.logger.info("[AI] Extracting... (~30 seconds, costs ~$0.12)")
+                pdf_hash = file_hash(pdf_path)
+                if not self.force and self.spec_registry.content_unchanged(registry_key, content_hash=pdf_hash):
+                    self.logger.info("[SKIP] Spec PDF bytes unchanged")
+                    self.spec_registry.record(registry_key, pdf_url, spec_check, content_hash=pdf_hash)
+                    self.state.setdefault('skipped', []).append(subject_id)
+                    continue
                 
-                complete_data = self.pdf_extractor.extract_complete_specification(
-                    pdf_path=pdf_path,
-                    subject=subject['name'],
-                    exam_board='AQA',
-                    qualification=subject['qualification']
-                )
+                # Extract with AI (reused while the PDF bytes are unchanged)
+                def extract():
+                    self.logger.info("[AI] Extracting... (~30 seconds, costs ~$0.12)")
+                    return self.pdf_extractor.extract_complete_specification(
+                        pdf_path=pdf_path,
+                        subject=subject['name'],
+                        exam_board='AQA',
+                        qualification=subject['qualification']
+                    )
+                
+                complete_data = store.run('extraction', [pdf_hash], extract)
                 
                 if not complete_data:
                     raise ValueError("Extraction returned no data")
@@ -168,17 +204,27 @@ class PDFBatchProcessor:
                 # Upload to Supabase
                 self.logger.info("[UPLOAD] Uploading to Supabase...")
                 
-                upload_result = self.uploader.upload_specification_complete({
-                    **complete_data,
-                    'exam_board': 'AQA',
-                    'subject': subject['name'],
-                    'qualification': subject['qualification']
-                })
+                upload_result = store.run(
+                    'upload', [store.output_hash('extraction')],
+                    lambda: self.uploader.upload_specification_complete({
+                        **complete_data,
+                        'exam_board': 'AQA',
+                        'subject': subject['name'],
+                        'qualification': subject['qualification']
+                    }),
+                    valid=lambda r: r.get('metadata_id') and not r.get('errors')
+                )
                 
                 self.logger.info(f"[SUCCESS] Uploaded - Metadata ID: {upload_result.get('metadata_id')}")
                 
+                self.spec_registry.record(
+                    registry_key, pdf_url, spec_check, content_hash=pdf_hash,
+                    version=(complete_data.get('metadata') or {}).get('spec_version')
+                )
+                
                 self.state['completed'].append(subject_id)
-                self.state['total_cost_estimate'] += 0.12
+                if 'extraction' not in store.resumed:
+                    self.state['total_cost_estimate'] += 0.12
                 
             except KeyboardInterrupt:
                 self.logger.warning("\nInterrupted by user. State saved.")
@@ -199,6 +245,7 @@ class PDFBatchProcessor:
         self.logger.info("=" * 80)
         self.logger.info(f"Completed: {len(self.state['completed'])}")
         self.logger.info(f"Failed: {len(self.state['failed'])}")
+        self.logger.info(f"Unchanged (skipped): {len(self.state.get('skipped', []))}")
         self.logger.info(f"Estimated cost: ${self.state['total_cost_estimate']:.2f}")
         self.logger.info("=" * 80)
     
@@ -238,8 +285,8 @@ class PDFBatchProcessor:
             self.logger.error(f"Error finding PDF: {e}")
             return None
     
-    def _download_pdf(self, url, subject):
-        """Download PDF."""
+    def _download_pdf(self, url, subject, refresh=False):
+        """Download PDF (reuses the saved copy unless refresh)."""
         from utils.helpers import sanitize_filename, ensure_directory
         
         filename = f"{sanitize_filename(subject['name'])}_{subject['qualification']}_{subject['code']}.pdf"
@@ -247,7 +294,7 @@ class PDFBatchProcessor:
         ensure_directory(output_dir)
         filepath = os.path.join(output_dir, filename)
         
-        if os.path.exists(filepath):
+        if os.path.exists(filepath) and not refresh:
             return filepath
         
         try:
@@ -268,6 +315,10 @@ def main():
     import argparse
     parser = argparse.ArgumentParser(description='PDF Batch Processor - Full Rich Metadata')
     parser.add_argument('--test', action='store_true', help='Test mode: 3 subjects only')
+    parser.add_argument('--refresh-from', choices=STAGES,
+                        help='Ignore stage checkpoints from this stage on (e.g. extraction to re-run AI)')
+    parser.add_argument('--no-stage-cache', action='store_true', help='Do not read or write stage checkpoints')
+    parser.add_argument('--force', action='store_true', help='Re-process subjects even if their spec is unchanged')
     
     args = parser.parse_args()
     
@@ -279,7 +330,12 @@ def main():
         print(f"ERROR: Missing {', '.join(missing)}")
         return 1
     
-    processor = PDFBatchProcessor(test_mode=args.test)
+    processor = PDFBatchProcessor(
+        test_mode=args.test,
+        refresh_from=args.refresh_from,
+        use_stage_cache=not args.no_stage_cache,
+        force=args.force
+    )
     
     try:
         processor.process_all()
@@ -11,6 +11,8 @@ from dotenv import load_dotenv
 from supabase import create_client
 from datetime import datetime
 
+from database.reporting import fetch_overview, topics_by_board, topics_by_level
+
 load_dotenv()
 
 def create_html_report(data: dict, filename: str):
@@ -243,7 +245,7 @@ def generate_recommendations(data):
     return '\n'.join(recs)
 
 
-def main():
+def main(refresh: bool = False):
     """Check all tables and generate report."""
     print("=" * 60)
     print("SUPABASE DATA AUDIT")
@@ -259,104 +261,37 @@ def main():
     
     client = create_client(url, key)
     
-    print("\n📊 Checking tables...\n")
-    
-    data = {}
-    
-    # Core tables
-    print("Core Tables:")
-    data['exam_boards'] = client.table('exam_boards').select('*', count='exact').execute().count or 0
-    print(f"  - exam_boards: {data['exam_boards']}")
-    
-    data['qualification_types'] = client.table('qualification_types').select('*', count='exact').execute().count or 0
-    print(f"  - qualification_types: {data['qualification_types']}")
-    
-    data['exam_board_subjects'] = client.table('exam_board_subjects').select('*', count='exact').execute().count or 0
-    print(f"  - exam_board_subjects: {data['exam_board_subjects']}")
-    
-    data['curriculum_topics'] = client.table('curriculum_topics').select('*', count='exact').execute().count or 0
-    print(f"  - curriculum_topics: {data['curriculum_topics']:,}")
-    
-    # Specification tables
-    print("\nSpecification Tables:")
-    data['specification_metadata'] = client.table('specification_metadata').select('*', count='exact').execute().count or 0
-    print(f"  - specification_metadata: {data['specification_metadata']}")
-    
-    data['spec_components'] = client.table('spec_components').select('*', count='exact').execute().count or 0
-    print(f"  - spec_components: {data['spec_components']}")
-    
-    data['selection_constraints'] = client.table('selection_constraints').select('*', count='exact').execute().count or 0
-    print(f"  - selection_constraints: {data['selection_constraints']}")
-    
-    data['subject_vocabulary'] = client.table('subject_vocabulary').select('*', count='exact').execute().count or 0
-    print(f"  - subject_vocabulary: {data['subject_vocabulary']}")
-    
-    # Assessment tables
-    print("\nAssessment Resources Tables:")
-    data['exam_papers'] = client.table('exam_papers').select('*', count='exact').execute().count or 0
-    print(f"  - exam_papers: {data['exam_papers']}")
-    
-    data['mark_scheme_insights'] = client.table('mark_scheme_insights').select('*', count='exact').execute().count or 0
-    print(f"  - mark_scheme_insights: {data['mark_scheme_insights']}")
-    
-    data['examiner_report_insights'] = client.table('examiner_report_insights').select('*', count='exact').execute().count or 0
-    print(f"  - examiner_report_insights: {data['examiner_report_insights']}")
-    
-    data['question_bank'] = client.table('question_bank').select('*', count='exact').execute().count or 0
-    print(f"  - question_bank: {data['question_bank']}")
-    
-    # Sample data
-    print("\n📋 Fetching sample data...")
-    data['exam_boards_sample'] = client.table('exam_boards').select('code,full_name,country').limit(10).execute().data
-    
-    data['subjects_sample'] = client.table('exam_board_subjects').select(
-        'subject_name,subject_code,exam_board:exam_boards(code,full_name),qualification_type:qualification_types(code,name)'
-    ).limit(20).execute().data
-    
-    # Count topics per subject
-    for subject in data['subjects_sample']:
-        topic_count = client.table('curriculum_topics').select('id', count='exact').eq(
-            'exam_board_subject_id', subject['id']
-        ).execute().count or 0
-        subject['topic_count'] = topic_count
-    
-    # Get specification samples
-    data['specifications_sample'] = client.table('specification_metadata').select('*').limit(10).execute().data
-    for spec in data['specifications_sample']:
-        components_count = client.table('spec_components').select('id', count='exact').eq(
-            'spec_metadata_id', spec['id']
-        ).execute().count or 0
-        constraints_count = client.table('selection_constraints').select('id', count='exact').eq(
-            'spec_metadata_id', spec['id']
-        ).execute().count or 0
-        spec['components_count'] = components_count
-        spec['constraints_count'] = constraints_count
+    print("\n📊 Fetching report aggregates...\n")
+    try:
+        overview = fetch_overview(client, sample_size=0, refresh=refresh)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+    if overview.get('from_cache'):
+        print(f"Using cached aggregates from {overview.get('generated_at')} (--refresh to re-query)\n")
+    
+    data = dict(overview['table_counts'])
+    
+    for title, tables in (
+        ("Core Tables", ['exam_boards', 'qualification_types', 'exam_board_subjects', 'curriculum_topics']),
+        ("Specification Tables", ['specification_metadata', 'spec_components', 'selection_constraints',
+                                  'subject_vocabulary']),
+        ("Assessment Resources Tables", ['exam_papers', 'mark_scheme_insights', 'examiner_report_insights',
+                                         'question_bank']),
+    ):
+        print(f"{title}:")
+        for table in tables:
+            print(f"  - {table}: {data[table]:,}")
+        print()
+    
+    # Sample data (topic counts come from the grouped query, not one count per subject)
+    data['exam_boards_sample'] = overview['exam_boards']
+    data['subjects_sample'] = overview['subjects'][:20]
+    data['specifications_sample'] = overview['specifications']
     
     # Statistics
-    print("\n📊 Analyzing data quality...")
-    
-    # Topics by board - need to do this carefully
-    # First get all topics with their exam_board_subject
-    topics_with_board = client.table('curriculum_topics').select(
-        'id,exam_board_subject_id,exam_board_subjects!inner(exam_board:exam_boards(code))'
-    ).limit(10000).execute().data  # Adjust limit as needed
-    
-    # Count by board
-    from collections import Counter
-    board_counts = Counter()
-    for topic in topics_with_board:
-        try:
-            board_code = topic.get('exam_board_subjects', {}).get('exam_board', {}).get('code', 'Unknown')
-            board_counts[board_code] += 1
-        except:
-            pass
-    
-    data['topics_by_board'] = [{'board': board, 'count': count} for board, count in board_counts.items()]
-    
-    # Topics by level
-    level_result = client.table('curriculum_topics').select('topic_level').execute().data
-    level_counts = Counter(t.get('topic_level', -1) for t in level_result)
-    data['topics_by_level'] = [{'topic_level': level, 'count': count} for level, count in sorted(level_counts.items())]
+    data['topics_by_board'] = topics_by_board(overview)
+    data['topics_by_level'] = topics_by_level(overview)
     
     # Generate report
     report_file = f'data/reports/data_audit_{datetime.now().strftime("%Y%m%d_%H%M%S")}.html'
@@ -371,4 +306,7 @@ def main():
 
 
 if __name__ == '__main__':
-    sys.exit(main())
+    import argparse
+    parser = argparse.ArgumentParser(description='Audit curriculum data in Supabase')
+    parser.add_argument('--refresh', action='store_true', help='Ignore cached report aggregates')
+    sys.exit(main(parser.parse_args().refresh))
@@ -1,5 +1,16 @@
 """Database package for Supabase integration."""
 
 from .supabase_client import SupabaseUploader
+from .keyset_reader import fetch_all, iter_pages, iter_rows
+from .local_mirror import connect as connect_mirror, sync_mirror
+from .reporting import fetch_overview
+from .integrity import check_subject, run_checks
+from .staging_sync import sync_subject_topics
+from .dedup import find_duplicates
+from .vector_index import VectorIndex, open_index, sync_index
+from .embedding_writer import upsert_embeddings, vector_literals
 
-__all__ = ['SupabaseUploader']
+__all__ = ['SupabaseUploader', 'fetch_all', 'iter_pages', 'iter_rows', 'connect_mirror', 'sync_mirror',
+           'fetch_overview', 'check_subject', 'run_checks', 'sync_subject_topics',
+           'find_duplicates', 'VectorIndex', 'open_index', 'sync_index', 'upsert_embeddings',
+           'vector_literals']
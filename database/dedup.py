@@ -0,0 +1,378 @@
+"""
+Near-duplicate sibling detection and merging for staging topic trees.
+
+AI extraction often emits the same topic twice under one parent with slightly
+different wording ("Cardiac cycle" / "The cardiac cycle."). The exact-name checks
+(CHECK-DUPLICATES.sql, the promote script) miss those. This module:
+
+1. normalizes names (unicode, case, bullets/punctuation, leading article, spaces)
+2. turns each name into character shingles and a MinHash signature
+3. buckets signatures with LSH banding keyed by (subject, parent, level), so only
+   siblings that share a band are ever compared - no pairwise scan of a subject
+4. confirms candidates with the exact Jaccard similarity of their shingle sets
+   (names whose numbers / single-letter labels / roman numerals differ, or that differ
+   only by a negating prefix like "Organic" / "Inorganic", are never merged) and
+   clusters them with union-find
+
+Merging keeps the canonical node of each cluster (lowest topic_code, then id - the
+same pick as scripts/promote_subject_and_embeddings.py), rewires the duplicates'
+children to it and drops the duplicates. Rewiring makes former cousins siblings, so
+planning repeats on the affected sibling groups until a pass finds nothing new.
+
+Usage:
+    report = find_duplicates(sb, exam_boards=['EDUQAS'])              # report only
+    report = find_duplicates(sb, exam_boards=['EDUQAS'], merge=True)
+    plan = plan_merges(topics)                                        # in memory
+"""
+
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from database.keyset_reader import fetch_all, iter_rows
+from utils.logger import get_logger
+
+logger = get_logger()
+
+TABLE = 'staging_aqa_topics'
+TOPIC_COLUMNS = 'id,subject_id,topic_code,topic_name,topic_level,parent_topic_id,exam_board'
+
+DEFAULT_THRESHOLD = 0.8
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16                    # 16 bands x 4 rows: J=0.8 pairs collide ~99.9%, J=0.3 ~12%
+_ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 31) - 1
+_DELETE_CHUNK = 100
+
+# Fixed seed so signatures are comparable between runs
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+_BAND_MIX = _rng.integers(1, 1 << 63, _ROWS, dtype=np.uint64)  # folds a band's rows into one key
+
+_PUNCT = re.compile(r'[^\w\s]|_')
+_ARTICLE = re.compile(r'^(?:the|a|an)\s+')
+_ROMAN = re.compile(r'^x{0,3}(?:ix|iv|v?i{0,3})$')  # i .. xxxix
+_NEGATING_PREFIXES = ('in', 'un', 'non', 'dis', 'im', 'ir', 'il', 'anti')
+# Greek privative a-/an- ("asexual", "anaerobic", "abiotic"): a- before a consonant,
+# an- before a vowel or h; these a-words aren't negations
+_NOT_PRIVATIVE = frozenset({
+    'aboard', 'abroad', 'across', 'ahead', 'along', 'amount', 'another', 'anew', 'arise',
+    'around', 'aside', 'await', 'awake', 'aware',
+})
+
+
+def normalize_name(name) -> str:
+    """'  • The Cardiac  cycle. ' -> 'cardiac cycle'"""
+    s = unicodedata.normalize('NFKC', str(name or '')).replace('\ufffd', ' ').lower()
+    s = ' '.join(_PUNCT.sub(' ', s).split())
+    return _ARTICLE.sub('', s)
+
+
+def shingles(normalized: str, k: int = SHINGLE_SIZE) -> frozenset:
+    if len(normalized) <= k:
+        return frozenset([normalized]) if normalized else frozenset()
+    return frozenset(normalized[i:i + k] for i in range(len(normalized) - k + 1))
+
+
+def _markers(normalized: str) -> Tuple[str, ...]:
+    # Numbers, single-letter labels and roman numerals ("section a", "1 2", "statistics ii")
+    # must match exactly
+    return tuple(tok for tok in normalized.split()
+                 if tok.isdigit() or len(tok) == 1 or _ROMAN.match(tok))
+
+
+def _stems(normalized: str) -> Tuple[str, ...]:
+    # Tokens with a detached negating prefix glued back on ("non metals" -> "nonmetals")
+    out: List[str] = []
+    for tok in normalized.split():
+        if out and out[-1] in _NEGATING_PREFIXES:
+            out[-1] += tok
+        else:
+            out.append(tok)
+    return tuple(out)
+
+
+def _differ_by_prefix(a: Tuple[str, ...], b: Tuple[str, ...]) -> bool:
+    """True if the names differ only where one word is the other plus in-/un-/non-/a-/..."""
+    if len(a) != len(b):
+        return False
+    for x, y in zip(a, b):
+        if x == y:
+            continue
+        short, long_ = (x, y) if len(x) < len(y) else (y, x)
+        if any(long_ == p + short for p in _NEGATING_PREFIXES) or _is_privative(long_, short):
+            return True
+    return False
+
+
+def _is_privative(long_: str, short: str) -> bool:
+    if len(short) < 4 or long_ in _NOT_PRIVATIVE:
+        return False
+    if short[0] in 'aeiouh':
+        return long_ == 'an' + short
+    return long_ == 'a' + short
+
+
+def minhash(shingle_sets: List[frozenset], chunk: int = 50_000) -> np.ndarray:
+    """MinHash signatures (len(shingle_sets) x NUM_PERM), computed in vectorized chunks."""
+    cache: Dict[str, int] = {}
+    sigs = np.empty((len(shingle_sets), NUM_PERM), dtype=np.uint64)
+    start = 0
+    while start < len(shingle_sets):
+        end, total = start, 0
+        while end < len(shingle_sets) and (total < chunk or end == start):
+            total += len(shingle_sets[end])
+            end += 1
+        hashes, offsets = [], []
+        for sh in shingle_sets[start:end]:
+            offsets.append(len(hashes))
+            for s in sh:
+                h = cache.get(s)
+                if h is None:
+                    h = cache[s] = zlib.crc32(s.encode('utf-8')) % _PRIME
+                hashes.append(h)
+        values = (np.outer(_A, np.array(hashes, dtype=np.uint64)) + _B[:, None]) % _PRIME
+        sigs[start:end] = np.minimum.reduceat(values, offsets, axis=1).T
+        start = end
+    return sigs
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _sibling_key(topic: Dict) -> Tuple:
+    return (str(topic.get('subject_id') or ''), str(topic.get('parent_topic_id') or ''),
+            int(topic.get('topic_level') or 0))
+
+
+def _canonical_order(topic: Dict) -> Tuple[str, str]:
+    return str(topic.get('topic_code') or ''), str(topic.get('id') or '')
+
+
+def find_clusters(topics: List[Dict], threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """
+    Near-duplicate sibling clusters among `topics` (any number of subjects).
+
+    Returns [{'canonical': topic, 'duplicates': [(topic, similarity), ...]}].
+    """
+    prepared = []
+    for t in topics:
+        norm = normalize_name(t.get('topic_name'))
+        sh = shingles(norm)
+        if sh:
+            prepared.append((t, sh, (_markers(norm), _stems(norm))))
+
+    if len(prepared) < 2:
+        return []
+    # One int per sibling group and one uint64 per (topic, band); a candidate pair is two
+    # topics with equal group and band key in any band, found by sorting - never pairwise.
+    group_ids: Dict[Tuple, int] = {}
+    groups_arr = np.array([group_ids.setdefault(_sibling_key(t), len(group_ids)) for t, _, _ in prepared],
+                          dtype=np.int64)
+    signatures = minhash([sh for _, sh, _ in prepared])
+    band_keys = (signatures.reshape(len(prepared), BANDS, _ROWS) * _BAND_MIX).sum(axis=2)
+
+    parent = list(range(len(prepared)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked = set()
+    for band in range(BANDS):
+        keys = band_keys[:, band]
+        order = np.lexsort((keys, groups_arr))
+        g, k = groups_arr[order], keys[order]
+        same = (g[1:] == g[:-1]) & (k[1:] == k[:-1])
+        if not same.any():
+            continue
+        # Runs of equal (group, key): starts where a match begins, ends where it stops
+        edges = np.diff(np.concatenate(([0], same.astype(np.int8), [0])))
+        for run_start, run_end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+            members = sorted(order[run_start:run_end + 1].tolist())
+            for i, j in combinations(members, 2):
+                if (i, j) in checked or find(i) == find(j):
+                    continue
+                checked.add((i, j))
+                _, sh_i, (mk_i, st_i) = prepared[i]
+                _, sh_j, (mk_j, st_j) = prepared[j]
+                if mk_i == mk_j and jaccard(sh_i, sh_j) >= threshold and not _differ_by_prefix(st_i, st_j):
+                    parent[find(i)] = find(j)
+
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for idx in range(len(prepared)):
+        groups[find(idx)].append(idx)
+
+    clusters = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=lambda i: _canonical_order(prepared[i][0]))
+        canon, canon_sh, _ = prepared[members[0]]
+        clusters.append({
+            'canonical': canon,
+            'duplicates': [(prepared[i][0], round(jaccard(canon_sh, prepared[i][1]), 3)) for i in members[1:]],
+        })
+    return clusters
+
+
+@dataclass
+class MergePlan:
+    clusters: List[Dict] = field(default_factory=list)
+    kept: List[Dict] = field(default_factory=list)          # surviving topics, parents rewired
+    removed: Dict[str, str] = field(default_factory=dict)   # duplicate id -> canonical id
+    rewired: Dict[str, str] = field(default_factory=dict)   # child id -> new parent id
+
+
+def plan_merges(topics: Iterable[Dict], threshold: float = DEFAULT_THRESHOLD) -> MergePlan:
+    """Cluster, rewire children to canonicals and repeat on affected sibling groups (copies; input untouched)."""
+    live = [dict(t) for t in topics if t.get('id')]
+    plan = MergePlan()
+    candidates = live
+    while candidates:
+        clusters = find_clusters(candidates, threshold)
+        if not clusters:
+            break
+        plan.clusters.extend(clusters)
+        for c in clusters:
+            canon_id = str(c['canonical']['id'])
+            for dup, _ in c['duplicates']:
+                plan.removed[str(dup['id'])] = canon_id
+
+        affected = set()
+        for t in live:
+            pid = str(t.get('parent_topic_id') or '')
+            if pid not in plan.removed:
+                continue
+            while pid in plan.removed:
+                pid = plan.removed[pid]
+            t['parent_topic_id'] = pid
+            plan.rewired[str(t['id'])] = pid
+            affected.add(_sibling_key(t))
+
+        live = [t for t in live if str(t['id']) not in plan.removed]
+        candidates = [t for t in live if _sibling_key(t) in affected]
+
+    plan.kept = live
+    plan.rewired = {cid: pid for cid, pid in plan.rewired.items() if cid not in plan.removed}
+    return plan
+
+
+def apply_plan(client, plan: MergePlan, batch_size: int = 500) -> None:
+    """Write the rewired parents (bulk upsert on id), then delete duplicates deepest first."""
+    columns = TOPIC_COLUMNS.split(',')
+    rows = [{c: t.get(c) for c in columns} for t in plan.kept if str(t['id']) in plan.rewired]
+    for i in range(0, len(rows), batch_size):
+        client.table(TABLE).upsert(rows[i:i + batch_size], on_conflict='id').execute()
+
+    level = {}
+    for c in plan.clusters:
+        for dup, _ in c['duplicates']:
+            level[str(dup['id'])] = int(dup.get('topic_level') or 0)
+    ids = sorted(plan.removed, key=lambda i: -level.get(i, 0))
+    for i in range(0, len(ids), _DELETE_CHUNK):
+        client.table(TABLE).delete().in_('id', ids[i:i + _DELETE_CHUNK]).execute()
+
+
+def load_topics(client, exam_boards: Iterable[str] = None, qualification: str = None,
+                subject_ids: Iterable[str] = None) -> List[Dict]:
+    """Stream the selected staging topics in one keyset pass."""
+    filters = []
+    if exam_boards:
+        filters.append(('exam_board', 'in_', list(exam_boards)))
+    wanted = set(subject_ids) if subject_ids else None
+    if qualification:
+        subject_filters = [('qualification_type', 'eq', qualification)]
+        if exam_boards:
+            subject_filters.append(('exam_board', 'in_', list(exam_boards)))
+        qualified = {s['id'] for s in fetch_all(client, 'staging_aqa_subjects', 'id', subject_filters)}
+        wanted = qualified if wanted is None else wanted & qualified
+    elif wanted:
+        filters.append(('subject_id', 'in_', sorted(wanted)))
+    return [t for t in iter_rows(client, TABLE, TOPIC_COLUMNS, filters)
+            if wanted is None or t['subject_id'] in wanted]
+
+
+def topics_from_snapshot(conn, exam_boards: Iterable[str] = None, qualification: str = None,
+                         subject_ids: Iterable[str] = None) -> List[Dict]:
+    """Same selection from the local mirror (database/local_mirror.py)."""
+    where, params = [], []
+    for column, values in (('t.exam_board', exam_boards), ('t.subject_id', subject_ids)):
+        if values:
+            values = list(values)
+            where.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+    if qualification:
+        where.append("s.qualification_type = ?")
+        params.append(qualification)
+    cols = ', '.join(f't.{c}' for c in TOPIC_COLUMNS.split(','))
+    sql = f"SELECT {cols} FROM staging_aqa_topics t JOIN staging_aqa_subjects s ON s.id = t.subject_id"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return [dict(r) for r in conn.execute(sql, params)]
+
+
+def _brief(topic: Dict) -> Dict:
+    return {'id': topic['id'], 'topic_code': topic.get('topic_code'), 'topic_name': topic.get('topic_name')}
+
+
+def build_report(plan: MergePlan, source: str, threshold: float, merged: bool) -> Dict:
+    clusters = [{
+        'subject_id': c['canonical'].get('subject_id'),
+        'parent_topic_id': c['canonical'].get('parent_topic_id'),
+        'topic_level': c['canonical'].get('topic_level'),
+        'canonical': _brief(c['canonical']),
+        'duplicates': [dict(_brief(dup), similarity=sim) for dup, sim in c['duplicates']],
+    } for c in plan.clusters]
+    return {
+        'source': source,
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'threshold': threshold,
+        'merged': merged,
+        'clusters': clusters,
+        'summary': {
+            'subjects': len({c['subject_id'] for c in clusters}),
+            'clusters': len(clusters),
+            'duplicates': len(plan.removed),
+            'rewired_children': len(plan.rewired),
+        },
+    }
+
+
+def find_duplicates(client, exam_boards: Iterable[str] = None, qualification: str = None,
+                    subject_ids: Iterable[str] = None, threshold: float = DEFAULT_THRESHOLD,
+                    merge: bool = False, topics: Optional[List[Dict]] = None) -> Dict:
+    """
+    Report (and optionally merge) near-duplicate siblings across the selected subjects.
+
+    Args:
+        client: Supabase client (may be None when `topics` is given and merge is False)
+        exam_boards / qualification / subject_ids: Selection, as in database/integrity.py
+        threshold: Minimum Jaccard similarity of name shingles (1.0 = normalized-exact only)
+        merge: Rewire children and delete the duplicates
+        topics: Pre-loaded topic rows (e.g. from topics_from_snapshot)
+    """
+    source = 'snapshot' if topics is not None else 'supabase'
+    if topics is None:
+        topics = load_topics(client, exam_boards, qualification, subject_ids)
+    plan = plan_merges(topics, threshold)
+    logger.info(f"[DEDUP] {len(topics)} topics: {len(plan.clusters)} clusters, "
+                f"{len(plan.removed)} duplicates, {len(plan.rewired)} children to rewire")
+    if merge and plan.removed:
+        apply_plan(client, plan)
+        logger.info(f"[DEDUP] merged {len(plan.removed)} duplicates")
+    return build_report(plan, source, threshold, merge)
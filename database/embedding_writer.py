@@ -0,0 +1,138 @@
+"""
+Compact embedding writer for topic_ai_metadata (and any other pgvector column).
+
+PostgREST only takes JSON, so vectors still travel as pgvector text literals, but:
+- each value is written with the fewest significant digits that parse back to the
+  same float32 (or float16) value, without the leading zero ('-.0123' not '-0.01230000')
+- vectors can be sent at float16 precision (what a `halfvec` column stores anyway) or
+  truncated to fewer dimensions and renormalised (text-embedding-3-* vectors allow this)
+- upserts are chunked by payload size instead of a fixed row count, and a chunk that
+  keeps failing is split in half before giving up
+
+Usage:
+    rows = [{"topic_id": tid, "embedding": lit, ...} for tid, lit in zip(ids, vector_literals(matrix))]
+    upsert_embeddings(sb, rows)
+"""
+
+import json
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# precision -> (dtype, significant digits to try); the last count always round-trips
+PRECISIONS = {
+    'float32': (np.float32, (8, 9)),
+    'float16': (np.float16, (4, 5)),
+}
+DEFAULT_MAX_BYTES = 1_000_000  # well under PostgREST/proxy body limits, ~55 float32 1536-d rows
+DEFAULT_RETRIES = 4
+
+
+def prepare_vectors(matrix, precision: str = 'float32', dimensions: Optional[int] = None) -> np.ndarray:
+    """
+    Cast (and optionally shorten) an (n x dim) embedding matrix for writing.
+
+    Args:
+        matrix: Embeddings, one row per vector
+        precision: 'float32' or 'float16'
+        dimensions: Keep only the first N dimensions and renormalise to unit length
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision} (expected one of {sorted(PRECISIONS)})")
+    vectors = np.asarray(matrix, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    if not np.isfinite(vectors).all():
+        raise ValueError("Embeddings contain NaN or infinite values")
+    if dimensions and dimensions < vectors.shape[1]:
+        vectors = vectors[:, :dimensions]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms > 0, norms, 1.0)
+    return vectors.astype(PRECISIONS[precision][0])
+
+
+def _shortest_strings(flat: np.ndarray, digit_ladder) -> List[str]:
+    # One formatting pass at the cheapest digit count, then redo only the values that
+    # don't parse back exactly (~1% for float32 at 8 digits)
+    values = flat.tolist()
+    out = list(map(f'{{:.{digit_ladder[0]}g}}'.format, values))
+    for digits in digit_ladder[1:]:
+        bad = np.flatnonzero(np.array(out).astype(flat.dtype) != flat)
+        if not bad.size:
+            break
+        spec = f'.{digits}g'
+        for i in bad.tolist():
+            out[i] = format(values[i], spec)
+    return out
+
+
+def vector_literals(matrix, precision: str = 'float32', dimensions: Optional[int] = None) -> List[str]:
+    """
+    Format every row of `matrix` as a pgvector literal ('[.0123,-.004,...]').
+
+    Values round-trip exactly at the chosen precision; see prepare_vectors for the options.
+    """
+    vectors = prepare_vectors(matrix, precision, dimensions)
+    n, dim = vectors.shape
+    if not n:
+        return []
+    strings = _shortest_strings(vectors.ravel(), PRECISIONS[precision][1])
+    literals = []
+    for i in range(n):
+        lit = '[' + ','.join(strings[i * dim:(i + 1) * dim]) + ']'
+        literals.append(lit.replace('[0.', '[.').replace(',0.', ',.').replace('-0.', '-.'))
+    return literals
+
+
+def chunk_by_bytes(rows: Iterable[Dict[str, Any]], max_bytes: int = DEFAULT_MAX_BYTES) -> Iterator[List[Dict[str, Any]]]:
+    """Group rows into chunks whose JSON body stays under `max_bytes` (a bigger row goes alone)."""
+    chunk: List[Dict[str, Any]] = []
+    size = 2  # '[' + ']'
+    for row in rows:
+        row_size = len(json.dumps(row, default=str)) + 1
+        if chunk and size + row_size > max_bytes:
+            yield chunk
+            chunk, size = [], 2
+        chunk.append(row)
+        size += row_size
+    if chunk:
+        yield chunk
+
+
+def _upsert_chunk(client, table: str, rows: List[Dict[str, Any]], on_conflict: str, retries: int) -> None:
+    for attempt in range(retries):
+        try:
+            client.table(table).upsert(rows, on_conflict=on_conflict).execute()
+            return
+        except Exception as e:
+            if attempt == retries - 1:
+                if len(rows) == 1:
+                    raise
+                # Payload-size trouble shows up as resets/timeouts; smaller halves usually go through
+                half = len(rows) // 2
+                logger.warning(f"Upsert of {len(rows)} rows into {table} failed ({e}); splitting")
+                _upsert_chunk(client, table, rows[:half], on_conflict, retries)
+                _upsert_chunk(client, table, rows[half:], on_conflict, retries)
+                return
+            time.sleep(min(8.0, 0.8 * (2 ** attempt)))
+
+
+def upsert_embeddings(client, rows: Iterable[Dict[str, Any]], table: str = 'topic_ai_metadata',
+                      on_conflict: str = 'topic_id', max_bytes: int = DEFAULT_MAX_BYTES,
+                      retries: int = DEFAULT_RETRIES) -> int:
+    """
+    Upsert rows (embedding already a literal from vector_literals) in byte-budgeted chunks.
+
+    Returns:
+        Number of rows written
+    """
+    written = 0
+    for chunk in chunk_by_bytes(rows, max_bytes):
+        _upsert_chunk(client, table, chunk, on_conflict, retries)
+        written += len(chunk)
+    return written
@@ -0,0 +1,225 @@
+"""
+Integrity checks for staging topic hierarchies.
+
+Checks every selected subject for orphaned parents, cycles, level jumps (child
+topic_level != parent topic_level + 1), duplicate topic codes within a subject,
+topics tagged with a different exam board than their subject, and subjects with no
+topics. Three interchangeable backends produce the same report:
+
+- server:   the `staging_integrity_report` RPC (database/migrations/009) - one call,
+            all set logic in Postgres
+- client:   per-subject keyset reads checked concurrently (fallback when the RPC
+            isn't installed)
+- snapshot: the local SQLite mirror (database/local_mirror.py), no network
+
+The report is plain JSON:
+    {"source", "generated_at", "subjects": [{subject_id, exam_board, subject_code,
+     subject_name, topic_count, ...}], "issues": [{check, subject_id, topic_id,
+     topic_code, detail}], "summary": {check: count}, "ok": bool}
+
+Usage:
+    report = run_checks(sb, exam_boards=["EDUQAS", "WJEC"], qualification="A-Level")
+    report = check_subject(sb, subject_id)   # cheap post-upload check
+"""
+
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from database.keyset_reader import fetch_all
+from utils.logger import get_logger
+
+logger = get_logger()
+
+INTEGRITY_FUNCTION = 'staging_integrity_report'
+CHECKS = ('empty_subject', 'orphan_parent', 'cycle', 'level_jump', 'duplicate_code', 'board_mismatch')
+TOPIC_COLUMNS = 'id,subject_id,parent_topic_id,topic_level,topic_code,exam_board'
+SUBJECT_COLUMNS = 'id,exam_board,qualification_type,subject_code,subject_name'
+
+
+def _issue(check: str, subject_id, topic: Dict = None, detail: Dict = None, topic_code: str = None) -> Dict:
+    return {
+        'check': check,
+        'subject_id': subject_id,
+        'topic_id': topic['id'] if topic else None,
+        'topic_code': topic.get('topic_code') if topic else topic_code,
+        'detail': detail or {},
+    }
+
+
+def check_topics(subject: Dict, topics: List[Dict]) -> List[Dict]:
+    """All issues for one subject's topics (subject needs 'id' and 'exam_board')."""
+    subject_id = subject['id']
+    if not topics:
+        return [_issue('empty_subject', subject_id)]
+
+    issues = []
+    by_id = {t['id']: t for t in topics}
+
+    for t in topics:
+        parent_id = t.get('parent_topic_id')
+        if parent_id:
+            parent = by_id.get(parent_id)
+            if parent is None:
+                issues.append(_issue('orphan_parent', subject_id, t, {'parent_topic_id': parent_id}))
+            elif t.get('topic_level') is not None and parent.get('topic_level') is not None \
+                    and t['topic_level'] != parent['topic_level'] + 1:
+                issues.append(_issue('level_jump', subject_id, t, {
+                    'topic_level': t['topic_level'],
+                    'parent_topic_id': parent_id,
+                    'parent_level': parent['topic_level'],
+                }))
+        if subject.get('exam_board') and t.get('exam_board') != subject['exam_board']:
+            issues.append(_issue('board_mismatch', subject_id, t, {
+                'topic_exam_board': t.get('exam_board'),
+                'subject_exam_board': subject['exam_board'],
+            }))
+
+    # Cycles: follow parent links iteratively; 0 = unvisited, 1 = on current path, 2 = done
+    state = dict.fromkeys(by_id, 0)
+    for start in by_id:
+        if state[start]:
+            continue
+        path, node = [], start
+        while node in by_id and state[node] == 0:
+            state[node] = 1
+            path.append(node)
+            node = by_id[node].get('parent_topic_id')
+        if node in by_id and state[node] == 1:
+            cycle = path[path.index(node):]
+            for member in cycle:
+                issues.append(_issue('cycle', subject_id, by_id[member], {'path': cycle}))
+        for member in path:
+            state[member] = 2
+
+    codes = defaultdict(list)
+    for t in topics:
+        if t.get('topic_code'):
+            codes[t['topic_code']].append(t['id'])
+    for code, ids in codes.items():
+        if len(ids) > 1:
+            issues.append(_issue('duplicate_code', subject_id, topic_code=code,
+                                 detail={'count': len(ids), 'topic_ids': sorted(ids)}))
+    return issues
+
+
+def summarize(report: Dict) -> Dict:
+    """Add per-check counts and an overall ok flag."""
+    counts = Counter(i['check'] for i in report.get('issues', []))
+    report['summary'] = {check: counts.get(check, 0) for check in CHECKS}
+    report['ok'] = not report.get('issues')
+    return report
+
+
+def _build_report(source: str, subjects: List[Dict], topics_by_subject: Dict[str, List[Dict]]) -> Dict:
+    rows, issues = [], []
+    for s in subjects:
+        topics = topics_by_subject.get(s['id'], [])
+        rows.append({
+            'subject_id': s['id'],
+            'exam_board': s.get('exam_board'),
+            'qualification_type': s.get('qualification_type'),
+            'subject_code': s.get('subject_code'),
+            'subject_name': s.get('subject_name'),
+            'topic_count': len(topics),
+        })
+        issues.extend(check_topics(s, topics))
+    return summarize({
+        'source': source,
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'subjects': rows,
+        'issues': issues,
+    })
+
+
+def run_server(client, exam_boards: Iterable[str] = None, qualification: str = None,
+               subject_ids: Iterable[str] = None) -> Dict:
+    """One RPC; raises if migration 009 isn't applied."""
+    report = client.rpc(INTEGRITY_FUNCTION, {
+        'p_exam_boards': list(exam_boards) if exam_boards else None,
+        'p_qualification': qualification,
+        'p_subject_ids': list(subject_ids) if subject_ids else None,
+    }).execute().data
+    if isinstance(report, list):
+        report = report[0] if report else {}
+    report['source'] = 'server'
+    return summarize(report)
+
+
+def _fetch_subjects(client, exam_boards, qualification, subject_ids) -> List[Dict]:
+    filters = []
+    if exam_boards:
+        filters.append(('exam_board', 'in_', list(exam_boards)))
+    if qualification:
+        filters.append(('qualification_type', 'eq', qualification))
+    if subject_ids:
+        filters.append(('id', 'in_', list(subject_ids)))
+    return fetch_all(client, 'staging_aqa_subjects', SUBJECT_COLUMNS, filters)
+
+
+def run_client(client, exam_boards: Iterable[str] = None, qualification: str = None,
+               subject_ids: Iterable[str] = None, max_workers: int = 8) -> Dict:
+    """Fetch each subject's topics concurrently and check them locally."""
+    subjects = _fetch_subjects(client, exam_boards, qualification, subject_ids)
+
+    def load(subject):
+        return subject['id'], fetch_all(client, 'staging_aqa_topics', TOPIC_COLUMNS,
+                                        [('subject_id', 'eq', subject['id'])])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        topics_by_subject = dict(pool.map(load, subjects))
+    return _build_report('client', subjects, topics_by_subject)
+
+
+def run_snapshot(conn, exam_boards: Iterable[str] = None, qualification: str = None,
+                 subject_ids: Iterable[str] = None) -> Dict:
+    """Same checks against the local mirror."""
+    where, params = [], []
+    for column, values in (('exam_board', exam_boards), ('id', subject_ids)):
+        if values:
+            values = list(values)
+            where.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+    if qualification:
+        where.append("qualification_type = ?")
+        params.append(qualification)
+    sql = f"SELECT {SUBJECT_COLUMNS} FROM staging_aqa_subjects"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    subjects = [dict(r) for r in conn.execute(sql, params)]
+
+    wanted = {s['id'] for s in subjects}
+    topics_by_subject = defaultdict(list)
+    for row in conn.execute(f"SELECT {TOPIC_COLUMNS} FROM staging_aqa_topics"):
+        if row['subject_id'] in wanted:
+            topics_by_subject[row['subject_id']].append(dict(row))
+    return _build_report('snapshot', subjects, topics_by_subject)
+
+
+def run_checks(client, exam_boards: Iterable[str] = None, qualification: str = None,
+               subject_ids: Iterable[str] = None, mode: str = 'auto', max_workers: int = 8) -> Dict:
+    """Server-side when available ('auto'), else concurrent client-side checks."""
+    if mode in ('auto', 'server'):
+        try:
+            return run_server(client, exam_boards, qualification, subject_ids)
+        except Exception as e:
+            if mode == 'server':
+                raise
+            logger.warning(f"{INTEGRITY_FUNCTION}() unavailable ({e}) - checking client-side")
+    return run_client(client, exam_boards, qualification, subject_ids, max_workers)
+
+
+def check_subject(client, subject_id: str) -> Optional[Dict]:
+    """Post-upload check of one subject; logs issues, never raises."""
+    try:
+        report = run_checks(client, subject_ids=[subject_id])
+    except Exception as e:
+        logger.warning(f"Integrity check failed for subject {subject_id}: {e}")
+        return None
+    if report['ok']:
+        logger.info(f"[INTEGRITY] subject {subject_id}: OK")
+    else:
+        found = ', '.join(f"{k}={v}" for k, v in report['summary'].items() if v)
+        logger.warning(f"[INTEGRITY] subject {subject_id}: {found}")
+    return report
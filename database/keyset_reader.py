@@ -0,0 +1,91 @@
+"""
+Keyset-paginated streaming reader for Supabase tables and views.
+
+A bare `.select(...).execute()` silently stops at PostgREST's row limit (1000 by
+default), and `.range(offset, ...)` paging makes the server skip `offset` rows on
+every page. This reader pages with `key > last_key ORDER BY key LIMIT n` instead, so
+each page is an index range scan, and fetches the next page in the background while
+the caller works through the current one. At most two pages are held in memory.
+
+Usage:
+    for topic in iter_rows(sb, "staging_aqa_topics", "id,topic_code,parent_topic_id",
+                           filters=[("subject_id", "eq", subject_id)]):
+        ...
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 1000
+
+Filter = Tuple[str, str, Any]
+
+
+def _apply_filters(query, filters: Iterable[Filter]):
+    # ("subject_id", "eq", x) -> query.eq("subject_id", x); any postgrest filter method works
+    for column, op, value in filters or ():
+        method = getattr(query, op, None)
+        if method is None:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        query = method(column, value)
+    return query
+
+
+def _fetch_page(client, table: str, columns: str, filters, key: str,
+                after: Optional[Any], page_size: int) -> List[Dict[str, Any]]:
+    query = _apply_filters(client.table(table).select(columns), filters)
+    if after is not None:
+        query = query.gt(key, after)
+    return query.order(key).limit(page_size).execute().data or []
+
+
+def iter_pages(client, table: str, columns: str = "*", filters: Iterable[Filter] = (),
+               key: str = "id", page_size: int = DEFAULT_PAGE_SIZE,
+               prefetch: bool = True) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield pages (lists of rows) of `table` in `key` order.
+
+    Args:
+        client: Supabase client
+        table: Table or view name
+        columns: Column projection; `key` is added if missing
+        filters: (column, operator, value) tuples, e.g. ("exam_board", "eq", "AQA")
+        key: Unique, orderable column to page on
+        page_size: Rows per request (a lower PostgREST max-rows just means smaller pages)
+        prefetch: Request the next page while the current one is being consumed
+    """
+    filters = list(filters or ())
+    projected = [c.strip() for c in columns.split(",")]
+    if columns.strip() != "*" and key not in projected:
+        columns = f"{key},{columns}"
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    try:
+        page = _fetch_page(client, table, columns, filters, key, None, page_size)
+        # A short page doesn't mean the end: the server's max-rows can be below page_size.
+        # Only an empty page does (one extra cheap request per scan).
+        while page:
+            after = page[-1][key]
+            pending = (executor.submit(_fetch_page, client, table, columns, filters, key, after, page_size)
+                       if executor else None)
+            yield page
+            page = pending.result() if executor else _fetch_page(
+                client, table, columns, filters, key, after, page_size
+            )
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_rows(client, table: str, columns: str = "*", filters: Iterable[Filter] = (),
+              key: str = "id", page_size: int = DEFAULT_PAGE_SIZE,
+              prefetch: bool = True) -> Iterator[Dict[str, Any]]:
+    """Yield every matching row of `table`, lazily (see iter_pages)."""
+    for page in iter_pages(client, table, columns, filters, key, page_size, prefetch):
+        yield from page
+
+
+def fetch_all(client, table: str, columns: str = "*", filters: Iterable[Filter] = (),
+              key: str = "id", page_size: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+    """All matching rows as a list (for callers that need the whole set anyway)."""
+    return list(iter_rows(client, table, columns, filters, key, page_size))
@@ -0,0 +1,254 @@
+"""
+Local SQLite mirror of the curriculum tables for offline audits and reports.
+
+`sync_mirror()` copies exam boards, subjects and topics (production and staging)
+into one SQLite file. The first sync is a full keyset scan; later syncs only pull
+rows whose `updated_at` is at or after the table's saved watermark, then drop local
+rows whose ids no longer exist upstream (staging uploads delete and re-insert).
+Tables with only `created_at`, or that are rewritten in place without bumping
+`updated_at` (staging topics: sync_subject_topics renames, dedup rewires), are
+re-pulled in full every time. Full pulls load into a side table that replaces the
+old copy only once the fetch has finished, so a failed pull keeps the last snapshot.
+Audit scripts open the snapshot with `connect()` and use plain SQL instead of one
+Supabase query per subject.
+
+    python scripts/sync_local_mirror.py            # incremental
+    python scripts/sync_local_mirror.py --full     # rebuild
+"""
+
+import json
+import sqlite3
+from itertools import chain
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from database.keyset_reader import DEFAULT_PAGE_SIZE, iter_pages, iter_rows
+
+DEFAULT_MIRROR_PATH = Path(__file__).resolve().parent.parent / 'data' / 'mirror' / 'curriculum.sqlite3'
+
+# table -> primary key column
+MIRROR_TABLES = {
+    'exam_boards': 'id',
+    'qualification_types': 'id',
+    'exam_board_subjects': 'id',
+    'curriculum_topics': 'id',
+    'staging_aqa_subjects': 'id',
+    'staging_aqa_topics': 'id',
+    'staging_aqa_exam_papers': 'id',
+}
+WATERMARK_COLUMNS = ('updated_at', 'created_at')
+# Only a column bumped on every change makes an incremental pull safe
+INCREMENTAL_COLUMN = 'updated_at'
+# Written in place without touching updated_at (database/staging_sync.py, database/dedup.py)
+ALWAYS_FULL_TABLES = {'staging_aqa_topics'}
+
+# Created when the columns exist (the staging schema varies between projects)
+INDEXES = {
+    'exam_board_subjects': ['exam_board_id', 'qualification_type_id'],
+    'curriculum_topics': ['exam_board_subject_id', 'parent_topic_id'],
+    'staging_aqa_subjects': ['exam_board', 'qualification_type'],
+    'staging_aqa_topics': ['subject_id', 'parent_topic_id', 'exam_board'],
+    'staging_aqa_exam_papers': ['subject_id'],
+}
+
+_STATE_TABLE = '_mirror_state'
+
+
+def connect(path=DEFAULT_MIRROR_PATH) -> sqlite3.Connection:
+    """Open an existing snapshot (rows behave like dicts: row['subject_name'])."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"No mirror at {path} - run scripts/sync_local_mirror.py first")
+    conn = sqlite3.connect(str(path))
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _open_for_sync(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path))
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {_STATE_TABLE} ("
+        "table_name TEXT PRIMARY KEY, watermark_column TEXT, watermark TEXT, "
+        "synced_at TEXT, row_count INTEGER)"
+    )
+    return conn
+
+
+def _local_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({_quote(table)})")]
+
+
+def _ensure_columns(conn: sqlite3.Connection, table: str, key: str, columns: Iterable[str]) -> List[str]:
+    existing = _local_columns(conn, table)
+    if not existing:
+        conn.execute(f"CREATE TABLE {_quote(table)} ({_quote(key)} TEXT PRIMARY KEY)")
+        existing = [key]
+    for column in columns:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(column)}")
+            existing.append(column)
+    return existing
+
+
+def _write_rows(conn: sqlite3.Connection, table: str, key: str, rows: List[Dict]) -> int:
+    if not rows:
+        return 0
+    columns = list(dict.fromkeys(c for row in rows for c in row))
+    _ensure_columns(conn, table, key, columns)
+    placeholders = ', '.join('?' for _ in columns)
+    sql = (
+        f"INSERT OR REPLACE INTO {_quote(table)} ({', '.join(_quote(c) for c in columns)}) "
+        f"VALUES ({placeholders})"
+    )
+    conn.executemany(sql, [[_sql_value(row.get(c)) for c in columns] for row in rows])
+    return len(rows)
+
+
+def _watermark_column(client, table: str) -> Optional[str]:
+    for column in WATERMARK_COLUMNS:
+        try:
+            client.table(table).select(column).limit(1).execute()
+            return column
+        except Exception:
+            continue
+    return None
+
+
+def _changed_pages(client, table: str, key: str, column: str, since: str,
+                   page_size: int) -> Iterator[List[Dict]]:
+    """Pages of rows with column >= since, in watermark order (ties drained by key)."""
+    cursor, op = since, 'gte'
+    while True:
+        query = getattr(client.table(table).select('*'), op)(column, cursor)
+        page = query.order(column).order(key).limit(page_size).execute().data or []
+        # Short pages can just be the server's max-rows; only an empty one ends the scan
+        if not page:
+            return
+        yield page
+        # Rows sharing the last timestamp may continue past this page
+        cursor, op = page[-1][column], 'gt'
+        yield from iter_pages(client, table, '*', [(column, 'eq', cursor)], key=key, page_size=page_size)
+
+
+def _prune(conn: sqlite3.Connection, client, table: str, key: str, page_size: int) -> int:
+    upstream = {row[key] for row in iter_rows(client, table, key, key=key, page_size=page_size)}
+    local = [r[0] for r in conn.execute(f"SELECT {_quote(key)} FROM {_quote(table)}")]
+    stale = [(k,) for k in local if k not in upstream]
+    conn.executemany(f"DELETE FROM {_quote(table)} WHERE {_quote(key)} = ?", stale)
+    return len(stale)
+
+
+def _create_indexes(conn: sqlite3.Connection, table: str):
+    columns = set(_local_columns(conn, table))
+    for column in INDEXES.get(table, []):
+        if column in columns:
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {_quote(f'idx_{table}_{column}')} "
+                f"ON {_quote(table)} ({_quote(column)})"
+            )
+
+
+def _track_watermark(watermark, page: List[Dict], column: Optional[str]):
+    if column:
+        values = [row.get(column) for row in page if row.get(column)]
+        if values:
+            return max([watermark] + values) if watermark else max(values)
+    return watermark
+
+
+def _full_pull(conn: sqlite3.Connection, client, table: str, key: str, column: Optional[str],
+               page_size: int):
+    """Load the whole table into a side table, then swap it in; returns (rows, watermark)."""
+    side = f'_new_{table}'
+    conn.execute(f"DROP TABLE IF EXISTS {_quote(side)}")
+    written, watermark = 0, None
+    try:
+        for page in iter_pages(client, table, '*', key=key, page_size=page_size):
+            written += _write_rows(conn, side, key, page)
+            watermark = _track_watermark(watermark, page, column)
+            conn.commit()
+        _ensure_columns(conn, side, key, [])
+        conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+        conn.execute(f"ALTER TABLE {_quote(side)} RENAME TO {_quote(table)}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        conn.execute(f"DROP TABLE IF EXISTS {_quote(side)}")
+        conn.commit()
+        raise
+    return written, watermark
+
+
+def sync_table(conn: sqlite3.Connection, client, table: str, key: str = 'id', full: bool = False,
+               prune: bool = True, page_size: int = DEFAULT_PAGE_SIZE) -> Dict:
+    """Bring one local table up to date; returns {'mode', 'rows', 'pruned', 'total', 'seconds'}."""
+    started = time.time()
+    state = conn.execute(f"SELECT * FROM {_STATE_TABLE} WHERE table_name = ?", (table,)).fetchone()
+    column = state['watermark_column'] if state and not full else _watermark_column(client, table)
+    since = state['watermark'] if state and not full and state['watermark_column'] == column else None
+    incremental = bool(since) and column == INCREMENTAL_COLUMN and table not in ALWAYS_FULL_TABLES
+
+    pruned = 0
+    if incremental:
+        mode = 'incremental'
+        written, watermark = 0, since
+        pages = _changed_pages(client, table, key, column, since, page_size)
+        # Rows whose watermark is NULL never match >=; pick them up by key
+        null_pages = iter_pages(client, table, '*', [(column, 'is_', 'null')], key=key, page_size=page_size)
+        for page in chain(pages, null_pages):
+            written += _write_rows(conn, table, key, page)
+            watermark = _track_watermark(watermark, page, column)
+            conn.commit()
+        pruned = _prune(conn, client, table, key, page_size) if prune else 0
+    else:
+        mode = 'full'
+        written, watermark = _full_pull(conn, client, table, key, column, page_size)
+
+    _ensure_columns(conn, table, key, [])
+    _create_indexes(conn, table)
+    row_count = conn.execute(f"SELECT COUNT(*) FROM {_quote(table)}").fetchone()[0]
+    conn.execute(
+        f"INSERT OR REPLACE INTO {_STATE_TABLE} VALUES (?, ?, ?, ?, ?)",
+        (table, column, watermark, datetime.now().isoformat(timespec='seconds'), row_count),
+    )
+    conn.commit()
+    return {'mode': mode, 'rows': written, 'pruned': pruned, 'total': row_count,
+            'seconds': round(time.time() - started, 1)}
+
+
+def sync_mirror(client, path=DEFAULT_MIRROR_PATH, tables: Dict[str, str] = None, full: bool = False,
+                prune: bool = True, log: Callable[[str], None] = print) -> Dict[str, Dict]:
+    """Sync every mirrored table into the SQLite file at `path`."""
+    conn = _open_for_sync(Path(path))
+    results = {}
+    try:
+        for table, key in (tables or MIRROR_TABLES).items():
+            try:
+                results[table] = sync_table(conn, client, table, key, full=full, prune=prune)
+                r = results[table]
+                log(f"[OK] {table}: {r['mode']}, {r['rows']} rows written, {r['pruned']} pruned, "
+                    f"{r['total']} total ({r['seconds']}s)")
+            except Exception as e:
+                conn.rollback()
+                results[table] = {'error': str(e)}
+                log(f"[ERROR] {table}: {e}")
+    finally:
+        conn.close()
+    return results
@@ -0,0 +1,20 @@
+-- Migration 007: One mark scheme row per question
+-- extraction_service.extract_mark_scheme now writes all rows for a paper in a single
+-- upsert with on_conflict='question_id', which needs a unique index on that column.
+
+-- Remove duplicates left by the old per-row inserts: keep the earliest row by created_at,
+-- then id (ctid is physical position, which updates and VACUUM reorder)
+DELETE FROM mark_schemes
+WHERE id IN (
+  SELECT id
+  FROM (
+    SELECT id,
+           ROW_NUMBER() OVER (PARTITION BY question_id ORDER BY created_at NULLS LAST, id) AS rn
+    FROM mark_schemes
+    WHERE question_id IS NOT NULL
+  ) ranked
+  WHERE rn > 1
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mark_schemes_question_id_unique
+  ON mark_schemes(question_id);
@@ -0,0 +1,129 @@
+-- Migration 008: Aggregated reporting function
+-- check_existing_data.py and generate_detailed_report.py used to issue a count query per
+-- table, three queries per subject and a full scan of curriculum_topics.topic_level.
+-- report_curriculum_overview() returns everything those reports render (table counts,
+-- per-subject topic counts / last update / sample topics, per-board per-level counts and
+-- specification component/constraint counts) as one JSONB document in one round trip.
+-- Called via client.rpc('report_curriculum_overview', {...}) from database/reporting.py.
+
+-- Topic aggregates group by subject; make sure that is an index scan
+CREATE INDEX IF NOT EXISTS idx_curriculum_topics_exam_board_subject_id
+  ON curriculum_topics(exam_board_subject_id);
+
+CREATE INDEX IF NOT EXISTS idx_spec_components_spec_metadata_id
+  ON spec_components(spec_metadata_id);
+
+CREATE INDEX IF NOT EXISTS idx_selection_constraints_spec_metadata_id
+  ON selection_constraints(spec_metadata_id);
+
+CREATE OR REPLACE FUNCTION report_curriculum_overview(
+  p_board_code TEXT DEFAULT NULL,     -- NULL = all boards
+  p_sample_size INTEGER DEFAULT 5,    -- sample topics per subject (0 = none)
+  p_spec_limit INTEGER DEFAULT 10     -- specification rows to include
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+  WITH topic_stats AS (
+    SELECT exam_board_subject_id,
+           COUNT(*) AS topic_count,
+           MAX(updated_at) AS last_scraped
+    FROM curriculum_topics
+    GROUP BY exam_board_subject_id
+  ),
+  subjects AS (
+    SELECT ebs.id,
+           ebs.subject_name,
+           ebs.subject_code,
+           ebs.created_at,
+           ebs.updated_at,
+           jsonb_build_object('code', eb.code, 'full_name', eb.full_name) AS exam_board,
+           CASE WHEN qt.id IS NULL THEN NULL
+                ELSE jsonb_build_object('code', qt.code, 'name', qt.name) END AS qualification_type,
+           COALESCE(ts.topic_count, 0) AS topic_count,
+           ts.last_scraped,
+           COALESCE(samples.topics, '[]'::jsonb) AS sample_topics
+    FROM exam_board_subjects ebs
+    JOIN exam_boards eb ON eb.id = ebs.exam_board_id
+    LEFT JOIN qualification_types qt ON qt.id = ebs.qualification_type_id
+    LEFT JOIN topic_stats ts ON ts.exam_board_subject_id = ebs.id
+    LEFT JOIN LATERAL (
+      SELECT jsonb_agg(to_jsonb(s)) AS topics
+      FROM (
+        SELECT ct.topic_code, ct.topic_name, ct.topic_level,
+               ct.chronological_period, ct.geographical_region, ct.key_themes
+        FROM curriculum_topics ct
+        WHERE ct.exam_board_subject_id = ebs.id
+        ORDER BY ct.topic_code, ct.id
+        LIMIT GREATEST(p_sample_size, 0)
+      ) s
+    ) samples ON p_sample_size > 0
+    WHERE p_board_code IS NULL OR eb.code = p_board_code
+  ),
+  level_stats AS (
+    SELECT COALESCE(eb.code, 'Unknown') AS board,
+           ct.topic_level,
+           COUNT(*) AS count
+    FROM curriculum_topics ct
+    LEFT JOIN exam_board_subjects ebs ON ebs.id = ct.exam_board_subject_id
+    LEFT JOIN exam_boards eb ON eb.id = ebs.exam_board_id
+    WHERE p_board_code IS NULL OR eb.code = p_board_code
+    GROUP BY 1, 2
+  ),
+  component_counts AS (
+    SELECT spec_metadata_id, COUNT(*) AS n FROM spec_components GROUP BY spec_metadata_id
+  ),
+  constraint_counts AS (
+    SELECT spec_metadata_id, COUNT(*) AS n FROM selection_constraints GROUP BY spec_metadata_id
+  ),
+  specs AS (
+    SELECT sm.id,
+           sm.exam_board,
+           sm.qualification_type,
+           sm.subject_name,
+           sm.subject_code,
+           COALESCE(cc.n, 0) AS components_count,
+           COALESCE(sc.n, 0) AS constraints_count
+    FROM specification_metadata sm
+    LEFT JOIN component_counts cc ON cc.spec_metadata_id = sm.id
+    LEFT JOIN constraint_counts sc ON sc.spec_metadata_id = sm.id
+    WHERE p_board_code IS NULL OR sm.exam_board = p_board_code
+    ORDER BY sm.exam_board, sm.qualification_type, sm.subject_name
+    LIMIT GREATEST(p_spec_limit, 0)
+  )
+  SELECT jsonb_build_object(
+    'generated_at', NOW(),
+    'board_code', p_board_code,
+    'table_counts', jsonb_build_object(
+      'exam_boards', (SELECT COUNT(*) FROM exam_boards),
+      'qualification_types', (SELECT COUNT(*) FROM qualification_types),
+      'exam_board_subjects', (SELECT COUNT(*) FROM exam_board_subjects),
+      'curriculum_topics', (SELECT COUNT(*) FROM curriculum_topics),
+      'specification_metadata', (SELECT COUNT(*) FROM specification_metadata),
+      'spec_components', (SELECT COUNT(*) FROM spec_components),
+      'selection_constraints', (SELECT COUNT(*) FROM selection_constraints),
+      'subject_vocabulary', (SELECT COUNT(*) FROM subject_vocabulary),
+      'exam_papers', (SELECT COUNT(*) FROM exam_papers),
+      'mark_scheme_insights', (SELECT COUNT(*) FROM mark_scheme_insights),
+      'examiner_report_insights', (SELECT COUNT(*) FROM examiner_report_insights),
+      'question_bank', (SELECT COUNT(*) FROM question_bank)
+    ),
+    'exam_boards', COALESCE((
+      SELECT jsonb_agg(jsonb_build_object('code', code, 'full_name', full_name, 'country', country) ORDER BY code)
+      FROM exam_boards
+    ), '[]'::jsonb),
+    'subjects', COALESCE((
+      SELECT jsonb_agg(to_jsonb(s) ORDER BY s.topic_count DESC, s.subject_name) FROM subjects s
+    ), '[]'::jsonb),
+    'topics_by_board_level', COALESCE((
+      SELECT jsonb_agg(to_jsonb(l) ORDER BY l.board, l.topic_level) FROM level_stats l
+    ), '[]'::jsonb),
+    'specifications', COALESCE((
+      SELECT jsonb_agg(to_jsonb(sp) ORDER BY sp.exam_board, sp.qualification_type, sp.subject_name) FROM specs sp
+    ), '[]'::jsonb)
+  );
+$$;
+
+COMMENT ON FUNCTION report_curriculum_overview(TEXT, INTEGER, INTEGER) IS
+  'One-round-trip aggregates for check_existing_data.py / generate_detailed_report.py';
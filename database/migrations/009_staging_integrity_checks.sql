@@ -0,0 +1,122 @@
+-- Migration 009: Set-based integrity checks for staging topic hierarchies
+-- staging_integrity_report() checks every selected staging subject in one call instead of
+-- downloading each subject's (id, parent_topic_id) pairs. Checks:
+--   empty_subject   subject has no topics
+--   orphan_parent   parent_topic_id points outside the subject (or nowhere)
+--   cycle           topic is its own ancestor
+--   level_jump      child topic_level <> parent topic_level + 1
+--   duplicate_code  topic_code used more than once within a subject
+--   board_mismatch  topic exam_board differs from its subject's exam_board
+-- Called via client.rpc('staging_integrity_report', {...}) from database/integrity.py.
+
+CREATE INDEX IF NOT EXISTS idx_staging_aqa_topics_subject_id
+  ON staging_aqa_topics(subject_id);
+
+CREATE OR REPLACE FUNCTION staging_integrity_report(
+  p_exam_boards TEXT[] DEFAULT NULL,   -- NULL = all boards
+  p_qualification TEXT DEFAULT NULL,   -- e.g. 'A-Level'; NULL = all
+  p_subject_ids UUID[] DEFAULT NULL    -- restrict to these subjects (e.g. just uploaded)
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+  WITH RECURSIVE subjects AS (
+    SELECT s.id, s.exam_board, s.qualification_type, s.subject_code, s.subject_name
+    FROM staging_aqa_subjects s
+    WHERE (p_exam_boards IS NULL OR s.exam_board = ANY(p_exam_boards))
+      AND (p_qualification IS NULL OR s.qualification_type = p_qualification)
+      AND (p_subject_ids IS NULL OR s.id = ANY(p_subject_ids))
+  ),
+  topics AS (
+    SELECT t.id, t.subject_id, t.parent_topic_id, t.topic_level, t.topic_code, t.exam_board
+    FROM staging_aqa_topics t
+    JOIN subjects s ON s.id = t.subject_id
+  ),
+  topic_counts AS (
+    SELECT subject_id, COUNT(*) AS topic_count FROM topics GROUP BY subject_id
+  ),
+  -- Walk up from every child; a walk that revisits a node has found a cycle
+  walk (start_id, node_id, parent_id, path, is_cycle) AS (
+    SELECT t.id, t.id, t.parent_topic_id, ARRAY[t.id], false
+    FROM topics t
+    WHERE t.parent_topic_id IS NOT NULL
+    UNION ALL
+    SELECT w.start_id, p.id, p.parent_topic_id, w.path || p.id, p.id = ANY(w.path)
+    FROM walk w
+    JOIN topics p ON p.id = w.parent_id
+    WHERE NOT w.is_cycle
+  ),
+  issues AS (
+    SELECT 'empty_subject' AS check_name, s.id AS subject_id, NULL::uuid AS topic_id,
+           NULL::text AS topic_code, '{}'::jsonb AS detail
+    FROM subjects s
+    LEFT JOIN topic_counts tc ON tc.subject_id = s.id
+    WHERE tc.subject_id IS NULL
+
+    UNION ALL
+    SELECT 'orphan_parent', t.subject_id, t.id, t.topic_code,
+           jsonb_build_object('parent_topic_id', t.parent_topic_id)
+    FROM topics t
+    LEFT JOIN topics p ON p.id = t.parent_topic_id AND p.subject_id = t.subject_id
+    WHERE t.parent_topic_id IS NOT NULL AND p.id IS NULL
+
+    UNION ALL
+    SELECT 'cycle', t.subject_id, t.id, t.topic_code, jsonb_build_object('path', w.path)
+    FROM walk w
+    JOIN topics t ON t.id = w.start_id
+    WHERE w.is_cycle AND w.node_id = w.start_id
+
+    UNION ALL
+    SELECT 'level_jump', t.subject_id, t.id, t.topic_code,
+           jsonb_build_object('topic_level', t.topic_level, 'parent_topic_id', p.id,
+                              'parent_level', p.topic_level)
+    FROM topics t
+    JOIN topics p ON p.id = t.parent_topic_id AND p.subject_id = t.subject_id
+    WHERE t.topic_level IS NOT NULL AND p.topic_level IS NOT NULL
+      AND t.topic_level <> p.topic_level + 1
+
+    UNION ALL
+    SELECT 'duplicate_code', t.subject_id, NULL::uuid, t.topic_code,
+           jsonb_build_object('count', COUNT(*), 'topic_ids', jsonb_agg(t.id ORDER BY t.id))
+    FROM topics t
+    WHERE t.topic_code IS NOT NULL
+    GROUP BY t.subject_id, t.topic_code
+    HAVING COUNT(*) > 1
+
+    UNION ALL
+    SELECT 'board_mismatch', t.subject_id, t.id, t.topic_code,
+           jsonb_build_object('topic_exam_board', t.exam_board, 'subject_exam_board', s.exam_board)
+    FROM topics t
+    JOIN subjects s ON s.id = t.subject_id
+    WHERE t.exam_board IS DISTINCT FROM s.exam_board
+  )
+  SELECT jsonb_build_object(
+    'generated_at', NOW(),
+    'subjects', COALESCE((
+      SELECT jsonb_agg(jsonb_build_object(
+               'subject_id', s.id,
+               'exam_board', s.exam_board,
+               'qualification_type', s.qualification_type,
+               'subject_code', s.subject_code,
+               'subject_name', s.subject_name,
+               'topic_count', COALESCE(tc.topic_count, 0)
+             ) ORDER BY s.exam_board, s.subject_code)
+      FROM subjects s
+      LEFT JOIN topic_counts tc ON tc.subject_id = s.id
+    ), '[]'::jsonb),
+    'issues', COALESCE((
+      SELECT jsonb_agg(jsonb_build_object(
+               'check', i.check_name,
+               'subject_id', i.subject_id,
+               'topic_id', i.topic_id,
+               'topic_code', i.topic_code,
+               'detail', i.detail
+             ) ORDER BY i.check_name, i.subject_id, i.topic_code)
+      FROM issues i
+    ), '[]'::jsonb)
+  );
+$$;
+
+COMMENT ON FUNCTION staging_integrity_report(TEXT[], TEXT, UUID[]) IS
+  'Orphans, cycles, level jumps, duplicate codes, board mismatches and empty subjects for staging hierarchies';
@@ -0,0 +1,21 @@
+-- Migration 010: Question -> curriculum topic links
+-- exam_questions rows produced by extract_questions were never linked to curriculum_topics.
+-- processors/question_tagger.py fills this table in bulk: embedding matches against the
+-- subject's topic_ai_metadata vectors, with an LLM pick only for low-confidence questions.
+
+CREATE TABLE IF NOT EXISTS question_topic_links (
+  question_id UUID NOT NULL REFERENCES exam_questions(id) ON DELETE CASCADE,
+  topic_id UUID NOT NULL REFERENCES curriculum_topics(id) ON DELETE CASCADE,
+  rank SMALLINT NOT NULL DEFAULT 1,          -- 1 = primary topic
+  confidence REAL,                           -- cosine similarity of question and topic
+  method VARCHAR(20) NOT NULL,               -- 'embedding' or 'llm'
+  model VARCHAR(50),                         -- embedding / chat model used
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (question_id, topic_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_question_topic_links_topic_id
+  ON question_topic_links(topic_id);
+
+COMMENT ON TABLE question_topic_links IS
+  'Curriculum topics each extracted exam question assesses (processors/question_tagger.py)';
@@ -0,0 +1,172 @@
+"""
+Aggregated reporting backend for the HTML audit reports.
+
+`fetch_overview()` calls the `report_curriculum_overview` RPC
+(database/migrations/008_reporting_aggregates.sql), which returns table counts,
+per-subject topic counts / last update / sample topics, per-board per-level topic
+counts and specification summaries in one grouped query. The result is cached as
+JSON for `max_age` seconds so re-rendering a report doesn't touch the database.
+`overview_from_snapshot()` builds the same document from the local SQLite mirror
+(database/local_mirror.py) for offline runs.
+
+Usage:
+    overview = fetch_overview(client, board_code='AQA')
+    for subject in overview['subjects']:
+        print(subject['subject_name'], subject['topic_count'])
+"""
+
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+REPORT_FUNCTION = 'report_curriculum_overview'
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / 'data' / 'state' / 'report_cache'
+DEFAULT_MAX_AGE = 15 * 60
+
+SAMPLE_COLUMNS = ('topic_code', 'topic_name', 'topic_level', 'chronological_period',
+                  'geographical_region', 'key_themes')
+
+
+def _cache_file(cache_dir: Path, board_code: Optional[str], sample_size: int, spec_limit: int) -> Path:
+    return Path(cache_dir) / f"overview_{board_code or 'all'}_{sample_size}_{spec_limit}.json"
+
+
+def _read_cache(path: Path, max_age: float) -> Optional[Dict]:
+    if max_age <= 0 or not path.exists() or time.time() - path.stat().st_mtime > max_age:
+        return None
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(path: Path, overview: Dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(overview, default=str), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def fetch_overview(client, board_code: str = None, sample_size: int = 5, spec_limit: int = 10,
+                   max_age: float = DEFAULT_MAX_AGE, refresh: bool = False,
+                   cache_dir=DEFAULT_CACHE_DIR) -> Dict:
+    """
+    Reporting aggregates for one board (or all), from the cache when fresh.
+
+    Raises RuntimeError when the RPC is missing (migration 008 not applied).
+    """
+    path = _cache_file(cache_dir, board_code, sample_size, spec_limit)
+    if not refresh:
+        cached = _read_cache(path, max_age)
+        if cached is not None:
+            cached['from_cache'] = True
+            return cached
+
+    try:
+        overview = client.rpc(REPORT_FUNCTION, {
+            'p_board_code': board_code,
+            'p_sample_size': sample_size,
+            'p_spec_limit': spec_limit,
+        }).execute().data
+    except Exception as e:
+        raise RuntimeError(
+            f"{REPORT_FUNCTION}() failed ({e}) - apply database/migrations/008_reporting_aggregates.sql"
+        ) from e
+    if isinstance(overview, list):
+        overview = overview[0] if overview else {}
+    _write_cache(path, overview)
+    overview['from_cache'] = False
+    return overview
+
+
+def topics_by_board(overview: Dict) -> List[Dict]:
+    counts = defaultdict(int)
+    for row in overview.get('topics_by_board_level', []):
+        counts[row['board']] += row['count']
+    return [{'board': board, 'count': count} for board, count in sorted(counts.items())]
+
+
+def topics_by_level(overview: Dict) -> List[Dict]:
+    counts = defaultdict(int)
+    for row in overview.get('topics_by_board_level', []):
+        level = row['topic_level'] if row['topic_level'] is not None else -1
+        counts[level] += row['count']
+    return [{'topic_level': level, 'count': count} for level, count in sorted(counts.items())]
+
+
+def overview_from_snapshot(conn, board_code: str = None, sample_size: int = 5) -> Dict:
+    """Same document from the local mirror (only the mirrored tables are counted)."""
+    board_filter = "WHERE eb.code = ?" if board_code else ""
+    params = (board_code,) if board_code else ()
+
+    subjects = conn.execute(f"""
+        SELECT ebs.id, ebs.subject_name, ebs.subject_code, ebs.created_at, ebs.updated_at,
+               eb.code AS board_code, eb.full_name AS board_name,
+               qt.code AS qual_code, qt.name AS qual_name,
+               COUNT(ct.id) AS topic_count, MAX(ct.updated_at) AS last_scraped
+        FROM exam_board_subjects ebs
+        JOIN exam_boards eb ON eb.id = ebs.exam_board_id
+        LEFT JOIN qualification_types qt ON qt.id = ebs.qualification_type_id
+        LEFT JOIN curriculum_topics ct ON ct.exam_board_subject_id = ebs.id
+        {board_filter}
+        GROUP BY ebs.id
+        ORDER BY topic_count DESC, ebs.subject_name
+    """, params).fetchall()
+
+    samples = defaultdict(list)
+    if sample_size > 0:
+        for row in conn.execute(f"""
+            SELECT exam_board_subject_id, {', '.join(SAMPLE_COLUMNS)} FROM (
+                SELECT ct.*, ROW_NUMBER() OVER (
+                    PARTITION BY ct.exam_board_subject_id ORDER BY ct.topic_code, ct.id
+                ) AS rn
+                FROM curriculum_topics ct
+                JOIN exam_board_subjects ebs ON ebs.id = ct.exam_board_subject_id
+                JOIN exam_boards eb ON eb.id = ebs.exam_board_id
+                {board_filter}
+            ) WHERE rn <= ?
+        """, params + (sample_size,)):
+            topic = dict(row)
+            samples[topic.pop('exam_board_subject_id')].append(topic)
+
+    levels = conn.execute(f"""
+        SELECT COALESCE(eb.code, 'Unknown') AS board, ct.topic_level, COUNT(*) AS count
+        FROM curriculum_topics ct
+        LEFT JOIN exam_board_subjects ebs ON ebs.id = ct.exam_board_subject_id
+        LEFT JOIN exam_boards eb ON eb.id = ebs.exam_board_id
+        {board_filter}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    """, params).fetchall()
+
+    counts = {
+        table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        for table in ('exam_boards', 'qualification_types', 'exam_board_subjects', 'curriculum_topics')
+    }
+    boards = [dict(r) for r in conn.execute("SELECT code, full_name, country FROM exam_boards ORDER BY code")]
+
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'board_code': board_code,
+        'table_counts': counts,
+        'exam_boards': boards,
+        'subjects': [{
+            'id': s['id'],
+            'subject_name': s['subject_name'],
+            'subject_code': s['subject_code'],
+            'created_at': s['created_at'],
+            'updated_at': s['updated_at'],
+            'exam_board': {'code': s['board_code'], 'full_name': s['board_name']},
+            'qualification_type': {'code': s['qual_code'], 'name': s['qual_name']} if s['qual_code'] else None,
+            'topic_count': s['topic_count'],
+            'last_scraped': s['last_scraped'],
+            'sample_topics': samples.get(s['id'], []),
+        } for s in subjects],
+        'topics_by_board_level': [dict(r) for r in levels],
+        'specifications': [],
+        'from_cache': False,
+    }
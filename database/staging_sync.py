@@ -0,0 +1,229 @@
+"""
+Diff-based upload of a subject's topic tree into staging_aqa_topics.
+
+Scrapers used to delete every topic of the subject, insert the whole tree again and
+then link parents one UPDATE at a time. `sync_subject_topics()` instead reads the
+current tree once, keys both sides on topic_code and compares a content hash per
+node (name, level, board and any extra columns), then applies only the difference:
+
+- inserts:    codes that are new (bulk insert, parents linked in the same request
+              when the parent already exists)
+- updates:    same code, content hash changed
+- reparents:  same code, parent code changed
+- deletes:    codes no longer in the scrape (deepest level first)
+
+Updates and reparents go out as one bulk upsert on id, so a re-scrape that changes
+one line writes one row and every other topic keeps its id (and therefore its
+promoted copy, embeddings and any links to it).
+
+Usage:
+    result = sync_subject_topics(supabase, subject_id, 'EDUQAS', topics)
+    print(f"[OK] {result.summary()}")
+
+`topics` are dicts or objects with code / title / level / parent (parent = parent
+code or None); the staging column names (topic_code, topic_name, topic_level,
+parent_code) are accepted as well.
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from database.keyset_reader import fetch_all
+from utils.logger import get_logger
+
+logger = get_logger()
+
+TABLE = 'staging_aqa_topics'
+DEFAULT_BATCH_SIZE = 500
+_DELETE_CHUNK = 100  # ids per DELETE ... WHERE id IN (...) (keeps the URL short)
+
+
+@dataclass
+class SyncResult:
+    subject_id: str
+    inserted: int = 0
+    updated: int = 0
+    reparented: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    code_to_id: Dict[str, str] = field(default_factory=dict, repr=False)
+    integrity: Optional[Dict] = field(default=None, repr=False)
+
+    @property
+    def written(self) -> int:
+        return self.inserted + self.updated + self.reparented + self.deleted
+
+    def summary(self) -> str:
+        return (
+            f"Topics synced: {self.inserted} inserted, {self.updated} updated, "
+            f"{self.reparented} re-parented, {self.deleted} deleted, {self.unchanged} unchanged"
+        )
+
+
+def _get(node: Any, *names: str, default=None):
+    for name in names:
+        value = node.get(name) if isinstance(node, dict) else getattr(node, name, None)
+        if value is not None:
+            return value
+    return default
+
+
+def normalize_topics(topics: Iterable[Any], exam_board: str, extra_fields: Iterable[str] = ()) -> List[Dict]:
+    """Scraper topics -> [{topic_code, topic_name, topic_level, parent_code, ...}], first code wins."""
+    seen = set()
+    rows = []
+    for t in topics:
+        code = _get(t, 'code', 'topic_code')
+        if not code or code in seen:
+            continue
+        seen.add(code)
+        row = {
+            'topic_code': code,
+            'topic_name': _get(t, 'title', 'topic_name', 'name', default=''),
+            'topic_level': _get(t, 'level', 'topic_level', default=0),
+            'exam_board': exam_board,
+            'parent_code': _get(t, 'parent', 'parent_code'),
+        }
+        for extra in extra_fields:
+            row[extra] = _get(t, extra)
+        rows.append(row)
+    return rows
+
+
+def content_hash(row: Dict, extra_fields: Iterable[str] = ()) -> str:
+    """Hash of the columns a re-scrape can change (parent handled separately)."""
+    payload = [row.get('topic_name'), row.get('topic_level'), row.get('exam_board')]
+    payload += [row.get(extra) for extra in extra_fields]
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+@dataclass
+class TopicDiff:
+    inserts: List[Dict]
+    updates: List[Dict]      # desired rows whose content changed (may also be re-parented)
+    reparents: List[Dict]    # desired rows whose only change is the parent
+    deletes: List[Dict]      # existing rows
+    unchanged: int
+
+
+def diff_topics(existing: List[Dict], desired: List[Dict], extra_fields: Iterable[str] = ()) -> TopicDiff:
+    """Compare the current staging rows with the normalized scrape, keyed on topic_code."""
+    extra_fields = list(extra_fields)
+    by_code: Dict[str, Dict] = {}
+    deletes = []
+    for row in existing:
+        code = row.get('topic_code')
+        if not code or code in by_code:
+            deletes.append(row)  # legacy duplicate / blank code
+        else:
+            by_code[code] = row
+    id_to_code = {row['id']: code for code, row in by_code.items()}
+
+    desired_codes = {row['topic_code'] for row in desired}
+    inserts, updates, reparents, unchanged = [], [], [], 0
+    for row in desired:
+        current = by_code.get(row['topic_code'])
+        if current is None:
+            inserts.append(row)
+            continue
+        parent_code = row['parent_code'] if row['parent_code'] in desired_codes else None
+        current_parent = id_to_code.get(current.get('parent_topic_id'))
+        if content_hash(row, extra_fields) != content_hash(current, extra_fields):
+            updates.append(row)
+        elif parent_code != current_parent or (current.get('parent_topic_id') and current_parent is None):
+            reparents.append(row)
+        else:
+            unchanged += 1
+
+    deletes += [row for code, row in by_code.items() if code not in desired_codes]
+    return TopicDiff(inserts, updates, reparents, deletes, unchanged)
+
+
+def _row(subject_id: str, row: Dict, parent_id: Optional[str], extra_fields: Iterable[str],
+         topic_id: str = None) -> Dict:
+    payload = {
+        'subject_id': subject_id,
+        'exam_board': row['exam_board'],
+        'topic_code': row['topic_code'],
+        'topic_name': row['topic_name'],
+        'topic_level': row['topic_level'],
+        'parent_topic_id': parent_id,
+    }
+    for extra in extra_fields:
+        payload[extra] = row.get(extra)
+    if topic_id:
+        payload['id'] = topic_id
+    return payload
+
+
+def sync_subject_topics(client, subject_id: str, exam_board: str, topics: Iterable[Any],
+                        extra_fields: Iterable[str] = (), batch_size: int = DEFAULT_BATCH_SIZE,
+                        check: bool = True) -> SyncResult:
+    """
+    Make the subject's staging topics match `topics`, writing only what changed.
+
+    Args:
+        client: Supabase client
+        subject_id: staging_aqa_subjects.id
+        exam_board: Board written on every topic row
+        topics: Scraped topics (code / title / level / parent)
+        extra_fields: Further staging columns carried on the topics and compared
+        batch_size: Rows per bulk insert / upsert
+        check: Run the integrity check (database/integrity.py) on the subject afterwards
+    """
+    extra_fields = list(extra_fields)
+    desired = normalize_topics(topics, exam_board, extra_fields)
+    columns = ','.join(['id', 'topic_code', 'topic_name', 'topic_level', 'parent_topic_id', 'exam_board']
+                       + extra_fields)
+    existing = fetch_all(client, TABLE, columns, [('subject_id', 'eq', subject_id)])
+    diff = diff_topics(existing, desired, extra_fields)
+    result = SyncResult(subject_id, unchanged=diff.unchanged)
+
+    deleted_ids = {row['id'] for row in diff.deletes}
+    code_to_id = {row['topic_code']: row['id'] for row in existing
+                  if row.get('topic_code') and row['id'] not in deleted_ids}
+
+    # 1) New codes (shallowest first), linked to parents that already have an id
+    inserts = sorted(diff.inserts, key=lambda r: r['topic_level'] or 0)
+    pending_links = []
+    for i in range(0, len(inserts), batch_size):
+        batch = inserts[i:i + batch_size]
+        payload = []
+        for row in batch:
+            parent_id = code_to_id.get(row['parent_code'])
+            if row['parent_code'] and parent_id is None:
+                pending_links.append(row)
+            payload.append(_row(subject_id, row, parent_id, extra_fields))
+        inserted = client.table(TABLE).insert(payload).execute().data or []
+        for row in inserted:
+            code_to_id[row['topic_code']] = row['id']
+        result.inserted += len(inserted)
+
+    # 2) Changed content, changed parents and new rows whose parent was new too: one bulk upsert
+    upserts = diff.updates + diff.reparents + [r for r in pending_links if r['parent_code'] in code_to_id]
+    payload = [
+        _row(subject_id, row, code_to_id.get(row['parent_code']), extra_fields, code_to_id[row['topic_code']])
+        for row in upserts
+        if row['topic_code'] in code_to_id
+    ]
+    for i in range(0, len(payload), batch_size):
+        client.table(TABLE).upsert(payload[i:i + batch_size], on_conflict='id').execute()
+    result.updated = len(diff.updates)
+    result.reparented = len(diff.reparents)
+
+    # 3) Codes that disappeared, deepest first so parents never go before their children
+    doomed = sorted(diff.deletes, key=lambda r: -(r.get('topic_level') or 0))
+    ids = [row['id'] for row in doomed]
+    for i in range(0, len(ids), _DELETE_CHUNK):
+        client.table(TABLE).delete().in_('id', ids[i:i + _DELETE_CHUNK]).execute()
+    result.deleted = len(ids)
+
+    result.code_to_id = code_to_id
+    logger.info(f"[STAGING] subject {subject_id}: {result.summary()}")
+
+    if check:
+        from database.integrity import check_subject
+        result.integrity = check_subject(client, subject_id)
+    return result
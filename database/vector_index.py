@@ -0,0 +1,329 @@
+"""
+Local vector index over topic_ai_metadata embeddings.
+
+Loads the embeddings of a board / qualification / subject into one contiguous
+float32 (or float16) matrix, stored as a .npy file and memory-mapped on open, so
+bulk jobs (e.g. tagging thousands of extracted questions) search locally instead of
+sending every query to pgvector. Rows are L2-normalized when written, so cosine
+similarity is a single matrix product; `search()` takes a batch of queries and
+streams the matrix in blocks, keeping a running top-k per query.
+
+Layout (data/state/vector_index/<name>/):
+    vectors.npy   (capacity x dim) matrix; rows past len(ids) are spare capacity
+    meta.json     ids per row (null = removed), per-topic attrs, sync watermark
+
+`sync_index()` keeps an index current incrementally: ids no longer upstream are
+removed, rows changed since the last watermark (updated_at / created_at) and ids
+not yet indexed are fetched and added. Removed rows are tombstoned and their
+slots reused; the file is compacted when a quarter of it is dead.
+
+Usage:
+    index = sync_index(sb, exam_board='AQA', qualification_level='A_LEVEL')
+    ids, scores = index.search(query_vectors, k=5)
+    ids, scores = index.search(query_vectors, k=5, allowed=topic_ids_at_level_2)
+"""
+
+import json
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from database.keyset_reader import iter_pages, iter_rows
+from utils.logger import get_logger
+
+logger = get_logger()
+
+TABLE = 'topic_ai_metadata'
+KEY = 'topic_id'
+ATTR_COLUMNS = ('topic_level', 'full_path', 'subject_name')
+WATERMARK_COLUMNS = ('updated_at', 'created_at')
+DEFAULT_INDEX_DIR = Path(__file__).resolve().parent.parent / 'data' / 'state' / 'vector_index'
+DTYPES = {'float32': np.float32, 'float16': np.float16}
+SEARCH_BLOCK = 65536          # matrix rows scored per step
+_FETCH_CHUNK = 200            # ids per `in_` request
+_MIN_CAPACITY = 1024
+
+
+def parse_embedding(value) -> Optional[np.ndarray]:
+    """pgvector comes back from PostgREST as '[0.1,0.2,...]' (or a list)."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return np.fromstring(value.strip().strip('[]'), dtype=np.float32, sep=',')
+    return np.asarray(value, dtype=np.float32)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def index_name(exam_board: str = None, qualification_level: str = None, subject_name: str = None) -> str:
+    parts = [p for p in (exam_board, qualification_level, subject_name) if p] or ['all']
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', '__'.join(parts))
+
+
+def _write_json(path: Path, payload: Dict):
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(payload, default=str), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+class VectorIndex:
+    """Memory-mapped (capacity x dim) matrix plus the topic id of each row."""
+
+    def __init__(self, path: Path, vectors: np.ndarray, meta: Dict):
+        self.path = Path(path)
+        self.vectors = vectors
+        self.meta = meta
+        self.row_ids: List[Optional[str]] = meta['ids']
+        self.attrs: Dict[str, Dict] = meta.setdefault('attrs', {})
+        self._row_of = {tid: row for row, tid in enumerate(self.row_ids) if tid is not None}
+
+    # -- files -------------------------------------------------------------
+
+    @classmethod
+    def create(cls, path, dim: int, dtype: str = 'float32', capacity: int = _MIN_CAPACITY) -> 'VectorIndex':
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        vectors = np.lib.format.open_memmap(path / 'vectors.npy', mode='w+', dtype=DTYPES[dtype],
+                                            shape=(max(capacity, 1), dim))
+        meta = {'dim': dim, 'dtype': dtype, 'ids': [], 'attrs': {}, 'watermark': None,
+                'watermark_column': None, 'synced_at': None}
+        index = cls(path, vectors, meta)
+        index.save()
+        return index
+
+    @classmethod
+    def open(cls, path, writable: bool = False) -> 'VectorIndex':
+        path = Path(path)
+        if not (path / 'meta.json').exists():
+            raise FileNotFoundError(f"No vector index at {path} - build it with scripts/build_vector_index.py")
+        meta = json.loads((path / 'meta.json').read_text(encoding='utf-8'))
+        vectors = np.load(path / 'vectors.npy', mmap_mode='r+' if writable else 'r')
+        return cls(path, vectors, meta)
+
+    def save(self):
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+        self.meta['ids'] = self.row_ids
+        _write_json(self.path / 'meta.json', self.meta)
+
+    def _resize(self, capacity: int, keep_rows: Sequence[int] = None):
+        """Rewrite vectors.npy with a new capacity (optionally keeping only `keep_rows`, in order)."""
+        rows = list(range(len(self.row_ids))) if keep_rows is None else list(keep_rows)
+        tmp = self.path / 'vectors.npy.tmp'
+        resized = np.lib.format.open_memmap(tmp, mode='w+', dtype=self.vectors.dtype,
+                                            shape=(max(capacity, len(rows), 1), self.dim))
+        for start in range(0, len(rows), SEARCH_BLOCK):
+            chunk = rows[start:start + SEARCH_BLOCK]
+            resized[start:start + len(chunk)] = self.vectors[chunk]
+        resized.flush()
+        del resized
+        self.vectors = None  # release the old mapping before replacing the file (Windows)
+        os.replace(tmp, self.path / 'vectors.npy')
+        self.vectors = np.load(self.path / 'vectors.npy', mmap_mode='r+')
+
+    # -- contents ----------------------------------------------------------
+
+    @property
+    def dim(self) -> int:
+        return self.meta['dim']
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def __contains__(self, topic_id) -> bool:
+        return topic_id in self._row_of
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._row_of)
+
+    def get(self, topic_ids: Iterable[str]) -> np.ndarray:
+        return np.asarray(self.vectors[[self._row_of[t] for t in topic_ids]], dtype=np.float32)
+
+    def add(self, topic_ids: Sequence[str], vectors, attrs: Sequence[Dict] = None):
+        """Insert or replace rows (vectors are normalized on the way in)."""
+        vectors = _normalize(vectors)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dim vectors, got {vectors.shape[1]}")
+        free = [row for row, tid in enumerate(self.row_ids) if tid is None]
+        new = sum(1 for t in dict.fromkeys(topic_ids) if t not in self._row_of)
+        needed = len(self.row_ids) + max(0, new - len(free))
+        if needed > self.vectors.shape[0]:
+            self._resize(max(needed, self.vectors.shape[0] * 2, _MIN_CAPACITY))
+
+        for i, tid in enumerate(topic_ids):
+            row = self._row_of.get(tid)
+            if row is None:
+                if free:
+                    row = free.pop()
+                else:
+                    row = len(self.row_ids)
+                    self.row_ids.append(None)
+                self.row_ids[row] = tid
+                self._row_of[tid] = row
+            self.vectors[row] = vectors[i]
+            if attrs is not None:
+                self.attrs[tid] = attrs[i]
+
+    def remove(self, topic_ids: Iterable[str]) -> int:
+        removed = 0
+        for tid in topic_ids:
+            row = self._row_of.pop(tid, None)
+            if row is None:
+                continue
+            self.row_ids[row] = None
+            self.vectors[row] = 0
+            self.attrs.pop(tid, None)
+            removed += 1
+        while self.row_ids and self.row_ids[-1] is None:
+            self.row_ids.pop()
+        if len(self.row_ids) > _MIN_CAPACITY and len(self._row_of) < 0.75 * len(self.row_ids):
+            self.compact()
+        return removed
+
+    def compact(self):
+        keep = [row for row, tid in enumerate(self.row_ids) if tid is not None]
+        self._resize(max(len(keep), _MIN_CAPACITY), keep)
+        self.row_ids = [self.row_ids[row] for row in keep]
+        self._row_of = {tid: row for row, tid in enumerate(self.row_ids)}
+
+    # -- search ------------------------------------------------------------
+
+    def search(self, queries, k: int = 10, allowed: Iterable[str] = None,
+               block: int = SEARCH_BLOCK) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k cosine matches for a batch of query vectors.
+
+        Returns (ids, scores), both (n_queries x k) - ids is an object array, padded
+        with None / -inf when fewer than k rows are eligible. `allowed` restricts the
+        candidates to those topic ids.
+        """
+        q = _normalize(queries)
+        if allowed is None:
+            rows = np.array([row for row, tid in enumerate(self.row_ids) if tid is not None], dtype=np.int64)
+        else:
+            rows = np.array(sorted(self._row_of[t] for t in set(allowed) if t in self._row_of), dtype=np.int64)
+        best_scores = np.full((len(q), k), -np.inf, dtype=np.float32)
+        best_rows = np.full((len(q), k), -1, dtype=np.int64)
+
+        contiguous = len(rows) and rows[-1] - rows[0] + 1 == len(rows)
+        for start in range(0, len(rows), block):
+            chunk = rows[start:start + block]
+            matrix = (self.vectors[chunk[0]:chunk[-1] + 1] if contiguous else self.vectors[chunk])
+            scores = q @ np.asarray(matrix, dtype=np.float32).T
+            merged_scores = np.concatenate([best_scores, scores], axis=1)
+            merged_rows = np.concatenate([best_rows, np.broadcast_to(chunk, scores.shape)], axis=1)
+            if merged_scores.shape[1] > k:
+                top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(merged_scores, top, axis=1)
+                best_rows = np.take_along_axis(merged_rows, top, axis=1)
+            else:
+                best_scores, best_rows = merged_scores, merged_rows
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)[:, :k]
+        best_rows = np.take_along_axis(best_rows, order, axis=1)[:, :k]
+        lookup = np.array(self.row_ids + [None], dtype=object)
+        return lookup[best_rows], best_scores
+
+
+def _watermark_column(client) -> Optional[str]:
+    for column in WATERMARK_COLUMNS:
+        try:
+            client.table(TABLE).select(column).limit(1).execute()
+            return column
+        except Exception:
+            continue
+    return None
+
+
+def _add_rows(index: VectorIndex, rows: List[Dict]) -> int:
+    ids, vectors, attrs = [], [], []
+    for row in rows:
+        vec = parse_embedding(row.get('embedding'))
+        if vec is None or not len(vec):
+            continue
+        ids.append(row[KEY])
+        vectors.append(vec)
+        attrs.append({c: row.get(c) for c in ATTR_COLUMNS})
+    if ids:
+        index.add(ids, np.vstack(vectors), attrs)
+    return len(ids)
+
+
+def _missing_pages(client, index: VectorIndex, upstream, columns: str, filters) -> Iterator[List[Dict]]:
+    """Upstream ids the index doesn't have yet (evaluated lazily, after the changed rows were added)."""
+    missing = sorted(t for t in upstream if t not in index)
+    for i in range(0, len(missing), _FETCH_CHUNK):
+        yield from iter_pages(client, TABLE, columns, filters + [(KEY, 'in_', missing[i:i + _FETCH_CHUNK])], key=KEY)
+
+
+def sync_index(client, exam_board: str = None, qualification_level: str = None, subject_name: str = None,
+               dtype: str = 'float32', full: bool = False, index_dir=DEFAULT_INDEX_DIR) -> VectorIndex:
+    """Build or incrementally refresh the index for one board / qualification / subject selection."""
+    started = time.time()
+    filters = [(col, 'eq', val) for col, val in (('exam_board', exam_board),
+                                                 ('qualification_level', qualification_level),
+                                                 ('subject_name', subject_name)) if val]
+    path = Path(index_dir) / index_name(exam_board, qualification_level, subject_name)
+    column = _watermark_column(client)
+    columns = ','.join([KEY, 'embedding', *ATTR_COLUMNS] + ([column] if column else []))
+
+    index = None
+    if not full and (path / 'meta.json').exists():
+        index = VectorIndex.open(path, writable=True)
+        if index.meta['dtype'] != dtype or index.meta.get('watermark_column') != column:
+            index = None
+    if index is None:
+        shutil.rmtree(path, ignore_errors=True)
+
+    upstream = {row[KEY] for row in iter_rows(client, TABLE, KEY, filters, key=KEY)}
+    added = removed = 0
+    since = index.meta.get('watermark') if index else None
+    if index is not None:
+        removed = index.remove([t for t in index.ids if t not in upstream])
+        changed = (iter_pages(client, TABLE, columns, filters + [(column, 'gte', since)], key=KEY)
+                   if column and since else iter([]))
+        pages = chain(changed, _missing_pages(client, index, upstream, columns, filters))
+    else:
+        pages = iter_pages(client, TABLE, columns, filters, key=KEY)
+
+    for page in pages:
+        if index is None:
+            first = next((parse_embedding(r['embedding']) for r in page if r.get('embedding')), None)
+            if first is None:
+                continue
+            index = VectorIndex.create(path, len(first), dtype, capacity=len(upstream))
+        added += _add_rows(index, page)
+        if column:
+            values = [r[column] for r in page if r.get(column)]
+            if values:
+                since = max([since] + values) if since else max(values)
+
+    if index is None:
+        raise RuntimeError(f"No embeddings in {TABLE} for {path.name}")
+    index.meta.update({'watermark': since, 'watermark_column': column,
+                       'filters': filters, 'synced_at': datetime.now().isoformat(timespec='seconds')})
+    index.save()
+    logger.info(f"[VECTOR INDEX] {path.name}: {added} added/updated, {removed} removed, "
+                f"{len(index)} total ({time.time() - started:.1f}s)")
+    return index
+
+
+def open_index(exam_board: str = None, qualification_level: str = None, subject_name: str = None,
+               index_dir=DEFAULT_INDEX_DIR) -> VectorIndex:
+    return VectorIndex.open(Path(index_dir) / index_name(exam_board, qualification_level, subject_name))
@@ -1,6 +1,7 @@
 """Extractors package for AI-powered specification extraction."""
 
 from .specification_extractor import SpecificationExtractor
+from .spec_document_index import SpecDocumentIndex
 from .topic_extractor import (
     extract_topics_from_pdf,
     extract_topics_from_html,
@@ -9,6 +10,7 @@ from .topic_extractor import (
 
 __all__ = [
     'SpecificationExtractor',
+    'SpecDocumentIndex',
     'extract_topics_from_pdf',
     'extract_topics_from_html',
     'extract_topics_from_content'
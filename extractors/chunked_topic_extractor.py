@@ -15,6 +15,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 load_dotenv()
 
 from utils.logger import get_logger
+from extractors.spec_document_index import SpecDocumentIndex
+from extractors.concurrency import provider_limit, provider_slot, run_in_order, log_timings
 
 logger = get_logger()
 
@@ -22,9 +24,12 @@ logger = get_logger()
 class ChunkedTopicExtractor:
     """Extract topics by processing each section separately."""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, max_workers: int = None):
         self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
         self.client = anthropic.Anthropic(api_key=self.api_key)
+        # Sections are independent; actual Claude concurrency is capped by provider_slot('anthropic')
+        self.max_workers = max_workers or provider_limit('anthropic')
+        self.last_timings = []
     
     def extract_topics_complete(self, pdf_path: str, subject: str,
                                 exam_board: str, qualification: str) -> list:
@@ -41,62 +46,52 @@ class ChunkedTopicExtractor:
         
         logger.info(f"Extracted {len(full_text)} characters from PDF")
         
-        # Find all section markers (3.1, 3.2, 3.3, etc.)
-        section_pattern = r'(3\.\d+)\s+([^\n]+)'
-        sections = re.findall(section_pattern, full_text)
+        # Index the document once; every section lookup below is a dict hit
+        index = SpecDocumentIndex(full_text)
         
-        logger.info(f"Found {len(sections)} sections to extract")
+        # All section markers (3.1, 3.2, 3.3, etc.)
+        sections = [(code, title) for code, title in index.sections if code.startswith('3.')]
         
-        all_topics = []
+        logger.info(f"Found {len(sections)} sections to extract")
         
-        # Extract each section separately
-        for section_code, section_title in sections:
+        def _extract_one(section):
+            section_code, section_title = section
             logger.info(f"  Extracting {section_code}: {section_title[:50]}...")
             
             # Find the text for THIS section (from 3.1 to 3.2, or 3.2 to 3.3, etc.)
-            section_text = self._extract_section_text(full_text, section_code)
+            section_text = self._extract_section_text(full_text, section_code, index)
             
             if not section_text:
                 logger.warning(f"    No content found for {section_code}")
-                continue
+                return []
             
             # Extract topics for this section
             topics = self._extract_section_topics(
                 section_code, section_title, section_text, subject
             )
             
-            logger.info(f"    Found {len(topics)} sub-topics")
-            all_topics.extend(topics)
+            logger.info(f"    {section_code}: found {len(topics)} sub-topics")
+            return topics
+        
+        # Fan out across sections; results come back in section order
+        results, self.last_timings = run_in_order(
+            sections, _extract_one, self.max_workers, label=lambda sec: sec[0]
+        )
+        log_timings(self.last_timings)
+        
+        all_topics = []
+        for topics in results:
+            all_topics.extend(topics or [])
         
         logger.info(f"Total extracted: {len(all_topics)} topics")
         
         return all_topics
     
-    def _extract_section_text(self, full_text: str, section_code: str) -> str:
-        """Extract text for one section."""
-        
-        # Find start of this section
-        pattern = rf'{section_code}\s+[^\n]+'
-        match = re.search(pattern, full_text)
-        
-        if not match:
-            return ""
-        
-        start_pos = match.start()
-        
-        # Find start of NEXT section (3.2 after 3.1, or 4.0 after 3.5)
-        next_section_num = section_code.split('.')[0]
-        next_minor = int(section_code.split('.')[1]) + 1
-        next_pattern = rf'({next_section_num}\.{next_minor}|{int(next_section_num)+1}\.0)\s+'
-        
-        next_match = re.search(next_pattern, full_text[start_pos + 10:])
-        
-        if next_match:
-            end_pos = start_pos + next_match.start() + 10
-            return full_text[start_pos:end_pos]
-        else:
-            # Last section - take rest of document
-            return full_text[start_pos:start_pos + 15000]
+    def _extract_section_text(self, full_text: str, section_code: str,
+                              index: SpecDocumentIndex = None) -> str:
+        """Extract text for one section (from 3.1 to 3.2, or 3.5 to 4.0)."""
+        index = index or SpecDocumentIndex(full_text)
+        return index.section_text(section_code)
     
     def _extract_section_topics(self, section_code: str, section_title: str,
                                 section_text: str, subject: str) -> list:
@@ -134,11 +129,12 @@ Section text:
 {section_text[:20000]}"""
         
         try:
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=4096,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            with provider_slot('anthropic'):
+                response = self.client.messages.create(
+                    model="claude-3-5-sonnet-20241022",
+                    max_tokens=4096,
+                    messages=[{"role": "user", "content": prompt}]
+                )
             
             result_text = response.content[0].text.strip()
             
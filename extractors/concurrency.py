@@ -0,0 +1,85 @@
+"""
+Bounded fan-out helpers shared by the extractors.
+
+Every extractor that calls a provider (Anthropic, exam-board websites) goes through
+`provider_slot(name)`, a process-wide semaphore per provider. Fan-out with
+`run_in_order` can therefore use as many workers as it likes without exceeding the
+provider's concurrency limit, even when several extractors run at once.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Defaults per provider; override with e.g. ANTHROPIC_MAX_CONCURRENCY=8
+DEFAULT_PROVIDER_LIMITS = {
+    'anthropic': 4,
+    'openai': 4,
+    'aqa_web': 4,
+}
+
+_provider_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_provider_lock = threading.Lock()
+
+
+def provider_limit(provider: str) -> int:
+    env_value = os.getenv(f"{provider.upper()}_MAX_CONCURRENCY")
+    if env_value:
+        return max(1, int(env_value))
+    return DEFAULT_PROVIDER_LIMITS.get(provider, 4)
+
+
+def provider_slot(provider: str) -> threading.BoundedSemaphore:
+    """Semaphore bounding concurrent calls to one provider (use as `with provider_slot('anthropic'):`)."""
+    with _provider_lock:
+        sem = _provider_semaphores.get(provider)
+        if sem is None:
+            sem = threading.BoundedSemaphore(provider_limit(provider))
+            _provider_semaphores[provider] = sem
+        return sem
+
+
+def run_in_order(items: Sequence, fn: Callable, max_workers: int = None,
+                 label: Callable = str) -> Tuple[List, List[Tuple[str, float]]]:
+    """
+    Run `fn(item)` for every item on a thread pool and return
+    (results in input order, [(label, seconds), ...] in input order).
+
+    Exceptions are logged and that item's result is None, matching the extractors'
+    existing "log and carry on" behaviour for a single failed section.
+    """
+    items = list(items)
+    if not items:
+        return [], []
+    workers = max(1, min(max_workers or len(items), len(items)))
+
+    def _timed(item):
+        started = time.perf_counter()
+        try:
+            return fn(item), time.perf_counter() - started
+        except Exception as e:
+            logger.error(f"{label(item)} failed: {e}")
+            return None, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(_timed, items))
+
+    results = [result for result, _ in outcomes]
+    timings = [(label(item), seconds) for item, (_, seconds) in zip(items, outcomes)]
+    return results, timings
+
+
+def log_timings(timings: List[Tuple[str, float]], what: str = "section") -> None:
+    if not timings:
+        return
+    slowest = max(timings, key=lambda t: t[1])
+    total = sum(seconds for _, seconds in timings)
+    logger.info(f"Per-{what} timings ({len(timings)} {what}s, sum {total:.1f}s, slowest {slowest[0]} {slowest[1]:.1f}s):")
+    for name, seconds in timings:
+        logger.info(f"  {name}: {seconds:.1f}s")
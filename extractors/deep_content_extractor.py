@@ -7,6 +7,8 @@ import json
 import re
 from typing import Dict, List, Optional
 from utils.logger import get_logger
+from extractors.spec_document_index import SpecDocumentIndex, next_option_codes
+from extractors.concurrency import provider_limit, provider_slot, run_in_order, log_timings
 import anthropic
 import os
 
@@ -29,6 +31,14 @@ class DeepContentExtractor:
             raise ValueError("ANTHROPIC_API_KEY required")
         
         self.client = anthropic.Anthropic(api_key=self.api_key)
+        self._index: Optional[SpecDocumentIndex] = None
+        self.last_timings = []
+    
+    def get_index(self, pdf_text: str) -> SpecDocumentIndex:
+        """Build the spec index once per document and reuse it across options."""
+        if self._index is None or (self._index.text is not pdf_text and self._index.text != pdf_text):
+            self._index = SpecDocumentIndex(pdf_text)
+        return self._index
     
     def extract_option_complete(self, pdf_text: str, option_code: str, 
                                option_title: str, subject: str) -> Dict:
@@ -72,93 +82,50 @@ class DeepContentExtractor:
         
         return result
     
+    def extract_options_complete(self, pdf_text: str, options: List[Dict], subject: str,
+                                 max_workers: int = None) -> Dict[str, Dict]:
+        """
+        Extract COMPLETE content for many options concurrently.
+        
+        Args:
+            options: List of option dicts with 'code' and 'title'
+            
+        Returns:
+            Dict mapping option_code -> result of extract_option_complete, in option order
+            (options that failed or weren't found are omitted)
+        """
+        # Build the index up front so worker threads share one copy
+        self.get_index(pdf_text)
+        
+        results, self.last_timings = run_in_order(
+            options,
+            lambda opt: self.extract_option_complete(pdf_text, opt.get('code'), opt.get('title'), subject),
+            max_workers or provider_limit('anthropic'),
+            label=lambda opt: opt.get('code'),
+        )
+        log_timings(self.last_timings, what="option")
+        
+        return {opt.get('code'): result for opt, result in zip(options, results) if result}
+    
     def _extract_option_section(self, full_text: str, option_code: str, option_title: str) -> str:
         """
         Extract just the section of the PDF that covers this option.
-        Looks for the DETAILED content section, not just the table of contents.
+        Looks for the DETAILED content section, not just the table of contents
+        (scored by bullet/"key questions"/"part one" density in the spec index).
         """
-        # For History, the detailed sections come AFTER "Subject content" heading
-        # and usually have longer content with key questions and bullet points
+        index = self.get_index(full_text)
         
-        # Find all occurrences of this option code
-        pattern = rf"\b{option_code}\b"
-        matches = list(re.finditer(pattern, full_text))
-        
-        if not matches:
+        count = index.option_match_count(option_code)
+        if not count:
             logger.warning(f"No matches found for {option_code}")
             return ""
         
-        logger.info(f"Found {len(matches)} occurrences of {option_code}")
-        
-        # For each match, check if it has detailed content nearby
-        best_match = None
-        best_score = 0
-        
-        for match in matches:
-            start_pos = match.start()
-            # Check next 5000 chars for indicators of detailed content
-            sample = full_text[start_pos:start_pos + 5000]
-            
-            # Score this section based on detailed content indicators
-            score = 0
-            if "key questions" in sample.lower() or "this option allows" in sample.lower():
-                score += 10
-            if "part one" in sample.lower() or "part two" in sample.lower():
-                score += 10
-            # Count bullet points (often indicates detailed content)
-            score += sample.count('•') + sample.count('–')
-            
-            if score > best_score:
-                best_score = score
-                best_match = match
-        
-        if not best_match:
-            # Fallback to first match
-            best_match = matches[0]
-            logger.warning(f"Using first match (no detailed content indicators found)")
-        else:
-            logger.info(f"Using match with score {best_score} (has detailed content)")
-        
-        start_pos = best_match.start()
-        
-        # Find where next option starts (or end of document)
-        # Next option would be like "1C" or "2A" etc
-        next_codes = self._get_next_option_codes(option_code)
-        
-        end_pos = len(full_text)
-        for next_code in next_codes:
-            next_pattern = rf"\n{next_code}\s+"
-            next_match = re.search(next_pattern, full_text[start_pos + 100:])  # Start searching after current option
-            if next_match:
-                end_pos = start_pos + 100 + next_match.start()
-                break
-        
-        section = full_text[start_pos:end_pos]
-        return section
+        logger.info(f"Found {count} occurrences of {option_code}")
+        return index.option_text(option_code)
     
     def _get_next_option_codes(self, current_code: str) -> List[str]:
         """Get possible next option codes to find section boundaries."""
-        # If current is "1B", next could be "1C", "1D", etc. or "2A" if Component 1 ends
-        
-        if current_code[0].isdigit():
-            component = current_code[0]
-            letter = current_code[1]
-            
-            # Generate next letters in same component
-            next_codes = []
-            for next_letter in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
-                if next_letter > letter:
-                    next_codes.append(f"{component}{next_letter}")
-                    if len(next_codes) >= 5:  # Check a few
-                        break
-            
-            # Also check next component
-            next_component = str(int(component) + 1)
-            next_codes.extend([f"{next_component}A", f"{next_component}B", f"{next_component}C"])
-            
-            return next_codes
-        
-        return []
+        return next_option_codes(current_code)
     
     def _extract_hierarchical_content(self, section_text: str, option_code: str,
                                      option_title: str, subject: str) -> Dict:
@@ -233,13 +200,14 @@ SPECIFICATION SECTION:
 {section_text}"""
         
         try:
-            message = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=8192,  # Maximum for Claude 3.5 Sonnet
-                temperature=0.1,
-                system="You are an expert at extracting detailed curriculum content. Return ONLY valid JSON with no markdown.",
-                messages=[{"role": "user", "content": prompt}]
-            )
+            with provider_slot('anthropic'):
+                message = self.client.messages.create(
+                    model="claude-3-5-sonnet-20241022",
+                    max_tokens=8192,  # Maximum for Claude 3.5 Sonnet
+                    temperature=0.1,
+                    system="You are an expert at extracting detailed curriculum content. Return ONLY valid JSON with no markdown.",
+                    messages=[{"role": "user", "content": prompt}]
+                )
             
             response_text = message.content[0].text.strip()
             
@@ -0,0 +1,150 @@
+"""
+Spec Context Planner - decide which pages of a specification each AI pass needs.
+
+SpecificationExtractor runs five passes (metadata, components, constraints, topics,
+vocabulary). Instead of sending the whole PDF (topics) or a blind prefix slice
+(the others), each pass gets the pages that actually carry its information:
+
+- metadata:    cover / "at a glance" / assessment overview pages
+- components:  assessment structure pages (papers, weightings, durations)
+- constraints: option-choice rule pages ("must choose", "may not be combined")
+- topics:      the subject-content block (from the "Subject content" heading to
+               the scheme of assessment)
+- vocabulary:  glossary pages plus the start of subject content
+"""
+
+import re
+from typing import Dict, List, Optional
+
+# Character budgets per pass (the old prefix slices used the same sizes)
+PASS_BUDGETS = {
+    'metadata': 10000,
+    'components': 15000,
+    'constraints': 15000,
+    'topics': None,  # whole subject-content block
+    'vocabulary': 8000,
+}
+
+PASS_KEYWORDS = {
+    'metadata': [
+        'guided learning hours', 'specification at a glance', 'at a glance',
+        'qualification accreditation number', 'subject code', 'version',
+        'assessment overview', 'introduction', 'why choose',
+    ],
+    'components': [
+        'component', 'paper 1', 'paper 2', 'paper 3', 'written exam', 'non-exam assessment',
+        '% of a-level', '% of gcse', '% of the qualification', 'marks', 'hours',
+        'assessment objectives', 'weighting', 'scheme of assessment',
+    ],
+    'constraints': [
+        'must choose', 'must study', 'students choose', 'may not', 'cannot be combined',
+        'combination', 'prohibited', 'non-british', 'british', 'chronological',
+        'one option from', 'two options', 'options are',
+    ],
+    'vocabulary': [
+        'glossary', 'key terms', 'definitions', 'command words', 'terminology',
+    ],
+}
+
+_SUBJECT_CONTENT_RE = re.compile(r'^\s*(?:\d+(?:\.\d+)?\s+)?subject content\b', re.IGNORECASE | re.MULTILINE)
+_ASSESSMENT_START_RE = re.compile(r'^\s*(?:\d+(?:\.\d+)?\s+)?scheme of assessment\b', re.IGNORECASE | re.MULTILINE)
+_CONTENTS_PAGE_RE = re.compile(r'\bcontents\b', re.IGNORECASE)
+
+
+def _score(page_lower: str, keywords: List[str]) -> int:
+    return sum(page_lower.count(k) for k in keywords)
+
+
+def _is_contents_page(page: str) -> bool:
+    # Table-of-contents pages mention every heading; lots of dotted leaders / trailing page numbers
+    head = page[:400]
+    trailing_numbers = len(re.findall(r'\s\d{1,3}\s*$', page, re.MULTILINE))
+    return bool(_CONTENTS_PAGE_RE.search(head)) and trailing_numbers >= 5
+
+
+def subject_content_range(pages: List[str]) -> Optional[range]:
+    """Page range of the subject-content block, skipping the contents page."""
+    start = None
+    for i, page in enumerate(pages):
+        if _is_contents_page(page):
+            continue
+        if _SUBJECT_CONTENT_RE.search(page):
+            start = i
+            break
+    if start is None:
+        return None
+    end = len(pages)
+    for i in range(start + 1, len(pages)):
+        if not _is_contents_page(pages[i]) and _ASSESSMENT_START_RE.search(pages[i]):
+            end = i
+            break
+    return range(start, end)
+
+
+def _join(pages: List[str], indices, budget: Optional[int]) -> str:
+    parts = []
+    used = 0
+    for i in sorted(set(indices)):
+        chunk = f"--- Page {i + 1} ---\n{pages[i]}\n"
+        if budget is not None and used + len(chunk) > budget:
+            remaining = budget - used
+            if remaining > 200:
+                parts.append(chunk[:remaining])
+            break
+        parts.append(chunk)
+        used += len(chunk)
+    return "".join(parts)
+
+
+def _top_pages(lowered: List[str], keywords: List[str], candidates, budget: int, pages: List[str]) -> List[int]:
+    scored = sorted(
+        ((_score(lowered[i], keywords), i) for i in candidates),
+        key=lambda t: (-t[0], t[1]),
+    )
+    chosen, used = [], 0
+    for score, i in scored:
+        if score <= 0 or used >= budget:
+            break
+        chosen.append(i)
+        used += len(pages[i])
+    return chosen
+
+
+def plan_pass_contexts(pages: List[str]) -> Dict[str, str]:
+    """
+    Return {pass_name: context_text} for the five SpecificationExtractor passes.
+    Falls back to the old prefix slices / full text when a pass finds no relevant pages.
+    """
+    full_text = "\n".join(pages)
+    if not pages:
+        return {name: "" for name in PASS_BUDGETS}
+
+    lowered = [p.lower() for p in pages]
+    content = subject_content_range(pages)
+    # Contents pages mention every heading and would win every keyword contest
+    scorable = [i for i in range(len(pages)) if not _is_contents_page(pages[i])]
+    non_content = [i for i in scorable if content is None or i not in content]
+    contexts: Dict[str, str] = {}
+
+    # Metadata: first pages (cover, intro) plus best "at a glance"/overview pages
+    meta_pages = list(range(min(3, len(pages))))
+    meta_pages += _top_pages(lowered, PASS_KEYWORDS['metadata'], non_content, PASS_BUDGETS['metadata'], pages)
+    contexts['metadata'] = _join(pages, meta_pages, PASS_BUDGETS['metadata'])
+
+    for name in ('components', 'constraints'):
+        chosen = _top_pages(lowered, PASS_KEYWORDS[name], scorable, PASS_BUDGETS[name], pages)
+        contexts[name] = _join(pages, chosen, PASS_BUDGETS[name]) if chosen else full_text[:PASS_BUDGETS[name]]
+
+    if content is not None and len(content) > 0:
+        contexts['topics'] = _join(pages, content, None)
+    else:
+        contexts['topics'] = full_text
+
+    glossary = _top_pages(lowered, PASS_KEYWORDS['vocabulary'], scorable, PASS_BUDGETS['vocabulary'] // 2, pages)
+    vocab_pages = glossary + (list(content)[:2] if content is not None else [])
+    contexts['vocabulary'] = (
+        _join(pages, vocab_pages, PASS_BUDGETS['vocabulary']) if vocab_pages
+        else full_text[:PASS_BUDGETS['vocabulary']]
+    )
+
+    return contexts
@@ -0,0 +1,177 @@
+"""
+Spec Document Index - tokenize a specification's text once and answer
+"text for option 1B" / "text for section 3.4" without re-scanning the document.
+
+Shared by DeepContentExtractor (History-style option codes) and
+ChunkedTopicExtractor (numbered 3.x content sections).
+"""
+
+import bisect
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Option codes like "1B", "2A" (component digit + option letter)
+OPTION_CODE_PATTERN = re.compile(r"\b(\d[A-Z])\b")
+# Option codes that start a line - used to find where the next option begins
+OPTION_HEADING_PATTERN = re.compile(r"\n(\d[A-Z])(?=\s)")
+# Numbered sections like "3.4 Title"
+SECTION_PATTERN = re.compile(r"(\d+\.\d+)\s+([^\n]+)")
+SECTION_START_PATTERN = re.compile(r"(\d+\.\d+)(?=\s)")
+
+DETAIL_PHRASES = ("key questions", "this option allows")
+PART_PHRASES = ("part one", "part two")
+BULLETS = ("•", "–")
+
+# How far ahead of an option code we look when scoring "is this the detailed content?"
+DENSITY_WINDOW = 5000
+# Last section has no successor; cap how much of the document it takes.
+LAST_SECTION_MAX_CHARS = 15000
+
+
+def next_option_codes(current_code: str) -> List[str]:
+    """Get possible next option codes to find section boundaries."""
+    # If current is "1B", next could be "1C", "1D", etc. or "2A" if Component 1 ends
+    if current_code and current_code[0].isdigit():
+        component = current_code[0]
+        letter = current_code[1]
+
+        next_codes = []
+        for next_letter in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
+            if next_letter > letter:
+                next_codes.append(f"{component}{next_letter}")
+                if len(next_codes) >= 5:  # Check a few
+                    break
+
+        next_component = str(int(component) + 1)
+        next_codes.extend([f"{next_component}A", f"{next_component}B", f"{next_component}C"])
+        return next_codes
+
+    return []
+
+
+class SpecDocumentIndex:
+    """
+    One-pass index over a specification's full text.
+
+    Records every option-code occurrence, line-start option headings, numbered
+    section headings and the positions of content-density markers (bullets,
+    "key questions", "part one", ...). Density for any window is then a couple of
+    bisects instead of lower-casing and counting a 5,000-char slice.
+    """
+
+    def __init__(self, full_text: str):
+        self.text = full_text or ""
+        lower = self.text.lower()
+
+        self.option_positions: Dict[str, List[int]] = {}
+        for m in OPTION_CODE_PATTERN.finditer(self.text):
+            self.option_positions.setdefault(m.group(1), []).append(m.start())
+
+        self.option_heading_positions: Dict[str, List[int]] = {}
+        for m in OPTION_HEADING_PATTERN.finditer(self.text):
+            self.option_heading_positions.setdefault(m.group(1), []).append(m.start())
+
+        # Every numbered heading in document order (same order the old findall produced)
+        self.sections: List[Tuple[str, str]] = []
+        self.section_positions: Dict[str, List[int]] = {}
+        for m in SECTION_PATTERN.finditer(self.text):
+            self.sections.append((m.group(1), m.group(2)))
+        for m in SECTION_START_PATTERN.finditer(self.text):
+            self.section_positions.setdefault(m.group(1), []).append(m.start())
+
+        self._bullet_positions = [
+            m.start() for m in re.finditer("|".join(map(re.escape, BULLETS)), self.text)
+        ]
+        self._phrase_positions: Dict[str, List[int]] = {
+            phrase: [m.start() for m in re.finditer(re.escape(phrase), lower)]
+            for phrase in DETAIL_PHRASES + PART_PHRASES
+        }
+
+        self._option_cache: Dict[str, str] = {}
+        self._section_cache: Dict[str, str] = {}
+
+    @staticmethod
+    def _count_between(positions: List[int], lo: int, hi: int) -> int:
+        return bisect.bisect_left(positions, hi) - bisect.bisect_left(positions, lo)
+
+    @staticmethod
+    def _first_after(positions: List[int], pos: int) -> Optional[int]:
+        i = bisect.bisect_left(positions, pos)
+        return positions[i] if i < len(positions) else None
+
+    def content_density(self, start: int, window: int = DENSITY_WINDOW) -> int:
+        """Score the `window` chars after `start` for detailed-content indicators."""
+        end = start + window
+        score = 0
+        if self._has_phrase(DETAIL_PHRASES, start, end):
+            score += 10
+        if self._has_phrase(PART_PHRASES, start, end):
+            score += 10
+        score += self._count_between(self._bullet_positions, start, end)
+        return score
+
+    def _has_phrase(self, phrases, start: int, end: int) -> bool:
+        # Phrase must lie entirely inside [start, end)
+        return any(
+            self._count_between(self._phrase_positions[p], start, end - len(p) + 1)
+            for p in phrases
+        )
+
+    def option_text(self, option_code: str) -> str:
+        """Text of the detailed-content section for an option code ("" if absent)."""
+        if option_code in self._option_cache:
+            return self._option_cache[option_code]
+
+        matches = self.option_positions.get(option_code, [])
+        if not matches:
+            self._option_cache[option_code] = ""
+            return ""
+
+        # Best-scoring occurrence; falls back to the first (e.g. only in the contents table)
+        best_pos, best_score = matches[0], 0
+        for pos in matches:
+            score = self.content_density(pos)
+            if score > best_score:
+                best_pos, best_score = pos, score
+
+        end_pos = len(self.text)
+        for next_code in next_option_codes(option_code):
+            nxt = self._first_after(self.option_heading_positions.get(next_code, []), best_pos + 100)
+            if nxt is not None:
+                end_pos = nxt
+                break
+
+        text = self.text[best_pos:end_pos]
+        self._option_cache[option_code] = text
+        return text
+
+    def option_match_count(self, option_code: str) -> int:
+        return len(self.option_positions.get(option_code, []))
+
+    def section_text(self, section_code: str) -> str:
+        """Text from a section heading ("3.4") to the next section ("3.5" or "4.0")."""
+        if section_code in self._section_cache:
+            return self._section_cache[section_code]
+
+        starts = self.section_positions.get(section_code)
+        if not starts:
+            self._section_cache[section_code] = ""
+            return ""
+        start_pos = starts[0]
+
+        major, minor = section_code.split('.')
+        candidates = [f"{major}.{int(minor) + 1}", f"{int(major) + 1}.0"]
+        next_positions = [
+            p for p in (
+                self._first_after(self.section_positions.get(code, []), start_pos + 10)
+                for code in candidates
+            ) if p is not None
+        ]
+
+        if next_positions:
+            text = self.text[start_pos:min(next_positions)]
+        else:
+            # Last section - take rest of document (capped)
+            text = self.text[start_pos:start_pos + LAST_SECTION_MAX_CHARS]
+        self._section_cache[section_code] = text
+        return text
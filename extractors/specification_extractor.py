@@ -8,10 +8,15 @@ import json
 import yaml
 from typing import Dict, List, Optional
 from pathlib import Path
+import time
+from concurrent.futures import ThreadPoolExecutor
 import PyPDF2
 import anthropic
 
 from utils.logger import get_logger
+from extractors.spec_context_planner import plan_pass_contexts
+from extractors.concurrency import provider_slot
+from scrapers.spec_text_compactor import compact_pages, format_stats
 
 logger = get_logger()
 
@@ -60,33 +65,59 @@ class SpecificationExtractor:
         """
         logger.info(f"Extracting complete specification for {subject} ({exam_board}, {qualification})")
         
-        # Extract full text from PDF
-        full_text = self._extract_pdf_text(pdf_path)
+        # Extract per-page text from PDF
+        pages = self._extract_pdf_pages(pdf_path)
+        full_text = "\n".join(pages)
         
-        if not full_text:
+        if not full_text.strip():
             logger.error(f"Failed to extract text from {pdf_path}")
             return {}
         
-        logger.info(f"Extracted {len(full_text)} characters from PDF")
+        logger.info(f"Extracted {len(full_text)} characters from PDF ({len(pages)} pages)")
         
-        # Extract each component
-        results = {}
+        # Drop running headers/footers and wrap artefacts (page boundaries are kept for the planner)
+        pages, stats = compact_pages(pages)
+        logger.info(f"Compacted spec text: {format_stats(stats)}")
+        
+        # Plan which pages each pass needs instead of sending the whole PDF everywhere
+        contexts = plan_pass_contexts(pages)
+        for name, ctx in contexts.items():
+            logger.info(f"  {name} context: {len(ctx)} chars")
         
-        # 1. Metadata
-        logger.info("Extracting specification metadata...")
-        results['metadata'] = self._extract_metadata(full_text, subject, exam_board, qualification)
+        # Passes are independent except constraints <- components, so run them concurrently
+        # (Claude concurrency is still capped by provider_slot('anthropic') in _call_ai)
+        results = {}
+        timings = {}
         
-        # 2. Components
-        logger.info("Extracting component structure...")
-        results['components'] = self._extract_components(full_text, subject)
+        def _timed(name, fn, *args):
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                timings[name] = time.perf_counter() - started
         
-        # 3. Constraints
-        logger.info("Extracting selection constraints...")
-        results['constraints'] = self._extract_constraints(full_text, subject, results['components'])
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            logger.info("Extracting metadata, components, topics and vocabulary concurrently...")
+            metadata_f = pool.submit(_timed, 'metadata', self._extract_metadata,
+                                     contexts['metadata'], subject, exam_board, qualification)
+            components_f = pool.submit(_timed, 'components', self._extract_components,
+                                       contexts['components'], subject)
+            topics_f = pool.submit(_timed, 'topics', self._extract_all_topics_deep,
+                                   contexts['topics'], subject, None, exam_board, qualification)
+            vocabulary_f = pool.submit(_timed, 'vocabulary', self._extract_vocabulary,
+                                       contexts['vocabulary'], subject)
+            
+            results['components'] = components_f.result()
+            logger.info("Extracting selection constraints...")
+            constraints_f = pool.submit(_timed, 'constraints', self._extract_constraints,
+                                        contexts['constraints'], subject, results['components'])
+            
+            results['metadata'] = metadata_f.result()
+            results['constraints'] = constraints_f.result()
+            results['options'] = topics_f.result()
+            results['vocabulary'] = vocabulary_f.result()
         
-        # 4. ALL Topics (deep hierarchical extraction)
-        logger.info("Extracting ALL topics with deep hierarchy...")
-        results['options'] = self._extract_all_topics_deep(full_text, subject, results['components'], exam_board, qualification)
+        logger.info("Pass timings: " + ", ".join(f"{k} {v:.1f}s" for k, v in timings.items()))
         
         # Add context to each option (for uploader)
         if results.get('options') and isinstance(results['options'], list):
@@ -96,24 +127,22 @@ class SpecificationExtractor:
                     option['subject'] = subject  
                     option['qualification'] = qualification
         
-        # 5. Vocabulary
-        logger.info("Extracting subject vocabulary...")
-        results['vocabulary'] = self._extract_vocabulary(full_text, subject)
-        
-        return results
+        # Keep the original key order for callers that dump the dict
+        return {k: results[k] for k in ('metadata', 'components', 'constraints', 'options', 'vocabulary')}
     
-    def _extract_pdf_text(self, pdf_path: str) -> str:
-        """Extract all text from PDF."""
+    def _extract_pdf_pages(self, pdf_path: str) -> List[str]:
+        """Extract text per page from PDF."""
         try:
-            text = ""
             with open(pdf_path, 'rb') as file:
                 reader = PyPDF2.PdfReader(file)
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-            return text
+                return [(page.extract_text() or "") for page in reader.pages]
         except Exception as e:
             logger.error(f"Error extracting PDF text: {e}")
-            return ""
+            return []
+    
+    def _extract_pdf_text(self, pdf_path: str) -> str:
+        """Extract all text from PDF."""
+        return "".join(page + "\n" for page in self._extract_pdf_pages(pdf_path))
     
     def _extract_metadata(self, text: str, subject: str, exam_board: str, qualification: str) -> Dict:
         """Extract specification overview metadata."""
@@ -137,7 +166,7 @@ Return ONLY valid JSON (no markdown, no explanation):
   "spec_version": "..."
 }}
 
-SPECIFICATION TEXT (first 10000 chars):
+SPECIFICATION TEXT (cover and overview pages):
 {text[:10000]}"""
         
         return self._call_ai(prompt, "metadata")
@@ -174,7 +203,7 @@ Return ONLY valid JSON array (no markdown):
   }}
 ]
 
-SPECIFICATION TEXT (first 15000 chars):
+SPECIFICATION TEXT (assessment structure pages):
 {text[:15000]}"""
         
         return self._call_ai(prompt, "components")
@@ -210,7 +239,7 @@ Return ONLY valid JSON array (no markdown):
   }}
 ]
 
-SPECIFICATION TEXT (first 15000 chars):
+SPECIFICATION TEXT (option selection pages):
 {text[:15000]}"""
         
         return self._call_ai(prompt, "constraints")
@@ -289,8 +318,8 @@ Example for Law:
 - Section 3.3 should have 8+ content points (Tort topics)
 - Etc.
 
-Full specification text (ENTIRE PDF to ensure all sections captured):
-{text}"""  # Send ENTIRE text, no truncation
+Subject content pages (the full subject-content block, so all sections are captured):
+{text}"""  # No truncation within the subject-content block
         
         return self._call_ai(prompt, "all_topics_deep")
     
@@ -369,7 +398,7 @@ Return top 20-30 most important terms as JSON:
   }}
 ]
 
-SPECIFICATION TEXT (sample):
+SPECIFICATION TEXT (glossary and subject content sample):
 {text[:8000]}"""
         
         return self._call_ai(prompt, "vocabulary")
@@ -377,13 +406,14 @@ SPECIFICATION TEXT (sample):
     def _call_ai(self, prompt: str, extraction_type: str) -> any:
         """Call Claude AI and parse JSON response."""
         try:
-            message = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=8192,  # Maximum allowed by Claude
-                temperature=0.1,  # Low temperature for factual extraction
-                system="You are an expert at analyzing UK exam specifications. Always return ONLY valid JSON with no markdown formatting, no code blocks, no explanations - just the raw JSON.",
-                messages=[{"role": "user", "content": prompt}]
-            )
+            with provider_slot('anthropic'):
+                message = self.client.messages.create(
+                    model="claude-3-5-sonnet-20241022",
+                    max_tokens=8192,  # Maximum allowed by Claude
+                    temperature=0.1,  # Low temperature for factual extraction
+                    system="You are an expert at analyzing UK exam specifications. Always return ONLY valid JSON with no markdown formatting, no code blocks, no explanations - just the raw JSON.",
+                    messages=[{"role": "user", "content": prompt}]
+                )
             
             response_text = message.content[0].text
             
@@ -6,6 +6,7 @@ This properly handles tables, diagrams, and complex layouts
 
 import os
 import sys
+import io
 import base64
 import anthropic
 from pathlib import Path
@@ -17,8 +18,11 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 # Load environment variables
 load_dotenv()
 
-from pdf2image import convert_from_path
 from utils.logger import get_logger
+from extractors.concurrency import provider_limit, provider_slot, run_in_order, log_timings
+from scrapers.page_classifier import (
+    SPEC_SKIP_LABELS, features_from_pdfplumber, features_from_pymupdf, select_content_pages, summarize_skipped,
+)
 
 logger = get_logger()
 
@@ -26,54 +30,135 @@ logger = get_logger()
 class VisionTopicExtractor:
     """Extract topics from PDFs using Claude Vision API."""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, dpi: int = 200, backend: str = None,
+                 max_workers: int = None, poppler_path: str = None):
         self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY required")
         
         self.client = anthropic.Anthropic(api_key=self.api_key)
+        self.dpi = dpi
+        # PyMuPDF needs no external binaries; pdf2image (poppler) is the fallback
+        self.backend = backend or os.getenv('VISION_PDF_BACKEND') or self._default_backend()
+        self.max_workers = max_workers or provider_limit('anthropic')
+        self.poppler_path = poppler_path or os.getenv('POPPLER_PATH') or self._local_poppler_path()
+        self.last_timings = []
+    
+    @staticmethod
+    def _default_backend() -> str:
+        try:
+            import fitz  # noqa: F401  (PyMuPDF)
+            return 'pymupdf'
+        except ImportError:
+            return 'pdf2image'
+    
+    @staticmethod
+    def _local_poppler_path():
+        # Old Windows setups ship poppler inside the repo; otherwise use poppler from PATH
+        local = Path(__file__).parent.parent / 'poppler' / 'poppler-24.08.0' / 'Library' / 'bin'
+        return str(local) if local.exists() else None
+    
+    def _page_count(self, pdf_path: str) -> int:
+        if self.backend == 'pymupdf':
+            import fitz
+            with fitz.open(pdf_path) as doc:
+                return doc.page_count
+        from pdf2image import pdfinfo_from_path
+        return int(pdfinfo_from_path(pdf_path, poppler_path=self.poppler_path)['Pages'])
+    
+    def _render_page(self, pdf_path: str, page_number: int) -> str:
+        """Render ONE page (1-based) to a base64 PNG at self.dpi."""
+        if self.backend == 'pymupdf':
+            import fitz
+            # Open per call: PyMuPDF documents must not be shared across threads
+            with fitz.open(pdf_path) as doc:
+                page = doc.load_page(page_number - 1)
+                pix = page.get_pixmap(matrix=fitz.Matrix(self.dpi / 72, self.dpi / 72), alpha=False)
+                png_bytes = pix.tobytes("png")
+        else:
+            from pdf2image import convert_from_path
+            image = convert_from_path(
+                pdf_path, dpi=self.dpi, first_page=page_number, last_page=page_number,
+                poppler_path=self.poppler_path,
+            )[0]
+            img_byte_arr = io.BytesIO()
+            image.save(img_byte_arr, format='PNG')
+            png_bytes = img_byte_arr.getvalue()
+        return base64.standard_b64encode(png_bytes).decode('utf-8')
+    
+    def _page_features(self, pdf_path: str, page_numbers: list, total_pages: int) -> list:
+        """Classifier features for the given pages from the text layer (no rendering)."""
+        if self.backend == 'pymupdf':
+            import fitz
+            with fitz.open(pdf_path) as doc:
+                return [features_from_pymupdf(doc.load_page(p - 1), p, total_pages) for p in page_numbers]
+        import pdfplumber
+        with pdfplumber.open(pdf_path) as pdf:
+            return [features_from_pdfplumber(pdf.pages[p - 1], p, total_pages) for p in page_numbers]
+    
+    def filter_content_pages(self, pdf_path: str, page_numbers: list, total_pages: int) -> list:
+        """Drop cover/blank/admin pages before any image is built."""
+        try:
+            features = self._page_features(pdf_path, page_numbers, total_pages)
+        except Exception as e:
+            logger.warning(f"Page classification failed ({e}); sending all selected pages")
+            return page_numbers
+        kept, skipped = select_content_pages(features, SPEC_SKIP_LABELS, document='spec')
+        if skipped:
+            logger.info(f"Skipping {len(skipped)} non-content pages ({summarize_skipped(skipped)})")
+        return kept
+    
+    @staticmethod
+    def select_spec_pages(total_pages: int) -> list:
+        """
+        Specification content pages (usually pages 8-25); skip intro/assessment pages.
+        Returns 1-based page numbers.
+        """
+        if total_pages > 25:
+            return list(range(8, 26))
+        return list(range(6, total_pages + 1))
     
     def extract_topics_from_pdf(self, pdf_path: str, subject: str, 
-                                exam_board: str, qualification: str) -> list:
+                                exam_board: str, qualification: str,
+                                pages: list = None, classify_pages: bool = True) -> list:
         """
         Extract ALL topics from PDF using vision.
         
-        Returns:
-            List of topics with full hierarchy
-        """
-        logger.info(f"Converting PDF to images for vision extraction...")
+        Only the selected pages are rendered, one at a time on demand, and sent
+        to the Vision API concurrently (bounded by provider_slot('anthropic')).
+        Cover, blank and admin pages are dropped first by the local page classifier.
         
-        # Path to local poppler installation
-        poppler_path = Path(__file__).parent.parent / 'poppler' / 'poppler-24.08.0' / 'Library' / 'bin'
+        Args:
+            pages: 1-based page numbers to analyse (default: select_spec_pages)
+            classify_pages: skip non-content pages before rendering
         
-        # Convert PDF pages to images
-        images = convert_from_path(pdf_path, dpi=200, poppler_path=str(poppler_path))
-        logger.info(f"Converted {len(images)} pages to images")
+        Returns:
+            List of topics with full hierarchy (in page order)
+        """
+        total_pages = self._page_count(pdf_path)
+        spec_pages = pages or self.select_spec_pages(total_pages)
+        spec_pages = [p for p in spec_pages if 1 <= p <= total_pages]
+        if classify_pages:
+            spec_pages = self.filter_content_pages(pdf_path, spec_pages, total_pages)
         
-        all_topics = []
+        logger.info(
+            f"Processing {len(spec_pages)} of {total_pages} pages with Vision API "
+            f"({self.backend}, {self.dpi} dpi)..."
+        )
         
-        # Process specification content pages (usually pages 8-20)
-        # Skip intro/assessment pages
-        spec_pages = images[7:25] if len(images) > 25 else images[5:]
+        def _process(page_number):
+            logger.info(f"  Analyzing page {page_number}...")
+            img_base64 = self._render_page(pdf_path, page_number)
+            return self._extract_from_image(img_base64, subject, page_number)
         
-        logger.info(f"Processing {len(spec_pages)} specification pages with Vision API...")
+        results, self.last_timings = run_in_order(
+            spec_pages, _process, self.max_workers, label=lambda p: f"page {p}"
+        )
+        log_timings(self.last_timings, what="page")
         
-        for page_num, image in enumerate(spec_pages, start=1):
-            logger.info(f"  Analyzing page {page_num}/{len(spec_pages)}...")
-            
-            # Convert image to base64
-            import io
-            img_byte_arr = io.BytesIO()
-            image.save(img_byte_arr, format='PNG')
-            img_byte_arr = img_byte_arr.getvalue()
-            img_base64 = base64.standard_b64encode(img_byte_arr).decode('utf-8')
-            
-            # Send to Claude Vision
-            topics_from_page = self._extract_from_image(
-                img_base64, subject, page_num
-            )
-            
-            all_topics.extend(topics_from_page)
+        all_topics = []
+        for topics_from_page in results:
+            all_topics.extend(topics_from_page or [])
         
         logger.info(f"Extracted {len(all_topics)} total topics from {len(spec_pages)} pages")
         
@@ -109,27 +194,28 @@ Return as JSON array:
 Return EVERY row you see in the table, no matter how many. Return empty array [] if no content table on this page."""
         
         try:
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=4096,
-                messages=[{
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": "image/png",
-                                "data": img_base64
+            with provider_slot('anthropic'):
+                response = self.client.messages.create(
+                    model="claude-3-5-sonnet-20241022",
+                    max_tokens=4096,
+                    messages=[{
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "image",
+                                "source": {
+                                    "type": "base64",
+                                    "media_type": "image/png",
+                                    "data": img_base64
+                                }
+                            },
+                            {
+                                "type": "text",
+                                "text": prompt
                             }
-                        },
-                        {
-                            "type": "text",
-                            "text": prompt
-                        }
-                    ]
-                }]
-            )
+                        ]
+                    }]
+                )
             
             result_text = response.content[0].text.strip()
             
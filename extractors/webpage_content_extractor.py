@@ -9,6 +9,7 @@ from bs4 import BeautifulSoup
 from typing import Dict, List, Optional
 from urllib.parse import urljoin
 from utils.logger import get_logger
+from extractors.concurrency import provider_limit, provider_slot, run_in_order, log_timings
 
 logger = get_logger()
 
@@ -25,6 +26,7 @@ class WebpageContentExtractor:
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
+        self.last_timings = []
     
     def construct_option_url(self, subject: str, qualification: str, subject_code: str,
                             option_code: str, option_title: str) -> str:
@@ -74,7 +76,8 @@ class WebpageContentExtractor:
         logger.info(f"Scraping content from: {url}")
         
         try:
-            response = self.session.get(url, timeout=30)
+            with provider_slot('aqa_web'):
+                response = self.session.get(url, timeout=30)
             response.raise_for_status()
             
             soup = BeautifulSoup(response.content, 'lxml')
@@ -197,7 +200,8 @@ class WebpageContentExtractor:
         return study_areas
     
     def extract_all_options_for_subject(self, subject: str, qualification: str,
-                                       subject_code: str, options: List[Dict]) -> Dict:
+                                       subject_code: str, options: List[Dict],
+                                       max_workers: int = None) -> Dict:
         """
         Extract detailed content for ALL options in a subject.
         
@@ -206,16 +210,16 @@ class WebpageContentExtractor:
             qualification: e.g., "A-Level"
             subject_code: e.g., "7042"
             options: List of option dicts with 'code' and 'title'
+            max_workers: Concurrent page fetches (default: aqa_web provider limit)
             
         Returns:
-            Dict mapping option_code → detailed content
+            Dict mapping option_code → detailed content (in option order)
         """
-        results = {}
-        
         total = len(options)
         logger.info(f"Extracting detailed content for {total} options...")
         
-        for i, option in enumerate(options, 1):
+        def _extract_one(indexed_option):
+            i, option = indexed_option
             option_code = option.get('code')
             option_title = option.get('title')
             
@@ -227,12 +231,22 @@ class WebpageContentExtractor:
             )
             
             # Extract content
-            content = self.extract_from_webpage(url, option_code)
-            
+            return self.extract_from_webpage(url, option_code)
+        
+        # Pages are independent; fetch concurrently (bounded by provider_slot('aqa_web'))
+        contents, self.last_timings = run_in_order(
+            list(enumerate(options, 1)), _extract_one,
+            max_workers or provider_limit('aqa_web'),
+            label=lambda io: io[1].get('code'),
+        )
+        log_timings(self.last_timings, what="option")
+        
+        results = {}
+        for option, content in zip(options, contents):
             if content:
-                results[option_code] = content
+                results[option.get('code')] = content
             else:
-                logger.warning(f"Failed to extract {option_code}, will retry with fallback")
+                logger.warning(f"Failed to extract {option.get('code')}, will retry with fallback")
         
         logger.info(f"Successfully extracted {len(results)}/{total} options")
         
@@ -12,73 +12,46 @@ from datetime import datetime
 from dotenv import load_dotenv
 from supabase import create_client
 
+from database.reporting import fetch_overview, overview_from_snapshot
+
 load_dotenv()
 
-def generate_detailed_report():
+def generate_detailed_report(snapshot=None, refresh=False):
     """Generate detailed HTML report showing actual scraped data."""
     
-    # Connect to Supabase
-    url = os.getenv('SUPABASE_URL')
-    key = os.getenv('SUPABASE_SERVICE_KEY')
-    
-    if not url or not key:
-        print("ERROR: Missing SUPABASE credentials")
-        return 1
-    
-    client = create_client(url, key)
-    
-    print("Fetching data from Supabase...\n")
-    
-    # Get all AQA exam_board_subjects
-    aqa_result = client.table('exam_boards').select('id').eq('code', 'AQA').execute()
-    if not aqa_result.data:
+    if snapshot:
+        from database.local_mirror import connect
+        print(f"Reading local mirror {snapshot}...\n")
+        overview = overview_from_snapshot(connect(snapshot), board_code='AQA')
+    else:
+        # Connect to Supabase
+        url = os.getenv('SUPABASE_URL')
+        key = os.getenv('SUPABASE_SERVICE_KEY')
+        
+        if not url or not key:
+            print("ERROR: Missing SUPABASE credentials")
+            return 1
+        
+        client = create_client(url, key)
+        
+        print("Fetching report aggregates from Supabase...\n")
+        try:
+            overview = fetch_overview(client, board_code='AQA', refresh=refresh)
+        except RuntimeError as e:
+            print(f"ERROR: {e}")
+            return 1
+        if overview.get('from_cache'):
+            print(f"Using cached aggregates from {overview.get('generated_at')} (--refresh to re-query)\n")
+    
+    if not any(board.get('code') == 'AQA' for board in overview.get('exam_boards', [])):
         print("ERROR: AQA not found in exam_boards table")
         return 1
     
-    aqa_id = aqa_result.data[0]['id']
-    
-    # Get all AQA subjects with topic counts
-    subjects = client.table('exam_board_subjects').select('''
-        id,
-        subject_name,
-        subject_code,
-        qualification_type:qualification_types(code, name),
-        created_at,
-        updated_at
-    ''').eq('exam_board_id', aqa_id).execute().data
-    
+    # Subjects with topic count, sample topics and latest topic update
+    detailed_subjects = overview['subjects']
+    subjects = detailed_subjects
     print(f"Found {len(subjects)} AQA subjects in database\n")
     
-    # For each subject, get topic count and sample
-    detailed_subjects = []
-    
-    for subject in subjects:
-        # Count topics
-        topic_count_result = client.table('curriculum_topics').select('id', count='exact').eq(
-            'exam_board_subject_id', subject['id']
-        ).execute()
-        
-        topic_count = topic_count_result.count or 0
-        
-        # Get sample topics
-        sample_topics = client.table('curriculum_topics').select(
-            'topic_code,topic_name,topic_level,chronological_period,geographical_region,key_themes'
-        ).eq('exam_board_subject_id', subject['id']).limit(5).execute().data
-        
-        # Get latest update
-        latest_topic = client.table('curriculum_topics').select('updated_at').eq(
-            'exam_board_subject_id', subject['id']
-        ).order('updated_at', desc=True).limit(1).execute().data
-        
-        last_scraped = latest_topic[0]['updated_at'] if latest_topic else None
-        
-        detailed_subjects.append({
-            **subject,
-            'topic_count': topic_count,
-            'sample_topics': sample_topics,
-            'last_scraped': last_scraped
-        })
-    
     # Sort by topic count (most topics first)
     detailed_subjects.sort(key=lambda x: x['topic_count'], reverse=True)
     
@@ -221,4 +194,11 @@ ORDER BY ebs.subject_name, ct.topic_code;
     return 0
 
 if __name__ == '__main__':
-    sys.exit(generate_detailed_report())
+    import argparse
+    from database.local_mirror import DEFAULT_MIRROR_PATH
+    parser = argparse.ArgumentParser(description='Generate detailed HTML report of scraped AQA data')
+    parser.add_argument('--snapshot', nargs='?', const=str(DEFAULT_MIRROR_PATH), default=None,
+                        help='Read the local mirror (scripts/sync_local_mirror.py) instead of Supabase')
+    parser.add_argument('--refresh', action='store_true', help='Ignore cached report aggregates')
+    args = parser.parse_args()
+    sys.exit(generate_detailed_report(args.snapshot, args.refresh))
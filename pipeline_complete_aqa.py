@@ -15,6 +15,7 @@ from database.supabase_client import SupabaseUploader
 from scrapers.uk.aqa_web_scraper import AQAWebScraper
 from extractors.specification_extractor import SpecificationExtractor
 from utils.logger import setup_logger
+from utils.spec_registry import SpecRegistry
 
 load_dotenv()
 
@@ -25,7 +26,7 @@ def load_subject_config():
         return yaml.safe_load(f)
 
 def process_all_aqa_subjects(qualification_filter=None, subject_filter=None, 
-                             upload=True, start_from=None):
+                             upload=True, start_from=None, force=False):
     """
     Process all AQA subjects.
     
@@ -34,6 +35,7 @@ def process_all_aqa_subjects(qualification_filter=None, subject_filter=None,
         subject_filter: Specific subject key or None for all
         upload: Whether to upload to Supabase
         start_from: Subject to start from (for resuming)
+        force: Re-process subjects even if their spec PDF is unchanged
     """
     # Setup
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -50,6 +52,7 @@ def process_all_aqa_subjects(qualification_filter=None, subject_filter=None,
     uploader = SupabaseUploader() if upload else None
     web_scraper = AQAWebScraper()
     spec_extractor = SpecificationExtractor()
+    spec_registry = SpecRegistry()
     
     # Build subject list
     subjects_to_process = []
@@ -88,7 +91,8 @@ def process_all_aqa_subjects(qualification_filter=None, subject_filter=None,
     results = {
         'successful': [],
         'failed': [],
-        'partial': []
+        'partial': [],
+        'skipped': []
     }
     
     for i, subject in enumerate(subjects_to_process, 1):
@@ -96,6 +100,15 @@ def process_all_aqa_subjects(qualification_filter=None, subject_filter=None,
         logger.info("-" * 80)
         
         try:
+            # The spec PDF is the change signal for the subject-content pages too
+            registry_key = f"aqa-pipeline/{subject['key']}_{subject['qualification']}"
+            pdf_url = find_spec_pdf_url(subject)
+            spec_check = spec_registry.check(registry_key, pdf_url, force=force) if pdf_url else None
+            if spec_check and not spec_check.changed:
+                results['skipped'].append(subject['key'])
+                logger.info(f"[SKIP] Spec unchanged ({spec_check.reason})")
+                continue
+            
             # SKIP Step 1 for now - web scraping is faster and works well
             # Can add PDF/AI extraction later for subjects that need it
             metadata_result = True
@@ -109,6 +122,8 @@ def process_all_aqa_subjects(qualification_filter=None, subject_filter=None,
             if metadata_result and content_result:
                 results['successful'].append(subject['key'])
                 logger.info(f"[SUCCESS] {subject['name']} complete!")
+                if spec_check and upload:
+                    spec_registry.record(registry_key, pdf_url, spec_check)
             elif metadata_result or content_result:
                 results['partial'].append(subject['key'])
                 logger.info(f"[PARTIAL] {subject['name']} - some data extracted")
@@ -135,6 +150,28 @@ def process_all_aqa_subjects(qualification_filter=None, subject_filter=None,
     
     return results
 
+def find_spec_pdf_url(subject):
+    """Spec PDF URL from the subject's specification page (None if not found)."""
+    import requests
+    from bs4 import BeautifulSoup
+    import re
+    from urllib.parse import urljoin
+    
+    qual_slug = 'a-level' if subject['qualification'] == 'A-LEVEL' else 'gcse'
+    spec_page_url = (
+        f"https://www.aqa.org.uk/subjects/{subject['slug']}/{qual_slug}/"
+        f"{subject['slug']}-{subject['code']}/specification"
+    )
+    try:
+        response = requests.get(spec_page_url, timeout=30)
+        if response.status_code != 200:
+            return None
+        soup = BeautifulSoup(response.content, 'lxml')
+        pdf_link = soup.find('a', href=re.compile(r'\.pdf$', re.I))
+        return urljoin('https://www.aqa.org.uk', pdf_link['href']) if pdf_link else None
+    except Exception:
+        return None
+
 def process_spec_metadata(subject, spec_extractor, uploader, upload):
     """
     Process specification metadata using PDF + AI.
@@ -441,6 +478,7 @@ def print_summary(results, logger):
     logger.info(f"Successful: {len(results['successful'])}")
     logger.info(f"Partial: {len(results['partial'])}")
     logger.info(f"Failed: {len(results['failed'])}")
+    logger.info(f"Unchanged (skipped): {len(results['skipped'])}")
     
     if results['failed']:
         logger.warning(f"\nFailed subjects: {', '.join(results['failed'])}")
@@ -455,6 +493,7 @@ def main():
     parser.add_argument('--start-from', help='Resume from specific subject')
     parser.add_argument('--no-upload', action='store_true', help='Extract only, no upload')
     parser.add_argument('--test', action='store_true', help='Test with first 3 subjects only')
+    parser.add_argument('--force', action='store_true', help='Re-process subjects even if their spec is unchanged')
     
     args = parser.parse_args()
     
@@ -464,7 +503,8 @@ def main():
         qualification_filter=qual_filter,
         subject_filter=args.subject,
         upload=not args.no_upload,
-        start_from=args.start_from
+        start_from=args.start_from,
+        force=args.force
     )
     
     return 0 if len(results['failed']) == 0 else 1
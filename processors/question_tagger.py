@@ -0,0 +1,344 @@
+"""
+Batch tagging of extracted exam questions to curriculum topics.
+
+exam_questions rows written by extraction_service.extract_questions carry no topic.
+`tag_questions()` links a whole set of papers in a few bulk steps:
+
+1. load the questions (by paper, or by subject + years) and skip already-tagged ones
+2. embed all question texts in large batches (utils/embeddings.py)
+3. match them against the subject's topic vectors (database/vector_index.py) with one
+   batched top-k search, restricted to the allowed topic levels / path prefix
+4. re-rank so the parts of one main question agree on a top-level branch
+5. ask an LLM only about low-confidence questions (low score or an ambiguous
+   runner-up), several questions per request, choosing among the vector candidates
+6. write all links with bulk upserts into question_topic_links
+   (database/migrations/010_question_topic_links.sql)
+
+Usage:
+    report = tag_questions(sb, subject_id=ebs_id, years=[2023])
+    report = tag_questions(sb, paper_ids=[paper_id], use_llm=False, dry_run=True)
+"""
+
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from database.keyset_reader import fetch_all
+from database.vector_index import sync_index
+from utils.embeddings import DEFAULT_MODEL as EMBEDDING_MODEL, embed_texts, get_openai_client
+from utils.logger import get_logger
+
+logger = get_logger()
+
+LINK_TABLE = 'question_topic_links'
+QUESTION_COLUMNS = ('id,paper_id,main_question_number,full_question_number,question_text,'
+                    'context_text,command_word,marks')
+LLM_MODEL = 'gpt-4o-mini'
+
+TOP_K = 8
+MIN_SCORE = 0.40          # below this the best match is treated as a guess
+MIN_MARGIN = 0.015        # best vs runner-up (in another branch) closer than this = ambiguous
+BRANCH_PENALTY = 0.03     # cost of leaving the branch the rest of the main question agrees on
+LLM_BATCH = 12            # questions per LLM request
+_CHUNK = 200
+
+
+@dataclass
+class Tag:
+    question_id: str
+    candidates: List[Tuple[str, float]]           # (topic_id, adjusted score), best first
+    topic_ids: List[str] = field(default_factory=list)
+    method: str = 'embedding'
+    confident: bool = True
+
+
+def question_text(q: Dict, context_chars: int = 600) -> str:
+    parts = [q.get('command_word') or '', q.get('question_text') or '']
+    context = (q.get('context_text') or '').strip()
+    if context:
+        parts.append(f"Context: {context[:context_chars]}")
+    return ' '.join(p for p in parts if p).strip()
+
+
+def branch(attrs: Dict) -> Tuple:
+    """Path of the topic's level-0 ancestor, from full_path + topic_level."""
+    path = list(attrs.get('full_path') or [])
+    level = int(attrs.get('topic_level') or 0)
+    return tuple(path[:max(1, len(path) - level)])
+
+
+# -- loading -----------------------------------------------------------------
+
+def _chunks(items: Sequence, size: int = _CHUNK):
+    for i in range(0, len(items), size):
+        yield list(items[i:i + size])
+
+
+def load_questions(client, paper_ids: Iterable[str] = None, subject_id: str = None,
+                   years: Iterable[int] = None, retag: bool = False) -> List[Dict]:
+    if paper_ids is None:
+        if not subject_id:
+            raise ValueError('Pass paper_ids or subject_id')
+        filters = [('exam_board_subject_id', 'eq', subject_id)]
+        if years:
+            filters.append(('year', 'in_', list(years)))
+        paper_ids = [p['id'] for p in fetch_all(client, 'exam_papers', 'id', filters)]
+    paper_ids = list(paper_ids)
+
+    questions = []
+    for chunk in _chunks(paper_ids):
+        questions += fetch_all(client, 'exam_questions', QUESTION_COLUMNS, [('paper_id', 'in_', chunk)])
+    if retag or not questions:
+        return questions
+
+    # Paging on question_id (not unique here) can skip a question's extra links - we only need the ids
+    tagged = set()
+    for chunk in _chunks([q['id'] for q in questions]):
+        tagged |= {r['question_id'] for r in fetch_all(client, LINK_TABLE, 'question_id',
+                                                       [('question_id', 'in_', chunk)], key='question_id')}
+    return [q for q in questions if q['id'] not in tagged]
+
+
+def subjects_for_papers(client, paper_ids: Iterable[str]) -> Dict[str, Dict]:
+    """paper_id -> {id, subject_name, exam_board, qualification_level} of its production subject."""
+    papers = []
+    for chunk in _chunks(sorted(set(paper_ids))):
+        papers += fetch_all(client, 'exam_papers', 'id,exam_board_subject_id', [('id', 'in_', chunk)])
+    subject_ids = sorted({p['exam_board_subject_id'] for p in papers if p.get('exam_board_subject_id')})
+    subjects = fetch_all(client, 'exam_board_subjects', 'id,subject_name,exam_board_id,qualification_type_id',
+                         [('id', 'in_', subject_ids)]) if subject_ids else []
+    boards = {b['id']: b['code'] for b in fetch_all(client, 'exam_boards', 'id,code')}
+    quals = {q['id']: q['code'] for q in fetch_all(client, 'qualification_types', 'id,code')}
+    info = {s['id']: {
+        'id': s['id'],
+        'subject_name': s['subject_name'],
+        'exam_board': boards.get(s.get('exam_board_id')),
+        'qualification_level': quals.get(s.get('qualification_type_id')),
+    } for s in subjects}
+    return {p['id']: info[p['exam_board_subject_id']] for p in papers if p.get('exam_board_subject_id') in info}
+
+
+# -- matching ----------------------------------------------------------------
+
+def allowed_topics(index, min_level: int = None, max_level: int = None,
+                   path_prefix: str = None) -> Optional[List[str]]:
+    if min_level is None and max_level is None and not path_prefix:
+        return None
+    prefix = (path_prefix or '').lower()
+    allowed = []
+    for topic_id in index.ids:
+        attrs = index.attrs.get(topic_id, {})
+        level = int(attrs.get('topic_level') or 0)
+        if min_level is not None and level < min_level:
+            continue
+        if max_level is not None and level > max_level:
+            continue
+        if prefix and not any(prefix in str(p).lower() for p in attrs.get('full_path') or []):
+            continue
+        allowed.append(topic_id)
+    return allowed
+
+
+def match_questions(index, questions: List[Dict], vectors: np.ndarray, allowed: Iterable[str] = None,
+                    top_k: int = TOP_K, min_score: float = MIN_SCORE, min_margin: float = MIN_MARGIN,
+                    branch_penalty: float = BRANCH_PENALTY, max_topics: int = 1,
+                    secondary_margin: float = 0.01) -> List[Tag]:
+    """One batched search for all questions, then branch agreement within each main question."""
+    ids, scores = index.search(vectors, k=top_k, allowed=allowed)
+    branches = np.empty(ids.shape, dtype=object)
+    for i, j in np.ndindex(ids.shape):
+        branches[i, j] = branch(index.attrs.get(ids[i, j], {})) if ids[i, j] else None
+
+    # Each main question votes (by best score) for the branch its parts belong to
+    groups: Dict[Tuple, List[int]] = defaultdict(list)
+    for i, q in enumerate(questions):
+        groups[(q.get('paper_id'), q.get('main_question_number') or q.get('full_question_number'))].append(i)
+    adjusted = scores.copy()
+    for members in groups.values():
+        votes: Dict[Tuple, float] = defaultdict(float)
+        for i in members:
+            if ids[i, 0] is not None:
+                votes[branches[i, 0]] += float(scores[i, 0])
+        if len(votes) > 1:
+            agreed = max(votes, key=votes.get)
+            for i in members:
+                off_branch = np.array([b != agreed for b in branches[i]])
+                adjusted[i] -= branch_penalty * off_branch
+
+    order = np.argsort(-adjusted, axis=1)
+    tags = []
+    for i, q in enumerate(questions):
+        cands = [(ids[i, j], float(adjusted[i, j])) for j in order[i] if ids[i, j] is not None]
+        tag = Tag(q['id'], cands)
+        if not cands:
+            tag.confident = False
+            tags.append(tag)
+            continue
+        best_score, best_branch = cands[0][1], branch(index.attrs.get(cands[0][0], {}))
+        rival = next((s for t, s in cands[1:] if branch(index.attrs.get(t, {})) != best_branch), None)
+        tag.confident = best_score >= min_score and (rival is None or best_score - rival >= min_margin)
+        tag.topic_ids = [t for t, s in cands[:max_topics] if s >= best_score - secondary_margin]
+        tags.append(tag)
+    return tags
+
+
+# -- LLM fallback ------------------------------------------------------------
+
+def _llm_prompt(batch: List[Tuple[Dict, Tag]], index) -> str:
+    lines = ["Map each exam question to the curriculum topic it assesses. For each question pick the",
+             "number of the best candidate topic, or 0 if none fits.",
+             'Return JSON: {"answers": [{"q": <question number>, "topic": <candidate number>}]}', ""]
+    for n, (q, tag) in enumerate(batch, 1):
+        lines.append(f"Question {n}: {question_text(q)[:800]}")
+        for c, (topic_id, _) in enumerate(tag.candidates, 1):
+            path = ' > '.join(str(p) for p in index.attrs.get(topic_id, {}).get('full_path') or [] if p)
+            lines.append(f"  {c}. {path or topic_id}")
+        lines.append("")
+    return '\n'.join(lines)
+
+
+def llm_resolve(tags: List[Tag], questions_by_id: Dict[str, Dict], index, model: str = LLM_MODEL,
+                batch_size: int = LLM_BATCH) -> int:
+    """Let the LLM choose among the vector candidates of low-confidence tags. Returns requests made."""
+    pending = [(questions_by_id[t.question_id], t) for t in tags if not t.confident and t.candidates]
+    client = get_openai_client() if pending else None
+    requests_made = 0
+    for batch in _chunks(pending, batch_size):
+        try:
+            res = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {'role': 'system', 'content': 'You are an exam board curriculum expert.'},
+                    {'role': 'user', 'content': _llm_prompt(batch, index)},
+                ],
+                temperature=0,
+                response_format={'type': 'json_object'},
+            )
+            requests_made += 1
+            answers = json.loads(res.choices[0].message.content or '{}').get('answers', [])
+        except Exception as e:
+            logger.warning(f"LLM fallback failed for {len(batch)} questions: {e}")
+            continue
+        for answer in answers:
+            try:
+                q_no, choice = int(answer.get('q', 0)), int(answer.get('topic', 0))
+            except (TypeError, ValueError):
+                continue
+            if not 1 <= q_no <= len(batch):
+                continue
+            tag = batch[q_no - 1][1]
+            if 1 <= choice <= len(tag.candidates):
+                tag.topic_ids = [tag.candidates[choice - 1][0]]
+                tag.method = 'llm'
+                tag.confident = True
+            elif choice == 0:
+                tag.topic_ids = []
+                tag.method = 'llm'
+    return requests_made
+
+
+# -- writing -----------------------------------------------------------------
+
+def link_rows(tags: List[Tag], embedding_model: str = EMBEDDING_MODEL, llm_model: str = LLM_MODEL,
+              include_unconfident: bool = False) -> List[Dict]:
+    rows = []
+    for tag in tags:
+        if not tag.topic_ids or (not tag.confident and not include_unconfident):
+            continue
+        score_of = dict(tag.candidates)
+        for rank, topic_id in enumerate(tag.topic_ids, 1):
+            rows.append({
+                'question_id': tag.question_id,
+                'topic_id': topic_id,
+                'rank': rank,
+                'confidence': round(score_of.get(topic_id, 0.0), 4),
+                'method': tag.method,
+                'model': llm_model if tag.method == 'llm' else embedding_model,
+            })
+    return rows
+
+
+def write_links(client, rows: List[Dict], replace_question_ids: Iterable[str] = (), batch_size: int = 500):
+    for chunk in _chunks(sorted(set(replace_question_ids))):
+        client.table(LINK_TABLE).delete().in_('question_id', chunk).execute()
+    for chunk in _chunks(rows, batch_size):
+        client.table(LINK_TABLE).upsert(chunk, on_conflict='question_id,topic_id').execute()
+
+
+# -- pipeline ----------------------------------------------------------------
+
+def tag_questions(client, paper_ids: Iterable[str] = None, subject_id: str = None, years: Iterable[int] = None,
+                  min_level: int = None, max_level: int = None, path_prefix: str = None,
+                  top_k: int = TOP_K, min_score: float = MIN_SCORE, max_topics: int = 1,
+                  use_llm: bool = True, llm_model: str = LLM_MODEL, retag: bool = False,
+                  include_unconfident: bool = False, dry_run: bool = False,
+                  embed: Callable[[List[str]], np.ndarray] = embed_texts) -> Dict:
+    """
+    Tag every (untagged) question of the selected papers; returns a summary report.
+
+    Args:
+        client: Supabase client
+        paper_ids / subject_id + years: Which papers to tag
+        min_level / max_level: Allowed topic_level range for matches
+        path_prefix: Only topics whose path contains this text (e.g. a component name)
+        top_k: Vector candidates per question (also the LLM's choice list)
+        min_score: Cosine score below which a match counts as low-confidence
+        max_topics: Links per question (extra ones only when nearly tied with the best)
+        use_llm: Resolve low-confidence questions with `llm_model`
+        retag: Replace existing links instead of skipping tagged questions
+        include_unconfident: Also write low-confidence matches the LLM didn't resolve
+        dry_run: Match but don't write
+        embed: texts -> vectors (defaults to OpenAI text-embedding-3-small)
+    """
+    questions = load_questions(client, paper_ids, subject_id, years, retag)
+    report = {'questions': len(questions), 'tagged': 0, 'by_embedding': 0, 'by_llm': 0,
+              'untagged': 0, 'llm_requests': 0, 'links_written': 0, 'subjects': []}
+    if not questions:
+        return report
+
+    by_subject: Dict[str, List[Dict]] = defaultdict(list)
+    subject_of_paper = subjects_for_papers(client, {q['paper_id'] for q in questions})
+    subjects = {}
+    for q in questions:
+        subject = subject_of_paper.get(q['paper_id'])
+        if subject:
+            subjects[subject['id']] = subject
+            by_subject[subject['id']].append(q)
+        else:
+            report['untagged'] += 1
+
+    all_rows, replace_ids = [], []
+    for sid, subject_questions in by_subject.items():
+        subject = subjects[sid]
+        index = sync_index(client, subject['exam_board'], subject['qualification_level'], subject['subject_name'])
+        vectors = embed([question_text(q) for q in subject_questions])
+        tags = match_questions(index, subject_questions, vectors,
+                               allowed_topics(index, min_level, max_level, path_prefix),
+                               top_k=top_k, min_score=min_score, max_topics=max_topics)
+        confident_before = sum(t.confident for t in tags)
+        if use_llm:
+            report['llm_requests'] += llm_resolve(tags, {q['id']: q for q in subject_questions}, index, llm_model)
+        rows = link_rows(tags, llm_model=llm_model, include_unconfident=include_unconfident)
+        tagged = {r['question_id'] for r in rows}
+        by_llm = sum(1 for t in tags if t.method == 'llm' and t.question_id in tagged)
+
+        report['subjects'].append({'subject_name': subject['subject_name'], 'exam_board': subject['exam_board'],
+                                   'questions': len(subject_questions), 'confident': confident_before,
+                                   'tagged': len(tagged), 'by_llm': by_llm})
+        report['tagged'] += len(tagged)
+        report['by_llm'] += by_llm
+        report['by_embedding'] += len(tagged) - by_llm
+        report['untagged'] += len(subject_questions) - len(tagged)
+        all_rows += rows
+        if retag:
+            replace_ids += [q['id'] for q in subject_questions]
+
+    if not dry_run:
+        write_links(client, all_rows, replace_ids)
+        report['links_written'] = len(all_rows)
+    logger.info(f"[TAGGING] {report['tagged']}/{report['questions']} questions tagged "
+                f"({report['by_llm']} via LLM in {report['llm_requests']} requests)")
+    return report
@@ -14,6 +14,7 @@ from __future__ import annotations
 import logging
 import os
 import re
+import sys
 import time
 from dataclasses import dataclass
 from io import BytesIO
@@ -24,6 +25,9 @@ import requests
 from dotenv import load_dotenv
 from supabase import create_client
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from database.staging_sync import sync_subject_topics
+
 
 ENV_PATH = Path(r"C:\Users\tonyd\OneDrive - 4Sight Education Ltd\Apps\flash-curriculum-pipeline\.env")
 
@@ -358,69 +362,9 @@ def replace_subject_topics(
     topics: List[ParsedTopic],
     batch_size: int = 500,
 ) -> int:
-    # Unique constraint is (subject_id, topic_code) so we must clear all rows for this subject.
-    sb.table("staging_aqa_topics").delete().eq("subject_id", subject_id).execute()
-
-    if not topics:
-        return 0
-
-    payload = [
-        {
-            "subject_id": subject_id,
-            "exam_board": exam_board,
-            "topic_code": t.code,
-            "topic_name": t.title,
-            "topic_level": t.level,
-            "parent_topic_id": None,
-        }
-        for t in topics
-    ]
-
-    def _insert(rows: list) -> None:
-        if not rows:
-            return
-        sb.table("staging_aqa_topics").insert(rows).execute()
-
-    # Batch insert
-    for i in range(0, len(payload), batch_size):
-        _insert(payload[i : i + batch_size])
-        time.sleep(0.1)
-
-    # Second pass: wire up parent_topic_id so the data viewer can collapse/expand properly.
-    # We do this after insert because parent_topic_id references UUID ids.
-    rows = (
-        sb.table("staging_aqa_topics")
-        .select("id,topic_code")
-        .eq("subject_id", subject_id)
-        .execute()
-        .data
-        or []
-    )
-    code_to_id = {r["topic_code"]: r["id"] for r in rows if r.get("topic_code") and r.get("id")}
-    # Build full-row upserts to avoid NOT NULL violations if a row is unexpectedly missing.
-    updates = []
-    for t in topics:
-        if not t.parent_code:
-            continue
-        child_id = code_to_id.get(t.code)
-        parent_id = code_to_id.get(t.parent_code)
-        if child_id and parent_id:
-            updates.append(
-                {
-                    "id": child_id,
-                    "subject_id": subject_id,
-                    "exam_board": exam_board,
-                    "topic_code": t.code,
-                    "topic_name": t.title,
-                    "topic_level": t.level,
-                    "parent_topic_id": parent_id,
-                }
-            )
-
-    for i in range(0, len(updates), batch_size):
-        sb.table("staging_aqa_topics").upsert(updates[i : i + batch_size], on_conflict="id").execute()
-        time.sleep(0.05)
-
-    return len(payload)
+    # Sync on (subject_id, topic_code): only changed rows are written and unchanged
+    # topics keep their ids (see database/staging_sync.py)
+    result = sync_subject_topics(sb, subject_id, exam_board, topics, batch_size=batch_size)
+    return result.inserted + result.updated + result.reparented + result.unchanged
 
 
@@ -29,6 +29,8 @@ import requests
 from dotenv import load_dotenv
 from pypdf import PdfReader
 from supabase import create_client
+sys.path.insert(0, str(Path(__file__).resolve().parents[4]))
+from database.staging_sync import sync_subject_topics
 
 
 def _force_utf8_stdio() -> None:
@@ -512,33 +514,10 @@ def upload_to_staging(rows: list[TopicRow]) -> None:
     subject_id = subject_result.data[0]["id"]
     print(f"[OK] Subject ID: {subject_id}")
 
-    supabase.table("staging_aqa_topics").delete().eq("subject_id", subject_id).execute()
-    print("[OK] Cleared old topics")
-
-    to_insert = [
-        {
-            "subject_id": subject_id,
-            "topic_code": r.code,
-            "topic_name": r.title,
-            "topic_level": r.level,
-            "exam_board": SUBJECT["exam_board"],
-        }
-        for r in rows
-    ]
-    inserted = supabase.table("staging_aqa_topics").insert(to_insert).execute()
-    print(f"[OK] Uploaded {len(inserted.data)} topics")
-
-    code_to_id = {t["topic_code"]: t["id"] for t in inserted.data}
-    linked = 0
-    for r in rows:
-        if not r.parent:
-            continue
-        parent_id = code_to_id.get(r.parent)
-        child_id = code_to_id.get(r.code)
-        if parent_id and child_id:
-            supabase.table("staging_aqa_topics").update({"parent_topic_id": parent_id}).eq("id", child_id).execute()
-            linked += 1
-    print(f"[OK] Linked {linked} relationships")
+    # Sync instead of delete + re-insert: only changed rows are written and
+    # unchanged topics keep their ids
+    result = sync_subject_topics(supabase, subject_id, SUBJECT["exam_board"], rows)
+    print(f"[OK] {result.summary()}")
 
 
 def main() -> None:
@@ -21,6 +21,9 @@ from io import BytesIO
 from dotenv import load_dotenv
 from supabase import create_client
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[4]))
+from database.staging_sync import sync_subject_topics
+
 # Try to import PDF library
 try:
     from pypdf import PdfReader
@@ -893,37 +896,9 @@ def upload_topics(topics, subject_code, subject_name, pdf_url):
     subject_id = subject_result.data[0]['id']
     print(f"[OK] Subject: {subject_result.data[0]['subject_name']}")
     
-    # Clear old
-    supabase.table('staging_aqa_topics').delete().eq('subject_id', subject_id).execute()
-    print("[OK] Cleared old topics")
-    
-    # Insert
-    to_insert = [{
-        'subject_id': subject_id,
-        'topic_code': t['code'],
-        'topic_name': t['title'],
-        'topic_level': t['level'],
-        'exam_board': 'EDEXCEL'
-    } for t in topics]
-    
-    inserted_result = supabase.table('staging_aqa_topics').insert(to_insert).execute()
-    print(f"[OK] Uploaded {len(inserted_result.data)} topics")
-    
-    # Link hierarchy
-    code_to_id = {t['topic_code']: t['id'] for t in inserted_result.data}
-    linked = 0
-    
-    for topic in topics:
-        if topic['parent']:
-            parent_id = code_to_id.get(topic['parent'])
-            child_id = code_to_id.get(topic['code'])
-            if parent_id and child_id:
-                supabase.table('staging_aqa_topics').update({
-                    'parent_topic_id': parent_id
-                }).eq('id', child_id).execute()
-                linked += 1
-    
-    print(f"[OK] Linked {linked} parent-child relationships")
+    # Apply only what changed since the last upload (existing topics keep their ids)
+    result = sync_subject_topics(supabase, subject_id, 'EDEXCEL', topics)
+    print(f"[OK] {result.summary()}")
     
     return subject_id
 
@@ -7,6 +7,8 @@ import os, sys
 from pathlib import Path
 from dotenv import load_dotenv
 from supabase import create_client
+sys.path.insert(0, str(Path(__file__).resolve().parents[4]))
+from database.staging_sync import sync_subject_topics
 
 env_path = Path(r"C:\Users\tonyd\OneDrive - 4Sight Education Ltd\Apps\flash-curriculum-pipeline\.env")
 load_dotenv(env_path)
@@ -83,26 +85,10 @@ try:
     subject_id = subject_result.data[0]['id']
     print(f"[OK] Subject ID: {subject_id}")
     
-    supabase.table('staging_aqa_topics').delete().eq('subject_id', subject_id).execute()
-    print("[OK] Cleared old topics")
-    
-    to_insert = [{'subject_id': subject_id, 'topic_code': t['code'], 'topic_name': t['title'], 'topic_level': t['level'], 'exam_board': 'Edexcel'} for t in TOPICS]
-    
-    inserted_result = supabase.table('staging_aqa_topics').insert(to_insert).execute()
-    print(f"[OK] Uploaded {len(inserted_result.data)} topics")
-    
-    code_to_id = {t['topic_code']: t['id'] for t in inserted_result.data}
-    linked = 0
-    
-    for topic in TOPICS:
-        if topic['parent']:
-            parent_id = code_to_id.get(topic['parent'])
-            child_id = code_to_id.get(topic['code'])
-            if parent_id and child_id:
-                supabase.table('staging_aqa_topics').update({'parent_topic_id': parent_id}).eq('id', child_id).execute()
-                linked += 1
-    
-    print(f"[OK] Linked {linked} relationships")
+    # Sync instead of delete + re-insert: only changed rows are written and
+    # unchanged topics keep their ids
+    result = sync_subject_topics(supabase, subject_id, 'Edexcel', TOPICS)
+    print(f"[OK] {result.summary()}")
     print("\n" + "=" * 80)
     print("[OK] ENGLISH LANGUAGE COMPLETE!")
     print("=" * 80)
@@ -11,6 +11,7 @@ Excludes: Languages (done), Art (done), Astronomy (done), Drama (done)
 
 import os
 import sys
+import argparse
 import json
 import re
 import time
@@ -30,6 +31,9 @@ from dotenv import load_dotenv
 from supabase import create_client
 from pypdf import PdfReader
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[4]))
+from utils.spec_registry import SpecRegistry
+
 load_dotenv(env_path)
 supabase = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY'))
 
@@ -58,7 +62,7 @@ def log(msg):
 
 
 def download_pdf(url, code):
-    """Download PDF and save debug."""
+    """Download PDF and save debug. Returns (text, pdf bytes)."""
     try:
         response = requests.get(url, timeout=30)
         pdf = PdfReader(BytesIO(response.content))
@@ -68,10 +72,10 @@ def download_pdf(url, code):
         debug_dir.mkdir(exist_ok=True)
         (debug_dir / f'{code}.txt').write_text(text, encoding='utf-8')
         
-        return text
+        return text, response.content
     except Exception as e:
         log(f"ERROR download {code}: {e}")
-        return None
+        return None, None
 
 
 def extract_examined_content(text, code, name):
@@ -233,7 +237,11 @@ def upload_topics(code, name, pdf_url, topics):
 
 def main():
     """Process remaining GCSE subjects."""
+    parser = argparse.ArgumentParser(description='GCSE Smart Batch Scraper')
+    parser.add_argument('--force', action='store_true', help='Re-process subjects even if their spec is unchanged')
+    args = parser.parse_args()
     
+    registry = SpecRegistry()
     start = datetime.now()
     
     print("=" * 80)
@@ -242,7 +250,7 @@ def main():
     print(f"Started: {start.strftime('%H:%M:%S')}")
     print(f"Processing {len(SUBJECTS)} subjects\n")
     
-    results = {'success': [], 'failed': []}
+    results = {'success': [], 'failed': [], 'skipped': []}
     
     for idx, subj in enumerate(SUBJECTS, 1):
         code, name, pdf_url = subj['code'], subj['name'], subj['pdf_url']
@@ -250,16 +258,30 @@ def main():
         log(f"[{idx}/{len(SUBJECTS)}] {name}...")
         
         try:
-            text = download_pdf(pdf_url, code)
+            registry_key = f"edexcel-gcse-smart-batch/{code}"
+            spec_check = registry.check(registry_key, pdf_url, force=args.force)
+            if not spec_check.changed:
+                log(f"   ⏭️  Spec unchanged ({spec_check.reason})")
+                results['skipped'].append(name)
+                continue
+            
+            text, content = download_pdf(pdf_url, code)
             if not text:
                 results['failed'].append(name)
                 continue
             
+            if not args.force and registry.content_unchanged(registry_key, content):
+                log(f"   ⏭️  Spec PDF unchanged")
+                registry.record(registry_key, pdf_url, spec_check, content=content)
+                results['skipped'].append(name)
+                continue
+            
             topics = extract_examined_content(text, code, name)
             
             if len(topics) >= 2:
                 uploaded = upload_topics(code, name, pdf_url, topics)
                 if uploaded > 0:
+                    registry.record(registry_key, pdf_url, spec_check, content=content)
                     results['success'].append({'name': name, 'topics': uploaded})
                     log(f"   ✅ {uploaded} topics (examined content)")
                 else:
@@ -289,6 +311,9 @@ def main():
             print(f"   • {r['name']}: {r['topics']} topics")
         print(f"\n   TOTAL: {total} topics (examined content)")
     
+    if results['skipped']:
+        print(f"\n⏭️  Unchanged (skipped): {len(results['skipped'])}")
+    
     if results['failed']:
         print(f"\n⚠️  Failed/Manual needed: {len(results['failed'])}")
         for name in results['failed']:
@@ -9,10 +9,13 @@ UPGRADED APPROACH:
 - Page-scoped chunks (10-15 pages)
 - JSON validation
 - Provenance tracking (page numbers)
+- Pass 2 runs sections concurrently; each finished section is checkpointed
 
 Usage:
     python ai-powered-scraper-v2-multipass.py --subject IG-Biology
     python ai-powered-scraper-v2-multipass.py --subject IG-Tamil
+    python ai-powered-scraper-v2-multipass.py --all-ial --workers 6
+    python ai-powered-scraper-v2-multipass.py --subject IG-Biology --fresh   # ignore section checkpoints
 """
 
 import os
@@ -20,11 +23,14 @@ import sys
 import re
 import json
 import argparse
+import hashlib
+import threading
 import requests
 from pathlib import Path
 from io import BytesIO
 from typing import List, Dict, Optional
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from supabase import create_client
 
@@ -58,6 +64,20 @@ except ImportError as e:
 
 client = OpenAI(api_key=openai_key)
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from scrapers.page_classifier import BLANK, COVER, SPEC_SKIP_LABELS, classify_page, features_from_pdfplumber, summarize_skipped
+
+
+OUTPUT_DIR = Path(__file__).parent / "adobe-ai-output"
+CHECKPOINT_DIR = OUTPUT_DIR / "checkpoints"
+
+# Pass-2 section calls in flight at once (override with --workers)
+PASS2_MAX_WORKERS = int(os.getenv('PASS2_MAX_WORKERS', '4'))
+
+# Per-page and per-section caps for pass-2 section text
+PER_PAGE_CAP = 8000
+SECTION_TEXT_CAP = 120000
+
 
 # OUTPUT SCHEMA
 SCHEMA = {
@@ -157,11 +177,15 @@ Return: JSON with only this section filled (same schema shape but scoped to one
 class MultiPassScraper:
     """Multi-pass AI scraper with table extraction."""
     
-    def __init__(self, subject_info: Dict):
+    def __init__(self, subject_info: Dict, max_workers: int = PASS2_MAX_WORKERS, use_checkpoints: bool = True):
         self.subject = subject_info
         self.pages = []
+        self.page_blobs = []
         self.scaffold = None
         self.topics = []
+        self.max_workers = max(1, max_workers)
+        self.use_checkpoints = use_checkpoints
+        self.checkpoint_dir = CHECKPOINT_DIR / self.subject['code']
         
     def download_pdf(self) -> Optional[bytes]:
         """Download PDF."""
@@ -207,16 +231,26 @@ class MultiPassScraper:
                         # Make pipe format
                         table_md.append("\n".join([" | ".join(r) for r in norm]))
                     
+                    # Non-content pages stay in the list so page numbers line up
+                    label, _ = classify_page(
+                        features_from_pdfplumber(page, i + 1, len(pdf.pages), text), document='spec'
+                    )
+                    
                     pages.append({
                         "page_index": i,
                         "text": text,
-                        "tables": table_md
+                        "tables": table_md,
+                        "label": label
                     })
                     
                     if i % 10 == 0:
                         print(f"[INFO] Page {i+1}/{len(pdf.pages)}...", end='\r')
             
             print(f"\n[OK] Extracted {len(pages)} pages")
+            self.page_blobs = self.build_page_blobs(pages)
+            skipped = {p["page_index"] + 1: (p["label"], "") for p in pages if p["label"] in SPEC_SKIP_LABELS}
+            if skipped:
+                print(f"[INFO] {len(skipped)} non-content pages ({summarize_skipped(skipped)})")
             return pages
             
         except Exception as e:
@@ -231,6 +265,9 @@ class MultiPassScraper:
         buf = ""
         
         for p in pages:
+            # Keep contents/admin pages here: the scaffold reads page spans from them
+            if p.get("label") in (COVER, BLANK):
+                continue
             page_header = f"===PAGE {p['page_index']+1}===\n"
             content = p["text"]
             
@@ -296,16 +333,18 @@ class MultiPassScraper:
             return None
     
     def pass2_section_details(self, scaffold: Dict, pages: List[Dict]) -> Optional[Dict]:
-        """Pass 2: Extract detailed content for each section."""
+        """Pass 2: Extract detailed content for each section (concurrently, checkpointed)."""
         print("\n[PASS 2] Extracting section details...")
         
         if not scaffold or 'structure' not in scaffold or 'papers' not in scaffold['structure']:
             print("[ERROR] Invalid scaffold")
             return None
         
-        detailed_sections = []
-        section_count = 0
+        if not self.page_blobs:
+            self.page_blobs = self.build_page_blobs(pages)
         
+        jobs = []
+        section_count = 0
         for paper in scaffold['structure']['papers']:
             for section in paper.get('sections', []):
                 section_count += 1
@@ -315,67 +354,130 @@ class MultiPassScraper:
                     print(f"[WARNING] Section '{section.get('section_name', 'Unknown')}' has no page span, skipping")
                     continue
                 
-                # Get pages for this section
-                section_text = self.pages_to_text(pages, page_span[0], page_span[1])
-                
                 section_meta = {
                     "paper_name": paper.get('paper_name', ''),
                     "section_name": section.get('section_name', ''),
                     "page_span": page_span
                 }
-                
-                print(f"[INFO] Section {section_count}: {section_meta['section_name']} (pages {page_span[0]}-{page_span[1]})...")
-                
-                try:
-                    response = client.chat.completions.create(
-                        model="gpt-4o",  # Full power for details
-                        temperature=0,
-                        response_format={"type": "json_object"},
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": "You are a meticulous academic content extractor. Always return valid JSON. No explanations."
-                            },
-                            {
-                                "role": "user",
-                                "content": PASS2_PROMPT.format(
-                                    section_meta=json.dumps(section_meta),
-                                    section_text=section_text[:120000]  # Cap
-                                )
-                            }
-                        ],
-                        max_tokens=8000
-                    )
-                    
-                    section_json = json.loads(response.choices[0].message.content)
-                    detailed_sections.append({
-                        'section_meta': section_meta,
-                        'section_data': section_json,
-                        'tokens': response.usage.total_tokens
-                    })
-                    
-                    print(f"[OK] Extracted {response.usage.total_tokens} tokens")
-                    
-                except Exception as e:
-                    print(f"[WARNING] Section failed: {str(e)}")
+                jobs.append((section_count, section_meta))
+        
+        results = {}
+        pending = []
+        for number, section_meta in jobs:
+            section_text = self.pages_to_text(pages, *section_meta['page_span'])
+            cached = self.load_section_checkpoint(section_meta, section_text)
+            if cached:
+                print(f"[OK] Section {number}: {section_meta['section_name']} (checkpoint)")
+                results[number] = cached
+            else:
+                pending.append((number, section_meta, section_text))
+        
+        if pending:
+            workers = min(self.max_workers, len(pending))
+            print(f"[INFO] {len(pending)} sections to extract ({len(results)} from checkpoints), {workers} at a time")
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(self.extract_section, number, meta, text): number
+                    for number, meta, text in pending
+                }
+                for future in as_completed(futures):
+                    detail = future.result()
+                    if detail:
+                        results[futures[future]] = detail
         
+        # Keep scaffold order regardless of completion order
+        detailed_sections = [results[number] for number, _ in jobs if number in results]
         print(f"[OK] Extracted {len(detailed_sections)} sections")
         return detailed_sections
     
-    def pages_to_text(self, pages: List[Dict], start: int, end: int, per_page_cap: int = 8000) -> str:
-        """Convert page range to text with tables."""
-        segs = []
+    def extract_section(self, number: int, section_meta: Dict, section_text: str) -> Optional[Dict]:
+        """One pass-2 call; the result is checkpointed as soon as it arrives."""
+        span = section_meta['page_span']
+        print(f"[INFO] Section {number}: {section_meta['section_name']} (pages {span[0]}-{span[1]})...")
         
-        for i in range(start-1, end):  # 1-based to 0-based
-            if i < 0 or i >= len(pages):
-                continue
+        try:
+            response = client.chat.completions.create(
+                model="gpt-4o",  # Full power for details
+                temperature=0,
+                response_format={"type": "json_object"},
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are a meticulous academic content extractor. Always return valid JSON. No explanations."
+                    },
+                    {
+                        "role": "user",
+                        "content": PASS2_PROMPT.format(
+                            section_meta=json.dumps(section_meta),
+                            section_text=section_text
+                        )
+                    }
+                ],
+                max_tokens=8000
+            )
+            
+            section_json = json.loads(response.choices[0].message.content)
+            detail = {
+                'section_meta': section_meta,
+                'section_data': section_json,
+                'tokens': response.usage.total_tokens
+            }
+            self.save_section_checkpoint(section_meta, section_text, detail)
+            
+            print(f"[OK] Section {number}: {response.usage.total_tokens} tokens")
+            return detail
             
-            body = pages[i]["text"] or ""
-            tbls = "\n".join([f"[TABLE]\n{t}\n[/TABLE]" for t in pages[i]["tables"]])
+        except Exception as e:
+            print(f"[WARNING] Section {number} failed: {str(e)}")
+            return None
+    
+    def _checkpoint_path(self, section_meta: Dict, section_text: str) -> Path:
+        # Keyed by section + the exact text sent, so a changed scaffold or PDF re-extracts
+        key = json.dumps(section_meta, sort_keys=True) + section_text
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        return self.checkpoint_dir / f"section-{digest}.json"
+    
+    def load_section_checkpoint(self, section_meta: Dict, section_text: str) -> Optional[Dict]:
+        if not self.use_checkpoints:
+            return None
+        path = self._checkpoint_path(section_meta, section_text)
+        if not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+    
+    def save_section_checkpoint(self, section_meta: Dict, section_text: str, detail: Dict):
+        path = self._checkpoint_path(section_meta, section_text)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write-then-rename so a crash mid-write never leaves a half checkpoint
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(detail, indent=2), encoding='utf-8')
+        os.replace(tmp, path)
+    
+    def build_page_blobs(self, pages: List[Dict], per_page_cap: int = PER_PAGE_CAP) -> List[str]:
+        """Page text + tables, formatted and capped once; pass 2 slices these by reference."""
+        blobs = []
+        for i, page in enumerate(pages):
+            if page.get("label") in SPEC_SKIP_LABELS:
+                blobs.append("")
+                continue
+            body = page["text"] or ""
+            tbls = "\n".join([f"[TABLE]\n{t}\n[/TABLE]" for t in page["tables"]])
             page_blob = f"===PAGE {i+1}===\n{body}\n{tbls}\n"
-            segs.append(page_blob[:per_page_cap])
+            blobs.append(page_blob[:per_page_cap])
+        return blobs
+    
+    def pages_to_text(self, pages: List[Dict], start: int, end: int, per_page_cap: int = PER_PAGE_CAP) -> str:
+        """Convert page range to text with tables."""
+        if per_page_cap != PER_PAGE_CAP or len(self.page_blobs) != len(pages):
+            blobs = self.build_page_blobs(pages, per_page_cap)
+        else:
+            blobs = self.page_blobs
         
-        return "\n".join(segs)[:120000]  # Hard cap
+        segs = [blob for blob in blobs[max(start-1, 0):max(end, 0)] if blob]  # 1-based to 0-based
+        return "\n".join(segs)[:SECTION_TEXT_CAP]  # Hard cap
     
     def convert_to_flat_hierarchy(self, structured_data: Dict) -> List[Dict]:
         """Convert JSON structure to flat topic list for Supabase."""
@@ -630,6 +732,8 @@ def main():
     parser.add_argument('--subject', help='Subject code (e.g., IG-Biology)')
     parser.add_argument('--all-igcse', action='store_true')
     parser.add_argument('--all-ial', action='store_true')
+    parser.add_argument('--workers', type=int, default=PASS2_MAX_WORKERS, help='Concurrent pass-2 section calls')
+    parser.add_argument('--fresh', action='store_true', help='Ignore pass-2 section checkpoints')
     
     args = parser.parse_args()
     
@@ -664,7 +768,7 @@ def main():
     results = {'success': 0, 'failed': 0}
     
     for subject in subjects_to_scrape:
-        scraper = MultiPassScraper(subject)
+        scraper = MultiPassScraper(subject, max_workers=args.workers, use_checkpoints=not args.fresh)
         if scraper.scrape():
             results['success'] += 1
         else:
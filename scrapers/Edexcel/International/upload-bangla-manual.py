@@ -16,6 +16,8 @@ from pathlib import Path
 from typing import List, Dict
 from dotenv import load_dotenv
 from supabase import create_client
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from database.staging_sync import sync_subject_topics
 
 # FORCE UTF-8
 import io
@@ -117,63 +119,10 @@ def upload_to_supabase(subject_info: Dict, topics: List[Dict]) -> bool:
         subject_id = subject_result.data[0]['id']
         print(f"[OK] Subject ID: {subject_id}")
         
-        # Clear old topics
-        supabase.table('staging_aqa_topics').delete().eq('subject_id', subject_id).execute()
-        print("[OK] Cleared old topics")
-        
-        # Deduplicate
-        unique = {}
-        for t in topics:
-            if t['code'] not in unique:
-                unique[t['code']] = t
-        topics = list(unique.values())
-        print(f"[OK] {len(topics)} unique topics")
-        
-        # Insert with UTF-8
-        to_insert = []
-        for t in topics:
-            title = t['title']
-            
-            # Ensure proper string encoding
-            if isinstance(title, bytes):
-                title = title.decode('utf-8', errors='replace')
-            title = str(title)  # Ensure Unicode string
-            
-            to_insert.append({
-                'subject_id': subject_id,
-                'topic_code': t['code'],
-                'topic_name': title,  # Bengali: বাংলা preserved
-                'topic_level': t['level'],
-                'exam_board': subject_info['exam_board']
-            })
-        
-        # Insert in smaller batches
-        BATCH_SIZE = 100
-        all_inserted = []
-        
-        for i in range(0, len(to_insert), BATCH_SIZE):
-            batch = to_insert[i:i+BATCH_SIZE]
-            inserted = supabase.table('staging_aqa_topics').insert(batch).execute()
-            all_inserted.extend(inserted.data)
-            print(f"[OK] Batch {i//BATCH_SIZE + 1}: {len(inserted.data)} topics")
-        
-        print(f"[OK] Total uploaded: {len(all_inserted)} topics")
-        
-        # Link parents
-        code_to_id = {t['topic_code']: t['id'] for t in all_inserted}
-        linked = 0
-        
-        for topic in topics:
-            if topic['parent'] and topic['code'] in code_to_id and topic['parent'] in code_to_id:
-                try:
-                    supabase.table('staging_aqa_topics').update({
-                        'parent_topic_id': code_to_id[topic['parent']]
-                    }).eq('id', code_to_id[topic['code']]).execute()
-                    linked += 1
-                except:
-                    pass
-        
-        print(f"[OK] Linked {linked} parent relationships")
+        # Sync instead of delete + re-insert: only changed rows are written and
+        # unchanged topics keep their ids
+        result = sync_subject_topics(supabase, subject_id, subject_info['exam_board'], topics)
+        print(f"[OK] {result.summary()}")
         
         # VERIFY native script in database
         print(f"\n[INFO] Verifying Bengali script in database...")
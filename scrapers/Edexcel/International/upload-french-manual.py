@@ -15,6 +15,8 @@ from pathlib import Path
 from typing import List, Dict
 from dotenv import load_dotenv
 from supabase import create_client
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from database.staging_sync import sync_subject_topics
 
 # FORCE UTF-8
 import io
@@ -112,42 +114,10 @@ def upload_to_supabase(subject_info: Dict, topics: List[Dict]) -> bool:
         subject_id = subject_result.data[0]['id']
         print(f"[OK] Subject ID: {subject_id}")
         
-        supabase.table('staging_aqa_topics').delete().eq('subject_id', subject_id).execute()
-        print("[OK] Cleared old topics")
-        
-        to_insert = [{
-            'subject_id': subject_id,
-            'topic_code': t['code'],
-            'topic_name': str(t['title']),
-            'topic_level': t['level'],
-            'exam_board': subject_info['exam_board']
-        } for t in topics]
-        
-        BATCH_SIZE = 100
-        all_inserted = []
-        
-        for i in range(0, len(to_insert), BATCH_SIZE):
-            batch = to_insert[i:i+BATCH_SIZE]
-            inserted = supabase.table('staging_aqa_topics').insert(batch).execute()
-            all_inserted.extend(inserted.data)
-            print(f"[OK] Batch {i//BATCH_SIZE + 1}: {len(inserted.data)} topics")
-        
-        print(f"[OK] Total uploaded: {len(all_inserted)} topics")
-        
-        code_to_id = {t['topic_code']: t['id'] for t in all_inserted}
-        linked = 0
-        
-        for topic in topics:
-            if topic['parent'] and topic['code'] in code_to_id and topic['parent'] in code_to_id:
-                try:
-                    supabase.table('staging_aqa_topics').update({
-                        'parent_topic_id': code_to_id[topic['parent']]
-                    }).eq('id', code_to_id[topic['code']]).execute()
-                    linked += 1
-                except:
-                    pass
-        
-        print(f"[OK] Linked {linked} parent relationships")
+        # Sync instead of delete + re-insert: only changed rows are written and
+        # unchanged topics keep their ids
+        result = sync_subject_topics(supabase, subject_id, subject_info['exam_board'], topics)
+        print(f"[OK] {result.summary()}")
         return True
         
     except Exception as e:
@@ -75,6 +75,13 @@ if not AI_PROVIDER:
     print("[ERROR] No AI API keys found!")
     sys.exit(1)
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[4]))
+from scrapers.spec_text_compactor import compact_pages, format_stats
+from scrapers.token_budget import extract_with_budget
+from utils.spec_registry import SpecRegistry, spec_version
+from utils.stage_store import StageStore
+from database.staging_sync import sync_subject_topics
+
 # Import PDF URL scraper
 import importlib.util
 pdf_url_scraper_path = Path(__file__).parent / "eduqas-pdf-url-scraper.py"
@@ -91,17 +98,41 @@ QUALIFICATIONS_FILE = Path(__file__).parent / "Eduqas Qualifications - All.md"
 PDF_URLS_FILE = Path(__file__).parent / "eduqas-pdf-urls.json"
 REPORTS_DIR = Path(__file__).parent / "reports"
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+# Per-subject stage checkpoints (URL discovery -> PDF -> text -> analysis -> AI hierarchy -> topics -> upload)
+STAGE_CACHE_DIR = Path(__file__).parent / "stage-cache"
+STAGES = ('subject_page_url', 'pdf_url', 'pdf', 'text', 'analysis', 'hierarchy', 'topics', 'upload')
+# Re-discover subject page / PDF URLs after a week
+URL_CACHE_MAX_AGE = 7 * 24 * 3600
+# Spec registry namespace (these scripts are copied per board folder)
+REGISTRY_PREFIX = Path(__file__).resolve().parents[2].name
 
 
 class EduqasALevelUniversalScraper:
     """Universal scraper for all Eduqas A-Level courses - uses same proven approach as GCSE scraper."""
     
-    def __init__(self):
+    def __init__(self, refresh_from: Optional[str] = None, use_stage_cache: bool = True, force: bool = False):
         self.reports_dir = REPORTS_DIR
         self.reports_dir.mkdir(exist_ok=True)
         self.subjects = []
         self.all_reports = []
         self.pdf_url_scraper = EduqasPDFURLScraper(headless=True)
+        self.refresh_from = refresh_from
+        self.use_stage_cache = use_stage_cache
+        self.stage_stores = {}
+        self.spec_registry = SpecRegistry()
+        self.force = force
+
+    def _stage_store(self, subject: Dict) -> StageStore:
+        """Checkpoints for one subject, reused across runs."""
+        key = f"{subject['name']}_{subject['level']}"
+        if key not in self.stage_stores:
+            self.stage_stores[key] = StageStore(
+                STAGE_CACHE_DIR, key, STAGES, refresh_from=self.refresh_from, enabled=self.use_stage_cache
+            )
+        return self.stage_stores[key]
+
+    def _registry_key(self, subject: Dict) -> str:
+        return f"{REGISTRY_PREFIX}/{subject['level']}/{subject['name']}"
     
     def load_alevel_subjects(self) -> List[Dict]:
         """Load A-Level subjects from qualifications file."""
@@ -230,6 +261,7 @@ class EduqasALevelUniversalScraper:
         # Process each subject
         success_count = 0
         fail_count = 0
+        skipped_count = 0
         
         for i, subject in enumerate(self.subjects, 1):
             print(f"\n{'='*80}")
@@ -242,7 +274,12 @@ class EduqasALevelUniversalScraper:
                 
                 try:
                     # Find subject page URL
-                    subject_page_url = self.pdf_url_scraper.find_subject_page_url(subject['name'], 'A-Level')
+                    store = self._stage_store(subject)
+                    subject_page_url = store.run(
+                        'subject_page_url', [subject['name'], 'A-Level'],
+                        lambda: self.pdf_url_scraper.find_subject_page_url(subject['name'], 'A-Level'),
+                        kind='text', max_age=URL_CACHE_MAX_AGE,
+                    )
                     
                     if not subject_page_url:
                         print(f"[ERROR] Could not find subject page for {subject['name']}")
@@ -252,8 +289,12 @@ class EduqasALevelUniversalScraper:
                     print(f"[OK] Found subject page: {subject_page_url}")
                     
                     # Find PDF URL from subject page
-                    pdf_url = self.pdf_url_scraper.find_pdf_url_from_subject_page(
-                        subject_page_url, subject['name'], 'A-Level'
+                    pdf_url = store.run(
+                        'pdf_url', [subject_page_url],
+                        lambda: self.pdf_url_scraper.find_pdf_url_from_subject_page(
+                            subject_page_url, subject['name'], 'A-Level'
+                        ),
+                        kind='text', max_age=URL_CACHE_MAX_AGE,
                     )
                     
                     if not pdf_url:
@@ -277,11 +318,30 @@ class EduqasALevelUniversalScraper:
                     fail_count += 1
                     continue
                 
+                # Skip specs that haven't changed since the last successful run
+                spec_check = self.spec_registry.check(self._registry_key(subject), subject['pdf_url'], force=self.force)
+                if not spec_check.changed:
+                    skipped_count += 1
+                    print(f"[SKIP] Spec unchanged ({spec_check.reason}): {subject['name']}")
+                    continue
+                print(f"[INFO] Spec check: {spec_check.reason}")
+                subject['spec_validator'] = spec_check.validator
+                
                 # STEP 2: Process subject (download PDF and extract content)
                 print(f"[INFO] Step 2: Processing PDF content for {subject['name']}...")
                 result = self._process_subject(subject)
                 
-                if result['success']:
+                if result.get('uploaded') or result.get('skipped'):
+                    self.spec_registry.record(
+                        self._registry_key(subject), subject['pdf_url'], spec_check,
+                        content_hash=result.get('pdf_sha1'), version=result.get('spec_version')
+                    )
+                
+                if result.get('skipped'):
+                    skipped_count += 1
+                    print(f"[SKIP] Spec PDF unchanged: {subject['name']}")
+                    continue
+                elif result['success']:
                     success_count += 1
                     print(f"[OK] ✓ Successfully processed {subject['name']}")
                 else:
@@ -315,10 +375,10 @@ class EduqasALevelUniversalScraper:
         self._generate_summary_report(success_count, fail_count)
         
         print(f"\n{'='*80}")
-        print(f"SUMMARY: {success_count} succeeded, {fail_count} failed")
+        print(f"SUMMARY: {success_count} succeeded, {fail_count} failed, {skipped_count} unchanged (skipped)")
         print(f"{'='*80}")
         
-        return success_count > 0
+        return success_count > 0 or (skipped_count > 0 and fail_count == 0)
     
     def _process_subject(self, subject: Dict) -> Dict:
         """Process one subject: Download → Analyze → Extract → Upload."""
@@ -340,23 +400,48 @@ class EduqasALevelUniversalScraper:
         }
         
         try:
+            # Each stage is checkpointed and keyed on the previous stage's output, so a
+            # rerun resumes from the first missing/invalidated stage
+            store = self._stage_store(subject)
+            
             # Download PDF
             print(f"[INFO] Downloading PDF from {subject['pdf_url']}...")
-            pdf_content = self._download_pdf(subject['pdf_url'])
+            pdf_content = store.run(
+                'pdf', [subject['pdf_url'], subject.get('spec_validator')],
+                lambda: self._download_pdf(subject['pdf_url']), kind='bytes',
+                # Without a validator the URL doesn't pin the bytes: re-download and compare below
+                refresh=not subject.get('spec_validator'),
+            )
             if not pdf_content:
                 report['error'] = "PDF download failed"
                 return report
+            report['pdf_sha1'] = store.output_hash('pdf')
+            
+            # Server sent no usable ETag/Last-Modified: compare the bytes instead
+            if not self.force and self.spec_registry.content_unchanged(
+                self._registry_key(subject), content_hash=report['pdf_sha1']
+            ):
+                report['skipped'] = True
+                report['success'] = True
+                return report
             
             # Extract PDF text
-            pdf_text = self._extract_pdf_text(pdf_content)
+            pdf_text = store.run(
+                'text', [store.output_hash('pdf')], lambda: self._extract_pdf_text(pdf_content), kind='text'
+            )
             if not pdf_text:
                 report['error'] = "PDF text extraction failed"
                 return report
             
             # PHASE 1: ANALYZE PDF STRUCTURE
             print("[INFO] Phase 1: Analyzing PDF structure...")
-            analysis = self._analyze_pdf_structure(subject, pdf_text)
+            analysis = store.run(
+                'analysis', [store.output_hash('text')],
+                lambda: self._analyze_pdf_structure(subject, pdf_text),
+                valid=lambda a: a.get('content_found'),
+            )
             report['analysis'] = analysis
+            report['spec_version'] = spec_version(pdf_text)
             
             if not analysis.get('content_found'):
                 report['error'] = "Could not find Subject Content section"
@@ -365,7 +450,10 @@ class EduqasALevelUniversalScraper:
             
             # PHASE 2: EXTRACT HIERARCHY
             print("[INFO] Phase 2: Extracting topic hierarchy...")
-            topics_text = self._extract_hierarchy(subject, pdf_text, analysis)
+            topics_text = store.run(
+                'hierarchy', [store.output_hash('text'), store.output_hash('analysis')],
+                lambda: self._extract_hierarchy(subject, pdf_text, analysis), kind='text',
+            )
             
             if not topics_text:
                 report['error'] = "No topics extracted"
@@ -373,7 +461,10 @@ class EduqasALevelUniversalScraper:
                 return report
             
             # Parse and count topics
-            parsed_topics = self._parse_hierarchy(topics_text, subject['name'])
+            parsed_topics = store.run(
+                'topics', [store.output_hash('hierarchy')],
+                lambda: self._parse_hierarchy(topics_text, subject['name']),
+            )
             
             # Count by level
             level_counts = {}
@@ -394,10 +485,15 @@ class EduqasALevelUniversalScraper:
             
             # Upload to database
             print("[INFO] Uploading to database...")
-            upload_success = self._upload_topics(subject, parsed_topics)
+            upload_success = store.run(
+                'upload', [store.output_hash('topics')],
+                lambda: self._upload_topics(subject, parsed_topics),
+            )
+            report['uploaded'] = bool(upload_success)
             if not upload_success:
                 report['warnings'].append("Database upload failed")
             
+            report['resumed_stages'] = list(store.resumed)
             report['duration_seconds'] = time.time() - start_time
             report['end_time'] = datetime.now().isoformat()
             
@@ -437,18 +533,21 @@ class EduqasALevelUniversalScraper:
         
         try:
             pdf_file = BytesIO(pdf_content)
-            text = ""
+            pages = []
             
             with pdfplumber.open(pdf_file) as pdf:
                 total_pages = len(pdf.pages)
                 for i, page in enumerate(pdf.pages):
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
+                    pages.append(page.extract_text() or "")
                     if i % 10 == 0 and i > 0:
                         print(f"[INFO] Processed {i+1}/{total_pages} pages...")
             
+            # Strip running headers/footers and wrap artefacts before any prompt sees the text
+            pages, stats = compact_pages(pages)
+            text = "".join(page + "\n" for page in pages if page)
+            
             print(f"[OK] Extracted {len(text)} characters from {total_pages} pages")
+            print(f"[INFO] Compacted spec text: {format_stats(stats)}")
             return text
             
         except Exception as e:
@@ -622,9 +721,13 @@ class EduqasALevelUniversalScraper:
         # Build extraction prompt based on analysis
         prompt = self._build_extraction_prompt(subject, pdf_text, analysis)
         
-        # Call AI
+        # Call AI (split at numbered headings if the spec won't fit one call)
         print("[INFO] Calling AI for extraction...")
-        result = self._call_ai(prompt, max_tokens=16000)
+        model = "gpt-4o" if AI_PROVIDER == "openai" else "claude-3-5-sonnet-20241022"
+        result = extract_with_budget(
+            prompt, lambda p: self._call_ai(p, max_tokens=16000), model, max_output_tokens=16000,
+            was_truncated=lambda: self.last_output_truncated,
+        )
         
         if result:
             print(f"[OK] AI extraction complete: {len(result)} characters")
@@ -1016,7 +1119,7 @@ Use numbered hierarchy (1, 1.1, 1.1.1, 1.1.1.1, etc.)
 Output ONLY the numbered hierarchy, nothing else.
 
 PDF CONTENT:
-{content_section[:250000]}"""
+{content_section}"""
 
         return prompt
     
@@ -1043,6 +1146,8 @@ CRITICAL RULES FOR DEPTH:
 9. DO NOT stop extraction at commas, parentheses, or "and" - continue extracting ALL items in lists until the end
 10. For Computer Science: Each bullet point should be broken down into 5-15+ sub-topics depending on complexity - extract EVERY item in lists"""
         
+        self.last_output_truncated = False
+        
         if AI_PROVIDER == "openai":
             try:
                 response = openai_client.chat.completions.create(
@@ -1054,6 +1159,7 @@ CRITICAL RULES FOR DEPTH:
                     max_tokens=max_tokens,
                     temperature=0.1  # Lower temperature to reduce hallucination
                 )
+                self.last_output_truncated = response.choices[0].finish_reason == 'length'
                 result = response.choices[0].message.content
                 
                 # Validate result - check for potential issues
@@ -1082,6 +1188,7 @@ CRITICAL RULES FOR DEPTH:
                         {"role": "user", "content": prompt}
                     ]
                 )
+                self.last_output_truncated = message.stop_reason == 'max_tokens'
                 result = message.content[0].text
                 
                 # Validate result - check for potential issues
@@ -1239,90 +1346,11 @@ CRITICAL RULES FOR DEPTH:
             subject_id = subject_result.data[0]['id']
             print(f"[OK] Subject ID: {subject_id}")
             
-            # Clear old topics for this subject
-            print(f"[INFO] Clearing old topics...")
-            supabase.table('staging_aqa_topics').delete().eq('subject_id', subject_id).eq('exam_board', 'EDUQAS').execute()
-            
-            # Remove duplicates by code
-            seen_codes = set()
-            unique_topics = []
-            for t in topics:
-                code = t.get('code', '')
-                if code and code not in seen_codes:
-                    seen_codes.add(code)
-                    unique_topics.append(t)
-            
-            print(f"[INFO] After deduplication: {len(unique_topics)} unique topics from {len(topics)} total")
-            
-            # Prepare topics for insertion
-            to_insert = [{
-                'subject_id': subject_id,
-                'topic_code': t.get('code', ''),
-                'topic_name': t.get('title', ''),
-                'topic_level': t.get('level', 0),
-                'exam_board': 'EDUQAS'
-            } for t in unique_topics]
-            
-            # Insert topics in batches
-            BATCH_SIZE = 500
-            all_inserted = []
-            
-            print(f"[INFO] Inserting {len(to_insert)} topics in batches of {BATCH_SIZE}...")
-            for i in range(0, len(to_insert), BATCH_SIZE):
-                batch = to_insert[i:i+BATCH_SIZE]
-                try:
-                    inserted = supabase.table('staging_aqa_topics').insert(batch).execute()
-                    all_inserted.extend(inserted.data)
-                    print(f"[OK] Inserted batch {i//BATCH_SIZE + 1}: {len(inserted.data)} topics")
-                except Exception as e:
-                    print(f"[ERROR] Batch {i//BATCH_SIZE + 1} failed: {e}")
-                    # Try inserting one by one to find the problem
-                    for item in batch:
-                        try:
-                            single_insert = supabase.table('staging_aqa_topics').insert([item]).execute()
-                            all_inserted.extend(single_insert.data)
-                        except Exception as e2:
-                            print(f"[ERROR] Failed to insert topic {item.get('topic_code', 'unknown')}: {e2}")
-            
-            print(f"[OK] Successfully inserted {len(all_inserted)} topics")
-            
-            # Link parent relationships using batched upserts
-            code_to_id = {t['topic_code']: t['id'] for t in all_inserted}
-            linked_count = 0
-            failed_links = 0
-            
-            print(f"[INFO] Linking parent-child relationships...")
-            # Collect all updates first
-            updates_to_apply = []
-            for topic in unique_topics:
-                if topic.get('parent'):
-                    parent_id = code_to_id.get(topic['parent'])
-                    child_id = code_to_id.get(topic.get('code', ''))
-                    if parent_id and child_id:
-                        updates_to_apply.append({
-                            'id': child_id,
-                            'parent_topic_id': parent_id
-                        })
-                    else:
-                        failed_links += 1
-            
-            # Link parent relationships (same approach as all other scrapers)
-            if updates_to_apply:
-                print(f"[INFO] Linking {len(updates_to_apply)} parent-child relationships...")
-                for update in updates_to_apply:
-                    try:
-                        supabase.table('staging_aqa_topics').update({
-                            'parent_topic_id': update['parent_topic_id']
-                        }).eq('id', update['id']).execute()
-                        linked_count += 1
-                    except Exception as e:
-                        failed_links += 1
-                
-                print(f"[OK] Linked {linked_count} parent-child relationships")
-            
-            if failed_links > 0:
-                print(f"[WARN] {failed_links} parent-child relationships failed to link")
-            print(f"[OK] Successfully uploaded {len(all_inserted)} topics to staging")
+            # Write only the inserts / updates / re-parents / deletes since the last upload;
+            # unchanged topics keep their ids
+            print(f"[INFO] Syncing {len(topics)} topics with staging...")
+            result = sync_subject_topics(supabase, subject_id, 'EDUQAS', topics)
+            print(f"[OK] {result.summary()}")
             return True
             
         except Exception as e:
@@ -1393,10 +1421,18 @@ def main():
     parser = argparse.ArgumentParser(description='Eduqas A-Level Universal Scraper')
     parser.add_argument('--subject', type=str, help='Filter by subject name')
     parser.add_argument('--limit', type=int, help='Limit number of subjects to process')
+    parser.add_argument('--refresh-from', choices=STAGES,
+                        help='Ignore checkpoints from this stage on (e.g. hierarchy to re-run AI extraction)')
+    parser.add_argument('--force', action='store_true', help='Re-process subjects even if their spec is unchanged')
+    parser.add_argument('--no-stage-cache', action='store_true', help='Do not read or write stage checkpoints')
     
     args = parser.parse_args()
     
-    scraper = EduqasALevelUniversalScraper()
+    scraper = EduqasALevelUniversalScraper(
+        refresh_from=args.refresh_from,
+        use_stage_cache=not args.no_stage_cache,
+        force=args.force
+    )
     success = scraper.scrape_all(subject_filter=args.subject, limit=args.limit)
     
     sys.exit(0 if success else 1)
@@ -31,6 +31,9 @@ import requests
 from dotenv import load_dotenv
 from pypdf import PdfReader
 from supabase import create_client
+sys.path.insert(0, str(Path(__file__).resolve().parents[4]))
+from database.staging_sync import sync_subject_topics
+from scrapers.spec_text_compactor import looks_like_header_footer
 
 
 @dataclass(frozen=True)
@@ -64,16 +67,7 @@ def _norm(s: str) -> str:
 
 
 def _looks_like_header_footer(line: str) -> bool:
-    s = (line or "").strip()
-    if not s:
-        return True
-    if "© WJEC" in s or "WJEC CBAC" in s:
-        return True
-    if s.startswith("A LEVEL PSYCHOLOGY"):
-        return True
-    if re.fullmatch(r"\d{1,3}", s):
-        return True
-    return False
+    return looks_like_header_footer(line, prefixes=("A LEVEL PSYCHOLOGY",))
 
 
 def download_pdf_text(url: str) -> str:
@@ -103,57 +97,10 @@ def upload_to_staging(*, subject: dict, nodes: list[Node]) -> None:
     subject_id = subject_result.data[0]["id"]
     print(f"[OK] Subject ID: {subject_id}")
 
-    deleted_total = 0
-    BATCH = 200
-    for lvl in range(7, -1, -1):
-        while True:
-            rows = (
-                supabase.table("staging_aqa_topics")
-                .select("id")
-                .eq("subject_id", subject_id)
-                .eq("exam_board", subject["exam_board"])
-                .eq("topic_level", lvl)
-                .limit(BATCH)
-                .execute()
-                .data
-                or []
-            )
-            if not rows:
-                break
-            ids = [r["id"] for r in rows]
-            res = supabase.table("staging_aqa_topics").delete().in_("id", ids).execute()
-            deleted_total += len(res.data or [])
-    print(f"[OK] Cleared old topics ({deleted_total} rows)")
-
-    inserted = (
-        supabase.table("staging_aqa_topics")
-        .insert(
-            [
-                {
-                    "subject_id": subject_id,
-                    "topic_code": n.code,
-                    "topic_name": n.title,
-                    "topic_level": n.level,
-                    "exam_board": subject["exam_board"],
-                }
-                for n in nodes
-            ]
-        )
-        .execute()
-    )
-    print(f"[OK] Uploaded {len(inserted.data)} topics")
-
-    code_to_id = {row["topic_code"]: row["id"] for row in inserted.data}
-    linked = 0
-    for n in nodes:
-        if not n.parent:
-            continue
-        child_id = code_to_id.get(n.code)
-        parent_id = code_to_id.get(n.parent)
-        if child_id and parent_id:
-            supabase.table("staging_aqa_topics").update({"parent_topic_id": parent_id}).eq("id", child_id).execute()
-            linked += 1
-    print(f"[OK] Linked {linked} relationships")
+    # Sync instead of delete + re-insert: only changed rows are written and
+    # unchanged topics keep their ids
+    result = sync_subject_topics(supabase, subject_id, subject["exam_board"], nodes)
+    print(f"[OK] {result.summary()}")
 
 
 def build_nodes(pdf_text: str) -> list[Node]:
@@ -34,6 +34,9 @@ import requests
 from dotenv import load_dotenv
 from pypdf import PdfReader
 from supabase import create_client
+sys.path.insert(0, str(Path(__file__).resolve().parents[4]))
+from database.staging_sync import sync_subject_topics
+from scrapers.spec_text_compactor import looks_like_header_footer
 
 
 @dataclass(frozen=True)
@@ -63,17 +66,6 @@ def _norm(s: str) -> str:
     return re.sub(r"\s+", " ", (s or "").strip())
 
 
-def _looks_like_header_footer(line: str) -> bool:
-    s = (line or "").strip()
-    if not s:
-        return True
-    if "© WJEC" in s or "© Eduqas" in s or "WJEC CBAC" in s:
-        return True
-    if re.fullmatch(r"\d{1,3}", s):
-        return True
-    return False
-
-
 def download_pdf_text(url: str) -> str:
     print("[INFO] Downloading PDF...")
     resp = requests.get(url, timeout=60)
@@ -110,7 +102,7 @@ def parse_geology(text: str) -> list[Node]:
 
     for raw in lines:
         s = _norm(raw)
-        if not s or _looks_like_header_footer(s):
+        if not s or looks_like_header_footer(s):
             continue
 
         km = key_idea_re.match(s)
@@ -193,38 +185,10 @@ def upload_to_staging(nodes: list[Node]) -> None:
     subject_id = subject_result.data[0]["id"]
     print(f"[OK] Subject ID: {subject_id}")
 
-    max_level = max((n.level for n in nodes), default=0)
-    deleted_total = 0
-    for lvl in range(max_level, -1, -1):
-        res = supabase.table("staging_aqa_topics").delete().eq("subject_id", subject_id).eq("topic_level", lvl).execute()
-        deleted_total += len(res.data or [])
-    print(f"[OK] Cleared old topics ({deleted_total} rows)")
-
-    inserted = supabase.table("staging_aqa_topics").insert(
-        [
-            {
-                "subject_id": subject_id,
-                "topic_code": n.code,
-                "topic_name": n.title,
-                "topic_level": n.level,
-                "exam_board": SUBJECT["exam_board"],
-            }
-            for n in nodes
-        ]
-    ).execute()
-    print(f"[OK] Uploaded {len(inserted.data)} topics")
-
-    code_to_id = {t["topic_code"]: t["id"] for t in inserted.data}
-    linked = 0
-    for n in nodes:
-        if not n.parent:
-            continue
-        parent_id = code_to_id.get(n.parent)
-        child_id = code_to_id.get(n.code)
-        if parent_id and child_id:
-            supabase.table("staging_aqa_topics").update({"parent_topic_id": parent_id}).eq("id", child_id).execute()
-            linked += 1
-    print(f"[OK] Linked {linked} relationships")
+    # Sync instead of delete + re-insert: only changed rows are written and
+    # unchanged topics keep their ids
+    result = sync_subject_topics(supabase, subject_id, SUBJECT["exam_board"], nodes)
+    print(f"[OK] {result.summary()}")
 
 
 def main() -> None:
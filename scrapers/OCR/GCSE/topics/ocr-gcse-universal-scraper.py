@@ -13,7 +13,7 @@ Requirements:
     pip install requests pdfplumber openai anthropic
 
 Usage:
-    python ocr-gcse-universal-scraper.py [--subject-code JXXX] [--limit N]
+    python ocr-gcse-universal-scraper.py [--subject-code JXXX] [--limit N] [--refresh-from STAGE] [--force] [--no-stage-cache]
 """
 
 import os
@@ -74,6 +74,12 @@ if not AI_PROVIDER:
     print("[ERROR] No AI API keys found!")
     sys.exit(1)
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[4]))
+from scrapers.spec_text_compactor import compact_pages, format_stats
+from scrapers.token_budget import extract_with_budget
+from utils.spec_registry import SpecRegistry, spec_version
+from utils.stage_store import StageStore, content_hash
+
 
 # ================================================================
 # CONFIGURATION
@@ -82,6 +88,12 @@ if not AI_PROVIDER:
 GCSE_SUBJECTS_FILE = Path(__file__).parent.parent.parent / "A-Level" / "topics" / "OCR GCSE.md"
 REPORTS_DIR = Path(__file__).parent / "reports"
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+# Stage checkpoints (PDF -> text -> analysis -> AI hierarchy -> topics -> upload), one
+# directory per PDF for the shared stages and per subject code for the rest
+STAGE_CACHE_DIR = Path(__file__).parent / "stage-cache"
+STAGES = ('pdf', 'text', 'analysis', 'hierarchy', 'topics', 'upload')
+# Spec registry namespace (these scripts are copied per board folder)
+REGISTRY_PREFIX = Path(__file__).resolve().parents[2].name
 
 # Subjects to exclude (already scraped and perfect)
 EXCLUDED_SUBJECT_CODES = [
@@ -93,13 +105,31 @@ EXCLUDED_SUBJECT_CODES = [
 class UniversalGCSEscraper:
     """Universal scraper for all OCR GCSE courses."""
     
-    def __init__(self):
+    def __init__(self, refresh_from: Optional[str] = None, use_stage_cache: bool = True, force: bool = False):
         self.debug_dir = Path(__file__).parent.parent.parent / "A-Level" / "debug-output"
         self.debug_dir.mkdir(exist_ok=True)
         self.reports_dir = REPORTS_DIR
         self.reports_dir.mkdir(exist_ok=True)
         self.subjects = []
         self.all_reports = []
+        self.last_output_truncated = False
+        self.refresh_from = refresh_from
+        self.use_stage_cache = use_stage_cache
+        self.stage_stores = {}
+        self.spec_registry = SpecRegistry()
+        self.force = force
+
+    def _stage_store(self, subjects: List[Dict]) -> StageStore:
+        """Checkpoints for one subject (or the subjects sharing a PDF), reused across runs."""
+        key = "_".join(s['code'] for s in subjects)
+        if key not in self.stage_stores:
+            self.stage_stores[key] = StageStore(
+                STAGE_CACHE_DIR, key, STAGES, refresh_from=self.refresh_from, enabled=self.use_stage_cache
+            )
+        return self.stage_stores[key]
+
+    def _registry_key(self, subjects: List[Dict]) -> str:
+        return f"{REGISTRY_PREFIX}/GCSE/{'_'.join(s['code'] for s in subjects)}"
     
     def load_subjects(self) -> List[Dict]:
         """Load subjects from markdown file."""
@@ -211,6 +241,7 @@ class UniversalGCSEscraper:
         # Process each unique PDF URL
         success_count = 0
         fail_count = 0
+        skipped_count = 0
         pdf_cache = {}  # Cache PDF content and extraction results by URL
         
         pdf_index = 0
@@ -224,10 +255,27 @@ class UniversalGCSEscraper:
             
             # Process PDF once
             try:
+                store = self._stage_store(subjects_with_same_pdf)
+                
+                # Skip specs that haven't changed since the last successful run
+                registry_key = self._registry_key(subjects_with_same_pdf)
+                spec_check = self.spec_registry.check(registry_key, url, force=self.force)
+                if not spec_check.changed:
+                    skipped_count += len(subjects_with_same_pdf)
+                    print(f"[SKIP] Spec unchanged ({spec_check.reason})")
+                    continue
+                print(f"[INFO] Spec check: {spec_check.reason}")
+                pdf_sha1 = version = None
+                uploaded_count = 0
+                
                 # Download PDF (if not cached)
                 if url not in pdf_cache:
                     print(f"[INFO] Downloading PDF from {url}...")
-                    pdf_content = self._download_pdf(url)
+                    pdf_content = store.run(
+                        'pdf', [url, spec_check.validator], lambda: self._download_pdf(url), kind='bytes',
+                        # Without a validator the URL doesn't pin the bytes: re-download and compare below
+                        refresh=not spec_check.validator,
+                    )
                     if not pdf_content:
                         # All subjects fail
                         for subject in subjects_with_same_pdf:
@@ -245,9 +293,19 @@ class UniversalGCSEscraper:
                             self.all_reports.append(result)
                             self._save_report(subject['code'], result)
                         continue
+                    pdf_sha1 = store.output_hash('pdf')
+                    
+                    # Server sent no usable ETag/Last-Modified: compare the bytes instead
+                    if not self.force and self.spec_registry.content_unchanged(registry_key, content_hash=pdf_sha1):
+                        self.spec_registry.record(registry_key, url, spec_check, content_hash=pdf_sha1)
+                        skipped_count += len(subjects_with_same_pdf)
+                        print("[SKIP] Spec PDF unchanged")
+                        continue
                     
                     # Extract PDF text
-                    pdf_text = self._extract_pdf_text(pdf_content)
+                    pdf_text = store.run(
+                        'text', [store.output_hash('pdf')], lambda: self._extract_pdf_text(pdf_content), kind='text'
+                    )
                     if not pdf_text:
                         # All subjects fail
                         for subject in subjects_with_same_pdf:
@@ -265,10 +323,15 @@ class UniversalGCSEscraper:
                             self.all_reports.append(result)
                             self._save_report(subject['code'], result)
                         continue
+                    version = spec_version(pdf_text)
                     
                     # Analyze PDF structure (once per PDF)
                     print("[INFO] Phase 1: Analyzing PDF structure...")
-                    analysis = self._analyze_pdf_structure(subjects_with_same_pdf[0], pdf_text)
+                    analysis = store.run(
+                        'analysis', [store.output_hash('text')],
+                        lambda: self._analyze_pdf_structure(subjects_with_same_pdf[0], pdf_text),
+                        valid=lambda a: a.get('content_found') and not a.get('analysis_failed'),
+                    )
                     
                     if not analysis.get('content_found'):
                         # All subjects fail
@@ -304,7 +367,11 @@ class UniversalGCSEscraper:
                     else:
                         # Extract hierarchy (once per PDF)
                         print("[INFO] Phase 2: Extracting topic hierarchy...")
-                        topics_text = self._extract_hierarchy(subjects_with_same_pdf[0], pdf_text, analysis)
+                        topics_text = store.run(
+                            'hierarchy', [store.output_hash('text'), store.output_hash('analysis')],
+                            lambda: self._extract_hierarchy(subjects_with_same_pdf[0], pdf_text, analysis),
+                            kind='text',
+                        )
                         
                         if not topics_text:
                             # All subjects fail
@@ -326,7 +393,10 @@ class UniversalGCSEscraper:
                             continue
                         
                         # Parse topics (once per PDF)
-                        parsed_topics = self._parse_hierarchy(topics_text, subjects_with_same_pdf[0]['code'])
+                        parsed_topics = store.run(
+                            'topics', [store.output_hash('hierarchy')],
+                            lambda: self._parse_hierarchy(topics_text, subjects_with_same_pdf[0]['code']),
+                        )
                         
                         # Cache results
                         pdf_cache[url] = {
@@ -356,11 +426,16 @@ class UniversalGCSEscraper:
                 # Process each subject that shares this PDF
                 for subject in subjects_with_same_pdf:
                     print(f"\n[INFO] Processing subject: {subject['name']} ({subject['code']})")
+                    subject_store = self._stage_store([subject])
                     
                     if multiple_subjects:
                         # Extract separately for this subject (filter subject-specific content)
                         print(f"[INFO] Phase 2: Extracting topic hierarchy for {subject['name']}...")
-                        topics_text = self._extract_hierarchy(subject, pdf_text, analysis, filter_by_subject=True)
+                        topics_text = subject_store.run(
+                            'hierarchy', [store.output_hash('text'), store.output_hash('analysis'), 'filter_by_subject'],
+                            lambda: self._extract_hierarchy(subject, pdf_text, analysis, filter_by_subject=True),
+                            kind='text',
+                        )
                         
                         if not topics_text:
                             fail_count += 1
@@ -380,7 +455,10 @@ class UniversalGCSEscraper:
                             continue
                         
                         # Parse topics for this subject
-                        parsed_topics = self._parse_hierarchy(topics_text, subject['code'])
+                        parsed_topics = subject_store.run(
+                            'topics', [subject_store.output_hash('hierarchy')],
+                            lambda: self._parse_hierarchy(topics_text, subject['code']),
+                        )
                     else:
                         # Use shared extraction, just update codes
                         # Create subject-specific topics (update codes)
@@ -422,7 +500,10 @@ class UniversalGCSEscraper:
                     
                     # Upload to database
                     print("[INFO] Uploading to database...")
-                    upload_success = self._upload_topics(subject, subject_topics)
+                    upload_success = subject_store.run(
+                        'upload', [content_hash(subject_topics)],
+                        lambda: self._upload_topics(subject, subject_topics),
+                    )
                     
                     # Create report
                     result = {
@@ -437,11 +518,15 @@ class UniversalGCSEscraper:
                         'warnings': assessment.get('warnings', []),
                         'success_grade': assessment.get('grade', 0),
                         'analysis': analysis,
+                        'uploaded': bool(upload_success),
+                        'resumed_stages': list(subject_store.resumed),
                         'duration_seconds': 0,
                         'end_time': datetime.now().isoformat()
                     }
                     
-                    if not upload_success:
+                    if upload_success:
+                        uploaded_count += 1
+                    else:
                         result['warnings'].append("Database upload failed")
                     
                     self.all_reports.append(result)
@@ -454,6 +539,10 @@ class UniversalGCSEscraper:
                         fail_count += 1
                         print(f"[FAIL] ✗ Failed to process {subject['code']}: {result.get('error', 'Unknown error')}")
                 
+                # Only a fully uploaded PDF counts as processed
+                if uploaded_count == len(subjects_with_same_pdf):
+                    self.spec_registry.record(registry_key, url, spec_check, content_hash=pdf_sha1, version=version)
+                
                 # Rate limiting
                 if pdf_index < len(url_to_subjects):
                     print(f"\n[INFO] Waiting 5 seconds before next PDF...")
@@ -479,10 +568,10 @@ class UniversalGCSEscraper:
         self._generate_summary_report(success_count, fail_count)
         
         print(f"\n{'='*80}")
-        print(f"SUMMARY: {success_count} succeeded, {fail_count} failed")
+        print(f"SUMMARY: {success_count} succeeded, {fail_count} failed, {skipped_count} unchanged (skipped)")
         print(f"{'='*80}")
         
-        return success_count > 0
+        return success_count > 0 or (skipped_count > 0 and fail_count == 0)
     
     def _process_subject(self, subject: Dict) -> Dict:
         """Process one subject: Analyze → Extract → Report."""
@@ -655,8 +744,11 @@ class UniversalGCSEscraper:
                     if i % 20 == 0 and i > 0:
                         print(f"[INFO] Processed {i+1}/{len(pdf.pages)} pages...")
             
+            # Strip running headers/footers and wrap artefacts before any prompt sees the text
+            page_texts, stats = compact_pages(page_texts)
             pdf_text = "\n".join(page_texts)
             print(f"[OK] Extracted {len(pdf_text)} chars from {len(page_texts)} pages")
+            print(f"[INFO] Compacted spec text: {format_stats(stats)}")
             return pdf_text
         except Exception as e:
             print(f"[ERROR] PDF extraction failed: {e}")
@@ -812,7 +904,12 @@ CRITICAL: Output ONLY valid JSON. No markdown, no explanations, just JSON."""
         # Build extraction prompt based on analysis
         extraction_prompt = self._build_extraction_prompt(subject, pdf_text, analysis, filter_by_subject=filter_by_subject)
         
-        result = self._call_ai(extraction_prompt, max_tokens=16000)
+        # Split the content at headings when it (or the hierarchy it yields) won't fit
+        model = "gpt-4o" if AI_PROVIDER == "openai" else "claude-3-5-haiku-20241022"
+        result = extract_with_budget(
+            extraction_prompt, lambda p: self._call_ai(p, max_tokens=16000), model, max_output_tokens=16000,
+            was_truncated=lambda: self.last_output_truncated,
+        )
         
         # Save AI output for debugging
         if result:
@@ -835,9 +932,9 @@ CRITICAL: Output ONLY valid JSON. No markdown, no explanations, just JSON."""
         
         if content_match:
             content_start = content_match.start()
-            content_section = pdf_text[content_start:content_start+150000]  # Large section
+            content_section = pdf_text[content_start:]
         else:
-            content_section = pdf_text[:150000]  # First 150k chars
+            content_section = pdf_text
         
         # Build tier instructions
         tier_instructions = ""
@@ -950,10 +1047,10 @@ CRITICAL RULES:
     - Extract learning objectives under "When studying..." sections as Level 4 topics
     - Include all sub-items, bullet points, and detailed content from Prescribed Sources sections
 
-CONTENT SECTION:
-{content_section[:120000]}
+EXTRACT NOW from the content section below.
 
-EXTRACT NOW:"""
+PDF CONTENT:
+{content_section}"""
         
         return prompt
     
@@ -1109,6 +1206,7 @@ CRITICAL: Output ONLY valid JSON. No markdown, no explanations, just JSON."""
     
     def _call_ai(self, prompt: str, max_tokens: int = 16000) -> Optional[str]:
         """Call AI API."""
+        self.last_output_truncated = False
         max_retries = 3
         for attempt in range(max_retries):
             try:
@@ -1120,6 +1218,7 @@ CRITICAL: Output ONLY valid JSON. No markdown, no explanations, just JSON."""
                         temperature=0,
                         timeout=240
                     )
+                    self.last_output_truncated = response.choices[0].finish_reason == 'length'
                     return response.choices[0].message.content
                 else:  # anthropic
                     response = claude.messages.create(
@@ -1128,6 +1227,7 @@ CRITICAL: Output ONLY valid JSON. No markdown, no explanations, just JSON."""
                         messages=[{"role": "user", "content": prompt}],
                         timeout=240
                     )
+                    self.last_output_truncated = response.stop_reason == 'max_tokens'
                     return response.content[0].text
             except Exception as e:
                 print(f"[WARN] Attempt {attempt + 1}/{max_retries} failed: {e}")
@@ -1374,9 +1474,17 @@ def main():
     parser = argparse.ArgumentParser(description='OCR GCSE Universal Scraper')
     parser.add_argument('--subject-code', type=str, help='Process only this subject code (e.g., J260)')
     parser.add_argument('--limit', type=int, help='Limit number of subjects to process')
+    parser.add_argument('--refresh-from', choices=STAGES,
+                        help='Ignore checkpoints from this stage on (e.g. hierarchy to re-run AI extraction)')
+    parser.add_argument('--force', action='store_true', help='Re-process subjects even if their spec is unchanged')
+    parser.add_argument('--no-stage-cache', action='store_true', help='Do not read or write stage checkpoints')
     args = parser.parse_args()
     
-    scraper = UniversalGCSEscraper()
+    scraper = UniversalGCSEscraper(
+        refresh_from=args.refresh_from,
+        use_stage_cache=not args.no_stage_cache,
+        force=args.force,
+    )
     success = scraper.scrape_all(
         subject_code_filter=args.subject_code,
         limit=args.limit
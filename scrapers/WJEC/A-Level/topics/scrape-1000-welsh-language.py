@@ -29,6 +29,8 @@ from typing import Optional
 
 from dotenv import load_dotenv
 from supabase import create_client
+sys.path.insert(0, str(Path(__file__).resolve().parents[4]))
+from database.staging_sync import sync_subject_topics
 
 
 @dataclass(frozen=True)
@@ -72,70 +74,10 @@ def upload_to_staging(*, subject: dict, nodes: list[Node]) -> None:
     subject_id = subject_result.data[0]["id"]
     print(f"[OK] Subject ID: {subject_id}")
 
-    existing_max = 0
-    try:
-        res = (
-            supabase.table("staging_aqa_topics")
-            .select("topic_level")
-            .eq("subject_id", subject_id)
-            .order("topic_level", desc=True)
-            .limit(1)
-            .execute()
-        )
-        if res.data:
-            existing_max = int(res.data[0]["topic_level"] or 0)
-    except Exception:
-        existing_max = 0
-
-    max_level = max(existing_max, max((n.level for n in nodes), default=0))
-    deleted_total = 0
-    BATCH = 500
-    for lvl in range(max_level, -1, -1):
-        while True:
-            rows = (
-                supabase.table("staging_aqa_topics")
-                .select("id")
-                .eq("subject_id", subject_id)
-                .eq("topic_level", lvl)
-                .limit(BATCH)
-                .execute()
-                .data
-                or []
-            )
-            if not rows:
-                break
-            ids = [r["id"] for r in rows]
-            res = supabase.table("staging_aqa_topics").delete().in_("id", ids).execute()
-            deleted_total += len(res.data or [])
-    print(f"[OK] Cleared old topics ({deleted_total} rows)")
-
-    payload = [
-        {
-            "subject_id": subject_id,
-            "topic_code": n.code,
-            "topic_name": n.title,
-            "topic_level": n.level,
-            "exam_board": subject["exam_board"],
-        }
-        for n in nodes
-    ]
-    inserted_rows: list[dict] = []
-    for i in range(0, len(payload), 500):
-        res = supabase.table("staging_aqa_topics").insert(payload[i : i + 500]).execute()
-        inserted_rows.extend(res.data or [])
-    print(f"[OK] Uploaded {len(inserted_rows)} topics")
-
-    code_to_id = {row["topic_code"]: row["id"] for row in inserted_rows}
-    linked = 0
-    for n in nodes:
-        if not n.parent:
-            continue
-        child_id = code_to_id.get(n.code)
-        parent_id = code_to_id.get(n.parent)
-        if child_id and parent_id:
-            supabase.table("staging_aqa_topics").update({"parent_topic_id": parent_id}).eq("id", child_id).execute()
-            linked += 1
-    print(f"[OK] Linked {linked} relationships")
+    # Sync instead of delete + re-insert: only changed rows are written and
+    # unchanged topics keep their ids
+    result = sync_subject_topics(supabase, subject_id, subject["exam_board"], nodes)
+    print(f"[OK] {result.summary()}")
 
 
 def build_nodes() -> list[Node]:
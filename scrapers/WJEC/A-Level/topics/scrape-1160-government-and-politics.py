@@ -38,6 +38,9 @@ import pdfplumber
 import requests
 from dotenv import load_dotenv
 from supabase import create_client
+sys.path.insert(0, str(Path(__file__).resolve().parents[4]))
+from database.staging_sync import sync_subject_topics
+from scrapers.spec_text_compactor import looks_like_header_footer
 
 
 @dataclass(frozen=True)
@@ -76,16 +79,7 @@ def _norm(s: str) -> str:
 
 
 def _looks_like_header_footer(line: str) -> bool:
-    s = (line or "").strip()
-    if not s:
-        return True
-    if "WJEC CBAC" in s or "© WJEC" in s:
-        return True
-    if s.startswith("GCE AS and A LEVEL GOVERNMENT AND POLITICS"):
-        return True
-    if re.fullmatch(r"\d{1,3}", s):
-        return True
-    return False
+    return looks_like_header_footer(line, prefixes=("GCE AS and A LEVEL GOVERNMENT AND POLITICS",))
 
 
 def download_pdf_text(url: str) -> str:
@@ -117,77 +111,10 @@ def upload_to_staging(*, subject: dict, nodes: list[Node]) -> None:
     subject_id = subject_result.data[0]["id"]
     print(f"[OK] Subject ID: {subject_id}")
 
-    # Delete existing topics, batched, deepest-first
-    existing_max = 0
-    try:
-        res = (
-            supabase.table("staging_aqa_topics")
-            .select("topic_level")
-            .eq("subject_id", subject_id)
-            .order("topic_level", desc=True)
-            .limit(1)
-            .execute()
-        )
-        if res.data:
-            existing_max = int(res.data[0]["topic_level"] or 0)
-    except Exception:
-        existing_max = 0
-
-    max_level = max(existing_max, max((n.level for n in nodes), default=0))
-    deleted_total = 0
-    batch_size = 500
-    for lvl in range(max_level, -1, -1):
-        while True:
-            rows = (
-                supabase.table("staging_aqa_topics")
-                .select("id")
-                .eq("subject_id", subject_id)
-                .eq("topic_level", lvl)
-                .limit(batch_size)
-                .execute()
-                .data
-                or []
-            )
-            if not rows:
-                break
-            ids = [r["id"] for r in rows]
-            res = supabase.table("staging_aqa_topics").delete().in_("id", ids).execute()
-            deleted_total += len(res.data or [])
-    print(f"[OK] Cleared old topics ({deleted_total} rows)")
-
-    # Insert batched
-    payload = [
-        {
-            "subject_id": subject_id,
-            "topic_code": n.code,
-            "topic_name": n.title,
-            "topic_level": n.level,
-            "exam_board": subject["exam_board"],
-        }
-        for n in nodes
-    ]
-    inserted_rows: list[dict] = []
-    INS_BATCH = 500
-    for i in range(0, len(payload), INS_BATCH):
-        res = supabase.table("staging_aqa_topics").insert(payload[i : i + INS_BATCH]).execute()
-        inserted_rows.extend(res.data or [])
-    print(f"[OK] Uploaded {len(inserted_rows)} topics")
-
-    code_to_id = {row["topic_code"]: row["id"] for row in inserted_rows}
-    linked = 0
-    expected_links = sum(1 for n in nodes if n.parent)
-    for n in nodes:
-        if not n.parent:
-            continue
-        child_id = code_to_id.get(n.code)
-        parent_id = code_to_id.get(n.parent)
-        if child_id and parent_id:
-            supabase.table("staging_aqa_topics").update({"parent_topic_id": parent_id}).eq("id", child_id).execute()
-            linked += 1
-    if linked != expected_links:
-        print(f"[WARN] Linked {linked}/{expected_links} relationships (some parents missing?)")
-    else:
-        print(f"[OK] Linked {linked} relationships")
+    # Sync instead of delete + re-insert: only changed rows are written and
+    # unchanged topics keep their ids
+    result = sync_subject_topics(supabase, subject_id, subject["exam_board"], nodes)
+    print(f"[OK] {result.summary()}")
 
 
 def _merge_wrapped_lines(lines: list[str]) -> list[str]:
@@ -40,6 +40,9 @@ import requests
 from dotenv import load_dotenv
 from pypdf import PdfReader
 from supabase import create_client
+sys.path.insert(0, str(Path(__file__).resolve().parents[4]))
+from database.staging_sync import sync_subject_topics
+from scrapers.spec_text_compactor import looks_like_header_footer
 
 
 @dataclass(frozen=True)
@@ -78,16 +81,7 @@ def _norm(s: str) -> str:
 
 
 def _looks_like_header_footer(line: str) -> bool:
-    s = (line or "").strip()
-    if not s:
-        return True
-    if "WJEC CBAC" in s or "© WJEC" in s:
-        return True
-    if s.startswith("GCE AS AND A LEVEL BUILT ENVIRONMENT"):
-        return True
-    if re.fullmatch(r"\d{1,3}", s):  # page number
-        return True
-    return False
+    return looks_like_header_footer(line, prefixes=("GCE AS AND A LEVEL BUILT ENVIRONMENT",))
 
 
 def download_pdf_text(url: str) -> str:
@@ -117,37 +111,10 @@ def upload_to_staging(*, subject: dict, nodes: list[Node]) -> None:
     subject_id = subject_result.data[0]["id"]
     print(f"[OK] Subject ID: {subject_id}")
 
-    max_level = max((n.level for n in nodes), default=0)
-    deleted_total = 0
-    for lvl in range(max_level, -1, -1):
-        res = supabase.table("staging_aqa_topics").delete().eq("subject_id", subject_id).eq("topic_level", lvl).execute()
-        deleted_total += len(res.data or [])
-    print(f"[OK] Cleared old topics ({deleted_total} rows)")
-
-    to_insert = [
-        {
-            "subject_id": subject_id,
-            "topic_code": n.code,
-            "topic_name": n.title,
-            "topic_level": n.level,
-            "exam_board": subject["exam_board"],
-        }
-        for n in nodes
-    ]
-    inserted = supabase.table("staging_aqa_topics").insert(to_insert).execute()
-    print(f"[OK] Uploaded {len(inserted.data)} topics")
-
-    code_to_id = {t["topic_code"]: t["id"] for t in inserted.data}
-    linked = 0
-    for n in nodes:
-        if not n.parent:
-            continue
-        parent_id = code_to_id.get(n.parent)
-        child_id = code_to_id.get(n.code)
-        if parent_id and child_id:
-            supabase.table("staging_aqa_topics").update({"parent_topic_id": parent_id}).eq("id", child_id).execute()
-            linked += 1
-    print(f"[OK] Linked {linked} relationships")
+    # Sync instead of delete + re-insert: only changed rows are written and
+    # unchanged topics keep their ids
+    result = sync_subject_topics(supabase, subject_id, subject["exam_board"], nodes)
+    print(f"[OK] {result.summary()}")
 
 
 def parse_built_environment(text: str) -> list[Node]:
@@ -3,7 +3,7 @@ Paper Extraction API Server
 Runs on Railway and provides extraction endpoints for the FLASH app
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import os
 import sys
@@ -12,10 +12,11 @@ from datetime import datetime, timezone
 import threading
 import time
 import re
+import json
 
 # Import extraction service
 sys.path.append(os.path.dirname(__file__))
-from extraction_service import extract_questions, extract_mark_scheme, extract_examiner_report, mark_answer
+from extraction_service import extract_questions, extract_mark_scheme, extract_examiner_report, mark_answer, mark_answer_stream, mark_answers_batch, get_marking_cache
 
 app = Flask(__name__)
 CORS(app)  # Allow requests from React Native app
@@ -54,6 +55,10 @@ def home():
         'version': '1.0.0',
         'endpoints': [
             'POST /api/extract-paper',
+            'POST /api/mark-answer',
+            'POST /api/mark-answer/stream',
+            'POST /api/mark-answers',
+            'GET /api/marking-cache/stats',
             'GET /health'
         ]
     })
@@ -305,6 +310,96 @@ def mark_answer_endpoint():
             'error': str(e)
         }), 500
 
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/mark-answer/stream', methods=['POST'])
+def mark_answer_stream_endpoint():
+    """
+    Streaming variant of /api/mark-answer (Server-Sent Events)
+    
+    Same request body as /api/mark-answer. Emits:
+      event: marks     data: {"marks_awarded": 3, "max_marks": 4}
+      event: feedback  data: {"delta": "...feedback text..."}   (repeated)
+      event: strengths / improvements  data: [...]
+      event: done      data: {full marking, same shape as /api/mark-answer}
+      event: error     data: {"error": "..."}
+    The student_attempts row is written before `done` is sent.
+    """
+    data = request.json
+    
+    if not data or not data.get('question_id') or not data.get('user_answer'):
+        return jsonify({'error': 'question_id and user_answer are required'}), 400
+    
+    question_id = data.get('question_id')
+    user_answer = data.get('user_answer')
+    user_id = data.get('user_id')
+    time_taken_seconds = data.get('time_taken_seconds', 0)
+
+    def generate():
+        try:
+            for event, payload in mark_answer_stream(question_id, user_answer, user_id, time_taken_seconds):
+                yield _sse(event, payload)
+        except Exception as e:
+            print(f"[ERROR] Streaming marking failed: {str(e)}")
+            traceback.print_exc()
+            yield _sse('error', {'success': False, 'error': str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/api/mark-answers', methods=['POST'])
+def mark_answers_endpoint():
+    """
+    Mark several answers for one paper in a single AI call
+    
+    Request body:
+    {
+      "paper_id": "uuid",
+      "user_id": "uuid",
+      "answers": [
+        {"question_id": "uuid", "user_answer": "text", "time_taken_seconds": 42}
+      ]
+    }
+    """
+    try:
+        data = request.json
+        answers = (data or {}).get('answers')
+        
+        if not answers or not isinstance(answers, list):
+            return jsonify({'error': 'answers must be a non-empty list'}), 400
+        if any(not a.get('question_id') or not a.get('user_answer') for a in answers):
+            return jsonify({'error': 'each answer needs question_id and user_answer'}), 400
+        
+        markings = mark_answers_batch(data.get('paper_id'), answers, data.get('user_id'))
+        
+        return jsonify({
+            'success': True,
+            'markings': [
+                {'question_id': a['question_id'], 'marking': m}
+                for a, m in zip(answers, markings)
+            ]
+        })
+        
+    except Exception as e:
+        print(f"[ERROR] Batch marking failed: {str(e)}")
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/marking-cache/stats', methods=['GET'])
+def marking_cache_stats_endpoint():
+    """Hit-rate metrics for the answer-level marking cache"""
+    cache = get_marking_cache()
+    if not cache:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **cache.stats()})
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
     app.run(host='0.0.0.0', port=port)
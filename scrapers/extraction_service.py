@@ -11,11 +11,20 @@ import requests
 import base64
 import io
 import binascii
+import bisect
+import threading
+import time
+from collections import OrderedDict
 from urllib.parse import urlparse
 from pathlib import Path
 from openai import OpenAI
 from supabase import create_client
 from dotenv import load_dotenv
+from marking_rules import rule_mark
+from marking_cache import MarkingCache, DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, mark_scheme_version
+from page_classifier import (
+    SKIP_LABELS, classify_page, features_from_pdfplumber, features_from_pymupdf, summarize_skipped,
+)
 
 # Load environment
 load_dotenv()
@@ -23,6 +32,7 @@ load_dotenv()
 # Initialize clients (lazy - only when needed)
 openai_client = None
 supabase = None
+marking_cache = None
 
 # User-facing message shown in the app when the extraction service cannot fetch a PDF.
 CCEA_EXTRACTION_UNAVAILABLE_MESSAGE = (
@@ -31,6 +41,13 @@ CCEA_EXTRACTION_UNAVAILABLE_MESSAGE = (
     "admin@fl4shcards.com"
 )
 
+# Question papers: nothing after these is a question.
+END_OF_QUESTIONS_PHRASES = (
+    'END OF QUESTION PAPER',
+    'END OF QUESTIONS',
+    'EXTRA ANSWER SPACE',
+)
+
 def normalize_question_number(s: str) -> str:
     """
     Normalize question identifiers so GCSE formats like '01.1' match '1.1'.
@@ -48,6 +65,67 @@ def normalize_question_number(s: str) -> str:
     s = re.sub(r'(?<=\D)0+(\d)', r'\1', s)
     return s
 
+
+class QuestionNumberIndex:
+    """
+    Sorted prefix index over normalized question numbers for one paper.
+
+    Resolves a mark-scheme/examiner-report question number to an extracted question id
+    in one lookup: exact match, normalized match, first subpart ("1" -> "1(a)") or
+    nearest parent ("1(a)(iii)" -> "1(a)" when the paper wasn't split that far).
+    """
+
+    def __init__(self, questions: list):
+        self.exact = {}
+        self.norm = {}
+        for q in questions or []:
+            raw = q.get('full_question_number')
+            if raw and raw not in self.exact:
+                self.exact[raw] = q['id']
+            key = normalize_question_number(raw)
+            if key and key not in self.norm:
+                self.norm[key] = q['id']
+        self.sorted_keys = sorted(self.norm)
+
+    @staticmethod
+    def _is_boundary(key: str, prefix_len: int) -> bool:
+        # "1" is a parent of "1(a)" / "1.1" but not of "10" / "12(b)".
+        if prefix_len >= len(key):
+            return True
+        return not (key[prefix_len - 1].isdigit() and key[prefix_len].isdigit())
+
+    def _first_subpart(self, q_norm: str):
+        i = bisect.bisect_left(self.sorted_keys, q_norm)
+        while i < len(self.sorted_keys) and self.sorted_keys[i].startswith(q_norm):
+            key = self.sorted_keys[i]
+            if self._is_boundary(key, len(q_norm)):
+                return self.norm[key]
+            i += 1
+        return None
+
+    def _nearest_parent(self, q_norm: str):
+        for cut in range(len(q_norm) - 1, 0, -1):
+            if self._is_boundary(q_norm, cut) and q_norm[:cut] in self.norm:
+                return self.norm[q_norm[:cut]]
+        return None
+
+    def resolve(self, q_num: str):
+        """Return (question_id, match_kind) or (None, None)."""
+        if q_num in self.exact:
+            return self.exact[q_num], 'exact'
+        q_norm = normalize_question_number(q_num)
+        if not q_norm:
+            return None, None
+        if q_norm in self.norm:
+            return self.norm[q_norm], 'normalized'
+        qid = self._first_subpart(q_norm)
+        if qid:
+            return qid, 'subpart'
+        qid = self._nearest_parent(q_norm)
+        if qid:
+            return qid, 'parent'
+        return None, None
+
 def get_openai_client():
     global openai_client
     if openai_client is None:
@@ -63,30 +141,49 @@ def get_supabase_client():
         )
     return supabase
 
-def extract_pages_as_images(pdf_content: bytes, skip_pages=1) -> dict:
-    """Convert PDF pages to images"""
+def get_marking_cache():
+    global marking_cache
+    if marking_cache is None and os.getenv('MARKING_CACHE_ENABLED', '1') != '0':
+        marking_cache = MarkingCache(
+            os.getenv('MARKING_CACHE_PATH', DEFAULT_CACHE_PATH),
+            int(os.getenv('MARKING_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)),
+        )
+    return marking_cache
+
+def extract_pages_as_images(pdf_content: bytes, skip_pages=0, classify_pages=True) -> dict:
+    """
+    Convert PDF pages to images.
+
+    Each page is classified locally first (see page_classifier) and only content pages
+    are rendered; cover, blank, admin and formula/answer-space pages never reach the
+    vision model. `skip_pages` still force-skips the first N pages.
+    """
     import pdfplumber
     from pypdfium2._helpers.misc import PdfiumError
     
     page_images = []
+    skipped = {}
     
     try:
         with pdfplumber.open(io.BytesIO(pdf_content)) as pdf:
+            total_pages = len(pdf.pages)
             for page_num, page in enumerate(pdf.pages, 1):
                 page_text = page.extract_text() or ""
                 
                 # Detect end of questions
-                if any(phrase in page_text for phrase in [
-                    'END OF QUESTION PAPER',
-                    'END OF QUESTIONS',
-                    'EXTRA ANSWER SPACE',
-                ]):
+                if any(phrase in page_text for phrase in END_OF_QUESTIONS_PHRASES):
                     break
                 
                 # Skip cover pages
                 if page_num <= skip_pages:
                     continue
                 
+                if classify_pages:
+                    label, reason = classify_page(features_from_pdfplumber(page, page_num, total_pages, page_text))
+                    if label in SKIP_LABELS:
+                        skipped[page_num] = (label, reason)
+                        continue
+                
                 # Render page to image
                 page_img = page.to_image(resolution=150)
                 img_bytes = io.BytesIO()
@@ -103,6 +200,8 @@ def extract_pages_as_images(pdf_content: bytes, skip_pages=1) -> dict:
         print(f"[WARN] pdfplumber/pdfium failed ({e}); falling back to PyMuPDF renderer")
         import fitz  # PyMuPDF
 
+        page_images = []
+        skipped = {}
         doc = fitz.open(stream=pdf_content, filetype="pdf")
         for idx in range(doc.page_count):
             page_num = idx + 1
@@ -114,20 +213,28 @@ def extract_pages_as_images(pdf_content: bytes, skip_pages=1) -> dict:
             page = doc.load_page(idx)
             page_text = page.get_text("text") or ""
 
-            if any(phrase in page_text for phrase in [
-                'END OF QUESTION PAPER',
-                'END OF QUESTIONS',
-                'EXTRA ANSWER SPACE',
-            ]):
+            if any(phrase in page_text for phrase in END_OF_QUESTIONS_PHRASES):
                 break
 
+            if classify_pages:
+                label, reason = classify_page(features_from_pymupdf(page, page_num, doc.page_count))
+                if label in SKIP_LABELS:
+                    skipped[page_num] = (label, reason)
+                    continue
+
             # Render at approx 150dpi (72 is default). 150/72 ≈ 2.08.
             mat = fitz.Matrix(150/72, 150/72)
             pix = page.get_pixmap(matrix=mat, alpha=False)
             img_base64 = base64.b64encode(pix.tobytes("png")).decode("utf-8")
             page_images.append({'page': page_num, 'base64': img_base64})
     
-    return {'page_images': page_images}
+    if skipped:
+        print(f"[INFO] Skipped {len(skipped)} non-content pages ({summarize_skipped(skipped)})")
+    
+    return {
+        'page_images': page_images,
+        'skipped_pages': [{'page': p, 'label': label, 'reason': reason} for p, (label, reason) in sorted(skipped.items())],
+    }
 
 def copy_paper_to_production(staging_paper_id: str) -> str:
     """Copy paper from staging to production exam_papers table"""
@@ -344,7 +451,7 @@ def extract_questions(question_url: str, paper_id: str) -> list:
     pdf_content = _download_pdf_bytes(question_url, timeout=90, retries=4)
     
     # Convert to images
-    pdf_data = extract_pages_as_images(pdf_content, skip_pages=1)
+    pdf_data = extract_pages_as_images(pdf_content)
     page_images = pdf_data['page_images']
     
     # Build GPT-4o Vision request
@@ -430,6 +537,7 @@ Return as: {"questions": [...]}'''
                     print(f"[WARN] Found {len(bad)} question rows still containing null bytes after sanitize")
                 raise
             print(f"[INFO] Inserted {len(questions)} questions")
+        invalidate_paper_cache(paper_id)
     
     return questions
 
@@ -440,7 +548,7 @@ def extract_mark_scheme(mark_scheme_url: str, paper_id: str) -> list:
     pdf_content = _download_pdf_bytes(mark_scheme_url, timeout=90, retries=4)
     
     # Convert to images
-    pdf_data = extract_pages_as_images(pdf_content, skip_pages=1)
+    pdf_data = extract_pages_as_images(pdf_content)
     page_images = pdf_data['page_images']
     
     # Build request
@@ -480,49 +588,41 @@ Return as: {"mark_schemes": [...]}'''
     
     # Link to questions and store
     sb = get_supabase_client()
-    questions = sb.table('exam_questions').select('*').eq('paper_id', paper_id).execute()
-    # Build maps with normalized keys to handle GCSE formats like 01.1 vs 1.1
-    question_map = {q['full_question_number']: q['id'] for q in questions.data}
-    question_map_norm = {}
-    for q in questions.data:
-        key = normalize_question_number(q.get('full_question_number'))
-        if key and key not in question_map_norm:
-            question_map_norm[key] = q['id']
-    
-    for ms in mark_schemes:
-        q_num = ms.pop('question_number')  # Remove from dict, get value
-        matched_id = None
-        if q_num in question_map:
-            matched_id = question_map[q_num]
-        else:
-            q_norm = normalize_question_number(q_num)
-            matched_id = question_map_norm.get(q_norm)
+    questions = sb.table('exam_questions').select('id, full_question_number').eq('paper_id', paper_id).execute()
+    # Normalized keys handle GCSE formats like 01.1 vs 1.1; the prefix index resolves
+    # "1" -> "1(a)" and "1(a)(i)" -> "1(a)" without scanning every key.
+    index = QuestionNumberIndex(questions.data or [])
 
+    # One row per question: direct matches win over subpart/parent fallbacks.
+    rows_by_question = {}
+    for ms in mark_schemes:
+        q_num = ms.pop('question_number', None)  # Remove from dict, get value
+        matched_id, kind = index.resolve(q_num)
         if not matched_id:
-            # Best-effort: if mark scheme references only the main question number ("1")
-            # but extracted questions are split into subparts ("1(a)", "1(b)"), attach
-            # to the first matching subpart.
-            if q_norm and q_norm.isdigit():
-                for k, qid in question_map_norm.items():
-                    if k.startswith(q_norm):
-                        matched_id = qid
-                        break
-
-        if matched_id:
-            # Build clean insert object matching schema
-            insert_data = {
-                'question_id': matched_id,
-                'max_marks': ms.get('max_marks'),
-                'marking_points': ms.get('marking_points'),  # Already JSONB
-                'levels': ms.get('levels'),  # Already JSONB if present
-                'examiner_notes': ms.get('examiner_notes'),
-                'common_errors': ms.get('common_errors', []),
-            }
-            sb.table('mark_schemes').insert(insert_data).execute()
-        else:
             # Helpful debug for cases where numbering formats don't match
             print(f"[WARN] Mark scheme question_number did not match any extracted question: {q_num}")
-    
+            continue
+        is_direct = kind in ('exact', 'normalized')
+        existing = rows_by_question.get(matched_id)
+        if existing and (existing[0] or not is_direct):
+            continue
+        # Build clean insert object matching schema
+        rows_by_question[matched_id] = (is_direct, {
+            'question_id': matched_id,
+            'max_marks': ms.get('max_marks'),
+            'marking_points': ms.get('marking_points'),  # Already JSONB
+            'levels': ms.get('levels'),  # Already JSONB if present
+            'examiner_notes': ms.get('examiner_notes'),
+            'common_errors': ms.get('common_errors', []),
+        })
+
+    rows = [row for _, row in rows_by_question.values()]
+    if rows:
+        # Single bulk write (requires migration 007: unique mark_schemes.question_id)
+        sb.table('mark_schemes').upsert(rows, on_conflict='question_id').execute()
+        print(f"[INFO] Linked {len(rows)} mark schemes")
+    invalidate_paper_cache(paper_id)
+
     return mark_schemes
 
 def extract_examiner_report(examiner_report_url: str, paper_id: str) -> dict:
@@ -542,7 +642,7 @@ def extract_examiner_report(examiner_report_url: str, paper_id: str) -> dict:
     pdf_content = _download_pdf_bytes(examiner_report_url, timeout=90, retries=4)
 
     # Convert pages to images (skip cover)
-    pdf_data = extract_pages_as_images(pdf_content, skip_pages=1)
+    pdf_data = extract_pages_as_images(pdf_content)
     page_images = pdf_data['page_images']
 
     client = get_openai_client()
@@ -606,11 +706,7 @@ I'm providing full-page images of the examiner report."""
 
     # Build question map
     questions = sb.table('exam_questions').select('id, full_question_number').eq('paper_id', paper_id).execute()
-    question_map_norm = {}
-    for q in questions.data or []:
-        key = normalize_question_number(q.get('full_question_number'))
-        if key and key not in question_map_norm:
-            question_map_norm[key] = q['id']
+    index = QuestionNumberIndex(questions.data or [])
 
     inserts = []
     if general_comments:
@@ -622,7 +718,7 @@ I'm providing full-page images of the examiner report."""
 
     for qi in question_insights:
         qnum = qi.get('question_number')
-        qid = question_map_norm.get(normalize_question_number(qnum))
+        qid = index.norm.get(normalize_question_number(qnum))
         if not qid:
             print(f"[WARN] Examiner report insight question_number did not match any extracted question: {qnum}")
             continue
@@ -642,28 +738,101 @@ I'm providing full-page images of the examiner report."""
 
     return {'inserted': len(inserts), 'skipped': False}
 
-def mark_answer(question_id: str, user_answer: str, user_id: str, time_taken_seconds: int = 0) -> dict:
-    """Mark a student's answer using AI + mark scheme"""
-    
-    # Get question and mark scheme
+class _TTLCache:
+    """Small thread-safe LRU cache with a per-entry TTL (Flask serves requests on threads)."""
+
+    def __init__(self, maxsize: int = 2048, ttl_seconds: float = 600):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._data.keys())
+
+
+_MISSING = object()
+_LOOKUP_TTL_SECONDS = float(os.getenv('MARKING_LOOKUP_TTL_SECONDS', '600'))
+# Deterministic marking for MCQ / numeric / short keyword answers (set to 0 to force AI marking)
+RULE_MARKING_ENABLED = os.getenv('RULE_MARKING_ENABLED', '1') != '0'
+_question_cache = _TTLCache(maxsize=4096, ttl_seconds=_LOOKUP_TTL_SECONDS)
+_mark_scheme_cache = _TTLCache(maxsize=4096, ttl_seconds=_LOOKUP_TTL_SECONDS)
+
+
+def invalidate_paper_cache(paper_id: str) -> None:
+    """Drop cached questions/mark schemes for a paper (call after (re-)extraction)."""
+    for qid in _question_cache.keys():
+        q = _question_cache.get(qid)
+        if q is None or q.get('paper_id') == paper_id:
+            _question_cache.pop(qid)
+            _mark_scheme_cache.pop(qid)
+
+
+def get_marking_context(question_ids: list) -> dict:
+    """
+    Return {question_id: (question_row, mark_scheme_row_or_None)} for the given ids.
+    Cache misses are fetched with one `in_` query per table rather than one query per question.
+    """
     sb = get_supabase_client()
-    question = sb.table('exam_questions').select('*').eq('id', question_id).single().execute()
-    mark_scheme_result = sb.table('mark_schemes').select('*').eq('question_id', question_id).maybe_single().execute()
-    
-    if not question.data:
-        raise Exception('Question not found')
-    
-    q_data = question.data
-    ms_data = mark_scheme_result.data if mark_scheme_result and mark_scheme_result.data else None
-
-    # If we don't have a mark scheme and this looks like a tick-box/MCQ/diagram question,
-    # do NOT guess. Return an explicit self-mark instruction.
+    ids = list(dict.fromkeys(question_ids))
+
+    missing_q = [qid for qid in ids if _question_cache.get(qid, _MISSING) is _MISSING]
+    if missing_q:
+        rows = sb.table('exam_questions').select('*').in_('id', missing_q).execute()
+        for row in rows.data or []:
+            _question_cache.set(row['id'], row)
+
+    missing_ms = [qid for qid in ids if _mark_scheme_cache.get(qid, _MISSING) is _MISSING]
+    if missing_ms:
+        rows = sb.table('mark_schemes').select('*').in_('question_id', missing_ms).execute()
+        found = {row['question_id']: row for row in rows.data or []}
+        for qid in missing_ms:
+            # Cache "no mark scheme" too so self-mark questions don't re-query every time
+            _mark_scheme_cache.set(qid, found.get(qid))
+
+    context = {}
+    for qid in ids:
+        q_data = _question_cache.get(qid)
+        if q_data is not None:
+            context[qid] = (q_data, _mark_scheme_cache.get(qid))
+    return context
+
+
+def _self_mark_result(q_data: dict, ms_data):
+    """
+    If we don't have a mark scheme and this looks like a tick-box/MCQ/diagram question,
+    do NOT guess. Return an explicit self-mark instruction (or None if AI marking is OK).
+    """
     q_text = (q_data.get('question_text') or '')
     is_mcq_like = bool(re.search(r"tick\s*\(?.*?\)?\s*one\s*box|tick\s+one\s+box|multiple\s+choice", q_text, re.IGNORECASE))
     is_diagram_like = bool(q_data.get('has_image')) and not q_data.get('image_url')
     if ms_data is None and (is_mcq_like or is_diagram_like):
         max_marks = int(q_data.get('marks') or 0)
-        marking = {
+        return {
             'marks_awarded': 0,
             'max_marks': max_marks,
             'feedback': 'Unable to mark accurately for this tick-box/diagram question without an extracted mark scheme. Please self-mark using the PDF/mark scheme.',
@@ -672,22 +841,55 @@ def mark_answer(question_id: str, user_answer: str, user_id: str, time_taken_sec
             'matched_points': [],
             'needs_self_mark': True,
         }
-        # Store attempt as 0 marks to ensure attempt exists; user can overwrite by self-mark in the app.
-        sb.table('student_attempts').insert({
-            'user_id': user_id,
-            'question_id': question_id,
-            'user_answer': user_answer,
-            'marks_awarded': marking['marks_awarded'],
-            'max_marks': marking['max_marks'],
-            'ai_feedback': marking['feedback'],
-            'strengths': [],
-            'improvements': [],
-            'time_taken_seconds': time_taken_seconds,
-        }).execute()
-        return marking
-    
-    # Build marking prompt
-    prompt = f'''You are an expert examiner marking a student's answer.
+    return None
+
+
+def _attempt_row(user_id: str, question_id: str, user_answer: str, marking: dict, time_taken_seconds: int = 0) -> dict:
+    return {
+        'user_id': user_id,
+        'question_id': question_id,
+        'user_answer': user_answer,
+        'marks_awarded': marking['marks_awarded'],
+        'max_marks': marking['max_marks'],
+        'ai_feedback': marking['feedback'],
+        'strengths': marking.get('strengths', []),
+        'improvements': marking.get('improvements', []),
+        'time_taken_seconds': time_taken_seconds,  # Save timer data!
+    }
+
+
+def _load_question_context(question_id: str):
+    context = get_marking_context([question_id])
+    if question_id not in context:
+        raise Exception('Question not found')
+    return context[question_id]
+
+
+def _marking_without_ai(question_id: str, q_data: dict, ms_data, user_answer: str):
+    """
+    Self-mark instruction, confident rule-based marking or a cached AI marking.
+    Returns (marking_or_None, cache, cache_key); cache/cache_key are for storing a fresh AI result.
+    """
+    # Store self-mark attempts as 0 marks so the attempt exists; user can overwrite by self-mark in the app.
+    self_mark = _self_mark_result(q_data, ms_data)
+    if self_mark:
+        return self_mark, None, None
+
+    # Fast path: confident rule-based marking skips the model call entirely
+    marking = rule_mark(q_data, ms_data, user_answer) if RULE_MARKING_ENABLED else None
+    if marking:
+        return marking, None, None
+
+    # Identical (normalized) answers to the same question + mark scheme reuse the earlier AI marking
+    cache = get_marking_cache()
+    cache_key = MarkingCache.make_key(question_id, mark_scheme_version(q_data, ms_data), user_answer) if cache else None
+    cached = cache.get(cache_key) if cache else None
+    return cached, cache, cache_key
+
+
+def _marking_prompt(q_data: dict, ms_data, user_answer: str) -> str:
+    # marks_awarded is listed first so streamed responses can surface it before the feedback.
+    return f'''You are an expert examiner marking a student's answer.
 
 Question: {q_data['question_text']} ({q_data['marks']} marks)
 
@@ -705,30 +907,238 @@ Award marks and provide feedback as JSON:
   "improvements": ["How to improve"],
   "matched_points": ["Which marking points achieved"]
 }}'''
+
+
+def mark_answer(question_id: str, user_answer: str, user_id: str, time_taken_seconds: int = 0) -> dict:
+    """Mark a student's answer using AI + mark scheme"""
     
-    client = get_openai_client()
-    response = client.chat.completions.create(
-        model='gpt-4o',
-        messages=[{'role': 'user', 'content': prompt}],
-        max_tokens=2000,
-        response_format={'type': 'json_object'},
-    )
-    
-    marking = json.loads(response.choices[0].message.content)
+    # Get question and mark scheme (cached between calls)
+    sb = get_supabase_client()
+    q_data, ms_data = _load_question_context(question_id)
+
+    marking, cache, cache_key = _marking_without_ai(question_id, q_data, ms_data, user_answer)
+    if marking is None:
+        client = get_openai_client()
+        response = client.chat.completions.create(
+            model='gpt-4o',
+            messages=[{'role': 'user', 'content': _marking_prompt(q_data, ms_data, user_answer)}],
+            max_tokens=2000,
+            response_format={'type': 'json_object'},
+        )
+        
+        marking = json.loads(response.choices[0].message.content)
+        if cache:
+            cache.put(cache_key, question_id, marking)
     
     # Store attempt
-    sb = get_supabase_client()
-    sb.table('student_attempts').insert({
-        'user_id': user_id,
-        'question_id': question_id,
-        'user_answer': user_answer,
-        'marks_awarded': marking['marks_awarded'],
-        'max_marks': marking['max_marks'],
-        'ai_feedback': marking['feedback'],
-        'strengths': marking.get('strengths', []),
-        'improvements': marking.get('improvements', []),
-        'time_taken_seconds': time_taken_seconds,  # Save timer data!
-    }).execute()
+    sb.table('student_attempts').insert(
+        _attempt_row(user_id, question_id, user_answer, marking, time_taken_seconds)
+    ).execute()
     
     return marking
 
+
+_STREAM_MARKS_RE = re.compile(r'"marks_awarded"\s*:\s*(\d+)\s*[,}\n]')
+_STREAM_FEEDBACK_RE = re.compile(r'"feedback"\s*:\s*"')
+_STREAM_LIST_RES = {
+    'strengths': re.compile(r'"strengths"\s*:\s*'),
+    'improvements': re.compile(r'"improvements"\s*:\s*'),
+}
+
+
+def _partial_json_string(buf: str, start: int):
+    """
+    Decode the (possibly unterminated) JSON string value starting at `start`.
+    Returns (decoded_text_so_far, is_complete). Stops before a dangling escape.
+    """
+    i = start
+    while i < len(buf):
+        ch = buf[i]
+        if ch == '\\':
+            # \uXXXX needs 6 chars, other escapes 2
+            need = 6 if buf[i + 1:i + 2] == 'u' else 2
+            if i + need > len(buf):
+                break
+            i += need
+            continue
+        if ch == '"':
+            return json.loads('"' + buf[start:i] + '"'), True
+        i += 1
+    return json.loads('"' + buf[start:i] + '"'), False
+
+
+def mark_answer_stream(question_id: str, user_answer: str, user_id: str, time_taken_seconds: int = 0):
+    """
+    Streaming variant of mark_answer. Yields (event, data) tuples:
+      ('marks', {'marks_awarded', 'max_marks'})  as soon as the mark is decided
+      ('feedback', {'delta': '...'})             feedback text as it is generated
+      ('strengths' / 'improvements', [...])      each list once it is complete
+      ('done', marking)                          full marking, after student_attempts is written
+    """
+    sb = get_supabase_client()
+    q_data, ms_data = _load_question_context(question_id)
+    max_marks = int(q_data.get('marks') or 0)
+
+    marking, cache, cache_key = _marking_without_ai(question_id, q_data, ms_data, user_answer)
+    if marking is None:
+        client = get_openai_client()
+        stream = client.chat.completions.create(
+            model='gpt-4o',
+            messages=[{'role': 'user', 'content': _marking_prompt(q_data, ms_data, user_answer)}],
+            max_tokens=2000,
+            response_format={'type': 'json_object'},
+            stream=True,
+        )
+        buf = ''
+        marks_sent = False
+        feedback_start = None
+        feedback_sent = 0
+        feedback_done = False
+        lists_sent = set()
+        decoder = json.JSONDecoder()
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            buf += chunk.choices[0].delta.content or ''
+            if not marks_sent:
+                m = _STREAM_MARKS_RE.search(buf)
+                if m:
+                    marks_sent = True
+                    yield 'marks', {'marks_awarded': max(0, min(int(m.group(1)), max_marks)), 'max_marks': max_marks}
+            if feedback_start is None:
+                m = _STREAM_FEEDBACK_RE.search(buf)
+                if m:
+                    feedback_start = m.end()
+            if feedback_start is not None and not feedback_done:
+                text, feedback_done = _partial_json_string(buf, feedback_start)
+                if len(text) > feedback_sent:
+                    yield 'feedback', {'delta': text[feedback_sent:]}
+                    feedback_sent = len(text)
+            for key, key_re in _STREAM_LIST_RES.items():
+                if key in lists_sent:
+                    continue
+                m = key_re.search(buf)
+                if not m:
+                    continue
+                try:
+                    value, _ = decoder.raw_decode(buf, m.end())
+                except ValueError:
+                    continue  # list still being generated
+                lists_sent.add(key)
+                yield key, value
+
+        marking = json.loads(buf)
+        # Same clamp as the early 'marks' event (and mark_answers_batch), so both events agree
+        marking['max_marks'] = max_marks
+        marking['marks_awarded'] = max(0, min(int(marking.get('marks_awarded') or 0), max_marks))
+        if cache:
+            cache.put(cache_key, question_id, marking)
+        if not marks_sent:
+            yield 'marks', {'marks_awarded': marking['marks_awarded'], 'max_marks': max_marks}
+    else:
+        yield 'marks', {'marks_awarded': marking['marks_awarded'], 'max_marks': marking['max_marks']}
+
+    # Persist once the full marking is known, then hand the complete result to the client
+    sb.table('student_attempts').insert(
+        _attempt_row(user_id, question_id, user_answer, marking, time_taken_seconds)
+    ).execute()
+    yield 'done', marking
+
+
+def mark_answers_batch(paper_id: str, answers: list, user_id: str) -> list:
+    """
+    Mark several answers for one paper with a single model call.
+
+    `answers` is a list of {"question_id", "user_answer", "time_taken_seconds"?}.
+    Returns markings in the same order and writes every student_attempts row in one insert.
+    """
+    sb = get_supabase_client()
+    context = get_marking_context([a['question_id'] for a in answers])
+
+    markings = [None] * len(answers)
+    caches = [(None, None)] * len(answers)
+    to_mark = []
+    for i, a in enumerate(answers):
+        qid = a['question_id']
+        if qid not in context:
+            raise Exception(f'Question not found: {qid}')
+        q_data, ms_data = context[qid]
+        if paper_id and q_data.get('paper_id') != paper_id:
+            raise Exception(f'Question {qid} does not belong to paper {paper_id}')
+        marking, cache, cache_key = _marking_without_ai(qid, q_data, ms_data, a['user_answer'])
+        if marking:
+            markings[i] = marking
+        else:
+            caches[i] = (cache, cache_key)
+            to_mark.append(i)
+
+    if to_mark:
+        items = []
+        for i in to_mark:
+            q_data, ms_data = context[answers[i]['question_id']]
+            items.append(
+                f"### Item {i}\n"
+                f"Question: {q_data['question_text']} ({q_data['marks']} marks)\n"
+                + (f"Mark Scheme: {ms_data['marking_points']}\n" if ms_data else "No official mark scheme - use your expert judgment\n")
+                + f"Student's Answer:\n{answers[i]['user_answer']}\n"
+            )
+        prompt = (
+            "You are an expert examiner marking a student's answers to several questions from one exam paper.\n"
+            "Mark each item independently against its own question and mark scheme.\n\n"
+            + "\n".join(items)
+            + """
+Return JSON with one result per item:
+{
+  "results": [
+    {
+      "item": 0,
+      "marks_awarded": 0,
+      "max_marks": 0,
+      "feedback": "Overall feedback...",
+      "strengths": ["What student did well"],
+      "improvements": ["How to improve"],
+      "matched_points": ["Which marking points achieved"]
+    }
+  ]
+}"""
+        )
+
+        client = get_openai_client()
+        response = client.chat.completions.create(
+            model='gpt-4o',
+            messages=[{'role': 'user', 'content': prompt}],
+            max_tokens=min(16000, 1000 * len(to_mark) + 500),
+            response_format={'type': 'json_object'},
+        )
+        results = json.loads(response.choices[0].message.content).get('results', []) or []
+        by_item = {}
+        for r in results:
+            try:
+                by_item[int(r.get('item'))] = r
+            except (TypeError, ValueError):
+                continue
+
+        for i in to_mark:
+            q_data, _ = context[answers[i]['question_id']]
+            max_marks = int(q_data.get('marks') or 0)
+            r = by_item.get(i)
+            if r is None:
+                raise RuntimeError(f"Batch marking returned no result for item {i}")
+            # Clamp so one bad item can't award more than the question is worth
+            r.pop('item', None)
+            r['max_marks'] = max_marks
+            r['marks_awarded'] = max(0, min(int(r.get('marks_awarded') or 0), max_marks))
+            r.setdefault('feedback', '')
+            markings[i] = r
+            cache, cache_key = caches[i]
+            if cache:
+                cache.put(cache_key, answers[i]['question_id'], r)
+
+    rows = [
+        _attempt_row(user_id, a['question_id'], a['user_answer'], markings[i], a.get('time_taken_seconds', 0))
+        for i, a in enumerate(answers)
+    ]
+    if rows:
+        sb.table('student_attempts').insert(rows).execute()
+
+    return markings
@@ -0,0 +1,131 @@
+"""
+Answer-level marking cache
+Many students submit the same answer to the same question (MCQ letters, single terms,
+standard numeric answers). AI markings are cached in a small SQLite file keyed by
+(question_id, mark-scheme version, whitespace-normalized answer) so repeats return instantly and
+consistently. The mark-scheme version is a hash of the scheme, so re-extraction
+naturally invalidates old entries.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output', 'marking_cache.sqlite3')
+DEFAULT_MAX_ENTRIES = 50000
+# Essays almost never repeat verbatim; don't let them crowd out short answers.
+MAX_CACHEABLE_ANSWER_CHARS = 500
+# Bumped whenever key normalization changes, so old entries can't answer for new keys.
+KEY_SCHEME = 'k2'
+
+_OUTER_PUNCT_RE = re.compile(r"^[\s\"'“”‘’(\[{]+|[\s.,;:!?\"'“”‘’)\]}]+$")
+
+
+def normalize_key_answer(text) -> str:
+    """
+    Answer text as a cache key: whitespace collapsed and outer punctuation dropped, nothing
+    else. Case and words are kept ("CO" vs "Co", "Option A" vs "Option" are different answers).
+    """
+    if text is None:
+        return ''
+    return _OUTER_PUNCT_RE.sub('', ' '.join(str(text).split()))
+
+
+def mark_scheme_version(q_data: dict, ms_data) -> str:
+    """Stable hash of everything the marking depends on besides the answer."""
+    payload = {
+        'question_text': (q_data or {}).get('question_text'),
+        'marks': (q_data or {}).get('marks'),
+        'max_marks': (ms_data or {}).get('max_marks'),
+        'marking_points': (ms_data or {}).get('marking_points'),
+        'levels': (ms_data or {}).get('levels'),
+    }
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+class MarkingCache:
+    """Bounded, persistent (SQLite) cache of AI markings with hit-rate counters."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            '''CREATE TABLE IF NOT EXISTS marking_cache (
+                   key TEXT PRIMARY KEY,
+                   question_id TEXT NOT NULL,
+                   marking TEXT NOT NULL,
+                   hit_count INTEGER NOT NULL DEFAULT 0,
+                   last_used REAL NOT NULL
+               )'''
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_marking_cache_last_used ON marking_cache(last_used)')
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(question_id: str, version: str, user_answer: str):
+        if user_answer is None or len(user_answer) > MAX_CACHEABLE_ANSWER_CHARS:
+            return None
+        norm = normalize_key_answer(user_answer)
+        if not norm:
+            return None
+        digest = hashlib.sha1(norm.encode('utf-8')).hexdigest()
+        return f"{question_id}:{version}:{KEY_SCHEME}:{digest}"
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            row = self._conn.execute('SELECT marking FROM marking_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                'UPDATE marking_cache SET hit_count = hit_count + 1, last_used = ? WHERE key = ?',
+                (time.time(), key),
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, question_id: str, marking: dict) -> None:
+        if key is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO marking_cache (key, question_id, marking, hit_count, last_used) '
+                'VALUES (?, ?, ?, 0, ?)',
+                (key, question_id, json.dumps(marking), time.time()),
+            )
+            count = self._conn.execute('SELECT COUNT(*) FROM marking_cache').fetchone()[0]
+            if count > self.max_entries:
+                # Evict least-recently-used entries (10% headroom so we don't evict on every put)
+                excess = count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    'DELETE FROM marking_cache WHERE key IN '
+                    '(SELECT key FROM marking_cache ORDER BY last_used ASC LIMIT ?)',
+                    (excess,),
+                )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM marking_cache').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,307 @@
+"""
+Deterministic fast-path marker
+Marks short-answer, MCQ and numeric questions directly from the extracted mark scheme
+(`marking_points` = [{"answer", "marks", "keywords"}]) so the common 1-2 mark cases
+never reach GPT-4o. Returns None whenever it isn't confident; callers fall back to AI.
+"""
+
+import re
+
+# Only questions worth this much or less are eligible for keyword marking.
+MAX_KEYWORD_MARKS = 2
+# Longer answers are usually explanations that need examiner judgement.
+MAX_KEYWORD_ANSWER_WORDS = 15
+# Relative tolerance for calculation answers (covers rounding to 2-3 s.f.).
+NUMERIC_REL_TOLERANCE = 0.01
+
+_MCQ_QUESTION_RE = re.compile(r"tick\s*\(?.*?\)?\s*one\s*box|tick\s+one\s+box|multiple\s+choice", re.IGNORECASE)
+_MCQ_ANSWER_RE = re.compile(r"^\(?([A-Da-d])\)?\.?$")
+# Digits inside a unit ("m/s2", "s^-1", "cm3") are not numbers; "x" stays allowed for working.
+_NUMBER_RE = re.compile(r"(?<![A-WYZa-wyzµ^/])(?<![A-Za-z^]-)[-+]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?(?:\s*[x×]\s*10\s*\^?\s*[-+]?\d+|[eE][-+]?\d+)?")
+_NUMERIC_ANSWER_RE = re.compile(
+    r"[-+]?\d[\d,]*(?:\.\d+)?(?:\s*[x×]\s*10\s*\^?\s*[-+]?\d+|[eE][-+]?\d+)?\s*[a-zA-Zµ%°/^\-\d\s]{0,12}"
+)
+_NEGATION_RE = re.compile(
+    r"\b(not|no|never|isn't|isnt|doesn't|doesnt|cannot|can't|without|absent|"
+    r"lack(?:s|ing)? of|absence of|shortage of|insufficient|deficien(?:t|cy))\b"
+)
+# Words that don't change what a short answer says ("it is the ribosome").
+_FILLER_WORDS = frozenset({
+    'a', 'an', 'the', 'it', 'its', 'it\'s', 'is', 'are', 'was', 'be', 'they', 'this', 'that',
+    'of', 'in', 'on', 'to', 'by', 'for', 'with', 'called', 'answer',
+})
+# Unit text after a number ("12.5 m/s", "3.2 x 10^4 J", "25 °C").
+_UNIT_RE = re.compile(r"\s*([a-zA-Zµ%°Ω/^\-\d\s²³]{0,12})")
+# Hedged or listed answers ("ribosome or mitochondria", "ribosome and nucleus") must not
+# pick up the mark by accident. Checked on the raw answer, before punctuation is dropped.
+_HEDGE_RE = re.compile(r"\bor\b|\band\b|\bplus\b|\bas well as\b|/|,|;|&")
+# Numeric answers keep '/' (units, working) and thousands separators ("1,000").
+_NUMERIC_HEDGE_RE = re.compile(r"\bor\b|\band\b|;|&|,(?!\d{3}(?!\d))")
+# Method/working points ("M1 correct substitution", "use of v = f x wavelength") are implied
+# by a correct final answer in calculation mark schemes.
+_METHOD_POINT_RE = re.compile(
+    r"^\s*(?:\(?[mc]\d\)?\b|method|working|substitut|use of\b|using\b|rearrang|convert|conversion|"
+    r"correct (?:substitution|working|method|rearrangement|conversion|formula|equation))",
+    re.IGNORECASE,
+)
+# Only a leading article is dropped, and never before a single letter ("a" in "vitamin a" stays).
+_LEADING_ARTICLE_RE = re.compile(r"^(?:the|an|a)\s+(?=\w\w)")
+
+# Small synonym table for spellings/terms that mark schemes routinely treat as equivalent.
+SYNONYMS = {
+    'haemoglobin': ['hemoglobin'],
+    'oesophagus': ['esophagus'],
+    'sulphur': ['sulfur'],
+    'aluminium': ['aluminum'],
+    'foetus': ['fetus'],
+    'centre': ['center'],
+    'fibre': ['fiber'],
+    'colour': ['color'],
+    'vaporise': ['vaporize'],
+    'photosynthesise': ['photosynthesize'],
+    'endoplasmic reticulum': ['er'],
+    'deoxyribonucleic acid': ['dna'],
+    'ribonucleic acid': ['rna'],
+    'adenosine triphosphate': ['atp'],
+}
+
+
+def normalize_answer(text) -> str:
+    """Lower-case, drop punctuation and a leading article, collapse whitespace."""
+    if text is None:
+        return ''
+    s = str(text).lower().strip()
+    s = s.replace('’', "'")
+    s = re.sub(r"[^\w\s'.+\-/]", ' ', s)
+    s = re.sub(r"(?<!\d)\.|\.(?!\d)", ' ', s)
+    s = re.sub(r"\s+", ' ', s).strip()
+    return _LEADING_ARTICLE_RE.sub('', s)
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('es') and word[-3] in 'sxz':
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def _stem_phrase(phrase: str) -> str:
+    return ' '.join(_singular(w) for w in phrase.split())
+
+
+def _variants(term: str) -> set:
+    """All accepted spellings for one keyword/answer (alternatives split on '/' or ' or ')."""
+    out = set()
+    for alt in re.split(r"\s*/\s*|\s+or\s+|;", normalize_answer(term)):
+        alt = alt.strip()
+        if not alt:
+            continue
+        out.add(_stem_phrase(alt))
+        for base, syns in SYNONYMS.items():
+            group = [base] + syns
+            if alt in group:
+                out.update(_stem_phrase(g) for g in group)
+    return out
+
+
+def _contains_phrase(haystack: str, phrase: str) -> bool:
+    return bool(re.search(r"(?<!\w)" + re.escape(phrase) + r"(?!\w)", haystack))
+
+
+def _number_match(text: str, last: bool = False):
+    matches = list(_NUMBER_RE.finditer(text or ''))
+    if not matches:
+        return None
+    # Student working ("5 x 2.5 = 12.5") ends with the final answer.
+    return matches[-1] if last else matches[0]
+
+
+def _unit(text: str, last: bool = False) -> str:
+    """Canonical unit after the (first/last) number: 'm/s', 'm s^-1' and 'ms-1' -> 'ms-1'."""
+    m = _number_match(text, last)
+    if not m:
+        return ''
+    unit = _UNIT_RE.match(text, m.end()).group(1)
+    unit = re.sub(r"[\s^]", "", unit).replace('²', '2').replace('³', '3').rstrip('-')
+    per = re.fullmatch(r"(.+?)/([a-zA-Zµ]+?)(\d?)", unit)
+    if per:
+        unit = f"{per.group(1)}{per.group(2)}-{per.group(3) or 1}"
+    return unit
+
+
+def _parse_number(text: str, last: bool = False):
+    m = _number_match(text, last)
+    if not m:
+        return None
+    raw = m.group(0).replace(',', '').replace(' ', '')
+    sci = re.match(r"([-+]?[\d.]+)[x×]10\^?([-+]?\d+)", raw)
+    try:
+        if sci:
+            return float(sci.group(1)) * (10 ** int(sci.group(2)))
+        return float(raw)
+    except ValueError:
+        return None
+
+
+def _points(ms_data) -> list:
+    points = (ms_data or {}).get('marking_points')
+    if not isinstance(points, list):
+        return []
+    return [p for p in points if isinstance(p, dict) and p.get('answer')]
+
+
+def _result(marks: int, max_marks: int, feedback: str, matched: list, method: str) -> dict:
+    full = marks >= max_marks
+    return {
+        'marks_awarded': marks,
+        'max_marks': max_marks,
+        'feedback': feedback,
+        'strengths': ['Correct answer'] if full else [],
+        'improvements': [] if full else ['Check the mark scheme for the expected answer'],
+        'matched_points': matched,
+        'marked_by': f'rules:{method}',
+    }
+
+
+def _mark_mcq(q_text: str, points: list, answer: str, max_marks: int):
+    expected = [_MCQ_ANSWER_RE.match(str(p['answer']).strip()) for p in points]
+    if not expected or not all(expected):
+        return None
+    if not (_MCQ_QUESTION_RE.search(q_text) or len(points) == 1):
+        return None
+    given = _MCQ_ANSWER_RE.match(answer.strip())
+    if not given:
+        return None
+    letter = given.group(1).upper()
+    correct = {m.group(1).upper() for m in expected}
+    if letter in correct:
+        return _result(max_marks, max_marks, f'Correct - {letter} is the right option.', [letter], 'mcq')
+    return _result(0, max_marks, f'Incorrect - the correct option is {"/".join(sorted(correct))}.', [], 'mcq')
+
+
+def _point_terms(point: dict) -> set:
+    terms = set()
+    for kw in (point.get('keywords') or []):
+        terms |= _variants(kw)
+    return terms | _variants(point['answer'])
+
+
+def _point_matched(point: dict, stemmed: str) -> bool:
+    # The whole point answer (or a variant), or every one of its keywords - one keyword
+    # of "glucose and oxygen" is not the point
+    if any(t and _contains_phrase(stemmed, t) for t in _variants(point['answer'])):
+        return True
+    keywords = [_variants(kw) for kw in (point.get('keywords') or [])]
+    keywords = [v for v in keywords if v]
+    return bool(keywords) and all(
+        any(t and _contains_phrase(stemmed, t) for t in variants) for variants in keywords
+    )
+
+
+def _extra_words(stemmed: str, points: list) -> set:
+    """Content words of the answer that none of these points' answers/keywords use."""
+    vocab = {w for p in points for t in _point_terms(p) for w in t.split()}
+    return {w for w in stemmed.split() if w not in vocab and w not in _FILLER_WORDS}
+
+
+def _is_exact(stemmed: str, points: list) -> bool:
+    return any(stemmed == t for p in points for t in _point_terms(p))
+
+
+def _is_hedged(answer: str, stemmed: str, points: list, hedge_re=_HEDGE_RE) -> bool:
+    if not hedge_re.search(answer.lower()):
+        return False
+    # A listed answer is fine only when it is exactly one accepted answer ("oxygen and glucose")
+    return not _is_exact(stemmed, points)
+
+
+def _mark_numeric(points: list, answer: str, max_marks: int):
+    # Calculation questions: the final-answer point is the one with a numeric answer.
+    numeric = [
+        (p, _parse_number(str(p['answer'])))
+        for p in points
+        if _NUMERIC_ANSWER_RE.fullmatch(str(p['answer']).strip())
+    ]
+    numeric = [(p, v) for p, v in numeric if v is not None]
+    if len(numeric) != 1:
+        return None
+    point, expected = numeric[0]
+    norm = normalize_answer(answer)
+    if _NEGATION_RE.search(norm) or _NUMERIC_HEDGE_RE.search(answer.lower()):
+        return None
+    given = _parse_number(answer, last=True)
+    if given is None:
+        return None
+    tolerance = abs(expected) * NUMERIC_REL_TOLERANCE or 1e-9
+    if abs(given - expected) > tolerance:
+        # A wrong final answer may still earn method marks from working - let AI judge.
+        return None
+    # Right number, different unit ("12.5 kg" for "12.5 m/s"): a unit error or a
+    # coincidence - let AI judge. A missing unit is left to the answer line's printed one.
+    expected_unit, given_unit = _unit(str(point['answer'])), _unit(answer, last=True)
+    if expected_unit and given_unit and given_unit != expected_unit:
+        return None
+    # A correct final answer implies the method marks (standard across boards' calc mark
+    # schemes), but any other point ("gamete 23") still has to be in the answer.
+    stemmed = _stem_phrase(norm)
+    matched = [str(point['answer'])]
+    for p in points:
+        if p is point or _METHOD_POINT_RE.match(str(p['answer'])):
+            continue
+        if not _point_matched(p, stemmed):
+            return None
+        matched.append(str(p['answer']))
+    return _result(max_marks, max_marks, f'Correct answer ({point["answer"]}).', matched, 'numeric')
+
+
+def _mark_keywords(points: list, answer: str, max_marks: int):
+    if max_marks > MAX_KEYWORD_MARKS:
+        return None
+    norm = normalize_answer(answer)
+    if not norm or len(norm.split()) > MAX_KEYWORD_ANSWER_WORDS:
+        return None
+    stemmed = _stem_phrase(norm)
+    if _NEGATION_RE.search(norm) and not _is_exact(stemmed, points):
+        return None
+    if _is_hedged(answer, stemmed, points):
+        return None
+
+    awarded, matched, matched_points = 0, [], []
+    for p in points:
+        if _point_matched(p, stemmed):
+            awarded += int(p.get('marks') or 1)
+            matched.append(str(p['answer']))
+            matched_points.append(p)
+    # "oxygen debt" is not "oxygen": anything said beyond the matched points needs judging
+    if _extra_words(stemmed, matched_points):
+        return None
+
+    # Only award directly when every mark is accounted for; partial or zero
+    # matches may be valid alternatives the mark scheme didn't list.
+    if awarded >= max_marks and matched:
+        return _result(max_marks, max_marks, 'Correct - matches the mark scheme.', matched, 'keywords')
+    return None
+
+
+def rule_mark(q_data: dict, ms_data, user_answer: str):
+    """
+    Try to mark without an LLM. Returns a marking dict (same shape as AI marking,
+    plus `marked_by`) when confident, otherwise None.
+    """
+    points = _points(ms_data)
+    if not points or not user_answer or not str(user_answer).strip():
+        return None
+    max_marks = int((ms_data or {}).get('max_marks') or q_data.get('marks') or 0)
+    if max_marks <= 0:
+        return None
+    answer = str(user_answer)
+    q_text = q_data.get('question_text') or ''
+
+    return (
+        _mark_mcq(q_text, points, answer, max_marks)
+        or _mark_numeric(points, answer, max_marks)
+        or _mark_keywords(points, answer, max_marks)
+    )
@@ -0,0 +1,217 @@
+"""
+Page relevance classifier
+Labels PDF pages as content / cover / blank / admin / appendix from cheap local
+signals (text density, ink coverage, boilerplate phrases, question markers) so the
+extractors only render and send content pages to vision/LLM calls.
+
+Runs on the text and object boxes pdfplumber / PyMuPDF already give us - nothing is
+rendered and no model is called. When in doubt a page is labelled content: a wasted
+call is cheaper than a missing question.
+"""
+
+import re
+from dataclasses import dataclass
+
+CONTENT = 'content'
+COVER = 'cover'
+BLANK = 'blank'
+ADMIN = 'admin'
+APPENDIX = 'appendix'
+
+# Exam papers / mark schemes / examiner reports: only content pages are useful.
+SKIP_LABELS = (COVER, BLANK, ADMIN, APPENDIX)
+# Specifications: appendices carry vocabulary/grammar lists that the topic passes want.
+SPEC_SKIP_LABELS = (COVER, BLANK, ADMIN)
+
+# Below these a page has nothing worth sending (after margin boilerplate is removed).
+BLANK_MAX_CHARS = 40
+BLANK_MAX_INK = 0.02
+# A short cover page: title, board, code, date.
+SPEC_COVER_MAX_WORDS = 60
+
+# Edexcel/OCR print these on every page; they say nothing about the page itself.
+_MARGIN_BOILERPLATE_RE = re.compile(
+    r"do not write in this area|do not write outside the box|turn over|"
+    r"\*[A-Z0-9]{6,}\*|©\s*[^\n]{0,60}|ib/m/[^\n]*|page \d+ of \d+",
+    re.IGNORECASE,
+)
+_BLANK_PHRASES = (
+    'blank page', 'intentionally left blank', 'intentionally blank',
+    'there are no questions printed on this page', 'no questions printed on this page',
+)
+_COVER_PHRASES = (
+    'instructions', 'information', 'candidate number', 'centre number', 'candidate signature',
+    'time allowed', 'answer all questions', "for examiner's use", 'for examiner’s use',
+    'materials', 'do not open this paper', 'you must have', 'total marks', 'advice',
+    'write your name', 'morning', 'afternoon', 'time: ',
+)
+_ADMIN_PHRASES = (
+    'acknowledgement of copyright', 'copyright acknowledgements', 'copyright information',
+    'permission to reproduce', 'every effort has been made', 'copyright holders',
+    'general marking guidance', 'principles for marking', 'marking instructions',
+    'level of response marking', 'step-by-step guide', 'step by step guide',
+    'get help and support', 'you can download a copy', 'registered office',
+)
+_APPENDIX_PHRASES = (
+    'formulae sheet', 'formula sheet', 'formulae and', 'data sheet', 'equations sheet',
+    'physics equations', 'periodic table of the elements', 'the periodic table',
+    'extra answer space', 'additional answer space', 'additional page',
+)
+# Appendix phrases only count as the page's heading, not when a question says
+# "use the data sheet"
+APPENDIX_HEADING_LINES = 3
+_APPENDIX_HEADING_RE = re.compile(r"^\s*(?:\d+\s+)?appendi(?:x|ces)\b", re.IGNORECASE)
+# Anything that says "this page asks/marks a question". Bare mark allocations: OCR/AQA
+# print "[2]", Edexcel prints "(2)" at the end of the answer line.
+_QUESTION_MARKER_RE = re.compile(
+    r"\[\s*\d+\s*marks?\s*\]|\(\s*\d+\s*marks?\s*\)|\(total for question|total for question|"
+    r"\[\s*\d{1,2}\s*\]|\(\s*\d{1,2}\s*\)\s*$|"
+    r"^\s*question\s+\d+|^\s*0\s*\d\s*\.\s*\d|^\s*\d{1,2}\s*\(\s*[a-h]\s*\)|"
+    r"^\s*question\s+(?:number|answers?)\b",
+    re.IGNORECASE | re.MULTILINE,
+)
+_CONTENTS_RE = re.compile(r"^\s*contents\s*$", re.IGNORECASE | re.MULTILINE)
+_TRAILING_PAGE_NUMBER_RE = re.compile(r"\s\d{1,3}\s*$", re.MULTILINE)
+
+# Ink coverage is measured on a coarse grid (cheap and overlap-safe).
+_GRID = 24
+
+
+@dataclass
+class PageFeatures:
+    page_number: int            # 1-based
+    total_pages: int
+    text: str
+    ink_ratio: float = None     # fraction of the page covered by text/images/drawings
+    image_count: int = 0
+
+
+def _ink_ratio(boxes, width: float, height: float) -> float:
+    if not width or not height:
+        return None
+    page_area = width * height
+    cells = set()
+    for x0, top, x1, bottom in boxes:
+        # Page frames/backgrounds would mark every cell
+        if (x1 - x0) * (bottom - top) > 0.9 * page_area:
+            continue
+        c0 = max(0, int(x0 / width * _GRID))
+        c1 = min(_GRID - 1, int(x1 / width * _GRID))
+        r0 = max(0, int(top / height * _GRID))
+        r1 = min(_GRID - 1, int(bottom / height * _GRID))
+        for r in range(r0, r1 + 1):
+            for c in range(c0, c1 + 1):
+                cells.add((r, c))
+    return len(cells) / (_GRID * _GRID)
+
+
+def features_from_pdfplumber(page, page_number: int, total_pages: int, text: str = None) -> PageFeatures:
+    """Features from a pdfplumber page (pass `text` if it was already extracted)."""
+    if text is None:
+        text = page.extract_text() or ""
+    boxes = [(w['x0'], w['top'], w['x1'], w['bottom']) for w in page.extract_words()]
+    for obj in list(page.images) + list(page.rects) + list(page.curves) + list(page.lines):
+        boxes.append((obj['x0'], obj['top'], obj['x1'], obj['bottom']))
+    return PageFeatures(
+        page_number=page_number,
+        total_pages=total_pages,
+        text=text,
+        ink_ratio=_ink_ratio(boxes, float(page.width), float(page.height)),
+        image_count=len(page.images),
+    )
+
+
+def features_from_pymupdf(page, page_number: int, total_pages: int) -> PageFeatures:
+    """Features from a PyMuPDF (fitz) page."""
+    blocks = page.get_text("blocks") or []
+    text = "\n".join(b[4] for b in blocks if len(b) > 6 and b[6] == 0)
+    boxes = [tuple(b[:4]) for b in blocks]
+    # Vector diagrams aren't text/image blocks; the bbox log lists every drawing op cheaply
+    try:
+        boxes.extend(tuple(bbox) for kind, bbox in page.get_bboxlog() if 'path' in kind)
+    except AttributeError:
+        pass
+    rect = page.rect
+    return PageFeatures(
+        page_number=page_number,
+        total_pages=total_pages,
+        text=text,
+        ink_ratio=_ink_ratio(boxes, rect.width, rect.height),
+        image_count=sum(1 for b in blocks if len(b) > 6 and b[6] == 1),
+    )
+
+
+def _hits(text_lower: str, phrases) -> int:
+    return sum(1 for p in phrases if p in text_lower)
+
+
+def _heading(text: str, lines: int = APPENDIX_HEADING_LINES) -> str:
+    return "\n".join([ln for ln in text.splitlines() if ln.strip()][:lines])
+
+
+def _is_contents_page(text: str) -> bool:
+    return bool(_CONTENTS_RE.search(text[:400])) and len(_TRAILING_PAGE_NUMBER_RE.findall(text)) >= 5
+
+
+def classify_page(features: PageFeatures, document: str = 'paper'):
+    """
+    Label one page. `document` is 'paper' (question papers, mark schemes, examiner
+    reports) or 'spec'. Returns (label, reason).
+    """
+    text = features.text or ""
+    substantive = _MARGIN_BOILERPLATE_RE.sub(" ", text)
+    chars = len(re.sub(r"\s+", "", substantive))
+    words = len(substantive.split())
+    lower = substantive.lower()
+    has_questions = bool(_QUESTION_MARKER_RE.search(substantive))
+    has_graphics = features.image_count > 0 or (features.ink_ratio or 0) > BLANK_MAX_INK
+
+    if chars < BLANK_MAX_CHARS and not has_graphics:
+        return BLANK, f"{chars} chars of text"
+    if _hits(lower, _BLANK_PHRASES) and chars < 200 and not has_questions:
+        return BLANK, "blank-page notice"
+
+    if has_questions:
+        return CONTENT, "question markers"
+
+    if features.page_number <= 2:
+        if document == 'spec':
+            if features.page_number == 1 and words <= SPEC_COVER_MAX_WORDS:
+                return COVER, f"{words} words on first page"
+        elif _hits(lower, _COVER_PHRASES) >= 3:
+            return COVER, "cover-page instructions"
+
+    if _is_contents_page(substantive):
+        return ADMIN, "contents page"
+    if _hits(lower, _ADMIN_PHRASES):
+        return ADMIN, "administrative boilerplate"
+
+    if _APPENDIX_HEADING_RE.search(substantive[:200]):
+        return APPENDIX, "appendix heading"
+    if document != 'spec' and _hits(_heading(substantive).lower(), _APPENDIX_PHRASES):
+        return APPENDIX, "formula/data sheet or answer space"
+
+    return CONTENT, "default"
+
+
+def select_content_pages(features_list, skip_labels=SKIP_LABELS, document: str = 'paper'):
+    """
+    Classify every page and split into (kept page numbers, {page_number: (label, reason)}
+    for skipped pages).
+    """
+    kept, skipped = [], {}
+    for features in features_list:
+        label, reason = classify_page(features, document)
+        if label in skip_labels:
+            skipped[features.page_number] = (label, reason)
+        else:
+            kept.append(features.page_number)
+    return kept, skipped
+
+
+def summarize_skipped(skipped: dict) -> str:
+    """'cover: 1; blank: 2, 20' style summary for log lines."""
+    by_label = {}
+    for page_number, (label, _) in sorted(skipped.items()):
+        by_label.setdefault(label, []).append(str(page_number))
+    return "; ".join(f"{label}: {', '.join(pages)}" for label, pages in by_label.items())
@@ -0,0 +1,184 @@
+"""
+Spec text compaction
+Strips running headers/footers, page numbers and repeated boilerplate from
+specification text before it goes into a prompt, and undoes PDF line-wrap artefacts
+(hyphenated breaks, hard-wrapped sentences). Headings, numbering and bullets are left
+on their own lines so hierarchy extraction still sees the document structure.
+
+Shared by the universal topic scrapers and SpecificationExtractor; generalises the
+WJEC/Eduqas `_looks_like_header_footer` helpers.
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # optional: fall back to the ~4 chars/token rule of thumb
+    _ENCODING = None
+
+# Only the first/last few lines of a page can be running headers or footers.
+EDGE_LINES = 3
+# A line is boilerplate when it sits at a page edge on at least this share of pages...
+REPEAT_PAGE_RATIO = 0.25
+# ...and on at least this many pages (short documents).
+REPEAT_MIN_PAGES = 3
+# Running banners/footers are long ("GCSE (9-1) Biology A Specification | 12"); shorter
+# numbered lines ("Topic 2", "Paper 1") are headings and are never deduplicated.
+BANNER_MIN_WORDS = 4
+# Wrapped lines run close to full width; shorter lines are headings or list items.
+REFLOW_MIN_LINE_CHARS = 45
+
+_PAGE_NUMBER_RE = re.compile(r"^(?:page\s+)?\d{1,3}(?:\s*(?:of|/)\s*\d{1,3})?$", re.IGNORECASE)
+# "(c)" only counts with a year or board after it: "(c) describe osmosis" is a list item
+_COPYRIGHT_RE = re.compile(
+    r"^(?:©|\(c\)\s*(?:\d{4}|wjec|eduqas|ocr|aqa|pearson)\b|copyright\b).{0,80}$", re.IGNORECASE
+)
+_BOARD_MARKERS = ("WJEC CBAC", "© WJEC", "© Eduqas", "© OCR", "© AQA", "© Pearson")
+# A board name alone on a line is a running header/footer
+_BOARD_NAME_RE = re.compile(r"^(?:wjec|eduqas|ocr|aqa|pearson|edexcel)$", re.IGNORECASE)
+_HEADING_LIKE_RE = re.compile(
+    r"^(?:\d+(?:\.\d+)*\.?\s|(?:topic|unit|component|paper|section|module|chapter|part|option|theme|"
+    r"content|appendix)\b)",
+    re.IGNORECASE,
+)
+_BULLET_RE = re.compile(r"^(?:[•\-–—*▪●○◦]|\d+(?:\.\d+)*\.?\s|\(?[a-z]\)|\(?[ivx]+\))", re.IGNORECASE)
+_SYMBOL_BULLET_RE = re.compile(r"^[•\-–—*▪●○◦]")
+_SENTENCE_END_RE = re.compile(r"[.:;?!)]$")
+_HYPHEN_BREAK_RE = re.compile(r"([A-Za-z]{2,})-\n([a-z]{2,})")
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count (tiktoken when installed, otherwise chars/4)."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def looks_like_header_footer(line: str, extra_markers=(), prefixes=()) -> bool:
+    """
+    Page numbers, copyright lines and exam-board running headers.
+
+    extra_markers match anywhere in the line; prefixes match its start (subject
+    banners such as "GCSE GEOGRAPHY" that precede the page's own text).
+    """
+    s = (line or "").strip()
+    if not s:
+        return True
+    if _PAGE_NUMBER_RE.match(s) or _COPYRIGHT_RE.match(s) or _BOARD_NAME_RE.match(s):
+        return True
+    if prefixes and s.startswith(tuple(prefixes)):
+        return True
+    return any(marker in s for marker in _BOARD_MARKERS + tuple(extra_markers))
+
+
+def _line_key(line: str) -> str:
+    # "Page 12 GCSE Biology" and "Page 13 GCSE Biology" are the same footer, but
+    # "Topic 1" and "Topic 2" are different headings: a leading/trailing number is only
+    # masked in a long banner line, or when it says it is a page number
+    key = re.sub(r"\s+", " ", line.strip().lower())
+    if _PAGE_NUMBER_RE.match(key):
+        return "#"
+    key = re.sub(r"\bpage \d{1,3}\b", "page #", key)
+    if len(re.sub(r"^\d{1,3}\s|\s\d{1,3}$", "", key).split()) >= BANNER_MIN_WORDS:
+        key = re.sub(r"^\d{1,3}(?=\s[^\d.])", "#", key)
+        key = re.sub(r"(?<=[^\d.]\s)\d{1,3}$", "#", key)
+    return key
+
+
+def _heading_like(line: str) -> bool:
+    s = line.strip()
+    return len(s.split()) < BANNER_MIN_WORDS and bool(_HEADING_LIKE_RE.match(s))
+
+
+def repeated_edge_lines(pages: List[str]) -> set:
+    """Normalised lines that appear at the top/bottom of many pages."""
+    counts = Counter()
+    for page in pages:
+        lines = [ln for ln in (page or "").splitlines() if ln.strip()]
+        edge = lines[:EDGE_LINES] + lines[-EDGE_LINES:]
+        counts.update({
+            _line_key(ln) for ln in edge
+            if not _SYMBOL_BULLET_RE.match(ln.strip()) and not _heading_like(ln)
+        })
+    threshold = max(REPEAT_MIN_PAGES, int(len(pages) * REPEAT_PAGE_RATIO))
+    return {key for key, n in counts.items() if n >= threshold}
+
+
+def reflow(text: str) -> str:
+    """Join hyphenated breaks and hard-wrapped sentence lines; keep structural lines."""
+    text = _HYPHEN_BREAK_RE.sub(r"\1\2", text)
+    out: List[str] = []
+    for line in text.splitlines():
+        s = re.sub(r"[ \t]+", " ", line).strip()
+        if not s:
+            if out and out[-1] != "":
+                out.append("")
+            continue
+        prev = out[-1] if out else ""
+        if (
+            prev
+            and len(prev) >= REFLOW_MIN_LINE_CHARS
+            and not _SENTENCE_END_RE.search(prev)
+            and s[0].islower()
+            and not _BULLET_RE.match(s)
+        ):
+            out[-1] = f"{prev} {s}"
+        else:
+            out.append(s)
+    return "\n".join(out).strip()
+
+
+def compact_pages(pages: List[str], extra_markers=()) -> Tuple[List[str], Dict]:
+    """
+    Compact a document page by page (page boundaries are preserved so page-aware
+    callers keep working). Returns (compacted pages, stats).
+    """
+    pages = [p or "" for p in pages]
+    repeated = repeated_edge_lines(pages)
+    seen_repeated = set()
+    removed = 0
+    compacted = []
+    for page in pages:
+        kept = []
+        for line in page.splitlines():
+            if not line.strip():
+                kept.append("")
+                continue
+            if looks_like_header_footer(line, extra_markers):
+                removed += 1
+                continue
+            key = _line_key(line)
+            if key in repeated:
+                # Keep the first one: a repeated line can also be a real heading
+                if key in seen_repeated:
+                    removed += 1
+                    continue
+                seen_repeated.add(key)
+            kept.append(line)
+        compacted.append(reflow("\n".join(kept)))
+
+    before = "\n".join(pages)
+    after = "\n".join(compacted)
+    stats = {
+        'pages': len(pages),
+        'chars_before': len(before),
+        'chars_after': len(after),
+        'tokens_before': estimate_tokens(before),
+        'tokens_after': estimate_tokens(after),
+        'lines_removed': removed,
+    }
+    return compacted, stats
+
+
+def format_stats(stats: Dict) -> str:
+    before, after = stats['tokens_before'], stats['tokens_after']
+    saved = (1 - after / before) * 100 if before else 0.0
+    return (
+        f"{before:,} -> {after:,} tokens ({saved:.0f}% smaller, "
+        f"{stats['lines_removed']} header/footer lines removed, {stats['pages']} pages)"
+    )
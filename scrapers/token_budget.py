@@ -0,0 +1,258 @@
+"""
+Token budgeting for hierarchy-extraction prompts
+Estimates input and output size before a `_call_ai` call. When a spec's subject
+content would overflow the model context, or the numbered hierarchy it produces
+would be cut off at `max_tokens`, the content is split at numbered-heading
+boundaries, each part is extracted separately and the numbered hierarchies are
+stitched back together with consistent codes.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from scrapers.spec_text_compactor import estimate_tokens
+
+# context window / maximum output tokens per model
+MODEL_LIMITS = {
+    'gpt-4o': {'context': 128000, 'max_output': 16384},
+    'gpt-4o-mini': {'context': 128000, 'max_output': 16384},
+    'claude-3-5-sonnet-20241022': {'context': 200000, 'max_output': 8192},
+    'claude-3-5-haiku-20241022': {'context': 200000, 'max_output': 8192},
+}
+DEFAULT_LIMITS = {'context': 128000, 'max_output': 8192}
+
+# A numbered hierarchy (one line per bullet, broken-down lists, codes) runs at
+# roughly this many output tokens per token of subject-content input.
+OUTPUT_TOKENS_PER_INPUT_TOKEN = 0.6
+# System message, chat framing and estimation error.
+SAFETY_MARGIN_TOKENS = 2000
+# Only plan to use this share of max_tokens for the expected output.
+OUTPUT_HEADROOM = 0.8
+
+# Marker the universal scrapers' prompts put in front of the spec text.
+PROMPT_CONTENT_MARKER = "PDF CONTENT:\n"
+
+_HEADING_RE = re.compile(
+    r"^[ \t]*(?:(\d+(?:\.\d+)*)\.?[ \t]+[A-Z]|(?:Component|Section|Unit|Theme|Option|Topic)[ \t]+[0-9A-Z]+\b)",
+    re.MULTILINE,
+)
+_HIERARCHY_LINE_RE = re.compile(r"^\s*(\d+(?:\.\d+)*)\.?\s+(.+)$")
+
+
+@dataclass
+class TokenBudget:
+    input_tokens: int
+    output_tokens_est: int
+    context_limit: int
+    max_output_tokens: int
+
+    @property
+    def input_fits(self) -> bool:
+        return self.input_tokens + self.max_output_tokens + SAFETY_MARGIN_TOKENS <= self.context_limit
+
+    @property
+    def output_fits(self) -> bool:
+        return self.output_tokens_est <= self.max_output_tokens * OUTPUT_HEADROOM
+
+    @property
+    def fits(self) -> bool:
+        return self.input_fits and self.output_fits
+
+    def describe(self) -> str:
+        return (
+            f"input ~{self.input_tokens:,} tokens (context {self.context_limit:,}), "
+            f"output ~{self.output_tokens_est:,} tokens (max_tokens {self.max_output_tokens:,})"
+        )
+
+
+def model_limits(model: str) -> Dict[str, int]:
+    return MODEL_LIMITS.get(model, DEFAULT_LIMITS)
+
+
+def effective_max_output(model: str, max_output_tokens: int) -> int:
+    return min(max_output_tokens, model_limits(model)['max_output'])
+
+
+def estimate_budget(prompt: str, model: str, max_output_tokens: int, content: str = None) -> TokenBudget:
+    """Budget for one call; output is estimated from `content` (default: the whole prompt)."""
+    content_tokens = estimate_tokens(content if content is not None else prompt)
+    return TokenBudget(
+        input_tokens=estimate_tokens(prompt),
+        output_tokens_est=int(content_tokens * OUTPUT_TOKENS_PER_INPUT_TOKEN),
+        context_limit=model_limits(model)['context'],
+        max_output_tokens=effective_max_output(model, max_output_tokens),
+    )
+
+
+def max_part_tokens(overhead_tokens: int, model: str, max_output_tokens: int) -> int:
+    """Largest content part (in tokens) whose input and expected output both fit."""
+    max_out = effective_max_output(model, max_output_tokens)
+    by_context = model_limits(model)['context'] - overhead_tokens - max_out - SAFETY_MARGIN_TOKENS
+    by_output = int(max_out * OUTPUT_HEADROOM / OUTPUT_TOKENS_PER_INPUT_TOKEN)
+    return max(1000, min(by_context, by_output))
+
+
+def split_prompt(prompt: str, marker: str = PROMPT_CONTENT_MARKER) -> Tuple[str, str]:
+    """(instructions up to and including the marker, spec content after it)."""
+    idx = prompt.rfind(marker)
+    if idx < 0:
+        return prompt, ""
+    cut = idx + len(marker)
+    return prompt[:cut], prompt[cut:]
+
+
+_TOP_LEVEL_WORD_RE = re.compile(r"\b(?:Component|Section|Unit|Option|Theme)\b")
+
+
+def _heading_depth(text: str, match) -> int:
+    # "2.1 Component 1: ..." / "Section B" outrank any numbered topic;
+    # otherwise "3" is depth 0, "3.1" depth 1, ...
+    line_end = text.find("\n", match.start())
+    line = text[match.start():line_end if line_end >= 0 else len(text)]
+    if _TOP_LEVEL_WORD_RE.search(line[:40]):
+        return -1
+    number = match.group(1)
+    return number.count('.') if number else 0
+
+
+def heading_trail(text: str, pos: int) -> List[str]:
+    """Nearest enclosing heading lines before `pos`, in document order."""
+    trail: Dict[int, Tuple[int, str]] = {}
+    for m in _HEADING_RE.finditer(text, 0, pos):
+        depth = _heading_depth(text, m)
+        line_end = text.find("\n", m.start())
+        trail[depth] = (m.start(), text[m.start():line_end if line_end >= 0 else len(text)].strip())
+        for deeper in [d for d in trail if d > depth]:
+            del trail[deeper]
+    return [line for _, line in sorted(trail.values())]
+
+
+def split_at_headings(text: str, max_tokens: int) -> List[Tuple[str, List[str]]]:
+    """
+    Split `text` into parts of at most ~max_tokens, cutting at the shallowest numbered
+    heading available in the back half of each window (paragraph breaks as a fallback).
+    Returns [(part_text, heading_trail_before_part), ...].
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [(text, [])]
+
+    chars_per_token = max(1.0, len(text) / max(1, estimate_tokens(text)))
+    max_chars = int(max_tokens * chars_per_token)
+    headings = [(m.start(), _heading_depth(text, m)) for m in _HEADING_RE.finditer(text)]
+
+    parts = []
+    start = 0
+    while start < len(text):
+        if len(text) - start <= max_chars:
+            end = len(text)
+        else:
+            window_lo, window_hi = start + max_chars // 2, start + max_chars
+            candidates = [(depth, -pos, pos) for pos, depth in headings if window_lo <= pos <= window_hi]
+            if candidates:
+                end = min(candidates)[2]
+            else:
+                para = text.rfind("\n\n", window_lo, window_hi)
+                line = text.rfind("\n", window_lo, window_hi)
+                end = para if para > 0 else (line if line > 0 else window_hi)
+        parts.append((text[start:end], heading_trail(text, start) if start else []))
+        start = end
+    return parts
+
+
+def _norm_title(title: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", title.lower()).strip()
+
+
+def stitch_hierarchies(outputs: List[str]) -> str:
+    """
+    Merge numbered hierarchies extracted from consecutive parts into one.
+
+    Each part numbers from 1 and may repeat the Component/topic headings it sits
+    under. Nodes with the same (normalised) title under the same parent are merged;
+    everything else is renumbered after its parent's existing children, so codes are
+    consistent and unique across the whole document.
+    """
+    # parent code -> {norm title: (code, part index)}
+    children: Dict[str, Dict[str, Tuple[str, int]]] = {"": {}}
+    lines: List[str] = []
+    for part_index, output in enumerate(outputs):
+        remap: Dict[str, str] = {}   # this part's code -> stitched code
+        for raw in (output or "").splitlines():
+            m = _HIERARCHY_LINE_RE.match(raw)
+            if not m:
+                continue
+            old_code, title = m.group(1), m.group(2).strip()
+            old_parent = old_code.rsplit('.', 1)[0] if '.' in old_code else ""
+            # Orphans (parent missing from this part) attach at top level
+            parent = remap.get(old_parent, "")
+            siblings = children.setdefault(parent, {})
+            key = _norm_title(title)
+            existing = siblings.get(key)
+            if existing and existing[1] < part_index:
+                # Heading repeated from an earlier part: continue under it
+                remap[old_code] = existing[0]
+                continue
+            new_code = f"{parent}.{len(siblings) + 1}" if parent else str(len(siblings) + 1)
+            siblings[key if not existing else f"{key}#{new_code}"] = (new_code, part_index)
+            children.setdefault(new_code, {})
+            remap[old_code] = new_code
+            lines.append(f"{new_code} {title}")
+    return "\n".join(lines)
+
+
+def part_prompt(instructions: str, part: str, trail: List[str], index: int, total: int) -> str:
+    note = (
+        f"NOTE: This is part {index} of {total} of the Subject Content. Extract ONLY the content in this part.\n"
+        "Number from 1 as usual and start by repeating the Component/topic heading lines this part sits under "
+        "(exactly as written) so the parts can be merged.\n"
+    )
+    if trail:
+        note += "This part continues under:\n" + "\n".join(trail) + "\n"
+    return f"{instructions.rstrip()}\n\n{note}\n{part}"
+
+
+def extract_with_budget(prompt: str, call: Callable[[str], Optional[str]], model: str,
+                        max_output_tokens: int, was_truncated: Callable[[], bool] = None,
+                        marker: str = PROMPT_CONTENT_MARKER, log: Callable[[str], None] = print) -> Optional[str]:
+    """
+    Run a hierarchy-extraction prompt within the model's token budget.
+
+    Single call when the prompt and its expected output fit; otherwise (or when the
+    single call comes back truncated) split the spec content at numbered headings,
+    extract each part and stitch the numbered hierarchies.
+    """
+    instructions, content = split_prompt(prompt, marker)
+    budget = estimate_budget(prompt, model, max_output_tokens, content=content or prompt)
+    log(f"[INFO] Token budget: {budget.describe()}")
+
+    if budget.fits or not content:
+        result = call(prompt)
+        if not (result and was_truncated and was_truncated() and content):
+            return result
+        log("[WARN] Output hit max_tokens - retrying in parts")
+
+    overhead = estimate_tokens(instructions)
+    limit = max_part_tokens(overhead, model, max_output_tokens)
+    if budget.fits:
+        # Estimate was too optimistic: at least halve the part size
+        limit = min(limit, max(1000, estimate_tokens(content) // 2))
+    parts = split_at_headings(content, limit)
+    log(f"[INFO] Splitting subject content into {len(parts)} parts (<= ~{limit:,} tokens each)")
+
+    outputs = []
+    for i, (part, trail) in enumerate(parts, 1):
+        log(f"[INFO] Extracting part {i}/{len(parts)} ({estimate_tokens(part):,} tokens)...")
+        result = call(part_prompt(instructions, part, trail, i, len(parts)))
+        if result is None:
+            log(f"[WARN] Part {i} failed")
+            continue
+        if was_truncated and was_truncated():
+            log(f"[WARN] Part {i} output hit max_tokens - hierarchy for this part may be incomplete")
+        outputs.append(result)
+
+    if not outputs:
+        return None
+    stitched = stitch_hierarchies(outputs)
+    log(f"[OK] Stitched {len(outputs)} parts into {len(stitched.splitlines())} numbered lines")
+    return stitched
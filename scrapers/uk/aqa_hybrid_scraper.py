@@ -12,6 +12,7 @@ from scrapers.uk.aqa_web_scraper import AQAWebScraper
 from extractors.specification_extractor import SpecificationExtractor
 from extractors.html_specification_extractor import HTMLSpecificationExtractor
 from utils.logger import get_logger
+from utils.stage_store import StageStore, file_hash
 from bs4 import BeautifulSoup
 import re
 from urllib.parse import urljoin
@@ -19,6 +20,10 @@ import requests
 
 logger = get_logger()
 
+# Checkpointed stages of process_subject_complete (see utils/stage_store.py)
+STAGES = ('web', 'pdf_url', 'extraction', 'upload')
+WEB_CACHE_MAX_AGE = 7 * 24 * 3600
+
 
 class AQAHybridScraper:
     """
@@ -34,10 +39,14 @@ class AQAHybridScraper:
         self.uploader = supabase_uploader
     
     def process_subject_complete(self, subject: str, qualification: str, 
-                                subject_code: str, upload_to_supabase: bool = True) -> dict:
+                                subject_code: str, upload_to_supabase: bool = True,
+                                stage_store: StageStore = None) -> dict:
         """
         Complete processing with hybrid approach.
         
+        Pass a StageStore (built with STAGES) to checkpoint the web scrape, PDF URL,
+        AI extraction and upload, so a rerun resumes after the last completed stage.
+        
         Returns:
         {
             'subject': str,
@@ -67,6 +76,10 @@ class AQAHybridScraper:
             'errors': []
         }
         
+        store = stage_store or StageStore(
+            'data/state/stages/hybrid', f"{subject}_{qualification}", STAGES, enabled=False
+        )
+        
         # Build specification page URL
         spec_page_url = self._build_specification_url(subject, qualification, subject_code)
         
@@ -74,10 +87,15 @@ class AQAHybridScraper:
         logger.info("Step 1: Scraping subject-content pages...")
         web_result = None
         try:
-            web_result = self.web_scraper.scrape_subject_content_complete(
-                subject=subject,
-                qualification=qualification,
-                subject_code=subject_code
+            web_result = store.run(
+                'web', [subject, qualification, subject_code],
+                lambda: self.web_scraper.scrape_subject_content_complete(
+                    subject=subject,
+                    qualification=qualification,
+                    subject_code=subject_code
+                ),
+                max_age=WEB_CACHE_MAX_AGE,
+                valid=lambda r: r.get('content_items')
             )
             
             if web_result and web_result.get('content_items'):
@@ -97,7 +115,8 @@ class AQAHybridScraper:
         try:
             logger.info(f"Specification page: {spec_page_url}")
             
-            pdf_url = self._find_pdf_on_page(spec_page_url)
+            pdf_url = store.run('pdf_url', [spec_page_url], lambda: self._find_pdf_on_page(spec_page_url),
+                                kind='text', max_age=WEB_CACHE_MAX_AGE)
             if not pdf_url:
                 raise ValueError("Could not find PDF on specification page")
             
@@ -111,15 +130,18 @@ class AQAHybridScraper:
             logger.info(f"[OK] Downloaded PDF to: {pdf_path}")
             result['pdf_path'] = pdf_path
             
-            # Extract with AI
-            logger.info("[AI] Extracting with AI (this costs ~$0.10-0.15)...")
+            # Extract with AI (reused while the PDF bytes are unchanged)
+            def extract():
+                logger.info("[AI] Extracting with AI (this costs ~$0.10-0.15)...")
+                return self.pdf_extractor.extract_complete_specification(
+                    pdf_path=pdf_path,
+                    subject=subject,
+                    exam_board='AQA',
+                    qualification=qualification
+                )
             
-            complete_data = self.pdf_extractor.extract_complete_specification(
-                pdf_path=pdf_path,
-                subject=subject,
-                exam_board='AQA',
-                qualification=qualification
-            )
+            complete_data = store.run('extraction', [file_hash(pdf_path)], extract,
+                                      valid=lambda d: isinstance(d, dict))
             
             if not complete_data:
                 raise ValueError("AI extraction returned no data")
@@ -159,12 +181,20 @@ class AQAHybridScraper:
                     'subject': subject,
                     'qualification': qualification
                 }
-                self._upload_pdf_data(data_package)
                 
-                # ALSO upload the web-scraped topics (they have rich hierarchical data!)
-                if web_result and web_result.get('content_items'):
-                    logger.info("Also uploading web-scraped topic details...")
-                    self._upload_web_topics(web_result, subject, qualification, subject_code)
+                def upload():
+                    upload_results = self._upload_pdf_data(data_package)
+                    
+                    # ALSO upload the web-scraped topics (they have rich hierarchical data!)
+                    if web_result and web_result.get('content_items'):
+                        logger.info("Also uploading web-scraped topic details...")
+                        self._upload_web_topics(web_result, subject, qualification, subject_code)
+                    return upload_results
+                
+                store.run(
+                    'upload', [store.output_hash('extraction'), store.output_hash('web')], upload,
+                    valid=lambda r: r.get('metadata_id') and not r.get('errors')
+                )
             
             return result
             
@@ -344,6 +374,7 @@ class AQAHybridScraper:
         logger.info(f"  - Components: {upload_results.get('components')}")
         logger.info(f"  - Constraints: {upload_results.get('constraints')}")
         logger.info(f"  - Topics: {upload_results.get('topics')}")
+        return upload_results
     
     def close(self):
         """Close scrapers."""
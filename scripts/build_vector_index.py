@@ -0,0 +1,68 @@
+"""
+Build or refresh a local vector index of topic embeddings (database/vector_index.py).
+
+Copies topic_ai_metadata embeddings for a board / qualification / subject into a
+memory-mapped matrix under data/state/vector_index/. Re-runs only fetch embeddings
+changed since the last sync and drop topics removed upstream.
+
+Usage:
+  python scripts/build_vector_index.py --exam-board AQA --qualification A_LEVEL
+  python scripts/build_vector_index.py --exam-board Edexcel --subject-name "Physical Education" --dtype float16
+  python scripts/build_vector_index.py --exam-board AQA --neighbours <topic_id>   # sanity check
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from database.vector_index import DEFAULT_INDEX_DIR, DTYPES, sync_index
+
+_env_path = Path(__file__).resolve().parents[1] / ".env"
+if _env_path.exists():
+    load_dotenv(_env_path)
+
+
+def load_supabase():
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        raise RuntimeError("SUPABASE_URL / SUPABASE_SERVICE_KEY not found in .env")
+    return create_client(url, key)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sync a local vector index from topic_ai_metadata")
+    parser.add_argument("--exam-board", help="topic_ai_metadata.exam_board, e.g. AQA")
+    parser.add_argument("--qualification", help="topic_ai_metadata.qualification_level, e.g. A_LEVEL")
+    parser.add_argument("--subject-name", help="topic_ai_metadata.subject_name")
+    parser.add_argument("--dtype", choices=list(DTYPES), default="float32",
+                        help="float16 halves memory and disk for a tiny loss of precision")
+    parser.add_argument("--full", action="store_true", help="Rebuild instead of syncing incrementally")
+    parser.add_argument("--index-dir", default=str(DEFAULT_INDEX_DIR))
+    parser.add_argument("--neighbours", metavar="TOPIC_ID", help="Print the nearest topics to this one")
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    index = sync_index(load_supabase(), args.exam_board, args.qualification, args.subject_name,
+                       dtype=args.dtype, full=args.full, index_dir=args.index_dir)
+    print(f"[OK] {index.path}: {len(index)} topics x {index.dim} dims ({index.meta['dtype']})")
+
+    if args.neighbours:
+        if args.neighbours not in index:
+            raise SystemExit(f"Topic {args.neighbours} is not in this index")
+        ids, scores = index.search(index.get([args.neighbours]), k=args.k + 1)
+        for topic_id, score in zip(ids[0], scores[0]):
+            if topic_id and topic_id != args.neighbours:
+                path = " > ".join(p for p in (index.attrs.get(topic_id, {}).get("full_path") or []) if p)
+                print(f"  {score:.3f}  {topic_id}  {path}")
+
+
+if __name__ == "__main__":
+    main()
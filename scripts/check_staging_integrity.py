@@ -0,0 +1,97 @@
+"""
+Integrity check for staging topic hierarchies (database/integrity.py).
+
+Reports orphaned parents, cycles, level jumps, duplicate topic codes, board-mismatched
+topics and empty subjects for every selected staging subject. Uses the
+staging_integrity_report RPC (database/migrations/009_staging_integrity_checks.sql)
+when installed, otherwise checks subjects concurrently client-side.
+
+Usage:
+  python scripts/check_staging_integrity.py
+  python scripts/check_staging_integrity.py --board EDUQAS --board WJEC --qualification A-Level
+  python scripts/check_staging_integrity.py --subject-id <uuid> --json out.json
+  python scripts/check_staging_integrity.py --snapshot            # local mirror, no network
+
+Exit code 1 when any issue is found.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from database.integrity import CHECKS, run_checks, run_snapshot
+from database.local_mirror import DEFAULT_MIRROR_PATH, connect
+
+_env_path = Path(__file__).resolve().parents[1] / ".env"
+if _env_path.exists():
+    load_dotenv(_env_path)
+
+
+def load_supabase():
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        raise RuntimeError("SUPABASE_URL / SUPABASE_SERVICE_KEY not found in .env")
+    return create_client(url, key)
+
+
+def print_summary(report: dict, seconds: float) -> None:
+    subjects = {s["subject_id"]: s for s in report["subjects"]}
+    print(f"Checked {len(subjects)} subjects ({report['source']}, {seconds:.1f}s)")
+    for check in CHECKS:
+        print(f"  {check:<16} {report['summary'][check]}")
+
+    per_subject = Counter((i["subject_id"], i["check"]) for i in report["issues"])
+    if per_subject:
+        print("\nSubjects with issues:")
+        for (subject_id, check), n in sorted(per_subject.items(), key=lambda kv: (str(kv[0][0]), kv[0][1])):
+            s = subjects.get(subject_id, {})
+            print(f"  - [{s.get('exam_board')}] {s.get('subject_name')} ({s.get('subject_code')}): {check} x{n}")
+    print("\nPASS" if report["ok"] else "\nFAIL")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check staging topic hierarchies")
+    parser.add_argument("--board", action="append", dest="boards", help="Exam board (repeatable)")
+    parser.add_argument("--qualification", help="e.g. A-Level, GCSE")
+    parser.add_argument("--subject-id", action="append", dest="subject_ids", help="Subject id (repeatable)")
+    parser.add_argument("--mode", choices=["auto", "server", "client"], default="auto",
+                        help="server = RPC only, client = concurrent client-side checks")
+    parser.add_argument("--max-workers", type=int, default=8, help="Concurrent subjects in client mode")
+    parser.add_argument("--snapshot", nargs="?", const=str(DEFAULT_MIRROR_PATH), default=None,
+                        help="Check the local mirror (scripts/sync_local_mirror.py) instead of Supabase")
+    parser.add_argument("--json", dest="json_path", help="Write the full report here ('-' for stdout)")
+    args = parser.parse_args()
+
+    started = time.time()
+    if args.snapshot:
+        report = run_snapshot(connect(args.snapshot), args.boards, args.qualification, args.subject_ids)
+    else:
+        report = run_checks(load_supabase(), args.boards, args.qualification, args.subject_ids,
+                            mode=args.mode, max_workers=args.max_workers)
+
+    if args.json_path == "-":
+        json.dump(report, sys.stdout, indent=2, default=str)
+        print()
+    else:
+        print_summary(report, time.time() - started)
+        if args.json_path:
+            Path(args.json_path).write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+            print(f"Report written to {args.json_path}")
+
+    if not report["ok"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,7 @@ from __future__ import annotations
 
 import argparse
 import os
+import sys
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -34,6 +35,9 @@ from supabase import create_client
 ROOT = Path(__file__).resolve().parents[1]
 ENV_PATH = ROOT / ".env"
 
+sys.path.insert(0, str(ROOT))
+from database.keyset_reader import fetch_all
+
 
 @dataclass(frozen=True)
 class Subject:
@@ -118,14 +122,11 @@ def count_topics(sb, *, subject_id: str, board: str) -> int:
 
 def clone_topics(sb, *, from_subject_id: str, from_board: str, to_subject_id: str, to_board: str) -> int:
     # Fetch source topics
-    src = (
-        sb.table("staging_aqa_topics")
-        .select("id,topic_code,topic_name,topic_level,parent_topic_id")
-        .eq("subject_id", from_subject_id)
-        .eq("exam_board", from_board)
-        .execute()
-        .data
-        or []
+    src = fetch_all(
+        sb,
+        "staging_aqa_topics",
+        "id,topic_code,topic_name,topic_level,parent_topic_id",
+        filters=[("subject_id", "eq", from_subject_id), ("exam_board", "eq", from_board)],
     )
     if not src:
         raise RuntimeError("Source subject has 0 topics; refusing to clone.")
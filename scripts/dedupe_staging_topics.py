@@ -0,0 +1,106 @@
+"""
+Near-duplicate sibling topics across staging (database/dedup.py).
+
+Finds sibling topics whose names only differ by case, punctuation, bullets, a leading
+article or a few characters ("Cardiac cycle" / "The cardiac cycle."), for every
+selected staging subject in one pass (MinHash/LSH, no pairwise comparison). Reports
+by default; --merge keeps one canonical topic per cluster, moves the duplicates'
+children under it and deletes the duplicates. Replaces the hand-run
+CHECK-DUPLICATES.sql / CLEANUP-ALL-DUPLICATES.sql for staging.
+
+Usage:
+  python scripts/dedupe_staging_topics.py --board EDUQAS --qualification A-Level
+  python scripts/dedupe_staging_topics.py --subject-id <uuid> --merge
+  python scripts/dedupe_staging_topics.py --threshold 1.0          # normalized-exact only
+  python scripts/dedupe_staging_topics.py --snapshot --json out.json
+
+Exit code 1 when duplicates are found and not merged.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from database.dedup import DEFAULT_THRESHOLD, find_duplicates, topics_from_snapshot
+from database.local_mirror import DEFAULT_MIRROR_PATH, connect
+
+_env_path = Path(__file__).resolve().parents[1] / ".env"
+if _env_path.exists():
+    load_dotenv(_env_path)
+
+
+def load_supabase():
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        raise RuntimeError("SUPABASE_URL / SUPABASE_SERVICE_KEY not found in .env")
+    return create_client(url, key)
+
+
+def print_summary(report: dict, seconds: float, limit: int) -> None:
+    summary = report["summary"]
+    print(
+        f"{summary['clusters']} duplicate clusters in {summary['subjects']} subjects "
+        f"({summary['duplicates']} duplicates, {summary['rewired_children']} children to rewire; "
+        f"threshold {report['threshold']}, {report['source']}, {seconds:.1f}s)"
+    )
+    for cluster in report["clusters"][:limit]:
+        canon = cluster["canonical"]
+        print(f"\n  [{cluster['subject_id']}] keep {canon['topic_code']}: {canon['topic_name']}")
+        for dup in cluster["duplicates"]:
+            print(f"      drop {dup['topic_code']}: {dup['topic_name']}  (similarity {dup['similarity']})")
+    if len(report["clusters"]) > limit:
+        print(f"\n  ... {len(report['clusters']) - limit} more (use --json for the full list)")
+    if summary["duplicates"]:
+        print("\nMERGED" if report["merged"] else "\nRe-run with --merge to apply")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Find (and merge) near-duplicate staging topics")
+    parser.add_argument("--board", action="append", dest="boards", help="Exam board (repeatable)")
+    parser.add_argument("--qualification", help="e.g. A-Level, GCSE")
+    parser.add_argument("--subject-id", action="append", dest="subject_ids", help="Subject id (repeatable)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Minimum name similarity (Jaccard of character 3-grams)")
+    parser.add_argument("--merge", action="store_true", help="Rewire children and delete duplicates")
+    parser.add_argument("--snapshot", nargs="?", const=str(DEFAULT_MIRROR_PATH), default=None,
+                        help="Read the local mirror (scripts/sync_local_mirror.py) instead of Supabase")
+    parser.add_argument("--limit", type=int, default=50, help="Clusters to print")
+    parser.add_argument("--json", dest="json_path", help="Write the full report here ('-' for stdout)")
+    args = parser.parse_args()
+
+    if args.snapshot and args.merge:
+        parser.error("--merge writes to Supabase; it can't be combined with --snapshot")
+
+    started = time.time()
+    if args.snapshot:
+        topics = topics_from_snapshot(connect(args.snapshot), args.boards, args.qualification, args.subject_ids)
+        report = find_duplicates(None, threshold=args.threshold, topics=topics)
+    else:
+        report = find_duplicates(load_supabase(), args.boards, args.qualification, args.subject_ids,
+                                 threshold=args.threshold, merge=args.merge)
+
+    if args.json_path == "-":
+        json.dump(report, sys.stdout, indent=2, default=str)
+        print()
+    else:
+        print_summary(report, time.time() - started, args.limit)
+        if args.json_path:
+            Path(args.json_path).write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+            print(f"Report written to {args.json_path}")
+
+    if report["summary"]["duplicates"] and not report["merged"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
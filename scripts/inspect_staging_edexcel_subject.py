@@ -24,6 +24,9 @@ from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 from supabase import create_client
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from database.keyset_reader import fetch_all
+
 
 CODE_2_RE = re.compile(r"^\d+\.\d+$")
 CODE_3_RE = re.compile(r"^\d+\.\d+\.\d+$")
@@ -86,17 +89,16 @@ def _find_subject(sb, subject_code: str, qualification_type: str, exam_board: st
 
 
 def _fetch_topics(sb, subject_id: str) -> List[Dict[str, Any]]:
-    # Pull only what we need for analysis.
-    resp = (
-        sb.table("staging_aqa_topics")
+    # Pull only what we need for analysis (paged, so large subjects aren't truncated).
+    topics = fetch_all(
+        sb,
+        "staging_aqa_topics",
         # Keep this select conservative: created_at/updated_at may not exist in staging.
-        .select("id, topic_code, topic_name, topic_level, parent_topic_id")
-        .eq("subject_id", subject_id)
-        .order("topic_level")
-        .order("topic_code")
-        .execute()
+        "id,topic_code,topic_name,topic_level,parent_topic_id",
+        filters=[("subject_id", "eq", subject_id)],
     )
-    return resp.data or []
+    topics.sort(key=lambda t: (t.get("topic_level") or 0, t.get("topic_code") or ""))
+    return topics
 
 
 def _summarize(subject: Dict[str, Any], topics: List[Dict[str, Any]]) -> None:
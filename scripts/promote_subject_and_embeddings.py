@@ -39,6 +39,13 @@ from typing import Any, Dict, List, Optional, Tuple
 from supabase import create_client
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from database.dedup import plan_merges
+from database.embedding_writer import DEFAULT_MAX_BYTES, PRECISIONS, upsert_embeddings, vector_literals
+from database.keyset_reader import fetch_all
+from utils.embeddings import embed_texts
+from utils.topic_tree import build_tree
+
 # Load local .env (keeps CLI usage simple)
 _env_path = Path(__file__).resolve().parents[1] / ".env"
 if _env_path.exists():
@@ -57,27 +64,6 @@ def getenv_required(name: str) -> str:
     return v
 
 
-def pgvector_literal(vec: List[float]) -> str:
-    # pgvector input format: [0.1,0.2,...]
-    # Keep it compact; PostgREST will cast text -> vector.
-    return "[" + ",".join(f"{x:.8f}" for x in vec) + "]"
-
-
-def openai_embed(texts: List[str]) -> List[List[float]]:
-    """
-    Uses OpenAI embeddings (text-embedding-3-small) and returns vectors.
-    """
-    from openai import OpenAI  # type: ignore
-
-    api_key = getenv_required("OPENAI_API_KEY")
-    client = OpenAI(api_key=api_key)
-
-    # Batch call
-    res = client.embeddings.create(model="text-embedding-3-small", input=texts)
-    # Preserve ordering
-    return [d.embedding for d in res.data]
-
-
 def openai_summary(topic_name: str, full_path: List[str]) -> str:
     """
     Optional small plain-English summary for search results.
@@ -139,11 +125,32 @@ def main() -> None:
     ap.add_argument("--subject-name", default="", help="fallback selector (ilike)")
     ap.add_argument("--generate-embeddings", action="store_true")
     ap.add_argument("--generate-summaries", action="store_true", help="extra cost; optional")
-    ap.add_argument("--batch-size", type=int, default=25)
+    ap.add_argument("--batch-size", type=int, default=200, help="topics embedded per OpenAI request")
+    ap.add_argument(
+        "--embedding-precision",
+        choices=list(PRECISIONS),
+        default="float32",
+        help="float16 sends ~35%% smaller payloads (exact for a halfvec column)",
+    )
+    ap.add_argument(
+        "--embedding-dimensions",
+        type=int,
+        help="shortened text-embedding-3 vectors; topic_ai_metadata.embedding must be vector(N)",
+    )
+    ap.add_argument("--upsert-max-bytes", type=int, default=DEFAULT_MAX_BYTES, help="JSON body budget per upsert")
+    ap.add_argument(
+        "--dedupe-threshold",
+        type=float,
+        default=1.0,
+        help="name similarity for merging sibling topics; default 1.0 merges exact (normalized) "
+        "matches only, lower values also merge near-duplicates (review with dedupe_staging_topics.py first)",
+    )
     args = ap.parse_args()
 
     if not args.subject_code and not args.subject_name:
         die("Provide --subject-code or --subject-name")
+    if not 0.0 < args.dedupe_threshold <= 1.0:
+        die("--dedupe-threshold must be in (0, 1]")
 
     supabase_url = getenv_required("SUPABASE_URL")
     # Backward compatible: older scripts/use-cases store the service role key as SUPABASE_SERVICE_KEY.
@@ -226,90 +233,36 @@ def main() -> None:
     # 4) Replace curriculum_topics for this subject
     print("[4/5] Updating curriculum_topics for this subject (preserve IDs where possible)...")
     # NOTE: staging_aqa_topics does NOT always include sort_order. We compute a deterministic order client-side.
-    topics_res = (
-        sb.table("staging_aqa_topics")
-        .select("id,topic_code,topic_name,topic_level,parent_topic_id,subject_id")
-        .eq("subject_id", stg["id"])
-        .order("topic_level")
-        .order("topic_code")
-        .execute()
+    stg_topics = fetch_all(
+        sb,
+        "staging_aqa_topics",
+        "id,topic_code,topic_name,topic_level,parent_topic_id,subject_id",
+        filters=[("subject_id", "eq", stg["id"])],
     )
-    stg_topics = topics_res.data or []
+    stg_topics.sort(key=lambda t: (int(t.get("topic_level") or 0), str(t.get("topic_code") or "")))
     if not stg_topics:
         die("No staging topics found for that staging subject id.")
     print(f"  - staging topics: {len(stg_topics)}")
 
     # Staging can contain accidental duplicates (especially from AI outputs), commonly at bullet level.
     # Production enforces uniqueness on (exam_board_subject_id, parent_topic_id, topic_level, topic_name),
-    # so we must de-duplicate BEFORE promoting.
-    def _norm_topic_name(x: Any) -> str:
-        s = str(x or "")
-        s = s.replace("\ufffd", "•").replace("●", "•")
-        s = " ".join(s.split()).strip()
-        return s
-
-    # Merge duplicates by rewiring children to a canonical node, then dropping duplicates.
-    stg_by_id: Dict[str, Dict[str, Any]] = {str(t["id"]): t for t in stg_topics if t.get("id")}
-    children_by_parent: Dict[str, List[str]] = {}
-    for t in stg_topics:
-        pid = t.get("parent_topic_id")
-        if pid:
-            children_by_parent.setdefault(str(pid), []).append(str(t.get("id")))
-
-    canonical_by_key: Dict[tuple, str] = {}
-    dup_ids: List[str] = []
-    # Deterministic canonical pick: lowest topic_code, then lowest UUID string.
-    for t in sorted(
-        (t for t in stg_topics if t.get("id")),
-        key=lambda x: (str(x.get("topic_code") or ""), str(x.get("id") or "")),
-    ):
-        tid = str(t["id"])
-        key = (
-            str(t.get("parent_topic_id") or ""),
-            int(t.get("topic_level") or 0),
-            _norm_topic_name(t.get("topic_name")),
+    # so we must de-duplicate BEFORE promoting. Near-duplicate siblings ("Cardiac cycle" / "The cardiac
+    # cycle.") are merged into a canonical node and their children rewired (database/dedup.py).
+    dedup = plan_merges(stg_topics, threshold=args.dedupe_threshold)
+    if dedup.removed:
+        stg_topics = dedup.kept
+        print(
+            f"  - staging duplicates removed: {len(dedup.removed)} "
+            f"(rewired {len(dedup.rewired)} children)"
         )
-        if key not in canonical_by_key:
-            canonical_by_key[key] = tid
-        else:
-            dup_ids.append(tid)
 
-    if dup_ids:
-        # Rewire children of dup nodes -> canonical node
-        for dup_id in dup_ids:
-            dup = stg_by_id.get(dup_id)
-            if not dup:
-                continue
-            key = (
-                str(dup.get("parent_topic_id") or ""),
-                int(dup.get("topic_level") or 0),
-                _norm_topic_name(dup.get("topic_name")),
-            )
-            canon_id = canonical_by_key.get(key)
-            if not canon_id or canon_id == dup_id:
-                continue
-            for child_id in children_by_parent.get(dup_id, []):
-                child = stg_by_id.get(child_id)
-                if child:
-                    child["parent_topic_id"] = canon_id
-        # Drop duplicate nodes from the list
-        before = len(stg_topics)
-        stg_topics = [t for t in stg_topics if str(t.get("id")) not in set(dup_ids)]
-        print(f"  - staging duplicates removed: {before - len(stg_topics)} (rewired children where needed)")
-
-    # Compute deterministic sort_order for production inserts/updates.
+    # Compute deterministic sort_order (pre-order: parents first, siblings by topic_code) plus the
+    # name paths the embedding step needs, in one pass over the in-memory tree (utils/topic_tree.py).
     # This avoids relying on a staging sort_order column and keeps ordering stable across runs.
-    stg_topics_sorted = sorted(
-        stg_topics,
-        key=lambda t: (
-            int(t.get("topic_level") or 0),
-            str(t.get("topic_code") or ""),
-            str(t.get("id") or ""),
-        ),
-    )
-    stg_sort_order_by_id: Dict[str, int] = {
-        str(t.get("id")): i for i, t in enumerate(stg_topics_sorted) if t.get("id")
-    }
+    tree = build_tree(stg_topics)
+    if tree.unreachable:
+        print(f"  - WARNING: {len(tree.unreachable)} staging topics sit on a parent cycle; they won't get embeddings")
+    stg_sort_order_by_id: Dict[str, int] = {topic_id: node.sort_order for topic_id, node in tree.nodes.items()}
 
     # SAFETY:
     # Do NOT delete all production topics for a subject once users can have flashcards referencing topic_id.
@@ -321,13 +274,8 @@ def main() -> None:
     # Fetch existing production topics for this subject (id + topic_code).
     # We intentionally treat topic_code as the stable identity key for a node.
     # Matching by (level,name) can incorrectly collapse legitimately distinct nodes that share names.
-    prod_rows = (
-        sb.table("curriculum_topics")
-        .select("id,topic_code")
-        .eq("exam_board_subject_id", prod_subject_id)
-        .execute()
-        .data
-        or []
+    prod_rows = fetch_all(
+        sb, "curriculum_topics", "id,topic_code", filters=[("exam_board_subject_id", "eq", prod_subject_id)]
     )
     prod_id_by_code = {
         r.get("topic_code"): r.get("id") for r in prod_rows if r.get("topic_code") and r.get("id")
@@ -368,13 +316,8 @@ def main() -> None:
         sb.table("curriculum_topics").upsert(upserts[i : i + 1000], on_conflict="id").execute()
 
     # Refresh production lookup (need IDs for newly-inserted codes)
-    prod_rows2 = (
-        sb.table("curriculum_topics")
-        .select("id,topic_code")
-        .eq("exam_board_subject_id", prod_subject_id)
-        .execute()
-        .data
-        or []
+    prod_rows2 = fetch_all(
+        sb, "curriculum_topics", "id,topic_code", filters=[("exam_board_subject_id", "eq", prod_subject_id)]
     )
     prod_id_by_code2 = {r.get("topic_code"): r.get("id") for r in prod_rows2 if r.get("topic_code") and r.get("id")}
 
@@ -439,46 +382,36 @@ def main() -> None:
         return
 
     print("[5/5] Generating embeddings for this subject...")
-
-    # Query topics_with_context for this subject (filters match the view fields)
-    ctx_res = (
-        sb.table("topics_with_context")
-        .select("topic_id,topic_name,topic_code,topic_level,sort_order,subject_name,exam_board,qualification_level,full_path")
-        .eq("exam_board", exam_board)
-        .eq("qualification_level", qualification)
-        .eq("subject_code", subject_code)
-        .order("topic_level")
-        .order("sort_order")
-        .execute()
-    )
-    ctx_rows = ctx_res.data or []
+    getenv_required("OPENAI_API_KEY")
+
+    # Paths come from the staging tree already in memory (no topics_with_context round trip,
+    # which is recursive server-side and capped by the row limit on large subjects).
+    stg_by_id = {str(t["id"]): t for t in stg_topics if t.get("id")}
+    ctx_rows = []
+    seen_prod_ids = set()
+    for stg_id in tree.order:
+        t = stg_by_id[stg_id]
+        prod_id = prod_id_by_code2.get(t.get("topic_code"))
+        if not prod_id or prod_id in seen_prod_ids:
+            continue
+        seen_prod_ids.add(prod_id)
+        ctx_rows.append(
+            {
+                "topic_id": prod_id,
+                "topic_name": t.get("topic_name"),
+                "topic_code": t.get("topic_code"),
+                "topic_level": t.get("topic_level"),
+                "full_path": list(tree[stg_id].full_path),
+            }
+        )
     if not ctx_rows:
-        die("topics_with_context returned 0 rows for this subject. Is production is_current=true and topics inserted?")
+        die("No promoted topics to embed for this subject.")
 
     # Batch embed
     batch_size = max(1, int(args.batch_size))
     total = len(ctx_rows)
     created = 0
 
-    def upsert_topic_ai_metadata_chunk(rows_chunk: List[Dict[str, Any]], chunk_size: int = 25) -> None:
-        """
-        Supabase/PostgREST can intermittently fail on large payloads (especially embeddings).
-        Upsert in small chunks with retries to handle transient network/TLS issues.
-        """
-        for j in range(0, len(rows_chunk), chunk_size):
-            batch = rows_chunk[j : j + chunk_size]
-            last_err: Exception | None = None
-            for attempt in range(5):
-                try:
-                    sb.table("topic_ai_metadata").upsert(batch, on_conflict="topic_id").execute()
-                    last_err = None
-                    break
-                except Exception as e:
-                    last_err = e
-                    time.sleep(min(8.0, 0.8 * (2**attempt)))
-            if last_err:
-                raise last_err
-
     # Pre-clear existing metadata for topics in this subject (defensive)
     # If IDs changed, this ensures no stale rows remain. If IDs are stable, delete is a no-op because topics were deleted.
     topic_ids = [r["topic_id"] for r in ctx_rows]
@@ -494,9 +427,12 @@ def main() -> None:
             text = f"{r.get('topic_name','')}\nPath: {path}\nCode: {r.get('topic_code','')}"
             texts.append(text)
 
-        vectors = openai_embed(texts)
+        literals = vector_literals(
+            embed_texts(texts, dimensions=args.embedding_dimensions),
+            precision=args.embedding_precision,
+        )
         upserts = []
-        for r, vec in zip(chunk, vectors):
+        for r, literal in zip(chunk, literals):
             full_path = r.get("full_path") or []
             summary = r.get("topic_name") or ""
             if args.generate_summaries:
@@ -506,13 +442,13 @@ def main() -> None:
             upserts.append(
                 {
                     "topic_id": r["topic_id"],
-                    "embedding": pgvector_literal(vec),
+                    "embedding": literal,
                     "plain_english_summary": summary,
                     "difficulty_band": "core",
                     "exam_importance": 0.5,
-                    "subject_name": r.get("subject_name") or subject_name,
-                    "exam_board": r.get("exam_board") or exam_board,
-                    "qualification_level": r.get("qualification_level") or qualification,
+                    "subject_name": subject_name,
+                    "exam_board": exam_board,
+                    "qualification_level": qualification,
                     "topic_level": r.get("topic_level"),
                     "full_path": full_path,
                     "is_active": True,
@@ -520,12 +456,8 @@ def main() -> None:
                 }
             )
 
-        # Upsert embeddings in smaller batches to avoid large payload/network issues
-        upsert_topic_ai_metadata_chunk(
-            upserts,
-            chunk_size=min(25, max(5, batch_size // 4)),
-        )
-        created += len(upserts)
+        # Chunked by payload size; a chunk that keeps failing is split rather than retried whole
+        created += upsert_embeddings(sb, upserts, max_bytes=args.upsert_max_bytes)
         print(f"  - upserted embeddings: {created}/{total}")
         time.sleep(0.2)
 
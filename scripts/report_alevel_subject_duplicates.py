@@ -13,12 +13,15 @@ This script DOES NOT delete anything. It prints:
 
 Usage:
   PYTHONIOENCODING=utf-8 python scripts/report_alevel_subject_duplicates.py
+  PYTHONIOENCODING=utf-8 python scripts/report_alevel_subject_duplicates.py --snapshot   # local mirror
 """
 
 from __future__ import annotations
 
+import argparse
 import os
 import re
+import sys
 from collections import defaultdict
 from dataclasses import dataclass
 from pathlib import Path
@@ -26,6 +29,9 @@ from pathlib import Path
 from dotenv import load_dotenv
 from supabase import create_client
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from database.local_mirror import DEFAULT_MIRROR_PATH, connect
+
 
 @dataclass(frozen=True)
 class SubjectRow:
@@ -91,6 +97,31 @@ def fetch_alevel_subjects(supabase, *, board: str) -> list[SubjectRow]:
     return rows
 
 
+def fetch_alevel_subjects_snapshot(conn, *, board: str) -> list[SubjectRow]:
+    """Same rows from the local mirror: one grouped query instead of a count per subject."""
+    subs = conn.execute(
+        """
+        select s.id, s.subject_code, s.subject_name, count(t.id) as topic_count
+        from staging_aqa_subjects s
+        left join staging_aqa_topics t on t.subject_id = s.id and t.exam_board = s.exam_board
+        where s.qualification_type = 'A-Level' and s.exam_board = ?
+        group by s.id, s.subject_code, s.subject_name
+        """,
+        (board,),
+    ).fetchall()
+    return [
+        SubjectRow(
+            id=s["id"],
+            subject_code=s["subject_code"],
+            subject_name=s["subject_name"],
+            exam_board=board,
+            topic_count=int(s["topic_count"]),
+            norm_name=norm_name(s["subject_name"]),
+        )
+        for s in subs
+    ]
+
+
 def pick_keeper(board: str, items: list[SubjectRow]) -> SubjectRow:
     """
     Prefer the 'real' A-level code row (BOARD-A###QS) when present.
@@ -105,13 +136,23 @@ def pick_keeper(board: str, items: list[SubjectRow]) -> SubjectRow:
 
 
 def main() -> None:
-    supabase = load_supabase()
+    parser = argparse.ArgumentParser(description="Report duplicate / placeholder A-Level subjects in staging")
+    parser.add_argument("--snapshot", nargs="?", const=str(DEFAULT_MIRROR_PATH), default=None,
+                        help="Read the local mirror (scripts/sync_local_mirror.py) instead of Supabase")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        conn = connect(args.snapshot)
+        fetch = lambda board: fetch_alevel_subjects_snapshot(conn, board=board)  # noqa: E731
+    else:
+        supabase = load_supabase()
+        fetch = lambda board: fetch_alevel_subjects(supabase, board=board)  # noqa: E731
     boards = ["EDUQAS", "WJEC"]
 
     to_delete: list[SubjectRow] = []
 
     for board in boards:
-        rows = fetch_alevel_subjects(supabase, board=board)
+        rows = fetch(board)
         groups: dict[str, list[SubjectRow]] = defaultdict(list)
         for r in rows:
             groups[r.norm_name].append(r)
@@ -6,18 +6,23 @@ Checks:
    logical subject name (normalized subject_name).
 2) Each A-Level subject should have >0 topics.
 3) Parent linkage integrity: no orphaned parent_topic_id rows for these subjects.
+   (Counts and orphans come from database/integrity.py; scripts/check_staging_integrity.py
+   also reports cycles, level jumps and duplicate codes.)
 4) Cross-board duplication: for paired entry codes A###QS, ensure EDUQAS-A###QS and WJEC-A###QS exist
    and have the same topic counts (optionally allow differences via threshold).
 
 Usage:
   cd <repo>
   PYTHONIOENCODING=utf-8 python scripts/sanity_check_alevel_staging.py
+  PYTHONIOENCODING=utf-8 python scripts/sanity_check_alevel_staging.py --snapshot   # local mirror, no network
 """
 
 from __future__ import annotations
 
+import argparse
 import os
 import re
+import sys
 from collections import Counter, defaultdict
 from dataclasses import dataclass
 from pathlib import Path
@@ -25,6 +30,10 @@ from pathlib import Path
 from dotenv import load_dotenv
 from supabase import create_client
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from database.integrity import run_checks, run_snapshot
+from database.local_mirror import DEFAULT_MIRROR_PATH, connect
+
 
 ENV_PATH = Path(r"C:\Users\tonyd\OneDrive - 4Sight Education Ltd\Apps\flash-curriculum-pipeline\.env")
 
@@ -60,70 +69,41 @@ def load_supabase():
     return create_client(url, key)
 
 
-def fetch_subjects(sb, board: str) -> list[Subject]:
-    rows = (
-        sb.table("staging_aqa_subjects")
-        .select("id,subject_code,subject_name,exam_board")
-        .eq("qualification_type", QUAL)
-        .eq("exam_board", board)
-        .execute()
-        .data
-        or []
-    )
-    return [Subject(**r) for r in rows]
-
-
-def topic_count(sb, *, subject_id: str, board: str) -> int:
-    res = sb.table("staging_aqa_topics").select("id", count="exact").eq("subject_id", subject_id).eq("exam_board", board).execute()
-    return int(res.count or 0)
-
-
-def orphan_parent_count(sb, *, subject_id: str, board: str) -> int:
-    """
-    Fetch topic ids and parent ids for the subject; compute orphans client-side.
-    IMPORTANT: Supabase/PostgREST will paginate; do NOT assume a single request returns all rows.
-    """
-    page_size = 1000
-    offset = 0
-    ids: set[str] = set()
-    parent_rows: list[dict] = []
-
-    while True:
-        res = (
-            sb.table("staging_aqa_topics")
-            .select("id,parent_topic_id")
-            .eq("subject_id", subject_id)
-            .eq("exam_board", board)
-            .range(offset, offset + page_size - 1)
-            .execute()
-        )
-        batch = res.data or []
-        if not batch:
-            break
-        for r in batch:
-            ids.add(r["id"])
-            if r.get("parent_topic_id"):
-                parent_rows.append(r)
-        if len(batch) < page_size:
-            break
-        offset += page_size
-
-    orphans = 0
-    for r in parent_rows:
-        pid = r.get("parent_topic_id")
-        if pid and pid not in ids:
-            orphans += 1
-    return orphans
+def subjects_from_report(report: dict, board: str) -> list[Subject]:
+    return [
+        Subject(id=s["subject_id"], subject_code=s["subject_code"], subject_name=s["subject_name"], exam_board=board)
+        for s in report["subjects"]
+        if s["exam_board"] == board
+    ]
+
+
+def topic_stats(report: dict) -> dict[str, tuple[int, int]]:
+    """subject_id -> (topic count, orphan parent refs) from an integrity report."""
+    orphans = Counter(i["subject_id"] for i in report["issues"] if i["check"] == "orphan_parent")
+    return {s["subject_id"]: (s["topic_count"], orphans.get(s["subject_id"], 0)) for s in report["subjects"]}
 
 
 def main() -> None:
-    sb = load_supabase()
+    parser = argparse.ArgumentParser(description="Sanity check EDUQAS + WJEC A-Level staging")
+    parser.add_argument("--snapshot", nargs="?", const=str(DEFAULT_MIRROR_PATH), default=None,
+                        help="Check the local mirror (scripts/sync_local_mirror.py) instead of Supabase")
+    args = parser.parse_args()
+
+    sb = conn = None
+    if args.snapshot:
+        conn = connect(args.snapshot)
+    else:
+        sb = load_supabase()
 
     print("=" * 90)
-    print("SANITY CHECK: EDUQAS + WJEC A-LEVEL STAGING")
+    print("SANITY CHECK: EDUQAS + WJEC A-LEVEL STAGING" + (f" (snapshot {args.snapshot})" if conn else ""))
     print("=" * 90)
 
-    subjects_by_board: dict[str, list[Subject]] = {b: fetch_subjects(sb, b) for b in BOARDS}
+    # Subjects, topic counts and orphan refs for both boards in one integrity run
+    # (server-side RPC when installed, otherwise subjects are checked concurrently)
+    report = run_snapshot(conn, BOARDS, QUAL) if conn else run_checks(sb, BOARDS, QUAL)
+    subjects_by_board: dict[str, list[Subject]] = {b: subjects_from_report(report, b) for b in BOARDS}
+    stats = topic_stats(report)
 
     # 1) Within-board duplicate normalized names
     print("\n## Within-board duplicates")
@@ -150,11 +130,10 @@ def main() -> None:
         zeros = 0
         orphans_total = 0
         for s in subs:
-            cnt = topic_count(sb, subject_id=s.id, board=board)
+            cnt, orph = stats.get(s.id, (0, 0))
             counts_by_code[(board, s.subject_code)] = cnt
             if cnt == 0:
                 zeros += 1
-            orph = orphan_parent_count(sb, subject_id=s.id, board=board)
             orphans_total += orph
         print(f"- {board}: subjects={len(subs)} zero-topic={zeros} orphan-parent-refs={orphans_total}")
         if zeros:
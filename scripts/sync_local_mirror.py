@@ -0,0 +1,61 @@
+"""
+Sync the local SQLite mirror of the curriculum tables (database/local_mirror.py).
+
+The first run copies everything; later runs only fetch rows changed since the last
+sync (updated_at / created_at watermarks) and drop rows deleted upstream. Audit
+scripts then read the snapshot with --snapshot instead of querying Supabase:
+
+  python scripts/sanity_check_alevel_staging.py --snapshot
+  python scripts/report_alevel_subject_duplicates.py --snapshot
+  python generate_detailed_report.py --snapshot
+
+Usage:
+  python scripts/sync_local_mirror.py
+  python scripts/sync_local_mirror.py --full
+  python scripts/sync_local_mirror.py --tables staging_aqa_subjects staging_aqa_topics
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from database.local_mirror import DEFAULT_MIRROR_PATH, MIRROR_TABLES, sync_mirror
+
+_env_path = Path(__file__).resolve().parents[1] / ".env"
+if _env_path.exists():
+    load_dotenv(_env_path)
+
+
+def load_supabase():
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        raise RuntimeError("SUPABASE_URL / SUPABASE_SERVICE_KEY not found in .env")
+    return create_client(url, key)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sync the local curriculum mirror from Supabase")
+    parser.add_argument("--path", default=str(DEFAULT_MIRROR_PATH), help="SQLite file to write")
+    parser.add_argument("--tables", nargs="+", choices=list(MIRROR_TABLES), help="Only sync these tables")
+    parser.add_argument("--full", action="store_true", help="Ignore watermarks and re-copy every row")
+    parser.add_argument("--no-prune", action="store_true",
+                        help="Skip the id scan that removes rows deleted upstream")
+    args = parser.parse_args()
+
+    tables = {t: MIRROR_TABLES[t] for t in args.tables} if args.tables else None
+    print(f"Syncing mirror {args.path}")
+    results = sync_mirror(load_supabase(), args.path, tables, full=args.full, prune=not args.no_prune)
+    if any("error" in r for r in results.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
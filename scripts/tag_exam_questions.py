@@ -0,0 +1,102 @@
+"""
+Batch-tag extracted exam questions to curriculum topics (processors/question_tagger.py).
+
+Embeds every untagged question of the selected papers in bulk, matches them against
+the subject's topic embeddings locally (database/vector_index.py) and writes
+question_topic_links in bulk. Only low-confidence questions go to the LLM.
+Needs database/migrations/010_question_topic_links.sql.
+
+Usage:
+  python scripts/tag_exam_questions.py --subject-id <exam_board_subjects.id> --year 2023 --year 2024
+  python scripts/tag_exam_questions.py --paper-id <exam_papers.id> --dry-run --no-llm
+  python scripts/tag_exam_questions.py --subject-id <uuid> --min-level 1 --retag
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from processors.question_tagger import LLM_MODEL, MIN_SCORE, TOP_K, tag_questions
+
+_env_path = Path(__file__).resolve().parents[1] / ".env"
+if _env_path.exists():
+    load_dotenv(_env_path)
+
+
+def load_supabase():
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        raise RuntimeError("SUPABASE_URL / SUPABASE_SERVICE_KEY not found in .env")
+    return create_client(url, key)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tag exam questions to curriculum topics in bulk")
+    parser.add_argument("--paper-id", action="append", dest="paper_ids", help="exam_papers.id (repeatable)")
+    parser.add_argument("--subject-id", help="exam_board_subjects.id (all its papers, or --year ones)")
+    parser.add_argument("--year", action="append", type=int, dest="years", help="Paper year (repeatable)")
+    parser.add_argument("--min-level", type=int, help="Lowest topic_level a question may be tagged with")
+    parser.add_argument("--max-level", type=int, help="Highest topic_level a question may be tagged with")
+    parser.add_argument("--path-prefix", help="Only topics whose path contains this (e.g. 'Component 1')")
+    parser.add_argument("--top-k", type=int, default=TOP_K, help="Candidates per question")
+    parser.add_argument("--min-score", type=float, default=MIN_SCORE, help="Confidence threshold (cosine)")
+    parser.add_argument("--max-topics", type=int, default=1, help="Links per question (near-ties only)")
+    parser.add_argument("--no-llm", action="store_true", help="Leave low-confidence questions untagged")
+    parser.add_argument("--llm-model", default=LLM_MODEL)
+    parser.add_argument("--include-unconfident", action="store_true",
+                        help="Write low-confidence embedding matches the LLM didn't resolve")
+    parser.add_argument("--retag", action="store_true", help="Replace existing links")
+    parser.add_argument("--dry-run", action="store_true", help="Match without writing links")
+    parser.add_argument("--json", dest="json_path", help="Write the report here ('-' for stdout)")
+    args = parser.parse_args()
+
+    if not args.paper_ids and not args.subject_id:
+        parser.error("Provide --paper-id or --subject-id")
+
+    started = time.time()
+    report = tag_questions(
+        load_supabase(),
+        paper_ids=args.paper_ids,
+        subject_id=args.subject_id,
+        years=args.years,
+        min_level=args.min_level,
+        max_level=args.max_level,
+        path_prefix=args.path_prefix,
+        top_k=args.top_k,
+        min_score=args.min_score,
+        max_topics=args.max_topics,
+        use_llm=not args.no_llm,
+        llm_model=args.llm_model,
+        retag=args.retag,
+        include_unconfident=args.include_unconfident,
+        dry_run=args.dry_run,
+    )
+
+    if args.json_path == "-":
+        json.dump(report, sys.stdout, indent=2, default=str)
+        print()
+        return
+    print(f"Questions: {report['questions']} ({time.time() - started:.1f}s)")
+    for s in report["subjects"]:
+        print(f"  - [{s['exam_board']}] {s['subject_name']}: {s['tagged']}/{s['questions']} tagged "
+              f"({s['confident']} confident by embedding, {s['by_llm']} via LLM)")
+    print(f"Tagged {report['tagged']} (embedding {report['by_embedding']}, LLM {report['by_llm']} "
+          f"in {report['llm_requests']} requests), untagged {report['untagged']}")
+    print("Dry run - nothing written" if args.dry_run else f"Links written: {report['links_written']}")
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+        print(f"Report written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 #!/usr/bin/env python
 """
-Test deep extraction with History 1B (Spain in the Age of Discovery).
-This will extract all 3 levels of content.
+Test deep extraction with History options (default 1B, Spain in the Age of Discovery).
+This will extract all 3 levels of content; several options are extracted concurrently.
+
+Usage:
+    python scripts/test_deep_extraction.py ["1B=Spain in the Age of Discovery, 1469-1598" ...]
 """
 
+import argparse
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -16,9 +20,60 @@ import PyPDF2
 
 load_dotenv()
 
+# "CODE=Title" per option; several options are extracted concurrently
+DEFAULT_OPTIONS = ["1B=Spain in the Age of Discovery, 1469-1598"]
+
+
+def parse_options(specs):
+    options = []
+    for spec in specs:
+        code, _, title = spec.partition("=")
+        options.append({'code': code.strip(), 'title': title.strip() or code.strip()})
+    return options
+
+
+def print_summary(result):
+    print(f"\nOption: {result.get('option_code')} - {result.get('option_title')}")
+    
+    key_qs = result.get('key_questions', [])
+    print(f"\nKey Questions: {len(key_qs)}")
+    for i, q in enumerate(key_qs[:3], 1):
+        print(f"  {i}. {q}")
+    if len(key_qs) > 3:
+        print(f"  ... and {len(key_qs) - 3} more")
+    
+    study_areas = result.get('study_areas', [])
+    print(f"\nStudy Areas: {len(study_areas)}")
+    
+    total_sections = 0
+    total_points = 0
+    
+    for area in study_areas:
+        print(f"\n  {area.get('area_title')}")
+        sections = area.get('sections', [])
+        total_sections += len(sections)
+        
+        for section in sections:
+            points = section.get('content_points', [])
+            total_points += len(points)
+            print(f"    - {section.get('section_title')}: {len(points)} content points")
+    
+    print(f"\nTOTAL:")
+    print(f"  Study Areas: {len(study_areas)}")
+    print(f"  Sections: {total_sections}")
+    print(f"  Content Points: {total_points}")
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Deep-extract History options from the AQA A-Level spec')
+    parser.add_argument('options', nargs='*', default=DEFAULT_OPTIONS,
+                        help='Options as "CODE=Title" (default: 1B)')
+    parser.add_argument('--max-workers', type=int, help='Concurrent option extractions (default: provider limit)')
+    args = parser.parse_args()
+    options = parse_options(args.options)
+    
     print("=" * 80)
-    print("DEEP EXTRACTION TEST: History 1B - Spain in the Age of Discovery")
+    print("DEEP EXTRACTION TEST: History " + ", ".join(opt['code'] for opt in options))
     print("=" * 80)
     
     # Load the PDF
@@ -37,68 +92,41 @@ def main():
     # Initialize deep extractor
     extractor = DeepContentExtractor()
     
-    # Extract complete content for option 1B
-    print("\nExtracting deep content for 1B: Spain in the Age of Discovery...")
-    print("This may take 30-60 seconds...\n")
+    # Options are independent: fan out under the shared Anthropic limit, results in option order
+    print(f"\nExtracting deep content for {len(options)} option(s)...")
+    print("Each option may take 30-60 seconds (options run concurrently)...\n")
     
-    result = extractor.extract_option_complete(
+    results = extractor.extract_options_complete(
         pdf_text=full_text,
-        option_code="1B",
-        option_title="Spain in the Age of Discovery, 1469-1598",
-        subject="History"
+        options=options,
+        subject="History",
+        max_workers=args.max_workers,
     )
     
-    # Save result
-    output_file = "data/test_deep_extraction_1B.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
-    
-    print(f"Saved to: {output_file}")
+    # Save results
+    for code, result in results.items():
+        output_file = f"data/test_deep_extraction_{code}.json"
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"Saved to: {output_file}")
     
     # Print summary
     print("\n" + "=" * 80)
     print("EXTRACTION RESULTS")
     print("=" * 80)
     
-    if result:
-        print(f"\nOption: {result.get('option_code')} - {result.get('option_title')}")
-        
-        key_qs = result.get('key_questions', [])
-        print(f"\nKey Questions: {len(key_qs)}")
-        for i, q in enumerate(key_qs[:3], 1):
-            print(f"  {i}. {q}")
-        if len(key_qs) > 3:
-            print(f"  ... and {len(key_qs) - 3} more")
-        
-        study_areas = result.get('study_areas', [])
-        print(f"\nStudy Areas: {len(study_areas)}")
-        
-        total_sections = 0
-        total_points = 0
-        
-        for area in study_areas:
-            print(f"\n  {area.get('area_title')}")
-            sections = area.get('sections', [])
-            total_sections += len(sections)
-            
-            for section in sections:
-                points = section.get('content_points', [])
-                total_points += len(points)
-                print(f"    - {section.get('section_title')}: {len(points)} content points")
-        
-        print(f"\nTOTAL:")
-        print(f"  Study Areas: {len(study_areas)}")
-        print(f"  Sections: {total_sections}")
-        print(f"  Content Points: {total_points}")
-        
-        print("\n" + "=" * 80)
-        print("SUCCESS! Complete hierarchical extraction working!")
-        print("=" * 80)
-        
-        return 0
-    else:
-        print("\nFailed to extract content")
+    for result in results.values():
+        print_summary(result)
+    
+    missing = [opt['code'] for opt in options if opt['code'] not in results]
+    if missing:
+        print(f"\nFailed to extract content for: {', '.join(missing)}")
         return 1
+    
+    print("\n" + "=" * 80)
+    print("SUCCESS! Complete hierarchical extraction working!")
+    print("=" * 80)
+    return 0
 
 if __name__ == '__main__':
     exit(main())
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+# Repo-root packages (database, utils, processors) and the flat scrapers/ modules
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'scrapers'))
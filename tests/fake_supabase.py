@@ -0,0 +1,70 @@
+"""In-memory stand-in for the supabase-py query builder (the subset the database helpers use)."""
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, client, table):
+        self.client, self.table = client, table
+        self.preds, self.orders, self.limit_n = [], [], None
+        self.columns = self.client.columns.get(table)
+
+    def select(self, columns):
+        for column in columns.split(','):
+            column = column.strip()
+            if column != '*' and self.columns is not None and column not in self.columns:
+                raise RuntimeError(f'column {self.table}.{column} does not exist')
+        return self
+
+    def _pred(self, fn):
+        self.preds.append(fn)
+        return self
+
+    def eq(self, column, value):
+        return self._pred(lambda r: r.get(column) == value)
+
+    def gt(self, column, value):
+        return self._pred(lambda r: r.get(column) is not None and r[column] > value)
+
+    def gte(self, column, value):
+        return self._pred(lambda r: r.get(column) is not None and r[column] >= value)
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._pred(lambda r: r.get(column) in values)
+
+    def is_(self, column, value):
+        return self._pred(lambda r: r.get(column) is None)
+
+    def order(self, column):
+        self.orders.append(column)
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def execute(self):
+        self.client.requests += 1
+        if self.table in self.client.fail_tables:
+            raise RuntimeError(f'{self.table} unavailable')
+        rows = [dict(r) for r in self.client.tables.get(self.table, []) if all(p(r) for p in self.preds)]
+        for column in reversed(self.orders):
+            rows.sort(key=lambda r: r[column])
+        cap = self.client.max_rows if self.limit_n is None else min(self.limit_n, self.client.max_rows)
+        return _Result(rows[:cap])
+
+
+class FakeSupabase:
+    def __init__(self, tables=None, max_rows=1000, columns=None):
+        self.tables = tables or {}
+        self.columns = columns or {}    # table -> allowed column names (None = anything)
+        self.max_rows = max_rows
+        self.fail_tables = set()
+        self.requests = 0
+
+    def table(self, name):
+        return _Query(self, name)
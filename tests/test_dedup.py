@@ -0,0 +1,63 @@
+from database.dedup import _differ_by_prefix, find_clusters, plan_merges
+
+
+def _topic(topic_id, name, parent=None, level=1, code=None):
+    return {'id': topic_id, 'subject_id': 's1', 'topic_code': code or topic_id, 'topic_name': name,
+            'topic_level': level, 'parent_topic_id': parent}
+
+
+def _merged(a, b, threshold=0.8):
+    return bool(find_clusters([_topic('t1', a, 'p'), _topic('t2', b, 'p')], threshold))
+
+
+def test_near_duplicates_merge():
+    assert _merged('Cardiac cycle', 'The cardiac cycle.')
+    assert _merged('Cardiac  cycle', 'cardiac cycle', threshold=1.0)
+
+
+def test_negating_prefix_is_a_different_topic():
+    assert not _merged('Organic chemistry', 'Inorganic chemistry')
+    assert not _merged('Metals', 'Non-metals')
+    assert not _merged('Saturated fats', 'Unsaturated fats')
+    assert not _merged('Sexual reproduction', 'Asexual reproduction')
+    assert not _merged('Aerobic respiration', 'Anaerobic respiration')
+    assert not _merged('Biotic factors', 'Abiotic factors')
+
+
+def test_words_starting_with_a_are_not_all_negations():
+    assert _differ_by_prefix(('anhydrous', 'salts'), ('hydrous', 'salts'))
+    assert not _differ_by_prefix(('around', 'the', 'world'), ('round', 'the', 'world'))
+    assert not _differ_by_prefix(('another', 'view'), ('other', 'view'))
+
+
+def test_roman_numerals_must_match():
+    assert not _merged('Statistics II', 'Statistics III')
+    assert not _merged('Hypothesis testing', 'Hypothesis testing II')
+    assert not _merged('Section A', 'Section B')
+
+
+def test_exact_threshold_only_merges_normalized_matches():
+    assert not _merged('Cardiac cycle', 'Cardiac cycles', threshold=1.0)
+
+
+def test_plan_keeps_distinct_siblings_and_their_children():
+    topics = [
+        _topic('p', 'Chemistry', level=0),
+        _topic('a', 'Inorganic chemistry', 'p', code='1.1'),
+        _topic('b', 'Organic chemistry', 'p', code='1.2'),
+        _topic('c', 'Alkanes', 'b', level=2, code='1.2.1'),
+    ]
+    plan = plan_merges(topics)
+    assert not plan.removed
+    assert {t['id']: t['parent_topic_id'] for t in plan.kept}['c'] == 'b'
+
+
+def test_plan_rewires_children_of_duplicates():
+    topics = [
+        _topic('a', 'Cardiac cycle', 'p', code='1.1'),
+        _topic('b', 'The cardiac cycle.', 'p', code='1.2'),
+        _topic('c', 'Systole', 'b', level=2, code='1.2.1'),
+    ]
+    plan = plan_merges(topics)
+    assert plan.removed == {'b': 'a'}
+    assert plan.rewired == {'c': 'a'}
@@ -0,0 +1,22 @@
+from database.keyset_reader import fetch_all, iter_pages
+
+from fake_supabase import FakeSupabase
+
+ROWS = [{'id': i, 'subject_id': 's1' if i % 2 else 's2'} for i in range(2500)]
+
+
+def test_pages_past_a_server_cap_below_page_size():
+    client = FakeSupabase({'t': ROWS}, max_rows=300)
+    assert [r['id'] for r in fetch_all(client, 't', 'id')] == list(range(2500))
+
+
+def test_filters_and_no_prefetch():
+    client = FakeSupabase({'t': ROWS})
+    pages = list(iter_pages(client, 't', 'subject_id', filters=[('subject_id', 'eq', 's1')],
+                            page_size=500, prefetch=False))
+    assert [len(p) for p in pages] == [500, 500, 250]
+    assert all(r['subject_id'] == 's1' for p in pages for r in p)
+
+
+def test_empty_table():
+    assert fetch_all(FakeSupabase(), 't') == []
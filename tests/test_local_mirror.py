@@ -0,0 +1,59 @@
+import pytest
+
+from database.local_mirror import _open_for_sync, sync_table
+
+from fake_supabase import FakeSupabase
+
+
+def _rows(conn, table):
+    return {r['id']: dict(r) for r in conn.execute(f'SELECT * FROM "{table}"')}
+
+
+@pytest.fixture
+def conn(tmp_path):
+    c = _open_for_sync(tmp_path / 'mirror.sqlite3')
+    yield c
+    c.close()
+
+
+def test_incremental_sync_pulls_changes_past_a_short_server_cap(conn):
+    rows = [{'id': f'{i:04d}', 'name': 'x', 'updated_at': f'2026-01-01T00:00:{i % 60:02d}'} for i in range(120)]
+    client = FakeSupabase({'curriculum_topics': rows}, max_rows=50)
+    assert sync_table(conn, client, 'curriculum_topics')['mode'] == 'full'
+
+    for r in rows[:70]:
+        r.update(name='renamed', updated_at='2026-02-01T00:00:00')
+    result = sync_table(conn, client, 'curriculum_topics')
+    assert result['mode'] == 'incremental'
+    local = _rows(conn, 'curriculum_topics')
+    assert sum(r['name'] == 'renamed' for r in local.values()) == 70
+
+
+def test_staging_topics_are_always_re_pulled(conn):
+    # sync_subject_topics / dedup rewires change rows without bumping updated_at
+    rows = [{'id': 'a', 'topic_name': 'Cells', 'parent_topic_id': None, 'updated_at': '2026-01-01'}]
+    client = FakeSupabase({'staging_aqa_topics': rows})
+    sync_table(conn, client, 'staging_aqa_topics')
+    rows[0]['topic_name'] = 'Cell biology'
+    assert sync_table(conn, client, 'staging_aqa_topics')['mode'] == 'full'
+    assert _rows(conn, 'staging_aqa_topics')['a']['topic_name'] == 'Cell biology'
+
+
+def test_created_at_only_tables_are_re_pulled(conn):
+    rows = [{'id': 'b1', 'code': 'AQA', 'created_at': '2026-01-01'}]
+    client = FakeSupabase({'exam_boards': rows}, columns={'exam_boards': {'id', 'code', 'created_at'}})
+    sync_table(conn, client, 'exam_boards')
+    rows[0]['code'] = 'AQA2'
+    assert sync_table(conn, client, 'exam_boards')['mode'] == 'full'
+    assert _rows(conn, 'exam_boards')['b1']['code'] == 'AQA2'
+
+
+def test_failed_full_pull_keeps_the_previous_snapshot(conn):
+    client = FakeSupabase({'curriculum_topics': [{'id': 'a', 'updated_at': '2026-01-01'}]})
+    sync_table(conn, client, 'curriculum_topics')
+    client.fail_tables.add('curriculum_topics')
+    with pytest.raises(RuntimeError):
+        sync_table(conn, client, 'curriculum_topics', full=True)
+    assert list(_rows(conn, 'curriculum_topics')) == ['a']
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert '_new_curriculum_topics' not in tables
@@ -0,0 +1,32 @@
+from marking_cache import MarkingCache, normalize_key_answer
+
+
+def _key(answer):
+    return MarkingCache.make_key('q1', 'v1', answer)
+
+
+def test_key_normalization_only_trims_whitespace_and_outer_punctuation():
+    assert normalize_key_answer('  CO2 \n emissions. ') == 'CO2 emissions'
+    assert normalize_key_answer('(A)') == 'A'
+    assert normalize_key_answer('-5') == '-5'
+    assert normalize_key_answer('.5') == '.5'
+
+
+def test_keys_preserve_case_and_words():
+    assert _key('CO') != _key('Co')
+    assert _key('Option A') != _key('Option')
+    assert _key('ribosome') == _key(' ribosome. ')
+
+
+def test_mcq_letters_are_cacheable(tmp_path):
+    cache = MarkingCache(str(tmp_path / 'cache.sqlite3'))
+    key = _key('A')
+    assert key is not None
+    cache.put(key, 'q1', {'marks_awarded': 1})
+    assert cache.get(_key('A.')) == {'marks_awarded': 1}
+    assert cache.get(_key('B')) is None
+
+
+def test_blank_and_long_answers_are_not_cached():
+    assert _key('  ') is None
+    assert _key('x' * 501) is None
@@ -0,0 +1,101 @@
+from marking_rules import normalize_answer, rule_mark
+
+
+def _mark(points, answer, max_marks=1, question='Name the structure.'):
+    ms = {'max_marks': max_marks, 'marking_points': points}
+    return rule_mark({'question_text': question, 'marks': max_marks}, ms, answer)
+
+
+def _marks(points, answer, max_marks=1):
+    result = _mark(points, answer, max_marks)
+    return None if result is None else result['marks_awarded']
+
+
+VITAMIN_A = [{'answer': 'vitamin A', 'marks': 1, 'keywords': ['vitamin A']}]
+RIBOSOME = [{'answer': 'Ribosome', 'marks': 1, 'keywords': ['ribosome']}]
+
+
+def test_normalize_keeps_single_letters_and_inner_articles():
+    assert normalize_answer('Vitamin A') == 'vitamin a'
+    assert normalize_answer('The nucleus.') == 'nucleus'
+    assert normalize_answer('site of the reaction') == 'site of the reaction'
+
+
+def test_single_letter_keywords_must_match():
+    assert _marks(VITAMIN_A, 'vitamin A') == 1
+    assert _marks(VITAMIN_A, 'Vitamin A.') == 1
+    assert _marks(VITAMIN_A, 'vitamin c') is None
+    assert _marks(VITAMIN_A, 'vitamin D') is None
+
+
+def test_keyword_match():
+    assert _marks(RIBOSOME, 'the ribosomes') == 1
+    assert _mark(RIBOSOME, 'ribosome')['marked_by'] == 'rules:keywords'
+
+
+def test_listed_or_hedged_answers_go_to_ai():
+    assert _marks(RIBOSOME, 'ribosome and nucleus') is None
+    assert _marks(RIBOSOME, 'ribosome or nucleus') is None
+    assert _marks(RIBOSOME, 'ribosome, nucleus') is None
+    assert _marks(RIBOSOME, 'not the ribosome') is None
+
+
+def test_listed_answer_that_is_the_scheme_answer():
+    points = [{'answer': 'glucose and oxygen', 'marks': 1, 'keywords': []}]
+    assert _marks(points, 'Glucose and oxygen') == 1
+
+
+def test_numeric_final_answer_implies_method_marks():
+    points = [
+        {'answer': 'Correct substitution 5 x 2.5', 'marks': 1},
+        {'answer': '12.5', 'marks': 1},
+    ]
+    assert _marks(points, '5 x 2.5 = 12.5', max_marks=2) == 2
+    assert _marks(points, '12.0', max_marks=2) is None
+
+
+def test_numeric_needs_every_other_point():
+    points = [
+        {'answer': '46', 'marks': 1},
+        {'answer': 'gamete 23', 'marks': 1, 'keywords': ['gamete', '23']},
+    ]
+    assert _marks(points, '46', max_marks=2) is None
+
+
+def test_numeric_hedges_and_negations_go_to_ai():
+    points = [{'answer': '12.5', 'marks': 3}]
+    assert _marks(points, '11 or 12.5', max_marks=3) is None
+    assert _marks(points, 'not 12.5', max_marks=3) is None
+    assert _marks([{'answer': '1,000', 'marks': 1}], '1,000') == 1
+
+
+def test_mcq_letters():
+    points = [{'answer': 'B', 'marks': 1}]
+    assert _marks(points, 'B') == 1
+    assert _marks(points, '(c)') == 0
+
+
+def test_one_keyword_is_not_the_whole_point():
+    points = [{'answer': 'glucose and oxygen', 'marks': 1, 'keywords': ['glucose', 'oxygen']}]
+    assert _marks(points, 'glucose') is None
+    site = [{'answer': 'site of protein synthesis', 'marks': 1, 'keywords': ['protein synthesis']}]
+    assert _marks(site, 'protein') is None
+    assert _marks(site, 'protein synthesis') == 1
+
+
+def test_negating_phrases_and_extra_words_go_to_ai():
+    oxygen = [{'answer': 'oxygen', 'marks': 1, 'keywords': ['oxygen']}]
+    assert _marks(oxygen, 'lack of oxygen') is None
+    assert _marks(oxygen, 'absence of oxygen') is None
+    assert _marks(oxygen, 'oxygen debt') is None
+    assert _marks(oxygen, 'it is oxygen') == 1
+    assert _marks([{'answer': 'lack of oxygen', 'marks': 1, 'keywords': ['oxygen']}], 'Lack of oxygen') == 1
+
+
+def test_numeric_units_must_agree():
+    points = [{'answer': '12.5 m/s', 'marks': 2}]
+    assert _marks(points, '12.5 kg', max_marks=2) is None
+    assert _marks(points, '12.5 m/s', max_marks=2) == 2
+    assert _marks(points, '25 / 2 = 12.5 m s^-1', max_marks=2) == 2
+    assert _marks(points, '12.5', max_marks=2) == 2
+    assert _marks([{'answer': '9.8 m/s2', 'marks': 1}], '9.8 m/s2') == 1
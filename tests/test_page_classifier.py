@@ -0,0 +1,27 @@
+from page_classifier import APPENDIX, CONTENT, PageFeatures, classify_page
+
+
+def _classify(text, page_number=5):
+    return classify_page(PageFeatures(page_number=page_number, total_pages=24, text=text, ink_ratio=0.3))[0]
+
+
+def test_ocr_question_page_mentioning_the_data_sheet_is_content():
+    text = (
+        "(b) Use the Periodic Table to identify the element with atomic number 12.\n"
+        "..........................................................................\n"
+        "[2]\n"
+        "(c) Use the data sheet to calculate the relative formula mass of MgO.\n"
+        "..........................................................................\n"
+        "[3]\n"
+    )
+    assert _classify(text) == CONTENT
+
+
+def test_edexcel_bare_mark_allocation_is_a_question_marker():
+    text = "Use the equation sheet to calculate the speed of the trolley.\n.............. m/s\n(2)\n"
+    assert _classify(text) == CONTENT
+
+
+def test_data_sheet_heading_is_appendix():
+    text = "Data Sheet\nThe Periodic Table of the Elements\n1 H hydrogen 1.0\n2 He helium 4.0\n" + "Li Be B C N O F Ne\n" * 5
+    assert _classify(text, page_number=24) == APPENDIX
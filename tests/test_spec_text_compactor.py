@@ -0,0 +1,39 @@
+from spec_text_compactor import compact_pages, looks_like_header_footer
+
+
+def test_board_footers_and_page_numbers():
+    assert looks_like_header_footer('© WJEC CBAC Ltd.')
+    assert looks_like_header_footer('© Eduqas 2016')
+    assert looks_like_header_footer('Eduqas')
+    assert looks_like_header_footer('12')
+    assert looks_like_header_footer('Page 3 of 40')
+    assert not looks_like_header_footer('Eduqas GCSE (9-1) in Geology')
+
+
+def test_lettered_list_items_are_not_copyright_lines():
+    assert looks_like_header_footer('(c) WJEC 2016')
+    assert not looks_like_header_footer('(c) describe the structure of DNA')
+
+
+def test_prefixes_only_match_the_start_of_a_line():
+    prefixes = ('GCSE GEOGRAPHY',)
+    assert looks_like_header_footer('GCSE GEOGRAPHY 14', prefixes=prefixes)
+    assert not looks_like_header_footer('Unit 1 GCSE GEOGRAPHY themes', prefixes=prefixes)
+
+
+def test_compaction_keeps_lettered_points():
+    pages, stats = compact_pages(['1.1 Cells\n(c) describe osmosis\n© WJEC CBAC Ltd.\n3'])
+    assert pages == ['1.1 Cells\n(c) describe osmosis']
+    assert stats['lines_removed'] == 2
+
+
+def test_per_page_topic_headings_survive_compaction():
+    pages = [
+        f"Topic {n}\nGCSE (9-1) Biology A Specification | {10 + n}\nContent for topic {n} goes here."
+        for n in range(1, 5)
+    ]
+    compacted, stats = compact_pages(pages)
+    text = "\n".join(compacted)
+    for n in range(1, 5):
+        assert f"Topic {n}" in text
+    assert text.count("Biology A Specification") == 1
@@ -0,0 +1,22 @@
+from utils.stage_store import StageStore
+
+
+def test_checkpoint_is_reused_for_the_same_inputs(tmp_path):
+    calls = []
+    store = StageStore(tmp_path, 'Biology_GCSE')
+    compute = lambda: calls.append(1) or b'%PDF-1'
+    assert store.run('pdf', ['url', 'etag-1'], compute, kind='bytes') == b'%PDF-1'
+    assert StageStore(tmp_path, 'Biology_GCSE').run('pdf', ['url', 'etag-1'], compute, kind='bytes') == b'%PDF-1'
+    assert len(calls) == 1
+
+
+def test_refresh_recomputes_and_saves_the_fresh_output(tmp_path):
+    store = StageStore(tmp_path, 'Biology_GCSE')
+    store.run('pdf', ['url', None], lambda: b'%PDF-old', kind='bytes')
+    old_hash = store.output_hash('pdf')
+
+    rerun = StageStore(tmp_path, 'Biology_GCSE')
+    assert rerun.run('pdf', ['url', None], lambda: b'%PDF-new', kind='bytes', refresh=True) == b'%PDF-new'
+    assert rerun.output_hash('pdf') != old_hash
+    assert rerun.resumed == []
+    assert StageStore(tmp_path, 'Biology_GCSE').run('pdf', ['url', None], lambda: None, kind='bytes') == b'%PDF-new'
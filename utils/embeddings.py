@@ -0,0 +1,73 @@
+"""
+OpenAI embedding helper for the batch jobs (question tagging, topic embeddings).
+
+Sends texts in large batches (the API accepts up to 2048 inputs per request),
+embeds each distinct text once and returns a float32 matrix in input order.
+"""
+
+import os
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from utils.logger import get_logger
+
+logger = get_logger()
+
+DEFAULT_MODEL = 'text-embedding-3-small'
+DEFAULT_BATCH_SIZE = 512
+MAX_INPUT_CHARS = 8000  # well under the 8191-token input limit
+
+_client = None
+
+
+def get_openai_client():
+    global _client
+    if _client is None:
+        from openai import OpenAI  # type: ignore
+
+        api_key = (os.getenv('OPENAI_API_KEY') or '').strip()
+        if not api_key:
+            raise RuntimeError('OPENAI_API_KEY not set')
+        _client = OpenAI(api_key=api_key)
+    return _client
+
+
+def embed_texts(texts: Sequence[str], model: str = DEFAULT_MODEL, batch_size: int = DEFAULT_BATCH_SIZE,
+                dimensions: Optional[int] = None, retries: int = 5) -> np.ndarray:
+    """
+    Embed `texts` -> (len(texts) x dim) float32 matrix.
+
+    Args:
+        texts: Input strings (blank strings embed as a single space)
+        model: OpenAI embedding model
+        batch_size: Inputs per request
+        dimensions: Shortened output size (text-embedding-3-* only); None = model default
+        retries: Attempts per batch on transient API errors
+    """
+    cleaned = [(t or ' ')[:MAX_INPUT_CHARS] for t in texts]
+    unique: List[str] = list(dict.fromkeys(cleaned))
+    position = {t: i for i, t in enumerate(unique)}
+    client = get_openai_client()
+    extra = {'dimensions': dimensions} if dimensions else {}
+
+    vectors: List[List[float]] = []
+    for start in range(0, len(unique), batch_size):
+        batch = unique[start:start + batch_size]
+        for attempt in range(retries):
+            try:
+                res = client.embeddings.create(model=model, input=batch, **extra)
+                break
+            except Exception as e:
+                if attempt == retries - 1:
+                    raise
+                wait = min(30.0, 1.0 * (2 ** attempt))
+                logger.warning(f"Embedding batch failed ({e}); retrying in {wait:.0f}s")
+                time.sleep(wait)
+        vectors.extend(d.embedding for d in sorted(res.data, key=lambda d: d.index))
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if not len(cleaned):
+        return matrix.reshape(0, dimensions or 0)
+    return matrix[[position[t] for t in cleaned]]
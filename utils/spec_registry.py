@@ -0,0 +1,156 @@
+"""
+Spec registry: skip subjects whose specification hasn't changed.
+
+Records, per subject, the spec PDF URL, its ETag / Last-Modified, the sha1 of the
+PDF bytes, the spec version string and when it was last processed successfully.
+Before re-scraping a subject a batch run asks `check()`, which sends one conditional
+HEAD (If-None-Match / If-Modified-Since). A 304 or matching validators means the
+spec is unchanged and the subject is skipped unless forced. When the server gives
+no validators, callers that download the PDF anyway can still skip processing via
+`content_unchanged()`.
+
+Usage:
+    registry = SpecRegistry()
+    check = registry.check("aqa-pdf-batch/Biology_A-Level", pdf_url, force=args.force)
+    if not check.changed:
+        return  # skip
+    ...process...
+    registry.record(key, pdf_url, check, content=pdf_bytes, version=spec_version)
+"""
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import requests
+
+from utils.logger import get_logger
+
+logger = get_logger()
+
+DEFAULT_REGISTRY_FILE = Path(__file__).resolve().parent.parent / 'data' / 'state' / 'spec_registry.json'
+
+_VERSION_RE = re.compile(
+    r"\b(?:version|issue)\s*:?\s*(\d+(?:\.\d+)*)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class SpecCheck:
+    changed: bool
+    reason: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def validator(self) -> Optional[str]:
+        """ETag or Last-Modified (whichever the server sent) for cache keys."""
+        return self.etag or self.last_modified
+
+
+def spec_version(text: str, head_chars: int = 5000) -> Optional[str]:
+    """'Version 2.1' / 'Issue 3' from the first pages of a spec (None if absent)."""
+    match = _VERSION_RE.search(text[:head_chars] if text else "")
+    return match.group(1) if match else None
+
+
+class SpecRegistry:
+    """JSON-file registry of processed spec PDFs, shared by the batch scrapers."""
+
+    def __init__(self, path=DEFAULT_REGISTRY_FILE, timeout: int = 20):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.entries = self._load()
+
+    def _load(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            logger.warning(f"Ignoring unreadable spec registry {self.path}")
+            return {}
+
+    def _save(self):
+        # Other batch runs may have recorded subjects since we loaded: merge, ours win
+        merged = self._load()
+        merged.update(self.entries)
+        self.entries = merged
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(json.dumps(self.entries, indent=2, sort_keys=True), encoding='utf-8')
+        os.replace(tmp, self.path)
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.entries.get(key)
+
+    def check(self, key: str, url: str, force: bool = False) -> SpecCheck:
+        """Has the spec at `url` changed since `key` was last processed?"""
+        entry = self.entries.get(key)
+        if force:
+            return SpecCheck(True, "forced", *self._head(url, {}))
+        if not entry or not entry.get('processed_at'):
+            return SpecCheck(True, "not processed before", *self._head(url, {}))
+        if entry.get('url') != url:
+            return SpecCheck(True, "spec URL changed", *self._head(url, {}))
+
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            response = requests.head(url, headers=headers, timeout=self.timeout, allow_redirects=True)
+        except requests.RequestException as e:
+            return SpecCheck(True, f"HEAD failed ({e})")
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code == 304:
+            return SpecCheck(False, "not modified (304)", entry.get('etag'), entry.get('last_modified'))
+        if response.status_code >= 400:
+            return SpecCheck(True, f"HEAD returned HTTP {response.status_code}")
+        if etag and etag == entry.get('etag'):
+            return SpecCheck(False, "same ETag", etag, last_modified)
+        if not etag and last_modified and last_modified == entry.get('last_modified'):
+            return SpecCheck(False, "same Last-Modified", etag, last_modified)
+        if not etag and not last_modified:
+            return SpecCheck(True, "no validators from server")
+        return SpecCheck(True, "spec modified", etag, last_modified)
+
+    def _head(self, url: str, headers: dict):
+        try:
+            response = requests.head(url, headers=headers, timeout=self.timeout, allow_redirects=True)
+            if response.status_code < 400:
+                return response.headers.get('ETag'), response.headers.get('Last-Modified')
+        except requests.RequestException:
+            pass
+        return None, None
+
+    def content_unchanged(self, key: str, content: bytes = None, content_hash: str = None) -> bool:
+        """True when these PDF bytes match the last processed ones."""
+        entry = self.entries.get(key)
+        if not entry or not entry.get('processed_at'):
+            return False
+        digest = content_hash or (hashlib.sha1(content).hexdigest() if content else None)
+        return bool(digest) and digest == entry.get('content_hash')
+
+    def record(self, key: str, url: str, check: SpecCheck = None, content: bytes = None,
+               content_hash: str = None, version: str = None):
+        """Mark `key` as successfully processed from this spec."""
+        previous = self.entries.get(key, {})
+        self.entries[key] = {
+            'url': url,
+            'etag': check.etag if check else None,
+            'last_modified': check.last_modified if check else None,
+            'content_hash': content_hash or (hashlib.sha1(content).hexdigest() if content else None),
+            'version': version or previous.get('version'),
+            'processed_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        self._save()
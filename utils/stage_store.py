@@ -0,0 +1,164 @@
+"""
+Per-subject stage store for resumable scraping pipelines.
+
+Each pipeline stage (URL discovery, PDF bytes, text, analysis, AI hierarchy,
+parsed topics, upload result) is saved under the subject's directory together with
+the hash of the inputs it was computed from. A rerun recomputes a stage only when it
+has no saved output, its inputs changed (e.g. the PDF bytes behind the URL changed,
+so text, analysis and hierarchy are invalidated in turn) or it is older than its
+max_age. A failed upload therefore reruns in seconds from the saved topics without
+spending any tokens.
+
+Usage:
+    store = StageStore(root, "Biology_A-Level")
+    pdf = store.run('pdf', [pdf_url], lambda: download(pdf_url), kind='bytes')
+    text = store.run('text', [store.output_hash('pdf')], lambda: extract(pdf), kind='text')
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger()
+
+_EXTENSIONS = {'json': '.json', 'text': '.txt', 'bytes': '.bin'}
+
+
+def content_hash(value: Any) -> str:
+    """Stable sha1 of bytes, text or any JSON-serialisable value."""
+    if isinstance(value, bytes):
+        raw = value
+    elif isinstance(value, str):
+        raw = value.encode('utf-8')
+    else:
+        raw = json.dumps(value, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()
+
+
+def file_hash(path) -> Optional[str]:
+    """sha1 of a file's bytes (None if it doesn't exist)."""
+    if not path or not os.path.exists(path):
+        return None
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StageStore:
+    """Content-hash keyed checkpoints for one subject's pipeline stages."""
+
+    def __init__(self, root, subject_key: str, stages: Iterable[str] = (), refresh_from: str = None,
+                 enabled: bool = True):
+        """
+        Args:
+            root: Directory holding one sub-directory per subject
+            subject_key: Subject identifier (e.g. "Biology_A-Level")
+            stages: Pipeline stage names in order (needed for refresh_from)
+            refresh_from: Recompute this stage and every later one, ignoring saved outputs
+            enabled: False disables reading and writing (always recompute)
+        """
+        safe_key = re.sub(r'[^A-Za-z0-9_.-]+', '_', subject_key).strip('_') or 'subject'
+        self.dir = Path(root) / safe_key
+        self.enabled = enabled
+        self.stages = list(stages)
+        self.forced = set()
+        if refresh_from:
+            if refresh_from not in self.stages:
+                raise ValueError(f"Unknown stage '{refresh_from}' (stages: {', '.join(self.stages)})")
+            self.forced = set(self.stages[self.stages.index(refresh_from):])
+        self._manifest_path = self.dir / 'manifest.json'
+        self.manifest = self._load_manifest()
+        self.resumed = []
+
+    def _load_manifest(self) -> dict:
+        if not self.enabled or not self._manifest_path.exists():
+            return {}
+        try:
+            return json.loads(self._manifest_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            logger.warning(f"Ignoring unreadable stage manifest {self._manifest_path}")
+            return {}
+
+    def _write_atomic(self, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def output_hash(self, stage: str) -> Optional[str]:
+        """Hash of a stage's saved output (use it as an input of later stages)."""
+        return self.manifest.get(stage, {}).get('output_hash')
+
+    def get(self, stage: str, input_hash: str, max_age: float = None):
+        """Saved output for `stage` if it was computed from `input_hash` (else None)."""
+        if not self.enabled or stage in self.forced:
+            return None
+        entry = self.manifest.get(stage)
+        if not entry or entry.get('input_hash') != input_hash:
+            return None
+        if max_age is not None and time.time() - entry.get('saved_at', 0) > max_age:
+            return None
+        path = self.dir / entry['file']
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        kind = entry.get('kind', 'json')
+        if kind == 'bytes':
+            return data
+        if kind == 'text':
+            return data.decode('utf-8')
+        return json.loads(data.decode('utf-8'))
+
+    def put(self, stage: str, input_hash: str, value, kind: str = 'json') -> str:
+        """Save a stage output; returns its content hash."""
+        if kind == 'bytes':
+            data = value
+        elif kind == 'text':
+            data = value.encode('utf-8')
+        else:
+            data = json.dumps(value, indent=2, default=str).encode('utf-8')
+        output_hash = content_hash(data if kind != 'json' else value)
+        if self.enabled:
+            filename = f"{stage}{_EXTENSIONS[kind]}"
+            self._write_atomic(self.dir / filename, data)
+            self.manifest[stage] = {
+                'input_hash': input_hash,
+                'output_hash': output_hash,
+                'file': filename,
+                'kind': kind,
+                'saved_at': time.time(),
+            }
+            self._write_atomic(self._manifest_path, json.dumps(self.manifest, indent=2).encode('utf-8'))
+        else:
+            self.manifest[stage] = {'input_hash': input_hash, 'output_hash': output_hash}
+        return output_hash
+
+    def run(self, stage: str, inputs: list, compute: Callable[[], Any], kind: str = 'json',
+            max_age: float = None, valid: Callable[[Any], Any] = bool, refresh: bool = False):
+        """
+        Return the saved output of `stage` for these inputs, or compute and save it.
+        Results failing `valid` (default: falsy ones - None, False, empty) are returned
+        but never saved, so a failed stage is retried on the next run.
+        refresh=True always recomputes (and saves) - for inputs that can't identify the
+        output, e.g. a URL whose server sends no ETag/Last-Modified.
+        """
+        input_hash = content_hash([stage] + list(inputs))
+        cached = None if refresh else self.get(stage, input_hash, max_age)
+        if cached is not None:
+            logger.info(f"[STAGE] {stage}: reusing checkpoint")
+            self.resumed.append(stage)
+            return cached
+        value = compute()
+        if value is not None and valid(value):
+            self.put(stage, input_hash, value, kind)
+        return value
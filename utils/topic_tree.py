@@ -0,0 +1,116 @@
+"""
+Client-side topic hierarchy: full paths, depth, pre-order position and ancestors.
+
+Computes in one linear pass over an in-memory topic list what the topics_with_context
+view builds recursively server-side. Each node's path and ancestor tuple extend its
+parent's (already computed) ones, so nothing is walked twice and deep trees don't
+recurse.
+
+Usage:
+    tree = build_tree(stg_topics)
+    for topic_id in tree.order:
+        node = tree[topic_id]
+        print(node.sort_order, " > ".join(node.full_path))
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class TreeNode:
+    id: str
+    full_path: Tuple[str, ...]       # names from the root down to this topic
+    depth: int                       # 0 for roots
+    sort_order: int                  # pre-order position (parents before children, siblings by key)
+    ancestors: Tuple[str, ...]       # ids from the root down to the parent
+    parent_id: Optional[str] = None
+
+
+@dataclass
+class TopicTree:
+    nodes: Dict[str, TreeNode] = field(default_factory=dict)
+    order: List[str] = field(default_factory=list)        # ids in pre-order
+    roots: List[str] = field(default_factory=list)
+    orphans: List[str] = field(default_factory=list)      # parent id given but not in the list
+    unreachable: List[str] = field(default_factory=list)  # on a parent cycle; not in nodes
+
+    def __getitem__(self, topic_id: str) -> TreeNode:
+        return self.nodes[topic_id]
+
+    def __contains__(self, topic_id) -> bool:
+        return topic_id in self.nodes
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def get(self, topic_id: str) -> Optional[TreeNode]:
+        return self.nodes.get(topic_id)
+
+
+def _default_sibling_key(topic: Mapping[str, Any]):
+    return (str(topic.get('topic_code') or ''), str(topic.get('id') or ''))
+
+
+def build_tree(topics: Iterable[Mapping[str, Any]], id_key: str = 'id',
+               parent_key: str = 'parent_topic_id', name_key: str = 'topic_name',
+               sibling_key: Callable[[Mapping[str, Any]], Any] = _default_sibling_key) -> TopicTree:
+    """
+    Index a flat topic list by position in its hierarchy.
+
+    Args:
+        topics: Rows with an id, a parent id (None for roots) and a name
+        id_key / parent_key / name_key: Column names in those rows
+        sibling_key: Order of children under one parent (default: topic_code, then id)
+
+    Topics whose parent is missing from the list are treated as roots (and listed in
+    `orphans`); topics on a parent cycle are listed in `unreachable`.
+    """
+    by_id: Dict[str, Mapping[str, Any]] = {}
+    for t in topics:
+        if t.get(id_key) is not None:
+            by_id[str(t[id_key])] = t
+
+    tree = TopicTree()
+    children: Dict[str, List[Mapping[str, Any]]] = {}
+    roots: List[Mapping[str, Any]] = []
+    for topic_id, t in by_id.items():
+        parent = t.get(parent_key)
+        parent = str(parent) if parent is not None else None
+        if parent is None or parent == topic_id:
+            roots.append(t)
+        elif parent not in by_id:
+            tree.orphans.append(topic_id)
+            roots.append(t)
+        else:
+            children.setdefault(parent, []).append(t)
+
+    # Stack holds siblings reversed so the smallest key pops first -> pre-order
+    stack: List[Tuple[Mapping[str, Any], Optional[TreeNode]]] = [
+        (t, None) for t in sorted(roots, key=sibling_key, reverse=True)
+    ]
+    while stack:
+        t, parent_node = stack.pop()
+        topic_id = str(t[id_key])
+        name = str(t.get(name_key) or '')
+        if parent_node is None:
+            node = TreeNode(topic_id, (name,), 0, len(tree.order), ())
+            tree.roots.append(topic_id)
+        else:
+            node = TreeNode(
+                topic_id,
+                parent_node.full_path + (name,),
+                parent_node.depth + 1,
+                len(tree.order),
+                parent_node.ancestors + (parent_node.id,),
+                parent_node.id,
+            )
+        tree.nodes[topic_id] = node
+        tree.order.append(topic_id)
+        kids = children.get(topic_id)
+        if kids:
+            stack.extend((c, node) for c in sorted(kids, key=sibling_key, reverse=True))
+
+    if len(tree.nodes) < len(by_id):
+        tree.unreachable = [topic_id for topic_id in by_id if topic_id not in tree.nodes]
+    return tree